@@ -0,0 +1,208 @@
+"""
+In-App Job Scheduler
+
+Runs the daily jobs inside the API process on its asyncio event loop:
+- audit_retention:        archive old audit entries (AUDIT_ARCHIVE_TIME, default 03:00)
+- digest_purge:           delete handled digest items (DIGEST_PURGE_TIME, default 03:30)
+- contract_renewals:      auto-renew expired contracts (CONTRACT_RENEWAL_TIME, default 07:30)
+- contract_notifications: contract end emails (CONTRACT_NOTIFICATION_TIME, default 08:00)
+
+With several API workers or replicas, every worker runs a scheduler but only
+the leader runs jobs. Leadership is a lease in the scheduler_locks table:
+each tick the leader renews it with a conditional UPDATE, and another worker
+takes over once it has expired (the leader died) or was released (the
+leader shut down). Being plain row updates, this works on PostgreSQL and on
+SQLite alike.
+
+A daily job is claimed in scheduled_jobs before it starts (one run per local
+date), so even a leader change in the middle of the day cannot run it twice.
+Jobs are blocking and run in a worker thread, off the event loop.
+
+Started with the API (see main.start_app_scheduler, disabled with
+APP_SCHEDULER_ENABLED=false), or as its own process:
+    python -m backend.app_scheduler
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, time
+from typing import Callable, Dict, List, NamedTuple, Optional
+from uuid import uuid4
+
+from .database import SessionLocal
+from .db_repositories import DBSchedulerRepository
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "app_scheduler"
+
+
+class ScheduledJob(NamedTuple):
+    name: str
+    at: time  # Local time of day
+    func: Callable[[], None]
+
+
+def _parse_time(value: str) -> time:
+    hours, minutes = value.split(":")
+    return time(int(hours), int(minutes))
+
+
+def default_jobs() -> List[ScheduledJob]:
+    from .notification_scheduler import check_and_renew_contracts, check_and_send_contract_notifications
+    from .audit_archive import archive_old_audit_logs
+    from .notification_digest import purge_old_digest_items
+
+    return [
+        ScheduledJob("audit_retention", _parse_time(os.getenv("AUDIT_ARCHIVE_TIME", "03:00")),
+                     archive_old_audit_logs),
+        ScheduledJob("digest_purge", _parse_time(os.getenv("DIGEST_PURGE_TIME", "03:30")),
+                     purge_old_digest_items),
+        ScheduledJob("contract_renewals", _parse_time(os.getenv("CONTRACT_RENEWAL_TIME", "07:30")),
+                     check_and_renew_contracts),
+        ScheduledJob("contract_notifications", _parse_time(os.getenv("CONTRACT_NOTIFICATION_TIME", "08:00")),
+                     check_and_send_contract_notifications),
+    ]
+
+
+class AppScheduler:
+    """Runs daily jobs on exactly one worker, elected through a database lease."""
+
+    def __init__(self, jobs: List[ScheduledJob], session_factory: Callable = SessionLocal,
+                 tick_seconds: float = 30.0, lock_ttl: float = 90.0, lock_name: str = LOCK_NAME,
+                 instance_id: Optional[str] = None):
+        self.jobs = jobs
+        self.session_factory = session_factory
+        self.tick_seconds = tick_seconds
+        self.lock_ttl = lock_ttl
+        self.lock_name = lock_name
+        self.instance_id = instance_id or f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.is_leader = False
+        self.running: Dict[str, asyncio.Task] = {}
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "AppScheduler":
+        return cls(
+            default_jobs(),
+            tick_seconds=float(os.getenv("APP_SCHEDULER_TICK", "30")),
+            lock_ttl=float(os.getenv("APP_SCHEDULER_LOCK_TTL", "90")),
+        )
+
+    def _elect_and_claim(self, now: datetime, running: List[str]) -> List[ScheduledJob]:
+        """Renew or take the lease; as leader, claim the jobs due at `now`."""
+        db = self.session_factory()
+        try:
+            repo = DBSchedulerRepository(db)
+            self.is_leader = repo.try_acquire_lock(self.lock_name, self.instance_id, self.lock_ttl)
+            if not self.is_leader:
+                return []
+            return [
+                job for job in self.jobs
+                if job.name not in running and now.time() >= job.at
+                and repo.claim_job(job.name, now.date().isoformat(), self.instance_id)
+            ]
+        finally:
+            db.close()
+
+    def _finish(self, name: str, error: Optional[str]) -> None:
+        db = self.session_factory()
+        try:
+            DBSchedulerRepository(db).finish_job(name, error)
+        finally:
+            db.close()
+
+    async def _run_job(self, job: ScheduledJob) -> None:
+        logger.info(f"Running scheduled job {job.name}")
+        error = None
+        try:
+            await asyncio.to_thread(job.func)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Scheduled job {job.name} failed: {error}")
+        try:
+            await asyncio.to_thread(self._finish, job.name, error)
+        except Exception as e:
+            logger.error(f"Could not record the end of scheduled job {job.name}: {str(e)}")
+
+    async def tick(self, now: Optional[datetime] = None) -> List[asyncio.Task]:
+        """
+        One scheduling pass: elect, then start the jobs that are due.
+
+        Returns:
+            Tasks of the jobs started by this pass
+        """
+        self.running = {name: task for name, task in self.running.items() if not task.done()}
+        due = await asyncio.to_thread(self._elect_and_claim, now or datetime.now(), list(self.running))
+        started = []
+        for job in due:
+            task = asyncio.create_task(self._run_job(job))
+            self.running[job.name] = task
+            started.append(task)
+        return started
+
+    async def run_forever(self) -> None:
+        self._stopping = self._stopping or asyncio.Event()
+        logger.info(f"App scheduler {self.instance_id} started")
+        while not self._stopping.is_set():
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"App scheduler tick failed: {str(e)}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.tick_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start on the running event loop (call from an async startup hook)."""
+        if self._task and not self._task.done():
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self.run_forever())
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop ticking, wait up to `timeout` seconds for running jobs, then release the lease."""
+        if self._stopping:
+            self._stopping.set()
+        if self._task:
+            await self._task
+            self._task = None
+        running = [task for task in self.running.values() if not task.done()]
+        if running:
+            await asyncio.wait(running, timeout=timeout)
+        if self.is_leader:
+            db = self.session_factory()
+            try:
+                DBSchedulerRepository(db).release_lock(self.lock_name, self.instance_id)
+            finally:
+                db.close()
+            self.is_leader = False
+
+    def status(self, repo: DBSchedulerRepository) -> Dict:
+        """This worker's view: its identity, the current leader and every job's last run."""
+        lock = repo.get_lock(self.lock_name)
+        states = {state.name: state for state in repo.get_jobs()}
+        return {
+            "instance_id": self.instance_id,
+            "running": self._task is not None and not self._task.done(),
+            "is_leader": self.is_leader,
+            "leader": {"instance_id": lock[0], "lease_expires_at": lock[1]} if lock else None,
+            "jobs": [
+                {
+                    "name": job.name,
+                    "at": job.at.strftime("%H:%M"),
+                    "running_here": job.name in self.running and not self.running[job.name].done(),
+                    **(states[job.name].model_dump(exclude={'name'}) if job.name in states else {}),
+                }
+                for job in self.jobs
+            ],
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(AppScheduler.from_env().run_forever())
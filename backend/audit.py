@@ -3,25 +3,61 @@ Audit Logging Module
 
 Provides functions to log critical user actions for security,
 compliance, and debugging purposes.
+
+Entries are written by the buffered AuditWriter: log_audit hands the row to
+it and returns, and the writer inserts rows in bulk once batch_size rows are
+waiting or every flush_interval seconds, and at shutdown. Security-critical
+actions (DURABLE_ACTIONS, e.g. failed logins) are committed before
+log_audit returns instead.
 """
 
+import csv
+import io
+import ipaddress
 import json
-from typing import Optional, Dict, Any
-from uuid import UUID
+import logging
+import os
+import threading
+from typing import Optional, Dict, Any, Iterable, Iterator, List
+from uuid import UUID, uuid4
 from datetime import datetime
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from fastapi import Request
 
-from .database import AuditLogModel
-from .models import User
+from .audit_lookups import ip_addresses, user_agents
+from .database import AuditLogModel, SessionLocal
+from .models import AuditLog, User
+from .pagination import encode_cursor, decode_cursor, InvalidCursorError
+
+logger = logging.getLogger(__name__)
+
+
+# Reverse proxies (addresses or networks) whose X-Forwarded-For/X-Real-IP headers are trusted
+TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(address.strip(), strict=False)
+    for address in os.getenv("TRUSTED_PROXIES", "").split(",") if address.strip()
+)
+
+# User-Agent headers are client-controlled; longer values are cut to this length
+USER_AGENT_MAX_LENGTH = 512
+
+
+def _is_trusted_proxy(address: Optional[str]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
 
 
 def get_client_ip(request: Request) -> str:
     """
     Extract client IP address from request headers.
 
-    Checks for proxy headers (X-Forwarded-For, X-Real-IP) first,
-    then falls back to direct client IP.
+    Proxy headers (X-Forwarded-For, X-Real-IP) are only used when the
+    request comes from one of TRUSTED_PROXIES; anyone else could send
+    arbitrary values in them. Otherwise the direct client IP is returned.
 
     Args:
         request: FastAPI Request object
@@ -29,21 +65,153 @@ def get_client_ip(request: Request) -> str:
     Returns:
         str: Client IP address
     """
-    # Check for X-Forwarded-For header (from proxies/load balancers)
-    if "X-Forwarded-For" in request.headers:
-        # X-Forwarded-For can contain multiple IPs (client, proxy1, proxy2...)
-        # The first IP is the original client
-        return request.headers["X-Forwarded-For"].split(",")[0].strip()
+    direct_ip = request.client.host if request.client else None
+
+    if _is_trusted_proxy(direct_ip):
+        # Check for X-Forwarded-For header (from proxies/load balancers)
+        if "X-Forwarded-For" in request.headers:
+            # X-Forwarded-For can contain multiple IPs (client, proxy1, proxy2...)
+            # The first IP is the original client
+            return request.headers["X-Forwarded-For"].split(",")[0].strip()
 
-    # Check for X-Real-IP header (from Nginx)
-    if "X-Real-IP" in request.headers:
-        return request.headers["X-Real-IP"]
+        # Check for X-Real-IP header (from Nginx)
+        if "X-Real-IP" in request.headers:
+            return request.headers["X-Real-IP"]
 
     # Fallback to direct client IP
-    if request.client:
-        return request.client.host
+    return direct_ip or "unknown"
 
-    return "unknown"
+
+def normalize_user_agent(user_agent: Optional[str]) -> Optional[str]:
+    """User-Agent header with whitespace collapsed, cut to USER_AGENT_MAX_LENGTH."""
+    if not user_agent:
+        return None
+    return " ".join(user_agent.split())[:USER_AGENT_MAX_LENGTH] or None
+
+
+class AuditWriter:
+    """
+    Collects audit rows in memory and writes them with bulk INSERTs.
+
+    Rows are flushed by a daemon thread once batch_size rows are waiting or
+    flush_interval seconds have passed, and by stop(). Until start() is
+    called (scripts, tests) every submitted row is written immediately.
+    If a flush fails the rows are kept for the next one, up to max_buffer.
+
+    The flush also interns the rows' IP addresses and user agents (see
+    backend.audit_lookups), so request handlers never wait for a lookup
+    table insert.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = 200,
+                 flush_interval: float = 2.0, max_buffer: int = 10000):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "AuditWriter":
+        return cls(
+            batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "200")),
+            flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", "2")),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @staticmethod
+    def _values(row: AuditLogModel) -> Dict[str, Any]:
+        values = {column.name: getattr(row, column.name) for column in AuditLogModel.__table__.columns}
+        values['id'] = values['id'] or uuid4()
+        return values
+
+    @staticmethod
+    def _intern_client_values(rows: List[Dict[str, Any]]) -> None:
+        """Replace text IP addresses/user agents by lookup ids (kept as text if that fails)."""
+        for values in rows:
+            for column, dictionary in (('ip_address', ip_addresses), ('user_agent', user_agents)):
+                if values[column] and values[f'{column}_id'] is None:
+                    value_id = dictionary.id_for(values[column])
+                    if value_id is not None:
+                        values[f'{column}_id'], values[column] = value_id, None
+
+    def submit(self, row: AuditLogModel) -> None:
+        """Queue a row for the next bulk insert."""
+        with self._lock:
+            self._buffer.append(self._values(row))
+            pending = len(self._buffer)
+        if not self.running:
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self) -> int:
+        """Insert all buffered rows. Returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            db = None
+            try:
+                self._intern_client_values(rows)
+                db = self.session_factory()
+                for start in range(0, len(rows), self.batch_size):
+                    db.execute(insert(AuditLogModel), rows[start:start + self.batch_size])
+                db.commit()
+                return len(rows)
+            except Exception as e:
+                if db is not None:
+                    db.rollback()
+                with self._lock:
+                    combined = rows + self._buffer
+                    dropped = max(0, len(combined) - self.max_buffer)
+                    self._buffer = combined[dropped:]
+                logger.error(f"Audit log flush of {len(rows)} rows failed: {e}")
+                if dropped:
+                    logger.error(f"Audit buffer full: dropped {dropped} oldest rows")
+                return 0
+            finally:
+                if db is not None:
+                    db.close()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        """Buffer rows and flush them from a daemon thread."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the flush thread and write whatever is still buffered."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+
+audit_writer = AuditWriter.from_env()
 
 
 def log_audit(
@@ -53,7 +221,8 @@ def log_audit(
     entity_id: str,
     user: Optional[User] = None,
     details: Optional[Dict[str, Any]] = None,
-    request: Optional[Request] = None
+    request: Optional[Request] = None,
+    durable: Optional[bool] = None
 ) -> None:
     """
     Log an audit entry to the database.
@@ -66,6 +235,8 @@ def log_audit(
         user: User who performed the action (None for system actions)
         details: Additional context as dictionary (will be JSON serialized)
         request: FastAPI Request object (for extracting IP and user agent)
+        durable: True commits the entry on `db` before returning; False hands it
+            to the buffered audit_writer. Defaults to True for DURABLE_ACTIONS.
 
     Example:
         ```python
@@ -84,15 +255,50 @@ def log_audit(
         )
         ```
     """
-    # Extract request metadata
-    ip_address = None
-    user_agent = None
+    row = build_audit_log(action, entity_type, entity_id, user, details, request)
+    if durable is None:
+        durable = action in DURABLE_ACTIONS
+    if durable:
+        db.add(row)
+        db.commit()
+    else:
+        audit_writer.submit(row)
+
+
+# details keys copied into indexed audit_logs columns, with their column lengths
+AUDIT_DETAIL_COLUMNS = {'employee_id': 50, 'previous_status': 20, 'new_status': 20, 'vacation_type': 50}
+
+
+def extract_detail_fields(details: Optional[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """Values of the AUDIT_DETAIL_COLUMNS keys in details (None where missing)."""
+    details = details if isinstance(details, dict) else {}
+    return {
+        key: str(details[key])[:length] if details.get(key) is not None else None
+        for key, length in AUDIT_DETAIL_COLUMNS.items()
+    }
+
+
+def build_audit_log(
+    action: str,
+    entity_type: str,
+    entity_id: str,
+    user: Optional[User] = None,
+    details: Optional[Dict[str, Any]] = None,
+    request: Optional[Request] = None
+) -> AuditLogModel:
+    """
+    Build an audit entry without adding or committing it.
+
+    Used to write audit rows in the same transaction as the change they
+    describe (e.g. bulk approvals). Arguments are the same as log_audit.
+    """
+    # Extract request metadata (interned into the lookup tables by the AuditWriter)
+    ip_address = user_agent = None
     if request:
-        ip_address = get_client_ip(request)
-        user_agent = request.headers.get("User-Agent")
+        ip_address = get_client_ip(request)[:50]
+        user_agent = normalize_user_agent(request.headers.get("User-Agent"))
 
-    # Create audit log entry
-    audit_log = AuditLogModel(
+    return AuditLogModel(
         timestamp=datetime.utcnow(),
         user_id=user.id if user else None,
         user_email=user.email if user else None,
@@ -101,11 +307,78 @@ def log_audit(
         entity_id=str(entity_id),
         details=json.dumps(details) if details else None,
         ip_address=ip_address,
-        user_agent=user_agent
+        user_agent=user_agent,
+        **extract_detail_fields(details)
     )
 
-    db.add(audit_log)
-    db.commit()
+
+def audit_log_to_dict(log: AuditLog) -> Dict[str, Any]:
+    """API representation of an audit entry (details parsed back into a dict)."""
+    return {
+        "id": str(log.id),
+        "timestamp": log.timestamp.isoformat(),
+        "user_id": str(log.user_id) if log.user_id else None,
+        "user_email": log.user_email,
+        "action": log.action,
+        "entity_type": log.entity_type,
+        "entity_id": log.entity_id,
+        "details": json.loads(log.details) if log.details else None,
+        "ip_address": log.ip_address,
+        "user_agent": log.user_agent
+    }
+
+
+AUDIT_EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+AUDIT_EXPORT_COLUMNS = ('id', 'timestamp', 'user_id', 'user_email', 'action', 'entity_type',
+                        'entity_id', 'details', 'ip_address', 'user_agent')
+
+
+def iter_audit_export(logs: Iterable[AuditLog], export_format: str, chunk_rows: int = 500) -> Iterator[str]:
+    """
+    Encode audit entries as NDJSON (one audit_log_to_dict object per line) or
+    CSV (details kept as its JSON string), yielded in chunks of chunk_rows rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == "csv" else None
+    if writer:
+        writer.writerow(AUDIT_EXPORT_COLUMNS)
+
+    rows = 0
+    for log in logs:
+        if writer:
+            entry = audit_log_to_dict(log)
+            entry["details"] = log.details
+            writer.writerow(["" if entry[column] is None else entry[column] for column in AUDIT_EXPORT_COLUMNS])
+        else:
+            buffer.write(json.dumps(audit_log_to_dict(log), ensure_ascii=False) + "\n")
+        rows += 1
+        if rows % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_audit_cursor(log: AuditLog) -> str:
+    """Keyset cursor pointing just past `log` in (timestamp, id) order."""
+    return encode_cursor(log.timestamp.isoformat(), log.id)
+
+
+def decode_audit_cursor(cursor: Optional[str]):
+    """
+    Decode a (timestamp, id) audit cursor; None means the first page.
+
+    Raises:
+        InvalidCursorError: If the cursor cannot be decoded
+    """
+    if not cursor:
+        return None
+    timestamp, log_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(timestamp), UUID(log_id)
+    except ValueError:
+        raise InvalidCursorError("Invalid cursor")
 
 
 # ==========================================
@@ -138,6 +411,7 @@ ACTION_PASSWORD_CHANGED = "password_changed"
 
 # Admin Actions
 ACTION_ADMIN_INIT = "admin_initialized"
+ACTION_AUDIT_LOG_EXPORTED = "audit_log_exported"
 ACTION_UNIT_CREATED = "unit_created"
 ACTION_UNIT_UPDATED = "unit_updated"
 ACTION_UNIT_DELETED = "unit_deleted"
@@ -147,6 +421,15 @@ ACTION_SYSTEM_BACKUP = "system_backup"
 ACTION_SYSTEM_RESTORE = "system_restore"
 ACTION_CONTRACT_AUTO_RENEWED = "contract_auto_renewed"
 
+# Written synchronously by log_audit: security-relevant and must not be lost in a crash
+DURABLE_ACTIONS = frozenset({
+    ACTION_USER_LOGIN_FAILED,
+    ACTION_PASSWORD_CHANGED,
+    ACTION_USER_CREATED,
+    ACTION_USER_DELETED,
+    ACTION_ADMIN_INIT,
+})
+
 # Entity Types
 ENTITY_TYPE_LEAVE_REQUEST = "leave_request"
 ENTITY_TYPE_EMPLOYEE = "employee"
@@ -0,0 +1,419 @@
+"""
+Audit Log Archive
+
+Keeps the audit_logs table small by moving old entries into compressed,
+append-only archive segments, one per calendar month (UTC):
+
+    backend/data/audit_archive/audit-2025-01.ndjson.gz     rows, one JSON object per line
+    backend/data/audit_archive/audit-2025-01.index.json    row count, time range, actions,
+                                                            entity types, users, watermark
+
+Each archive run appends one gzip member per month to the segment, so
+existing data is never rewritten. A month is archived in three steps:
+append the rows, then replace the index (atomically) with the new size and
+(timestamp, id) watermark, then delete the archived rows from the database.
+If a run is interrupted, the next one truncates anything past the indexed
+size and skips the rows at or below the watermark, so nothing is archived
+twice or lost.
+
+Readers (the audit log view and export, whenever their date range is
+open-ended or starts in an archived month) use the indexes to skip segments
+whose time range, actions, entity types or users cannot match, and parse
+the rest in full. A month segment
+holds at most one month of entries, so this stays bounded.
+
+The retention job runs daily in the app scheduler (see backend.app_scheduler),
+or manually:
+    python -m backend.audit_archive run      # Archive entries older than AUDIT_HOT_RETENTION_DAYS
+    python -m backend.audit_archive list     # Show the segments
+"""
+
+import copy
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from .audit import AUDIT_DETAIL_COLUMNS, extract_detail_fields
+from .database import AuditLogModel
+from .db_repositories import DBAuditLogRepository
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ('id', 'timestamp', 'user_id', 'user_email', 'action', 'entity_type',
+                   'entity_id', 'details', 'ip_address', 'user_agent') + tuple(AUDIT_DETAIL_COLUMNS)
+
+
+def _month_of(timestamp: datetime) -> str:
+    return timestamp.strftime("%Y-%m")
+
+
+def _month_bounds(month: str) -> Tuple[datetime, datetime]:
+    start = datetime.strptime(month, "%Y-%m")
+    end = datetime(start.year + (start.month == 12), start.month % 12 + 1, 1)
+    return start, end
+
+
+def _sort_key(log: AuditLog) -> Tuple[datetime, str]:
+    return log.timestamp, str(log.id)
+
+
+def matches(log: AuditLog, action: Optional[str] = None, entity_type: Optional[str] = None,
+            entity_id: Optional[str] = None, user_id: Optional[UUID] = None,
+            employee_id: Optional[str] = None, previous_status: Optional[str] = None,
+            new_status: Optional[str] = None, vacation_type: Optional[str] = None,
+            start: Optional[datetime] = None, end: Optional[datetime] = None) -> bool:
+    """Same filters as DBAuditLogRepository.search, applied to an archived row."""
+    return (
+        (not action or log.action == action)
+        and (not entity_type or log.entity_type == entity_type)
+        and (not entity_id or log.entity_id == entity_id)
+        and (not user_id or log.user_id == user_id)
+        and (not employee_id or log.employee_id == employee_id)
+        and (not previous_status or log.previous_status == previous_status)
+        and (not new_status or log.new_status == new_status)
+        and (not vacation_type or log.vacation_type == vacation_type)
+        and (start is None or log.timestamp >= start)
+        and (end is None or log.timestamp < end)
+    )
+
+
+class AuditArchive:
+    """Monthly gzip segments of archived audit entries."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._index_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AuditArchive":
+        return cls(Path(os.getenv("AUDIT_ARCHIVE_DIR", "backend/data/audit_archive")))
+
+    def segment_path(self, month: str) -> Path:
+        return self.directory / f"audit-{month}.ndjson.gz"
+
+    def index_path(self, month: str) -> Path:
+        return self.directory / f"audit-{month}.index.json"
+
+    # --- Index ---
+
+    def months(self) -> List[str]:
+        """Archived months, oldest first."""
+        if not self.directory.exists():
+            return []
+        return sorted(path.name[len("audit-"):-len(".index.json")] for path in self.directory.glob("audit-*.index.json"))
+
+    def load_index(self, month: str) -> Optional[Dict[str, Any]]:
+        path = self.index_path(month)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._index_cache.get(month)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        with self._lock:
+            self._index_cache[month] = (mtime, index)
+        return index
+
+    def _write_index(self, month: str, index: Dict[str, Any]) -> None:
+        path = self.index_path(month)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        with self._lock:
+            self._index_cache[month] = (path.stat().st_mtime, index)
+
+    def _may_contain(self, index: Dict[str, Any], action: Optional[str] = None,
+                     entity_type: Optional[str] = None, user_id: Optional[UUID] = None,
+                     start: Optional[datetime] = None, end: Optional[datetime] = None, **_) -> bool:
+        if not index.get("rows"):
+            return False
+        if start is not None and datetime.fromisoformat(index["last_timestamp"]) < start:
+            return False
+        if end is not None and datetime.fromisoformat(index["first_timestamp"]) >= end:
+            return False
+        if action and action not in index["actions"]:
+            return False
+        if entity_type and entity_type not in index["entity_types"]:
+            return False
+        if user_id and str(user_id) not in index["user_ids"]:
+            return False
+        return True
+
+    # --- Writing ---
+
+    @staticmethod
+    def _encode(log: AuditLogModel) -> bytes:
+        # Resolves interned IP addresses and user agents, so segments hold plain values
+        entry = DBAuditLogRepository._to_audit_log(log)
+        row = {column: getattr(entry, column) for column in ARCHIVE_COLUMNS}
+        row['id'] = str(row['id'])
+        row['user_id'] = str(row['user_id']) if row['user_id'] else None
+        row['timestamp'] = row['timestamp'].isoformat()
+        return (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def archive(self, db: Session, cutoff: datetime, batch_size: int = 1000) -> int:
+        """
+        Move audit entries older than cutoff (UTC) into their month segments.
+
+        Returns:
+            Number of rows removed from the audit_logs table
+        """
+        oldest = db.query(AuditLogModel.timestamp).filter(
+            AuditLogModel.timestamp < cutoff
+        ).order_by(AuditLogModel.timestamp).first()
+        if oldest is None:
+            return 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        removed = 0
+        month = _month_of(oldest[0])
+        while True:
+            month_start, month_end = _month_bounds(month)
+            if month_start >= cutoff:
+                break
+            removed += self._archive_month(db, month, month_start, min(month_end, cutoff), batch_size)
+            month = _month_of(month_end)
+        return removed
+
+    def _archive_month(self, db: Session, month: str, start: datetime, end: datetime, batch_size: int) -> int:
+        index = copy.deepcopy(self.load_index(month)) or {
+            "month": month, "rows": 0, "bytes": 0, "first_timestamp": None, "last_timestamp": None,
+            "actions": {}, "entity_types": {}, "user_ids": [], "watermark": None
+        }
+        watermark = tuple(index["watermark"]) if index["watermark"] else None
+
+        # Drop a partial member left by an interrupted run (not covered by the index)
+        path = self.segment_path(month)
+        if path.exists() and path.stat().st_size > index["bytes"]:
+            os.truncate(path, index["bytes"])
+
+        query = db.query(AuditLogModel).filter(
+            AuditLogModel.timestamp >= start, AuditLogModel.timestamp < end
+        ).order_by(AuditLogModel.timestamp, AuditLogModel.id)
+        if watermark:
+            # Rows at or below the watermark are already in the segment
+            query = query.filter(self._after_watermark(watermark))
+
+        appended = 0
+        user_ids = set(index["user_ids"])
+        raw = member = None
+        try:
+            for log in query.yield_per(batch_size):
+                if member is None:
+                    raw = open(path, 'ab')
+                    member = gzip.GzipFile(fileobj=raw, mode='wb')
+                member.write(self._encode(log))
+                appended += 1
+                timestamp = log.timestamp.isoformat()
+                index["first_timestamp"] = min(index["first_timestamp"] or timestamp, timestamp)
+                index["last_timestamp"] = max(index["last_timestamp"] or timestamp, timestamp)
+                index["actions"][log.action] = index["actions"].get(log.action, 0) + 1
+                index["entity_types"][log.entity_type] = index["entity_types"].get(log.entity_type, 0) + 1
+                if log.user_id:
+                    user_ids.add(str(log.user_id))
+                watermark = (timestamp, str(log.id))
+            if member is not None:
+                member.close()
+                raw.flush()
+                os.fsync(raw.fileno())
+        except Exception:
+            if raw is not None:
+                raw.close()
+                os.truncate(path, index["bytes"])
+            raise
+        finally:
+            if raw is not None:
+                raw.close()
+
+        if appended:
+            index["rows"] += appended
+            index["bytes"] = path.stat().st_size
+            index["user_ids"] = sorted(user_ids)
+            index["watermark"] = list(watermark)
+            self._write_index(month, index)
+        if not watermark:
+            return 0
+
+        # Everything up to the watermark is safely archived
+        removed = db.query(AuditLogModel).filter(
+            AuditLogModel.timestamp >= start, ~self._after_watermark(watermark)
+        ).delete(synchronize_session=False)
+        db.commit()
+        if removed:
+            logger.info(f"Archived {removed} audit entries into {path.name}")
+        return removed
+
+    @staticmethod
+    def _after_watermark(watermark: Tuple[str, str]):
+        timestamp, log_id = datetime.fromisoformat(watermark[0]), UUID(watermark[1])
+        return or_(
+            AuditLogModel.timestamp > timestamp,
+            and_(AuditLogModel.timestamp == timestamp, AuditLogModel.id > log_id)
+        )
+
+    # --- Reading ---
+
+    def iter_segment(self, month: str) -> Iterator[AuditLog]:
+        path = self.segment_path(month)
+        if not path.exists():
+            return
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        if 'employee_id' not in row:
+                            # Archived before the detail columns existed
+                            row.update(extract_detail_fields(json.loads(row['details']) if row['details'] else None))
+                        yield AuditLog(**row)
+        except (EOFError, gzip.BadGzipFile):
+            # Partial member of a run in progress or interrupted; not yet indexed
+            return
+
+    def _matching_months(self, filters: Dict[str, Any],
+                         before: Optional[datetime] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """(month, index) of the segments that may hold matching rows, newest first."""
+        found = []
+        for month in reversed(self.months()):
+            index = self.load_index(month)
+            if not index or not self._may_contain(index, **filters):
+                continue
+            if before is not None and datetime.fromisoformat(index["first_timestamp"]) > before:
+                continue
+            found.append((month, index))
+        return found
+
+    def search(self, after: Optional[Tuple[datetime, UUID]] = None, limit: Optional[int] = None,
+               **filters) -> List[AuditLog]:
+        """Archived entries matching the filters, newest first, ordered by (timestamp, id)."""
+        after_key = (after[0], str(after[1])) if after else None
+        results: List[AuditLog] = []
+        for month, _ in self._matching_months(filters, before=after[0] if after else None):
+            rows = [
+                log for log in self.iter_segment(month)
+                if matches(log, **filters) and (after_key is None or _sort_key(log) < after_key)
+            ]
+            results.extend(sorted(rows, key=_sort_key, reverse=True))
+            if limit is not None and len(results) >= limit:
+                return results[:limit]
+        return results
+
+    def stream(self, **filters) -> Iterator[AuditLog]:
+        """
+        Archived entries matching the filters, oldest first, read one line at a
+        time (runs append in (timestamp, id) order, so file order is sorted).
+        """
+        for month, _ in reversed(self._matching_months(filters)):
+            for log in self.iter_segment(month):
+                if matches(log, **filters):
+                    yield log
+
+    def timeline(self, entity_type: str, entity_id: str, after: Optional[Tuple[datetime, UUID]] = None,
+                 limit: Optional[int] = None) -> List[AuditLog]:
+        """Archived history of one entity, oldest first (see DBAuditLogRepository.timeline)."""
+        after_key = (after[0], str(after[1])) if after else None
+        filters: Dict[str, Any] = {"start": after[0] if after else None}
+        if entity_type != "employee":
+            filters["entity_type"] = entity_type
+        results: List[AuditLog] = []
+        for month, _ in reversed(self._matching_months(filters)):
+            for log in self.iter_segment(month):
+                concerns = (log.entity_type == entity_type and log.entity_id == entity_id) or \
+                    (entity_type == "employee" and log.employee_id == entity_id)
+                if concerns and (after_key is None or _sort_key(log) > after_key):
+                    results.append(log)
+                    if limit is not None and len(results) >= limit:
+                        return results
+        return results
+
+    def count(self, cap: Optional[int] = None, **filters) -> int:
+        """
+        Archived entries matching the filters; stops after cap + 1 when capped.
+
+        Counts come from the indexes when there is no filter or only an action
+        or entity_type filter; other filters read the segments.
+        """
+        active = {key: value for key, value in filters.items() if value is not None}
+        total = 0
+        for month, index in self._matching_months(filters):
+            if not active:
+                total += index["rows"]
+            elif active.keys() == {"action"}:
+                total += index["actions"].get(active["action"], 0)
+            elif active.keys() == {"entity_type"}:
+                total += index["entity_types"].get(active["entity_type"], 0)
+            else:
+                total += sum(1 for log in self.iter_segment(month) if matches(log, **filters))
+            if cap is not None and total > cap:
+                return cap + 1
+        return total
+
+    def reaches(self, start: Optional[datetime]) -> bool:
+        """Whether a query starting at `start` (None: open-ended) reaches into archived months."""
+        return any(
+            index.get("rows") and (start is None or datetime.fromisoformat(index["last_timestamp"]) >= start)
+            for index in (self.load_index(month) for month in self.months()) if index
+        )
+
+
+audit_archive = AuditArchive.from_env()
+
+
+def archive_old_audit_logs(retention_days: Optional[int] = None) -> int:
+    """
+    Daily retention job: intern the client values still stored as text (see
+    backend.audit_lookups), then archive audit entries older than
+    retention_days (default AUDIT_HOT_RETENTION_DAYS, 180).
+    """
+    from .database import SessionLocal
+
+    from .audit_lookups import intern_stored_values
+
+    retention_days = retention_days or int(os.getenv("AUDIT_HOT_RETENTION_DAYS", "180"))
+    # Entries committed directly still hold their client values as text
+    interned = intern_stored_values()
+    if interned:
+        logger.info(f"Audit retention: interned the client values of {interned} entries")
+    db = SessionLocal()
+    try:
+        removed = audit_archive.archive(db, datetime.utcnow() - timedelta(days=retention_days))
+        logger.info(f"Audit retention: archived {removed} entries older than {retention_days} days")
+        return removed
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "run":
+        print(f"[OK] Archived {archive_old_audit_logs()} audit entries")
+    elif command == "list":
+        for month in audit_archive.months():
+            index = audit_archive.load_index(month)
+            size = audit_archive.segment_path(month).stat().st_size
+            print(f"{month}: {index['rows']} rows, {size} bytes, "
+                  f"{index['first_timestamp']} .. {index['last_timestamp']}")
+    else:
+        print("Usage: python -m backend.audit_archive [run|list]")
+        sys.exit(2)
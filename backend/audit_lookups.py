@@ -0,0 +1,146 @@
+"""
+Interned audit request metadata for IAU Portal.
+
+Audit entries reference their client IP address and User-Agent header by
+integer id instead of repeating the strings on every row: a handful of
+browsers and addresses account for nearly all entries. The values live in
+the audit_ip_addresses and audit_user_agents lookup tables.
+
+Each table has a ValueDictionary in front of it, an in-process LRU cache of
+value -> id, so writing an audit entry costs no lookup query once its values
+have been seen. A new value is inserted (and committed) in a short
+transaction of its own; lookup rows are never updated or deleted, so cached
+ids stay valid.
+
+Interning happens off the request path: the AuditWriter interns the values
+of the rows it flushes, and entries committed directly (durable actions,
+entries written in the transaction of the change they describe) keep their
+text values until intern_stored_values converts them (daily, before the
+audit retention job archives anything).
+
+Configure with environment variables:
+    AUDIT_LOOKUP_CACHE_SIZE  - maximum number of values cached per table (default 10000)
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from sqlalchemy import or_, update
+
+from .database import SessionLocal, AuditUserAgentModel, AuditIpAddressModel, AuditLogModel
+from .db_repositories import DBAuditLookupRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ValueDictionary:
+    """Thread-safe value -> id cache in front of one lookup table."""
+
+    def __init__(self, model, max_size: int = 10000, session_factory: Callable = SessionLocal):
+        self.model = model
+        self.max_size = max_size
+        self.session_factory = session_factory
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def id_for(self, value: Optional[str]) -> Optional[int]:
+        """
+        Id of value, interning it on first use.
+
+        Returns None for empty values, or if the lookup table cannot be
+        reached (the caller then keeps the raw value).
+        """
+        if not value:
+            return None
+        with self._lock:
+            value_id = self._ids.get(value)
+            if value_id is not None:
+                self._ids.move_to_end(value)
+                self.hits += 1
+                return value_id
+            self.misses += 1
+
+        db = self.session_factory()
+        try:
+            value_id = DBAuditLookupRepository(db).get_or_create(self.model, value)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Could not intern {self.model.__tablename__} value: {e}")
+            return None
+        finally:
+            db.close()
+
+        with self._lock:
+            self._ids[value] = value_id
+            self._ids.move_to_end(value)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+        return value_id
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+
+
+_cache_size = int(os.getenv("AUDIT_LOOKUP_CACHE_SIZE", "10000"))
+user_agents = ValueDictionary(AuditUserAgentModel, max_size=_cache_size)
+ip_addresses = ValueDictionary(AuditIpAddressModel, max_size=_cache_size)
+
+
+def _intern(dictionary: ValueDictionary, value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    value_id = dictionary.id_for(value)
+    if value_id is None:
+        # Never clear a value that was not stored in the lookup table
+        raise RuntimeError(f"Could not intern {dictionary.model.__tablename__} value {value!r}")
+    return value_id
+
+
+def _interned_values(log_id, ip_address: Optional[str], user_agent: Optional[str]) -> dict:
+    """
+    UPDATE values for one entry. Only columns that still hold text are
+    touched: an entry may already have the id of one value (the AuditWriter
+    interned it) and only the other left as text.
+    """
+    values = {"id": log_id}
+    for column, dictionary, value in (("ip_address", ip_addresses, ip_address),
+                                      ("user_agent", user_agents, user_agent)):
+        if value is None:
+            continue
+        if value:
+            values[f"{column}_id"] = _intern(dictionary, value)
+        values[column] = None
+    return values
+
+
+def intern_stored_values(batch_size: int = 1000, session_factory: Callable = SessionLocal) -> int:
+    """
+    Move the text ip_address/user_agent values of stored audit entries into
+    the lookup tables, one short transaction per batch.
+
+    Returns:
+        Number of entries converted
+    """
+    converted = 0
+    db = session_factory()
+    try:
+        while True:
+            batch = db.query(AuditLogModel.id, AuditLogModel.ip_address, AuditLogModel.user_agent).filter(
+                or_(AuditLogModel.ip_address.isnot(None), AuditLogModel.user_agent.isnot(None))
+            ).limit(batch_size).all()
+            if not batch:
+                break
+            db.execute(update(AuditLogModel), [
+                _interned_values(log_id, ip_address, user_agent) for log_id, ip_address, user_agent in batch
+            ])
+            db.commit()
+            converted += len(batch)
+    finally:
+        db.close()
+    return converted
@@ -1,5 +1,6 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
@@ -8,6 +9,7 @@ import os
 
 from .dependencies import get_user_service
 from .models import User
+from .principal_cache import principal_cache
 from .services import UserService
 
 # --- Configuration ---
@@ -41,6 +43,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
 # --- Dependency to get current user ---
 async def get_current_user(token: str = Depends(oauth2_scheme), user_service: UserService = Depends(get_user_service)) -> User:
+    """
+    Resolve the bearer token to its active user.
+
+    Users are served from principal_cache when possible; otherwise the
+    (blocking) database lookup runs in the threadpool, off the event loop.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,7 +62,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme), user_service: Us
     except JWTError:
         raise credentials_exception
     
-    user = user_service.get_user_by_email(email)
+    user = principal_cache.get(email)
+    if user is None:
+        generation = principal_cache.generation()
+        user = await run_in_threadpool(user_service.get_user_by_email, email)
+        principal_cache.put(email, user, generation)
     if user is None:
         raise credentials_exception
     if not user.is_active:
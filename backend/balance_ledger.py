@@ -0,0 +1,274 @@
+"""
+Leave Balance Ledger
+
+Maintains the persisted leave_balances table so that reading an employee's
+balance is a single-row lookup instead of a replay of every approved request.
+
+A ledger row holds, per employee and contract period, the earned amount,
+the used amount and the carry-over. Rows are recomputed for the affected
+employee whenever one of their inputs changes:
+- a leave request moves into or out of 'Approved'
+- an employee's start_date, employee_type or monthly accrual changes
+- the portal's max_carry_over_days setting changes (permanent employees)
+
+With a notification planner configured, every recomputed row also replans
+the employee's contract notifications (see backend.notification_queue).
+
+Earned days keep accruing between events, so the stored value is a snapshot
+(earned_as_of) and is recomputed arithmetically when read on a later day.
+All components come from the functions in calculation.py, so the ledger
+always agrees with calculate_vacation_balance / calculate_permanent_vacation_balance.
+
+Usage:
+    python -m backend.balance_ledger rebuild   # Recompute every row from scratch
+    python -m backend.balance_ledger check     # Compare the ledger with calculation.py
+"""
+
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from .models import Employee, LeaveBalance, LeaveRequest
+from .calculation import (
+    calculate_vacation_balance,
+    calculate_permanent_vacation_balance,
+    calculate_contract_earned,
+    calculate_contract_used,
+    calculate_permanent_carry_over,
+    get_current_contract_period,
+    get_permanent_contract_period,
+    _calculate_earned_for_year,
+    _calculate_used_for_year,
+)
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class BalanceLedger:
+    """Reads and maintains persisted leave balances."""
+
+    def __init__(self, leave_balance_repository, leave_request_repository, portal_settings_repository=None,
+                 notification_planner=None):
+        self.leave_balance_repository = leave_balance_repository
+        self.leave_request_repository = leave_request_repository
+        self.portal_settings_repository = portal_settings_repository
+        self.notification_planner = notification_planner
+
+    def _max_carry_over(self) -> int:
+        if self.portal_settings_repository:
+            return self.portal_settings_repository.get().max_carry_over_days
+        return 15
+
+    @staticmethod
+    def current_period(employee: Employee, today: date) -> Tuple[date, date]:
+        """Return the contract period the employee's balance is computed over on `today`."""
+        if employee.employee_type == 'permanent':
+            return get_permanent_contract_period(today)
+        return get_current_contract_period(_parse_date(employee.start_date), today)
+
+    @staticmethod
+    def _earned(employee: Employee, period_start: date, period_end: date, today: date) -> float:
+        if employee.employee_type == 'permanent':
+            emp_start_date = _parse_date(employee.start_date)
+            return _calculate_earned_for_year(employee, period_start, period_end, emp_start_date, today)
+        return calculate_contract_earned(employee, period_start, today)
+
+    def compute_entry(self, employee: Employee, approved_requests: List[LeaveRequest],
+                      max_carry_over: int, today: Optional[date] = None) -> LeaveBalance:
+        """Compute a ledger entry from the employee's approved requests."""
+        today = today or date.today()
+        period_start, period_end = self.current_period(employee, today)
+
+        carry_over = 0.0
+        if employee.employee_type == 'permanent':
+            emp_start_date = _parse_date(employee.start_date)
+            carry_over = calculate_permanent_carry_over(
+                employee, approved_requests, today, emp_start_date, max_carry_over
+            )
+            used = _calculate_used_for_year(employee.id, approved_requests, period_start, period_end)
+        else:
+            used = calculate_contract_used(employee.id, approved_requests, period_start)
+
+        return LeaveBalance(
+            employee_id=employee.id,
+            employee_type=employee.employee_type,
+            period_start=period_start.isoformat(),
+            period_end=period_end.isoformat(),
+            earned_days=self._earned(employee, period_start, period_end, today),
+            earned_as_of=today.isoformat(),
+            used_days=used,
+            carry_over_days=carry_over
+        )
+
+    def balance_from_entry(self, employee: Employee, entry: LeaveBalance,
+                           today: Optional[date] = None) -> Tuple[float, Optional[float]]:
+        """
+        Turn a ledger entry into (vacation_balance, carry_over_balance).
+
+        carry_over_balance is None for contractors, matching EmployeeWithBalance.
+        """
+        today = today or date.today()
+        is_permanent = employee.employee_type == 'permanent'
+
+        if _parse_date(employee.start_date) > today:
+            return (0.0, 0.0) if is_permanent else (0.0, None)
+
+        if entry.earned_as_of == today.isoformat():
+            earned = entry.earned_days
+        else:
+            earned = self._earned(employee, _parse_date(entry.period_start), _parse_date(entry.period_end), today)
+
+        if is_permanent:
+            total_balance = entry.carry_over_days + earned - entry.used_days
+            return round(max(0.0, total_balance), 2), round(entry.carry_over_days, 2)
+        return round(max(0.0, earned - entry.used_days), 2), None
+
+    def refresh_employee(self, employee: Employee, today: Optional[date] = None,
+                         commit: bool = True) -> LeaveBalance:
+        """
+        Recompute and persist the current-period row for one employee.
+
+        With commit=False the row is only flushed, so it commits (or rolls
+        back) with the caller's transaction.
+        """
+        approved_requests = self.leave_request_repository.get_approved(employee.id)
+        max_carry_over = self._max_carry_over() if employee.employee_type == 'permanent' else 15
+        entry = self.compute_entry(employee, approved_requests, max_carry_over, today)
+        self.leave_balance_repository.upsert_many([entry], commit=commit)
+        if self.notification_planner:
+            self.notification_planner.replan([employee], [entry], today, commit=commit)
+        return entry
+
+    def refresh_employees(self, employees: List[Employee], today: Optional[date] = None,
+                          commit: bool = True) -> List[LeaveBalance]:
+        """Recompute and persist current-period rows for many employees in one pass (see refresh_employee)."""
+        if not employees:
+            return []
+
+        approved_by_employee: Dict[str, List[LeaveRequest]] = defaultdict(list)
+        for req in self.leave_request_repository.get_approved():
+            approved_by_employee[req.employee_id].append(req)
+
+        max_carry_over = 15
+        if any(emp.employee_type == 'permanent' for emp in employees):
+            max_carry_over = self._max_carry_over()
+
+        entries = [
+            self.compute_entry(emp, approved_by_employee.get(emp.id, []), max_carry_over, today)
+            for emp in employees
+        ]
+        self.leave_balance_repository.upsert_many(entries, commit=commit)
+        if self.notification_planner:
+            self.notification_planner.replan(employees, entries, today, commit=commit)
+        return entries
+
+    def get_balance(self, employee: Employee, today: Optional[date] = None) -> Tuple[float, Optional[float]]:
+        """Single-row balance lookup; computes the row on first use of a new period."""
+        today = today or date.today()
+        period_start, _ = self.current_period(employee, today)
+        entry = self.leave_balance_repository.get(employee.id, period_start.isoformat())
+        if entry is None or entry.employee_type != employee.employee_type:
+            entry = self.refresh_employee(employee, today)
+        return self.balance_from_entry(employee, entry, today)
+
+    def get_balances(self, employees: List[Employee],
+                     today: Optional[date] = None) -> Dict[str, Tuple[float, Optional[float]]]:
+        """Bulk balance lookup keyed by employee id, filling in any missing rows."""
+        today = today or date.today()
+        periods = {emp.id: self.current_period(emp, today)[0].isoformat() for emp in employees}
+        entries = {
+            entry.employee_id: entry
+            for entry in self.leave_balance_repository.get_for_employees(list(periods))
+            if periods.get(entry.employee_id) == entry.period_start
+        }
+
+        missing = [
+            emp for emp in employees
+            if emp.id not in entries or entries[emp.id].employee_type != emp.employee_type
+        ]
+        for entry in self.refresh_employees(missing, today):
+            entries[entry.employee_id] = entry
+
+        return {emp.id: self.balance_from_entry(emp, entries[emp.id], today) for emp in employees}
+
+    def forget_employee(self, employee_id: str) -> None:
+        """Drop all ledger rows for an employee (e.g. after an employee ID change)."""
+        self.leave_balance_repository.delete_by_employee(employee_id)
+        if self.notification_planner:
+            self.notification_planner.forget_employee(employee_id)
+
+    def rebuild(self, employees: List[Employee]) -> int:
+        """Discard the whole ledger and recompute it from leave requests."""
+        self.leave_balance_repository.delete_all()
+        return len(self.refresh_employees(employees))
+
+    def check_consistency(self, employees: List[Employee]) -> List[Dict]:
+        """
+        Compare ledger balances with the calculation functions.
+
+        Returns:
+            List of problems, one dict per employee whose ledger row is missing
+            or disagrees with calculate_vacation_balance / calculate_permanent_vacation_balance.
+        """
+        today = date.today()
+        approved_requests = self.leave_request_repository.get_approved()
+        max_carry_over = self._max_carry_over()
+        problems = []
+
+        for emp in employees:
+            if emp.employee_type == 'permanent':
+                expected = calculate_permanent_vacation_balance(emp, approved_requests, max_carry_over)
+            else:
+                expected = (calculate_vacation_balance(emp, approved_requests), None)
+
+            period_start, _ = self.current_period(emp, today)
+            entry = self.leave_balance_repository.get(emp.id, period_start.isoformat())
+            if entry is None:
+                problems.append({"employee_id": emp.id, "issue": "missing", "expected": expected})
+                continue
+
+            actual = self.balance_from_entry(emp, entry, today)
+            if actual != expected:
+                problems.append({"employee_id": emp.id, "issue": "mismatch", "expected": expected, "ledger": actual})
+
+        return problems
+
+
+if __name__ == "__main__":
+    import sys
+    from .database import SessionLocal
+    from .db_repositories import (
+        DBEmployeeRepository, DBLeaveRequestRepository,
+        DBPortalSettingsRepository, DBLeaveBalanceRepository, DBContractNotificationQueueRepository
+    )
+    from .notification_queue import ContractNotificationPlanner
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    db = SessionLocal()
+    try:
+        ledger = BalanceLedger(
+            DBLeaveBalanceRepository(db),
+            DBLeaveRequestRepository(db),
+            DBPortalSettingsRepository(db),
+            ContractNotificationPlanner(DBContractNotificationQueueRepository(db))
+        )
+        employees = DBEmployeeRepository(db).get_all()
+
+        if command == "rebuild":
+            count = ledger.rebuild(employees)
+            print(f"[OK] Rebuilt leave balance ledger for {count} employees")
+        elif command == "check":
+            problems = ledger.check_consistency(employees)
+            for problem in problems:
+                print(f"[ERROR] {problem}")
+            if problems:
+                print(f"[ERROR] {len(problems)} of {len(employees)} ledger rows are inconsistent")
+                sys.exit(1)
+            print(f"[OK] Ledger consistent for all {len(employees)} employees")
+        else:
+            print("Usage: python -m backend.balance_ledger [rebuild|check]")
+            sys.exit(2)
+    finally:
+        db.close()
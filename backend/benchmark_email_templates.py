@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for email template rendering
+
+Compares the per-email cost of the precompiled templates in
+email_templates.py with the previous approach, which rebuilt and re-formatted
+the whole base document (CSS included) and re-parsed dates for every email.
+
+Usage:
+    python backend/benchmark_email_templates.py [count]
+    python -m backend.benchmark_email_templates [count]
+"""
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Dict
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.email_templates import render_leave_request_created_email
+
+SAMPLE = {
+    'employee_name_ar': 'أحمد علي',
+    'employee_name_en': 'Ahmed Ali',
+    'employee_id': 'IAU-100',
+    'vacation_type': 'annual',
+    'start_date': '2025-03-02',
+    'end_date': '2025-03-06',
+    'duration': 5,
+    'manager_name_ar': 'سارة محمد',
+    'manager_name_en': 'Sara Mohammed'
+}
+
+
+# ------------------------------------------------------------------
+# Baseline: the render path before precompilation, copied verbatim from
+# the original email_templates.py (only the two functions are renamed)
+# ------------------------------------------------------------------
+
+def baseline_base_email_template() -> str:
+    """
+    Base HTML structure for all emails with IAU Portal branding
+
+    Returns:
+        str: HTML template string with {content} placeholder
+    """
+    return """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>
+        body {{
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background-color: #f5f5f5;
+        }}
+        .container {{
+            max-width: 800px;
+            margin: 0 auto;
+            background-color: white;
+            border-radius: 8px;
+            overflow: hidden;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        }}
+        .header {{
+            background: linear-gradient(135deg, #0f5132 0%, #1e7e4f 100%);
+            color: white;
+            padding: 30px;
+            text-align: center;
+        }}
+        .header h1 {{
+            margin: 0;
+            font-size: 24px;
+        }}
+        .content {{
+            padding: 30px;
+        }}
+        .info-table {{
+            width: 100%;
+            border-collapse: collapse;
+            margin: 20px 0;
+        }}
+        .info-table td {{
+            padding: 15px;
+            vertical-align: top;
+        }}
+        .info-table .ar-col {{
+            direction: rtl;
+            text-align: right;
+            width: 50%;
+            font-family: 'Arial', sans-serif;
+        }}
+        .info-table .en-col {{
+            direction: ltr;
+            text-align: left;
+            border-right: 1px solid #e0e0e0;
+            width: 50%;
+        }}
+        .label {{
+            font-weight: bold;
+            color: #0f5132;
+            margin-bottom: 5px;
+        }}
+        .value {{
+            color: #333;
+            margin-bottom: 15px;
+        }}
+        .footer {{
+            background-color: #f9f9f9;
+            padding: 20px;
+            text-align: center;
+            color: #666;
+            font-size: 12px;
+        }}
+        .warning {{
+            background-color: #fff3cd;
+            border-left: 4px solid #ffc107;
+            padding: 15px;
+            margin: 20px 0;
+        }}
+        .critical {{
+            background-color: #f8d7da;
+            border-left: 4px solid #dc3545;
+            padding: 15px;
+            margin: 20px 0;
+        }}
+    </style>
+</head>
+<body>
+    {content}
+</body>
+</html>
+"""
+
+
+def render_uncompiled(data: Dict[str, Any]) -> str:
+    """
+    Email to manager when employee creates leave request
+
+    Args:
+        data: Dict containing:
+            - employee_name_ar: str
+            - employee_name_en: str
+            - employee_id: str
+            - vacation_type: str (e.g., 'annual', 'sick')
+            - start_date: str (Gregorian YYYY-MM-DD)
+            - end_date: str (Gregorian YYYY-MM-DD)
+            - duration: int
+            - manager_name_ar: str
+            - manager_name_en: str
+
+    Returns:
+        str: Complete HTML email
+    """
+    from datetime import datetime
+
+    vacation_types = {
+        'annual': {'ar': 'إجازة اعتيادية', 'en': 'Annual Vacation'},
+        'sick': {'ar': 'مرضية', 'en': 'Sick Leave'},
+        'unpaid': {'ar': 'إجازة بدون أجر', 'en': 'Unpaid Leave'},
+        'emergency': {'ar': 'طارئة', 'en': 'Emergency Leave'},
+        'exams': {'ar': 'إجازة الامتحانات', 'en': 'Exams Leave'}
+    }
+
+    vac_type = vacation_types.get(data['vacation_type'].lower(), {'ar': data['vacation_type'], 'en': data['vacation_type']})
+
+    # Convert dates to Hijri for Arabic column
+    start_date_gregorian = data['start_date']
+    end_date_gregorian = data['end_date']
+
+    try:
+        from hijri_converter import Gregorian
+        start_dt = datetime.strptime(start_date_gregorian, '%Y-%m-%d')
+        end_dt = datetime.strptime(end_date_gregorian, '%Y-%m-%d')
+
+        # Convert to Hijri
+        start_hijri = Gregorian(start_dt.year, start_dt.month, start_dt.day).to_hijri()
+        end_hijri = Gregorian(end_dt.year, end_dt.month, end_dt.day).to_hijri()
+
+        # Format Hijri dates in Arabic format (YYYY/MM/DD)
+        start_date_ar = f"{start_hijri.year}/{start_hijri.month:02d}/{start_hijri.day:02d}"
+        end_date_ar = f"{end_hijri.year}/{end_hijri.month:02d}/{end_hijri.day:02d}"
+
+    except Exception as e:
+        # Fallback to Gregorian if conversion fails
+        start_date_ar = start_date_gregorian
+        end_date_ar = end_date_gregorian
+
+    content = f"""
+    <div class="container">
+        <div class="header">
+            <h1>New Leave Request / طلب إجازة جديد</h1>
+        </div>
+        <div class="content">
+            <table class="info-table">
+                <tr>
+                    <td class="en-col">
+                        <div class="label">Dear {data['manager_name_en']}</div>
+                        <p class="value">A new leave request has been submitted and requires your approval.</p>
+                    </td>
+                    <td class="ar-col">
+                        <div class="label">عزيزي/عزيزتي {data['manager_name_ar']}</div>
+                        <p class="value">تم تقديم طلب إجازة جديد ويحتاج إلى موافقتك.</p>
+                    </td>
+                </tr>
+                <tr>
+                    <td class="en-col">
+                        <div class="label">Employee Name:</div>
+                        <div class="value">{data['employee_name_en']} ({data['employee_id']})</div>
+                    </td>
+                    <td class="ar-col">
+                        <div class="label">اسم الموظف:</div>
+                        <div class="value">{data['employee_name_ar']} ({data['employee_id']})</div>
+                    </td>
+                </tr>
+                <tr>
+                    <td class="en-col">
+                        <div class="label">Vacation Type:</div>
+                        <div class="value">{vac_type['en']}</div>
+                    </td>
+                    <td class="ar-col">
+                        <div class="label">نوع الإجازة:</div>
+                        <div class="value">{vac_type['ar']}</div>
+                    </td>
+                </tr>
+                <tr>
+                    <td class="en-col">
+                        <div class="label">Start Date:</div>
+                        <div class="value">{start_date_gregorian}</div>
+                    </td>
+                    <td class="ar-col">
+                        <div class="label">تاريخ البدء:</div>
+                        <div class="value">{start_date_ar}</div>
+                    </td>
+                </tr>
+                <tr>
+                    <td class="en-col">
+                        <div class="label">End Date:</div>
+                        <div class="value">{end_date_gregorian}</div>
+                    </td>
+                    <td class="ar-col">
+                        <div class="label">تاريخ الانتهاء:</div>
+                        <div class="value">{end_date_ar}</div>
+                    </td>
+                </tr>
+                <tr>
+                    <td class="en-col">
+                        <div class="label">Duration:</div>
+                        <div class="value">{data['duration']} day(s)</div>
+                    </td>
+                    <td class="ar-col">
+                        <div class="label">المدة:</div>
+                        <div class="value">{data['duration']} يوم/أيام</div>
+                    </td>
+                </tr>
+            </table>
+        </div>
+        <div class="footer">
+            <p>IAU Portal - Vacation Management System</p>
+            <p>نظام إدارة الإجازات - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>
+        </div>
+    </div>
+    """
+
+    return baseline_base_email_template().format(content=content)
+
+
+def main(count: int = 20000):
+    # Both paths must produce the same email
+    assert render_uncompiled(SAMPLE).split() == render_leave_request_created_email(SAMPLE).split()
+
+    results = {
+        'uncompiled': timeit.timeit(lambda: render_uncompiled(SAMPLE), number=count),
+        'precompiled': timeit.timeit(lambda: render_leave_request_created_email(SAMPLE), number=count),
+    }
+
+    print(f"Rendering {count} 'New Leave Request' emails")
+    for name, seconds in results.items():
+        print(f"  {name:<12} {seconds / count * 1e6:8.2f} us/email")
+    print(f"  speed-up: {results['uncompiled'] / results['precompiled']:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
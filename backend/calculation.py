@@ -75,34 +75,24 @@ def get_current_contract_period(start_date: date, today: date) -> Tuple[date, da
         else:
              current_start = current_end
 
-def calculate_vacation_balance(employee: Employee, all_approved_requests: List[LeaveRequest]) -> float:
+def calculate_contract_earned(employee: Employee, contract_start: date, today: date) -> float:
     """
-    Calculates the current vacation balance based on the CURRENT 11-month contract period.
-    Balances from previous contracts are lost (reset to 0).
-    """
-    emp_start_date = datetime.strptime(employee.start_date, "%Y-%m-%d").date()
-    today = date.today()
-
-    if emp_start_date > today:
-        return 0.0
+    Calculate vacation earned by a contractor from `contract_start` up to `today`.
 
-    # 1. Determine Current Contract Period
-    contract_start, contract_end = get_current_contract_period(emp_start_date, today)
-
-    # 2. Calculate Earned Balance for CURRENT period only
+    The start month counts in full if the contract starts on or before the 15th
+    (half otherwise); the current month counts in full once past the 15th.
+    """
     # We treat calculation as if the employee started on `contract_start`
     # But we must preserve the original "day of month" logic for the 15th cutoff.
-    # The original logic used `start_date.day`. We should use `contract_start.day`? 
     # Since `contract_start` is derived from `start_date` via `relativedelta`, the day component is preserved (unless Feb 29 etc).
-    
     effective_start_date = contract_start
-    
+
     earned_balance = 0.0
-    
+
     # Iterate months starting from the month of effective_start_date
     current_month_cursor = date(effective_start_date.year, effective_start_date.month, 1)
     # Align cursor to the 1st of the month
-    
+
     while current_month_cursor <= today:
         # Month of contract start
         if current_month_cursor.year == effective_start_date.year and current_month_cursor.month == effective_start_date.month:
@@ -110,7 +100,7 @@ def calculate_vacation_balance(employee: Employee, all_approved_requests: List[L
                 earned_balance += employee.monthly_vacation_earned
             else:
                 earned_balance += employee.monthly_vacation_earned / 2.0
-        
+
         # Current month (today's month)
         elif current_month_cursor.year == today.year and current_month_cursor.month == today.month:
              if today.day > 15:
@@ -125,18 +115,46 @@ def calculate_vacation_balance(employee: Employee, all_approved_requests: List[L
         # Move to the next month
         current_month_cursor += relativedelta(months=1)
 
-    # --- Calculate Used Vacation ---
-    # Only count requests that fall within the current contract period
-    employee_requests = [req for req in all_approved_requests if req.employee_id == employee.id]
-    
+    return earned_balance
+
+
+def calculate_contract_used(employee_id: str, all_approved_requests: List[LeaveRequest], contract_start: date) -> int:
+    """
+    Calculate approved leave days deducted from a contractor's current contract.
+
+    Assumption: You can't start a vacation in previous contract and end in current (logic would be complex).
+    We simplify: Deduct based on start date.
+    """
     total_used = 0
-    for req in employee_requests:
+    for req in all_approved_requests:
+        if req.employee_id != employee_id:
+            continue
         req_start = datetime.strptime(req.start_date, "%Y-%m-%d").date()
         # If request starts after (or on) the current contract start, deduct it.
-        # Assumption: You can't start a vacation in previous contract and end in current (logic would be complex).
-        # We simplify: Deduct based on start date.
         if req_start >= contract_start:
             total_used += req.duration
+    return total_used
+
+
+def calculate_vacation_balance(employee: Employee, all_approved_requests: List[LeaveRequest]) -> float:
+    """
+    Calculates the current vacation balance based on the CURRENT 11-month contract period.
+    Balances from previous contracts are lost (reset to 0).
+    """
+    emp_start_date = datetime.strptime(employee.start_date, "%Y-%m-%d").date()
+    today = date.today()
+
+    if emp_start_date > today:
+        return 0.0
+
+    # 1. Determine Current Contract Period
+    contract_start, contract_end = get_current_contract_period(emp_start_date, today)
+
+    # 2. Calculate Earned Balance for CURRENT period only
+    earned_balance = calculate_contract_earned(employee, contract_start, today)
+
+    # 3. Calculate Used Vacation - only requests that fall within the current contract period
+    total_used = calculate_contract_used(employee.id, all_approved_requests, contract_start)
 
     return round(max(0.0, earned_balance - total_used), 2)
 
@@ -205,6 +223,29 @@ def _calculate_used_for_year(employee_id: str, all_approved_requests: List[Leave
     return total_used
 
 
+def calculate_permanent_carry_over(employee: Employee, all_approved_requests: List[LeaveRequest],
+                                   today: date, emp_start_date: date, max_carry_over_days: int) -> float:
+    """
+    Calculate the balance carried into the current calendar year from the previous one.
+
+    One-year lookback only (non-recursive), capped at max_carry_over_days.
+    """
+    prev_year_start = date(today.year - 1, 1, 1)
+    prev_year_end = date(today.year - 1, 12, 31)
+
+    if emp_start_date > prev_year_end:
+        return 0.0
+
+    prev_earned = _calculate_earned_for_year(
+        employee, prev_year_start, prev_year_end, emp_start_date, prev_year_end
+    )
+    prev_used = _calculate_used_for_year(
+        employee.id, all_approved_requests, prev_year_start, prev_year_end
+    )
+    prev_remaining = max(0.0, prev_earned - prev_used)
+    return min(prev_remaining, max_carry_over_days)
+
+
 def calculate_permanent_vacation_balance(
     employee: Employee,
     all_approved_requests: List[LeaveRequest],
@@ -229,19 +270,9 @@ def calculate_permanent_vacation_balance(
     current_year_end = date(today.year, 12, 31)
 
     # Calculate carry-over from previous year (one-year lookback, non-recursive)
-    carry_over = 0.0
-    prev_year_start = date(today.year - 1, 1, 1)
-    prev_year_end = date(today.year - 1, 12, 31)
-
-    if emp_start_date <= prev_year_end:
-        prev_earned = _calculate_earned_for_year(
-            employee, prev_year_start, prev_year_end, emp_start_date, prev_year_end
-        )
-        prev_used = _calculate_used_for_year(
-            employee.id, all_approved_requests, prev_year_start, prev_year_end
-        )
-        prev_remaining = max(0.0, prev_earned - prev_used)
-        carry_over = min(prev_remaining, max_carry_over_days)
+    carry_over = calculate_permanent_carry_over(
+        employee, all_approved_requests, today, emp_start_date, max_carry_over_days
+    )
 
     # Calculate earned for current year
     earned_this_year = _calculate_earned_for_year(
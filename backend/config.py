@@ -44,3 +44,15 @@ MIME_TYPE_MAP = {
     'png': 'image/png',
     'gif': 'image/gif'
 }
+
+# Manager notification preferences for new leave requests
+# 'immediate': one email per request; 'digest': batched (see backend/notification_digest.py)
+NOTIFICATION_PREFERENCES = ('immediate', 'digest')
+
+# Bounds for PortalSettings.digest_window_minutes
+MIN_DIGEST_WINDOW_MINUTES = 5
+MAX_DIGEST_WINDOW_MINUTES = 24 * 60
+
+# Admin audit log view: counting stops after this many matching rows
+# (the response then reports total_capped), so the count stays cheap on large tables
+AUDIT_LOG_COUNT_CAP = 10000
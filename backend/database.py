@@ -3,10 +3,10 @@ SQLAlchemy Database Models and Configuration
 Maps to Pydantic models in models.py
 """
 import os
-from sqlalchemy import create_engine, Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, JSON, TypeDecorator
+from sqlalchemy import create_engine, Column, String, Integer, Float, Boolean, Date, DateTime, Text, ForeignKey, JSON, TypeDecorator, UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
 
 # Database-agnostic UUID type
@@ -30,6 +30,34 @@ class GUID(TypeDecorator):
         return value
 
 
+# Typed calendar date exposed to the application as an ISO string
+# Stored as a native DATE so range and overlap predicates run (and use indexes) in SQL,
+# while Pydantic models and callers keep working with 'YYYY-MM-DD' strings.
+class InvalidDateError(ValueError):
+    """A value written to an ISODate column is not a 'YYYY-MM-DD' date"""
+
+
+class ISODate(TypeDecorator):
+    """DATE column that accepts and returns 'YYYY-MM-DD' strings."""
+    impl = Date
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            if not value:
+                return None
+            try:
+                return date.fromisoformat(value)
+            except ValueError:
+                raise InvalidDateError(f"Invalid date '{value}', expected YYYY-MM-DD")
+        return value
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+
+
 # Database URL from environment variable
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
@@ -93,11 +121,12 @@ class EmployeeModel(Base):
     position_en = Column(String(200), nullable=False)
     unit_id = Column(Integer, ForeignKey("units.id"), nullable=False, index=True)
     manager_id = Column(String(50), ForeignKey("employees.id"), nullable=True, index=True)
-    start_date = Column(String(10), nullable=False)  # YYYY-MM-DD
+    start_date = Column(ISODate, nullable=False)  # YYYY-MM-DD
     monthly_vacation_earned = Column(Float, default=2.5, nullable=False)
     signature_path = Column(String(500), nullable=True)
     contract_auto_renewed = Column(Boolean, default=False, nullable=False)
     employee_type = Column(String(20), default='contractor', nullable=False)  # 'permanent' or 'contractor'
+    notification_preference = Column(String(20), default='immediate', nullable=False)  # 'immediate' or 'digest'
 
     # Relationships
     user = relationship("UserModel", back_populates="employee")
@@ -126,18 +155,22 @@ class LeaveRequestModel(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     employee_id = Column(String(50), ForeignKey("employees.id"), nullable=False, index=True)
     vacation_type = Column(String(50), nullable=False)  # 'Annual', 'Sick', etc.
-    start_date = Column(String(10), nullable=False)  # YYYY-MM-DD
-    end_date = Column(String(10), nullable=False)  # YYYY-MM-DD
+    start_date = Column(ISODate, nullable=False)  # YYYY-MM-DD
+    end_date = Column(ISODate, nullable=False)  # YYYY-MM-DD
     duration = Column(Integer, nullable=False)
     status = Column(String(20), default='Pending', nullable=False)  # 'Pending', 'Approved', 'Rejected'
     rejection_reason = Column(Text, nullable=True)
-    approval_date = Column(String(10), nullable=True)  # YYYY-MM-DD
+    approval_date = Column(ISODate, nullable=True)  # YYYY-MM-DD
     balance_used = Column(Integer, nullable=False)
     attachments = Column(JSON, default=list, nullable=False)  # List of file paths
 
     # Relationships
     employee = relationship("EmployeeModel", back_populates="leave_requests")
 
+    __table_args__ = (
+        Index('ix_leave_requests_employee_status_start', 'employee_id', 'status', 'start_date'),
+    )
+
 
 class AttendanceLogModel(Base):
     """Employee attendance tracking"""
@@ -145,7 +178,7 @@ class AttendanceLogModel(Base):
 
     id = Column(GUID, primary_key=True, default=uuid.uuid4)
     employee_id = Column(String(50), ForeignKey("employees.id"), nullable=False, index=True)
-    date = Column(String(10), nullable=False, index=True)  # YYYY-MM-DD
+    date = Column(ISODate, nullable=False, index=True)  # YYYY-MM-DD
     check_in = Column(DateTime, nullable=False)
     check_out = Column(DateTime, nullable=True)
     status = Column(String(20), default='Present', nullable=False)  # 'Present', 'Absent', 'Late'
@@ -153,6 +186,11 @@ class AttendanceLogModel(Base):
     # Relationships
     employee = relationship("EmployeeModel", back_populates="attendance_logs")
 
+    __table_args__ = (
+        # One attendance record per employee per day
+        Index('ux_attendance_logs_employee_date', 'employee_id', 'date', unique=True),
+    )
+
 
 class EmailSettingsModel(Base):
     """SMTP email configuration (singleton)"""
@@ -173,6 +211,201 @@ class PortalSettingsModel(Base):
 
     id = Column(Integer, primary_key=True, default=1)  # Only one record
     max_carry_over_days = Column(Integer, default=15, nullable=False)
+    digest_window_minutes = Column(Integer, default=60, nullable=False)  # Manager digest email window
+
+
+class LeaveBalanceModel(Base):
+    """
+    Persisted leave balance ledger, one row per employee per contract period.
+
+    Derived data: maintained by backend.balance_ledger when approvals,
+    employee contract fields or carry-over settings change, and rebuildable
+    from leave_requests at any time.
+    """
+    __tablename__ = "leave_balances"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    employee_id = Column(String(50), nullable=False, index=True)
+    employee_type = Column(String(20), nullable=False)  # 'permanent' or 'contractor'
+    period_start = Column(ISODate, nullable=False)
+    period_end = Column(ISODate, nullable=False)
+    earned_days = Column(Float, default=0.0, nullable=False)  # Accrued as of earned_as_of
+    earned_as_of = Column(ISODate, nullable=False)
+    used_days = Column(Float, default=0.0, nullable=False)
+    carry_over_days = Column(Float, default=0.0, nullable=False)  # Permanent employees only
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'period_start', name='uq_leave_balances_employee_period'),
+    )
+
+
+class ContractNotificationQueueModel(Base):
+    """
+    Due-date queue of contract end notifications.
+
+    Derived data: backend.notification_queue plans each contractor's rows for
+    the current contract period ('40_days', 'critical', and a 'replan' row on
+    the first day of the next period) whenever their balance ledger row is
+    recomputed. The daily scheduler job only reads the rows due today.
+    """
+    __tablename__ = "contract_notification_queue"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    employee_id = Column(String(50), nullable=False, index=True)
+    notification_type = Column(String(20), nullable=False)  # '40_days', 'critical', 'replan'
+    due_date = Column(ISODate, nullable=False, index=True)  # YYYY-MM-DD
+    contract_end_date = Column(ISODate, nullable=False)  # YYYY-MM-DD, end of the period planned for
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'notification_type', 'contract_end_date',
+                         name='uq_contract_notification_queue_employee_type_end'),
+    )
+
+
+class SentNotificationModel(Base):
+    """
+    Contract end notifications that have been sent.
+
+    Deduplicates the scheduler's emails: each (employee, type, contract end)
+    is sent at most once. Rows older than a year are purged by the scheduler.
+    """
+    __tablename__ = "sent_notifications"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    employee_id = Column(String(50), nullable=False)
+    notification_type = Column(String(20), nullable=False)  # '40_days', 'critical'
+    contract_end_date = Column(ISODate, nullable=False)  # YYYY-MM-DD
+    sent_on = Column(ISODate, nullable=False, index=True)  # YYYY-MM-DD
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'notification_type', 'contract_end_date',
+                         name='uq_sent_notifications_employee_type_end'),
+    )
+
+
+class NotificationRunModel(Base):
+    """Statistics of one run of the contract notification scheduler job."""
+    __tablename__ = "notification_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    started_at = Column(DateTime, nullable=False, index=True)
+    duration_seconds = Column(Float, nullable=False)
+    due = Column(Integer, default=0, nullable=False)  # Queue rows due
+    planned = Column(Integer, default=0, nullable=False)  # Emails handed to delivery
+    sent = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)  # Still queued, retried next run
+    error = Column(Text, nullable=True)  # Set if the run itself aborted
+
+
+class SchedulerLockModel(Base):
+    """
+    Leader lease of the in-app scheduler (see backend.app_scheduler).
+
+    The worker whose lease has not expired is the leader and the only one
+    that runs scheduled jobs; it renews the lease on every tick.
+    """
+    __tablename__ = "scheduler_locks"
+
+    name = Column(String(50), primary_key=True)
+    owner = Column(String(100), nullable=False)  # host:pid:nonce of the leader
+    expires_at = Column(DateTime, nullable=False)  # UTC
+
+
+class ScheduledJobModel(Base):
+    """Last run of each scheduled job; last_run_date makes a daily job run once per day."""
+    __tablename__ = "scheduled_jobs"
+
+    name = Column(String(50), primary_key=True)
+    last_run_date = Column(ISODate, nullable=True)  # YYYY-MM-DD (local date the run was for)
+    last_owner = Column(String(100), nullable=True)
+    last_started_at = Column(DateTime, nullable=True)  # UTC
+    last_finished_at = Column(DateTime, nullable=True)  # UTC
+    last_error = Column(Text, nullable=True)
+
+
+class EmployeeHierarchyModel(Base):
+    """
+    Closure table of the management hierarchy.
+
+    One row per (ancestor, descendant) pair where the ancestor is a direct or
+    indirect manager of the descendant; depth 1 is a direct report.
+    Maintained by DBEmployeeRepository whenever manager_id changes, so
+    subordinate lookups are a single indexed query.
+    """
+    __tablename__ = "employee_hierarchy"
+
+    ancestor_id = Column(String(50), primary_key=True)
+    descendant_id = Column(String(50), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False)
+
+
+class NotificationDigestItemModel(Base):
+    """
+    A new leave request waiting to be included in its manager's digest email.
+
+    Written instead of an immediate email for managers whose
+    notification_preference is 'digest'; backend.notification_digest turns a
+    manager's items into one email once the oldest is older than the
+    portal's digest window.
+    """
+    __tablename__ = "notification_digest_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    manager_id = Column(String(50), nullable=False)
+    leave_request_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    digested_at = Column(DateTime, nullable=True)  # Set once sent (or dropped)
+
+    __table_args__ = (
+        Index('ix_notification_digest_items_pending', 'digested_at', 'manager_id', 'created_at'),
+    )
+
+
+class EmailOutboxModel(Base):
+    """
+    Transactional email outbox.
+
+    Notification emails are added to the session in the same transaction as
+    the change that triggers them, and delivered afterwards by
+    backend.email_outbox.OutboxWorker with retries and exponential backoff.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(500), nullable=False)
+    body = Column(Text, nullable=False)
+    is_html = Column(Boolean, default=True, nullable=False)
+    status = Column(String(20), default='pending', nullable=False)  # 'pending', 'sent', 'failed'
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Also the lease while sending
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+
+class AuditUserAgentModel(Base):
+    """Distinct User-Agent headers seen in audit entries, referenced by id."""
+    __tablename__ = "audit_user_agents"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    value_hash = Column(String(64), nullable=False, unique=True)  # SHA-256 of value (headers can be long)
+    value = Column(Text, nullable=False)
+
+
+class AuditIpAddressModel(Base):
+    """Distinct client IP addresses seen in audit entries, referenced by id."""
+    __tablename__ = "audit_ip_addresses"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    value_hash = Column(String(64), nullable=False, unique=True)
+    value = Column(Text, nullable=False)
 
 
 class AuditLogModel(Base):
@@ -203,9 +436,32 @@ class AuditLogModel(Base):
     entity_type = Column(String(50), nullable=False, index=True)  # e.g., "leave_request"
     entity_id = Column(String(100), nullable=False, index=True)  # ID of affected entity
     details = Column(Text, nullable=True)  # JSON string with additional context
+    # Request metadata, interned in the lookup tables (see backend.audit_lookups);
+    # ip_address/user_agent only hold values of entries written before that
+    ip_address_id = Column(Integer, ForeignKey("audit_ip_addresses.id"), nullable=True)
+    user_agent_id = Column(Integer, ForeignKey("audit_user_agents.id"), nullable=True)
     ip_address = Column(String(50), nullable=True)
     user_agent = Column(Text, nullable=True)
 
+    # Copied from details when the entry is written (see audit.AUDIT_DETAIL_COLUMNS)
+    employee_id = Column(String(50), nullable=True)  # Employee the action concerns
+    previous_status = Column(String(20), nullable=True, index=True)
+    new_status = Column(String(20), nullable=True, index=True)
+    vacation_type = Column(String(50), nullable=True, index=True)
+
+    ip_address_ref = relationship("AuditIpAddressModel", lazy="joined")
+    user_agent_ref = relationship("AuditUserAgentModel", lazy="joined")
+
+    # Match the admin view's filters and its (timestamp, id) keyset order
+    __table_args__ = (
+        Index('ix_audit_logs_timestamp_id', 'timestamp', 'id'),
+        Index('ix_audit_logs_action_timestamp', 'action', 'timestamp', 'id'),
+        Index('ix_audit_logs_entity_type_timestamp', 'entity_type', 'timestamp', 'id'),
+        Index('ix_audit_logs_user_timestamp', 'user_id', 'timestamp', 'id'),
+        Index('ix_audit_logs_employee_timestamp', 'employee_id', 'timestamp', 'id'),
+        Index('ix_audit_logs_entity_timestamp', 'entity_type', 'entity_id', 'timestamp', 'id'),
+    )
+
 
 # ==============================================
 # Database Helper Functions
@@ -251,6 +507,56 @@ def _run_migrations(db):
             db.commit()
             print("[MIGRATION] employee_type column added successfully")
 
+        # Migration: Add notification_preference column if missing
+        if 'notification_preference' not in columns:
+            print("[MIGRATION] Adding notification_preference column to employees table...")
+            db.execute(text(
+                "ALTER TABLE employees ADD COLUMN notification_preference VARCHAR(20) DEFAULT 'immediate' NOT NULL"
+            ))
+            db.commit()
+            print("[MIGRATION] notification_preference column added successfully")
+
+        # Migration: Backfill the hierarchy closure table for existing employees
+        if db.query(EmployeeHierarchyModel).count() == 0 and db.query(EmployeeModel).count() > 0:
+            from .db_repositories import DBEmployeeRepository
+            print("[MIGRATION] Backfilling employee_hierarchy closure table...")
+            rows = DBEmployeeRepository(db).rebuild_hierarchy()
+            print(f"[MIGRATION] employee_hierarchy backfilled with {rows} rows")
+
+    if 'portal_settings' in inspector.get_table_names():
+        columns = [col['name'] for col in inspector.get_columns('portal_settings')]
+
+        # Migration: Add digest_window_minutes column if missing
+        if 'digest_window_minutes' not in columns:
+            print("[MIGRATION] Adding digest_window_minutes column to portal_settings table...")
+            db.execute(text(
+                "ALTER TABLE portal_settings ADD COLUMN digest_window_minutes INTEGER DEFAULT 60 NOT NULL"
+            ))
+            db.commit()
+            print("[MIGRATION] digest_window_minutes column added successfully")
+
+    # Migration: One-time import of the old JSON notification tracking file
+    from .migrations.import_sent_notifications import LEGACY_TRACKING_FILE, upgrade as import_sent_notifications
+    if LEGACY_TRACKING_FILE.exists():
+        import_sent_notifications()
+
+    # Migration: Indexed audit detail columns (batched backfill from details)
+    from .migrations.extract_audit_details import needs_upgrade as audit_details_missing, upgrade as extract_audit_details
+    if audit_details_missing():
+        extract_audit_details()
+
+    # Migration: Intern audit IP addresses and user agents into lookup tables
+    from .migrations.intern_audit_client_values import needs_upgrade as audit_lookups_missing, upgrade as intern_audit_client_values
+    if audit_lookups_missing():
+        intern_audit_client_values()
+
+    # Migration: Typed DATE columns (batched backfill) and declared composite indexes
+    from .migrations.convert_date_columns import needs_conversion, upgrade as convert_date_columns, ensure_indexes
+    if needs_conversion():
+        convert_date_columns()
+    else:
+        ensure_indexes()
+
 
 def init_db():
     """
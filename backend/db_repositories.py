@@ -3,17 +3,28 @@ PostgreSQL Database Repositories using SQLAlchemy
 Replaces CSV repositories with database-backed versions
 Maintains same interface as CSVRepositories for compatibility
 """
-from typing import List, Optional
+import hashlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from uuid import UUID, uuid4
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
 from backend.database import (
     UserModel, EmployeeModel, UnitModel, LeaveRequestModel,
-    AttendanceLogModel, EmailSettingsModel, PortalSettingsModel
+    AttendanceLogModel, EmailSettingsModel, PortalSettingsModel, LeaveBalanceModel,
+    EmployeeHierarchyModel, EmailOutboxModel, NotificationDigestItemModel, ContractNotificationQueueModel,
+    SentNotificationModel, NotificationRunModel, SchedulerLockModel, ScheduledJobModel, AuditLogModel,
+    AuditUserAgentModel, AuditIpAddressModel
 )
 from backend.models import (
     User, Employee, Unit, LeaveRequest, AttendanceLog, EmailSettings,
-    PortalSettings
+    PortalSettings, LeaveBalance, OutboxMessage, ContractNotificationDue, NotificationRun,
+    ScheduledJobState, AuditLog
 )
+from backend.employee_cache import employee_cache
+from backend.principal_cache import principal_cache
+from backend.exceptions import HierarchyCycleError
 
 
 class DBUserRepository:
@@ -22,38 +33,30 @@ class DBUserRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all(self) -> List[User]:
-        users = self.db.query(UserModel).all()
-        return [User(
+    @staticmethod
+    def _to_user(u: UserModel) -> User:
+        return User(
             id=u.id,
             email=u.email,
             password_hash=u.password_hash,
             role=u.role,
             is_active=u.is_active
-        ) for u in users]
+        )
+
+    def get_all(self) -> List[User]:
+        users = self.db.query(UserModel).all()
+        return [self._to_user(u) for u in users]
 
     def get_by_id(self, user_id: UUID) -> Optional[User]:
         user = self.db.query(UserModel).filter(UserModel.id == user_id).first()
         if user:
-            return User(
-                id=user.id,
-                email=user.email,
-                password_hash=user.password_hash,
-                role=user.role,
-                is_active=user.is_active
-            )
+            return self._to_user(user)
         return None
 
     def get_by_email(self, email: str) -> Optional[User]:
         user = self.db.query(UserModel).filter(UserModel.email == email).first()
         if user:
-            return User(
-                id=user.id,
-                email=user.email,
-                password_hash=user.password_hash,
-                role=user.role,
-                is_active=user.is_active
-            )
+            return self._to_user(user)
         return None
 
     def add(self, user: User) -> User:
@@ -78,11 +81,15 @@ class DBUserRepository:
             db_user.is_active = updated_user.is_active
             self.db.commit()
             self.db.refresh(db_user)
+            employee_cache.invalidate_user(updated_user.id)
+            principal_cache.invalidate_user(updated_user.id)
         return updated_user
 
     def delete(self, user_id: UUID):
         self.db.query(UserModel).filter(UserModel.id == user_id).delete()
         self.db.commit()
+        employee_cache.invalidate_user(user_id)
+        principal_cache.invalidate_user(user_id)
 
 
 class DBEmployeeRepository:
@@ -91,9 +98,9 @@ class DBEmployeeRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all(self) -> List[Employee]:
-        employees = self.db.query(EmployeeModel).all()
-        return [Employee(
+    @staticmethod
+    def _to_employee(e: EmployeeModel) -> Employee:
+        return Employee(
             id=e.id,
             user_id=e.user_id,
             first_name_ar=e.first_name_ar,
@@ -108,56 +115,150 @@ class DBEmployeeRepository:
             monthly_vacation_earned=e.monthly_vacation_earned,
             signature_path=e.signature_path,
             contract_auto_renewed=e.contract_auto_renewed,
-            employee_type=e.employee_type or 'contractor'
-        ) for e in employees]
+            employee_type=e.employee_type or 'contractor',
+            notification_preference=e.notification_preference or 'immediate'
+        )
+
+    def _with_user_query(self):
+        return self.db.query(EmployeeModel, UserModel).outerjoin(
+            UserModel, EmployeeModel.user_id == UserModel.id
+        )
+
+    def _to_employee_with_user(self, row) -> Tuple[Employee, Optional[User]]:
+        emp, user = row
+        return self._to_employee(emp), (DBUserRepository._to_user(user) if user else None)
+
+    def get_all(self) -> List[Employee]:
+        employees = self.db.query(EmployeeModel).all()
+        return [self._to_employee(e) for e in employees]
 
     def get_by_id(self, employee_id: str) -> Optional[Employee]:
         emp = self.db.query(EmployeeModel).filter(EmployeeModel.id == employee_id).first()
         if emp:
-            return Employee(
-                id=emp.id,
-                user_id=emp.user_id,
-                first_name_ar=emp.first_name_ar,
-                last_name_ar=emp.last_name_ar,
-                first_name_en=emp.first_name_en,
-                last_name_en=emp.last_name_en,
-                position_ar=emp.position_ar,
-                position_en=emp.position_en,
-                unit_id=emp.unit_id,
-                manager_id=emp.manager_id,
-                start_date=emp.start_date,
-                monthly_vacation_earned=emp.monthly_vacation_earned,
-                signature_path=emp.signature_path,
-                contract_auto_renewed=emp.contract_auto_renewed,
-                employee_type=emp.employee_type or 'contractor'
-            )
+            return self._to_employee(emp)
         return None
 
     def get_by_user_id(self, user_id: UUID) -> Optional[Employee]:
         emp = self.db.query(EmployeeModel).filter(EmployeeModel.user_id == user_id).first()
         if emp:
-            return Employee(
-                id=emp.id,
-                user_id=emp.user_id,
-                first_name_ar=emp.first_name_ar,
-                last_name_ar=emp.last_name_ar,
-                first_name_en=emp.first_name_en,
-                last_name_en=emp.last_name_en,
-                position_ar=emp.position_ar,
-                position_en=emp.position_en,
-                unit_id=emp.unit_id,
-                manager_id=emp.manager_id,
-                start_date=emp.start_date,
-                monthly_vacation_earned=emp.monthly_vacation_earned,
-                signature_path=emp.signature_path,
-                contract_auto_renewed=emp.contract_auto_renewed,
-                employee_type=emp.employee_type or 'contractor'
-            )
+            return self._to_employee(emp)
         return None
 
+    def get_all_with_users(self) -> List[Tuple[Employee, Optional[User]]]:
+        """Get all employees paired with their user accounts in a single joined query."""
+        return [self._to_employee_with_user(row) for row in self._with_user_query().all()]
+
+    def get_by_ids_with_users(self, employee_ids: List[str]) -> List[Tuple[Employee, Optional[User]]]:
+        """Employees with the given IDs paired with their user accounts, in one joined query."""
+        if not employee_ids:
+            return []
+        rows = self._with_user_query().filter(EmployeeModel.id.in_(employee_ids)).all()
+        return [self._to_employee_with_user(row) for row in rows]
+
+    def get_by_id_with_user(self, employee_id: str) -> Tuple[Optional[Employee], Optional[User]]:
+        row = self._with_user_query().filter(EmployeeModel.id == employee_id).first()
+        if row:
+            return self._to_employee_with_user(row)
+        return None, None
+
+    def get_by_user_id_with_user(self, user_id: UUID) -> Tuple[Optional[Employee], Optional[User]]:
+        row = self._with_user_query().filter(EmployeeModel.user_id == user_id).first()
+        if row:
+            return self._to_employee_with_user(row)
+        return None, None
+
+    # --- Hierarchy closure table ---
+
+    def get_subordinate_ids(self, manager_id: str, include_indirect: bool = True) -> Set[str]:
+        """IDs of employees reporting to manager_id (directly, or at any depth)."""
+        query = self.db.query(EmployeeHierarchyModel.descendant_id).filter(
+            EmployeeHierarchyModel.ancestor_id == manager_id
+        )
+        if not include_indirect:
+            query = query.filter(EmployeeHierarchyModel.depth == 1)
+        return {row[0] for row in query.all()}
+
+    def is_subordinate(self, employee_id: str, manager_id: str) -> bool:
+        return self.db.query(EmployeeHierarchyModel).filter(
+            EmployeeHierarchyModel.ancestor_id == manager_id,
+            EmployeeHierarchyModel.descendant_id == employee_id
+        ).first() is not None
+
+    def _detach_subtree(self, employee_id: str) -> List[Tuple[str, int]]:
+        """
+        Remove the links between employee_id's subtree and its current ancestors.
+
+        Returns the subtree as (descendant_id, depth below employee_id), including
+        employee_id itself at depth 0. Does not commit.
+        """
+        subtree = [(employee_id, 0)] + [
+            (row.descendant_id, row.depth)
+            for row in self.db.query(EmployeeHierarchyModel).filter(
+                EmployeeHierarchyModel.ancestor_id == employee_id
+            ).all()
+        ]
+        subtree_ids = [node_id for node_id, _ in subtree]
+        self.db.query(EmployeeHierarchyModel).filter(
+            EmployeeHierarchyModel.descendant_id.in_(subtree_ids),
+            EmployeeHierarchyModel.ancestor_id.notin_(subtree_ids)
+        ).delete(synchronize_session=False)
+        return subtree
+
+    def _relink(self, employee_id: str, manager_id: Optional[str]):
+        """
+        Move employee_id (with all its reports) under manager_id in the closure table.
+
+        Raises HierarchyCycleError if manager_id is the employee or one of its
+        subordinates. Does not commit.
+        """
+        if manager_id and (manager_id == employee_id or self.is_subordinate(manager_id, employee_id)):
+            raise HierarchyCycleError(employee_id, manager_id)
+
+        subtree = self._detach_subtree(employee_id)
+        if not manager_id:
+            return
+
+        ancestors = [(manager_id, 0)] + [
+            (row.ancestor_id, row.depth)
+            for row in self.db.query(EmployeeHierarchyModel).filter(
+                EmployeeHierarchyModel.descendant_id == manager_id
+            ).all()
+        ]
+        self.db.add_all([
+            EmployeeHierarchyModel(
+                ancestor_id=ancestor_id,
+                descendant_id=descendant_id,
+                depth=ancestor_depth + descendant_depth + 1
+            )
+            for ancestor_id, ancestor_depth in ancestors
+            for descendant_id, descendant_depth in subtree
+        ])
+
+    def rebuild_hierarchy(self) -> int:
+        """Recompute the closure table from employees.manager_id. Returns the row count."""
+        managers = {emp_id: mgr_id for emp_id, mgr_id in self.db.query(EmployeeModel.id, EmployeeModel.manager_id).all()}
+        self.db.query(EmployeeHierarchyModel).delete(synchronize_session=False)
+
+        rows = []
+        for emp_id in managers:
+            depth = 1
+            ancestor_id = managers.get(emp_id)
+            seen = {emp_id}
+            # Walk up the chain; stop at the root, a deleted manager, or a pre-existing cycle
+            while ancestor_id in managers and ancestor_id not in seen:
+                rows.append(EmployeeHierarchyModel(ancestor_id=ancestor_id, descendant_id=emp_id, depth=depth))
+                seen.add(ancestor_id)
+                ancestor_id = managers.get(ancestor_id)
+                depth += 1
+
+        self.db.add_all(rows)
+        self.db.commit()
+        return len(rows)
+
     def add(self, employee: Employee) -> Employee:
         # Convert empty string to None for optional foreign keys
         manager_id = employee.manager_id if employee.manager_id and employee.manager_id.strip() else None
+        self._relink(employee.id, manager_id)
 
         db_emp = EmployeeModel(
             id=employee.id,
@@ -174,11 +275,13 @@ class DBEmployeeRepository:
             monthly_vacation_earned=employee.monthly_vacation_earned,
             signature_path=employee.signature_path,
             contract_auto_renewed=employee.contract_auto_renewed,
-            employee_type=employee.employee_type or 'contractor'
+            employee_type=employee.employee_type or 'contractor',
+            notification_preference=employee.notification_preference or 'immediate'
         )
         self.db.add(db_emp)
         self.db.commit()
         self.db.refresh(db_emp)
+        employee_cache.invalidate_employee(employee.id)
         return employee
 
     def update(self, updated_employee: Employee) -> Employee:
@@ -189,6 +292,8 @@ class DBEmployeeRepository:
         if db_emp:
             # Convert empty string to None for optional foreign keys
             manager_id = updated_employee.manager_id if updated_employee.manager_id and updated_employee.manager_id.strip() else None
+            if manager_id != db_emp.manager_id:
+                self._relink(employee_id, manager_id)
 
             db_emp.first_name_ar = updated_employee.first_name_ar
             db_emp.last_name_ar = updated_employee.last_name_ar
@@ -203,13 +308,22 @@ class DBEmployeeRepository:
             db_emp.signature_path = updated_employee.signature_path
             db_emp.contract_auto_renewed = updated_employee.contract_auto_renewed
             db_emp.employee_type = updated_employee.employee_type or 'contractor'
+            db_emp.notification_preference = updated_employee.notification_preference or 'immediate'
             self.db.commit()
             self.db.refresh(db_emp)
+            employee_cache.invalidate_employee(employee_id)
         return updated_employee
 
     def delete(self, employee_id: str):
+        # Direct reports become roots of their own subtrees
+        self._detach_subtree(employee_id)
+        self.db.query(EmployeeHierarchyModel).filter(
+            (EmployeeHierarchyModel.ancestor_id == employee_id) |
+            (EmployeeHierarchyModel.descendant_id == employee_id)
+        ).delete(synchronize_session=False)
         self.db.query(EmployeeModel).filter(EmployeeModel.id == employee_id).delete()
         self.db.commit()
+        employee_cache.invalidate_employee(employee_id)
 
 
 class DBUnitRepository:
@@ -267,9 +381,9 @@ class DBLeaveRequestRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all(self) -> List[LeaveRequest]:
-        requests = self.db.query(LeaveRequestModel).all()
-        return [LeaveRequest(
+    @staticmethod
+    def _to_leave_request(r: LeaveRequestModel) -> LeaveRequest:
+        return LeaveRequest(
             id=r.id,
             employee_id=r.employee_id,
             vacation_type=r.vacation_type,
@@ -281,45 +395,136 @@ class DBLeaveRequestRepository:
             approval_date=r.approval_date,
             balance_used=r.balance_used,
             attachments=r.attachments if r.attachments else []
-        ) for r in requests]
+        )
+
+    def get_all(self) -> List[LeaveRequest]:
+        requests = self.db.query(LeaveRequestModel).all()
+        return [self._to_leave_request(r) for r in requests]
 
     def get_by_id(self, request_id: int) -> Optional[LeaveRequest]:
         req = self.db.query(LeaveRequestModel).filter(LeaveRequestModel.id == request_id).first()
         if req:
-            return LeaveRequest(
-                id=req.id,
-                employee_id=req.employee_id,
-                vacation_type=req.vacation_type,
-                start_date=req.start_date,
-                end_date=req.end_date,
-                duration=req.duration,
-                status=req.status,
-                rejection_reason=req.rejection_reason,
-                approval_date=req.approval_date,
-                balance_used=req.balance_used,
-                attachments=req.attachments if req.attachments else []
-            )
+            return self._to_leave_request(req)
         return None
 
     def get_by_employee_id(self, employee_id: str) -> List[LeaveRequest]:
         requests = self.db.query(LeaveRequestModel).filter(
             LeaveRequestModel.employee_id == employee_id
         ).all()
-        return [LeaveRequest(
-            id=r.id,
-            employee_id=r.employee_id,
-            vacation_type=r.vacation_type,
-            start_date=r.start_date,
-            end_date=r.end_date,
-            duration=r.duration,
-            status=r.status,
-            rejection_reason=r.rejection_reason,
-            approval_date=r.approval_date,
-            balance_used=r.balance_used,
-            attachments=r.attachments if r.attachments else []
-        ) for r in requests]
+        return [self._to_leave_request(r) for r in requests]
+
+    def get_approved(self, employee_id: Optional[str] = None) -> List[LeaveRequest]:
+        """
+        Get approved leave requests, optionally for a single employee.
+
+        The status (and employee) filter runs in SQL so balance calculations
+        never have to load pending/rejected requests.
+        """
+        query = self.db.query(LeaveRequestModel).filter(LeaveRequestModel.status == 'Approved')
+        if employee_id is not None:
+            query = query.filter(LeaveRequestModel.employee_id == employee_id)
+        return [self._to_leave_request(r) for r in query.all()]
 
-    def add(self, leave_request: LeaveRequest) -> LeaveRequest:
+    def get_overlapping(self, start_date: str, end_date: str, employee_ids: Optional[List[str]] = None,
+                        status: Optional[str] = None) -> List[LeaveRequest]:
+        """
+        Requests overlapping [start_date, end_date] (YYYY-MM-DD, inclusive).
+
+        The overlap test runs in SQL against the DATE columns and can use the
+        (employee_id, status, start_date) index.
+        """
+        query = self.db.query(LeaveRequestModel).filter(
+            LeaveRequestModel.start_date <= end_date,
+            LeaveRequestModel.end_date >= start_date
+        )
+        if employee_ids is not None:
+            if not employee_ids:
+                return []
+            query = query.filter(LeaveRequestModel.employee_id.in_(employee_ids))
+        if status is not None:
+            query = query.filter(LeaveRequestModel.status == status)
+        return [self._to_leave_request(r) for r in query.order_by(LeaveRequestModel.id).all()]
+
+    def get_approved_overlapping(self, employee_ids: List[str], start_date: str, end_date: str) -> List[LeaveRequest]:
+        """Approved requests of the given employees that overlap [start_date, end_date] (YYYY-MM-DD)."""
+        return self.get_overlapping(start_date, end_date, employee_ids=employee_ids, status='Approved')
+
+    def _search_query(self, employee_id: Optional[str] = None, status: Optional[str] = None,
+                      vacation_type: Optional[str] = None, from_date: Optional[str] = None,
+                      to_date: Optional[str] = None, unit_id: Optional[int] = None,
+                      manager_id: Optional[str] = None, exclude_employee_id: Optional[str] = None):
+        query = self.db.query(LeaveRequestModel)
+        if unit_id is not None:
+            query = query.join(EmployeeModel, EmployeeModel.id == LeaveRequestModel.employee_id).filter(
+                EmployeeModel.unit_id == unit_id
+            )
+        if manager_id is not None:
+            subtree = self.db.query(EmployeeHierarchyModel.descendant_id).filter(
+                EmployeeHierarchyModel.ancestor_id == manager_id
+            )
+            query = query.filter(LeaveRequestModel.employee_id.in_(subtree))
+        if employee_id is not None:
+            query = query.filter(LeaveRequestModel.employee_id == employee_id)
+        if exclude_employee_id is not None:
+            query = query.filter(LeaveRequestModel.employee_id != exclude_employee_id)
+        if status is not None:
+            query = query.filter(LeaveRequestModel.status == status)
+        if vacation_type is not None:
+            query = query.filter(LeaveRequestModel.vacation_type == vacation_type)
+        if from_date is not None:
+            query = query.filter(LeaveRequestModel.end_date >= from_date)
+        if to_date is not None:
+            query = query.filter(LeaveRequestModel.start_date <= to_date)
+        return query
+
+    def search(self, after: Optional[Tuple[str, int]] = None, limit: Optional[int] = None,
+               ascending: bool = False, **filters) -> List[LeaveRequest]:
+        """
+        Filtered leave requests ordered by (start_date, id), evaluated entirely in SQL.
+
+        Filters (all optional): employee_id, status, vacation_type, unit_id,
+        from_date/to_date (keep requests overlapping this window), manager_id
+        (keep requests of the manager's direct and indirect reports) and
+        exclude_employee_id.
+
+        Args:
+            after: Keyset position (start_date, id) of the last row of the previous page
+            limit: Maximum number of rows to return
+            ascending: Oldest start_date first instead of newest first
+        """
+        query = self._search_query(**filters)
+        if after is not None:
+            after_start, after_id = after
+            if ascending:
+                query = query.filter(or_(
+                    LeaveRequestModel.start_date > after_start,
+                    and_(LeaveRequestModel.start_date == after_start, LeaveRequestModel.id > after_id)
+                ))
+            else:
+                query = query.filter(or_(
+                    LeaveRequestModel.start_date < after_start,
+                    and_(LeaveRequestModel.start_date == after_start, LeaveRequestModel.id < after_id)
+                ))
+        if ascending:
+            query = query.order_by(LeaveRequestModel.start_date, LeaveRequestModel.id)
+        else:
+            query = query.order_by(LeaveRequestModel.start_date.desc(), LeaveRequestModel.id.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        return [self._to_leave_request(r) for r in query.all()]
+
+    def count_by_vacation_type(self, **filters) -> Dict[str, int]:
+        """Number of requests matching the search filters, grouped by vacation type."""
+        query = self._search_query(**filters).with_entities(
+            LeaveRequestModel.vacation_type, func.count(LeaveRequestModel.id)
+        ).group_by(LeaveRequestModel.vacation_type)
+        return {vacation_type: count for vacation_type, count in query.all()}
+
+    def add(self, leave_request: LeaveRequest, extra_rows: Optional[Callable[[int], list]] = None) -> LeaveRequest:
+        """
+        Insert a leave request. extra_rows(new request id) gives rows that need
+        the id (e.g. a manager digest item) to commit in the same transaction.
+        """
         db_req = LeaveRequestModel(
             employee_id=leave_request.employee_id,
             vacation_type=leave_request.vacation_type,
@@ -333,12 +538,69 @@ class DBLeaveRequestRepository:
             attachments=leave_request.attachments if leave_request.attachments else []
         )
         self.db.add(db_req)
+        if extra_rows:
+            self.db.flush()  # Assigns the id
+            self.db.add_all(extra_rows(db_req.id))
         self.db.commit()
         self.db.refresh(db_req)
         leave_request.id = db_req.id  # Get auto-generated ID
+        employee_cache.invalidate_employee(leave_request.employee_id)
         return leave_request
 
-    def update(self, updated_request: LeaveRequest) -> LeaveRequest:
+    def get_by_ids(self, request_ids: List[int]) -> List[LeaveRequest]:
+        if not request_ids:
+            return []
+        rows = self.db.query(LeaveRequestModel).filter(LeaveRequestModel.id.in_(request_ids)).all()
+        return [self._to_leave_request(r) for r in rows]
+
+    def decide_pending(self, decided: List[LeaveRequest],
+                       extra_rows: Optional[Callable[[Set[int]], list]] = None) -> Set[int]:
+        """
+        Write the decisions (status fields) of several requests in a single commit,
+        but only for requests that are still Pending in the database.
+
+        The check is part of the UPDATE (WHERE status = 'Pending'), so when two
+        deciders race for a request exactly one of them wins it.
+        extra_rows(won request ids) gives the rows (e.g. audit log entries) to
+        add to the same transaction, so either every change is persisted or none is.
+
+        Returns:
+            Ids of the requests whose decision was written
+        """
+        if not decided:
+            return set()
+        groups: Dict[tuple, List[int]] = {}
+        for r in decided:
+            groups.setdefault((r.status, r.approval_date, r.rejection_reason), []).append(r.id)
+        try:
+            won: Set[int] = set()
+            for (new_status, approval_date, rejection_reason), ids in groups.items():
+                result = self.db.execute(
+                    update(LeaveRequestModel)
+                    .where(LeaveRequestModel.id.in_(ids), LeaveRequestModel.status == 'Pending')
+                    .values(status=new_status, approval_date=approval_date, rejection_reason=rejection_reason)
+                    .returning(LeaveRequestModel.id)
+                    .execution_options(synchronize_session=False)
+                )
+                won.update(result.scalars().all())
+            rows = extra_rows(won) if extra_rows and won else []
+            if rows:
+                self.db.add_all(rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        for employee_id in {r.employee_id for r in decided if r.id in won}:
+            employee_cache.invalidate_employee(employee_id)
+        return won
+
+    def update(self, updated_request: LeaveRequest,
+               in_transaction: Optional[Callable[[], None]] = None) -> LeaveRequest:
+        """
+        Write a leave request. in_transaction() runs after the change is
+        flushed and before it commits (e.g. to refresh the balance ledger),
+        so either both are persisted or neither is.
+        """
         # Get request_id from the updated_request object
         request_id = updated_request.id
 
@@ -353,13 +615,25 @@ class DBLeaveRequestRepository:
             db_req.approval_date = updated_request.approval_date
             db_req.balance_used = updated_request.balance_used
             db_req.attachments = updated_request.attachments if updated_request.attachments else []
-            self.db.commit()
+            try:
+                if in_transaction:
+                    self.db.flush()
+                    in_transaction()
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
             self.db.refresh(db_req)
+            employee_cache.invalidate_employee(db_req.employee_id)
         return updated_request
 
     def delete(self, request_id: int):
-        self.db.query(LeaveRequestModel).filter(LeaveRequestModel.id == request_id).delete()
-        self.db.commit()
+        db_req = self.db.query(LeaveRequestModel).filter(LeaveRequestModel.id == request_id).first()
+        if db_req:
+            employee_id = db_req.employee_id
+            self.db.delete(db_req)
+            self.db.commit()
+            employee_cache.invalidate_employee(employee_id)
 
 
 class DBAttendanceRepository:
@@ -498,7 +772,8 @@ class DBPortalSettingsRepository:
         if settings:
             return PortalSettings(
                 id=settings.id,
-                max_carry_over_days=settings.max_carry_over_days
+                max_carry_over_days=settings.max_carry_over_days,
+                digest_window_minutes=settings.digest_window_minutes
             )
         # Return defaults if not yet seeded
         return PortalSettings()
@@ -506,15 +781,700 @@ class DBPortalSettingsRepository:
     def update(self, update_data: dict) -> PortalSettings:
         db_settings = self.db.query(PortalSettingsModel).filter(PortalSettingsModel.id == 1).first()
         if not db_settings:
-            db_settings = PortalSettingsModel(id=1, max_carry_over_days=15)
+            db_settings = PortalSettingsModel(id=1, max_carry_over_days=15, digest_window_minutes=60)
             self.db.add(db_settings)
 
         if 'max_carry_over_days' in update_data and update_data['max_carry_over_days'] is not None:
             db_settings.max_carry_over_days = update_data['max_carry_over_days']
+        if 'digest_window_minutes' in update_data and update_data['digest_window_minutes'] is not None:
+            db_settings.digest_window_minutes = update_data['digest_window_minutes']
 
         self.db.commit()
         self.db.refresh(db_settings)
+        # Carry-over cap only affects permanent employees' balances
+        employee_cache.invalidate_employee_type('permanent')
         return PortalSettings(
             id=db_settings.id,
-            max_carry_over_days=db_settings.max_carry_over_days
+            max_carry_over_days=db_settings.max_carry_over_days,
+            digest_window_minutes=db_settings.digest_window_minutes
+        )
+
+
+class DBLeaveBalanceRepository:
+    """PostgreSQL-backed leave balance ledger repository"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _to_leave_balance(b: LeaveBalanceModel) -> LeaveBalance:
+        return LeaveBalance(
+            employee_id=b.employee_id,
+            employee_type=b.employee_type,
+            period_start=b.period_start,
+            period_end=b.period_end,
+            earned_days=b.earned_days,
+            earned_as_of=b.earned_as_of,
+            used_days=b.used_days,
+            carry_over_days=b.carry_over_days
         )
+
+    def get_all(self) -> List[LeaveBalance]:
+        return [self._to_leave_balance(b) for b in self.db.query(LeaveBalanceModel).all()]
+
+    def get(self, employee_id: str, period_start: str) -> Optional[LeaveBalance]:
+        balance = self.db.query(LeaveBalanceModel).filter(
+            LeaveBalanceModel.employee_id == employee_id,
+            LeaveBalanceModel.period_start == period_start
+        ).first()
+        if balance:
+            return self._to_leave_balance(balance)
+        return None
+
+    def get_for_employees(self, employee_ids: List[str]) -> List[LeaveBalance]:
+        if not employee_ids:
+            return []
+        balances = self.db.query(LeaveBalanceModel).filter(
+            LeaveBalanceModel.employee_id.in_(employee_ids)
+        ).all()
+        return [self._to_leave_balance(b) for b in balances]
+
+    def upsert_many(self, entries: List[LeaveBalance], commit: bool = True) -> None:
+        """
+        Insert or replace ledger rows keyed by (employee_id, period_start) in one commit.
+        With commit=False they are only flushed into the caller's transaction.
+        """
+        if not entries:
+            return
+        existing = {
+            (b.employee_id, b.period_start): b
+            for b in self.db.query(LeaveBalanceModel).filter(
+                LeaveBalanceModel.employee_id.in_({e.employee_id for e in entries})
+            ).all()
+        }
+        now = datetime.utcnow()
+        for entry in entries:
+            db_balance = existing.get((entry.employee_id, entry.period_start))
+            if db_balance is None:
+                db_balance = LeaveBalanceModel(employee_id=entry.employee_id, period_start=entry.period_start)
+                self.db.add(db_balance)
+                existing[(entry.employee_id, entry.period_start)] = db_balance
+            db_balance.employee_type = entry.employee_type
+            db_balance.period_end = entry.period_end
+            db_balance.earned_days = entry.earned_days
+            db_balance.earned_as_of = entry.earned_as_of
+            db_balance.used_days = entry.used_days
+            db_balance.carry_over_days = entry.carry_over_days
+            db_balance.updated_at = now
+        if not commit:
+            self.db.flush()
+            return
+        self.db.commit()
+        for employee_id in {e.employee_id for e in entries}:
+            employee_cache.invalidate_employee(employee_id)
+
+    def delete_by_employee(self, employee_id: str):
+        self.db.query(LeaveBalanceModel).filter(LeaveBalanceModel.employee_id == employee_id).delete()
+        self.db.commit()
+
+    def delete_all(self):
+        self.db.query(LeaveBalanceModel).delete()
+        self.db.commit()
+
+
+class DBContractNotificationQueueRepository:
+    """Due-date queue of contract end notifications (see backend.notification_queue)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _to_due(row: ContractNotificationQueueModel) -> ContractNotificationDue:
+        return ContractNotificationDue(
+            id=row.id,
+            employee_id=row.employee_id,
+            notification_type=row.notification_type,
+            due_date=row.due_date,
+            contract_end_date=row.contract_end_date
+        )
+
+    def replace_for_employees(self, employee_ids: List[str], rows: List[ContractNotificationDue],
+                              commit: bool = True) -> None:
+        """Replace all queued rows of the given employees with `rows` in one commit (or flush)."""
+        if not employee_ids:
+            return
+        self.db.query(ContractNotificationQueueModel).filter(
+            ContractNotificationQueueModel.employee_id.in_(set(employee_ids))
+        ).delete(synchronize_session=False)
+        now = datetime.utcnow()
+        self.db.add_all([
+            ContractNotificationQueueModel(
+                employee_id=row.employee_id,
+                notification_type=row.notification_type,
+                due_date=row.due_date,
+                contract_end_date=row.contract_end_date,
+                created_at=now
+            )
+            for row in rows
+        ])
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
+
+    def get_due(self, today: str) -> List[ContractNotificationDue]:
+        """Rows due on or before `today` (YYYY-MM-DD), oldest first."""
+        rows = self.db.query(ContractNotificationQueueModel).filter(
+            ContractNotificationQueueModel.due_date <= today
+        ).order_by(ContractNotificationQueueModel.due_date, ContractNotificationQueueModel.id).all()
+        return [self._to_due(row) for row in rows]
+
+    def get_by_employee(self, employee_id: str) -> List[ContractNotificationDue]:
+        rows = self.db.query(ContractNotificationQueueModel).filter(
+            ContractNotificationQueueModel.employee_id == employee_id
+        ).order_by(ContractNotificationQueueModel.due_date, ContractNotificationQueueModel.id).all()
+        return [self._to_due(row) for row in rows]
+
+    def delete_many(self, row_ids: List[int]) -> None:
+        if not row_ids:
+            return
+        self.db.query(ContractNotificationQueueModel).filter(
+            ContractNotificationQueueModel.id.in_(row_ids)
+        ).delete(synchronize_session=False)
+        self.db.commit()
+
+    def delete_by_employee(self, employee_id: str) -> None:
+        self.db.query(ContractNotificationQueueModel).filter(
+            ContractNotificationQueueModel.employee_id == employee_id
+        ).delete(synchronize_session=False)
+        self.db.commit()
+
+    def count(self) -> int:
+        return self.db.query(func.count(ContractNotificationQueueModel.id)).scalar()
+
+
+class DBSentNotificationRepository:
+    """Sent contract notifications, keyed by (employee_id, notification_type, contract_end_date)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_sent_keys(self, employee_ids: List[str]) -> Set[Tuple[str, str, str]]:
+        """Keys already sent to the given employees."""
+        if not employee_ids:
+            return set()
+        rows = self.db.query(
+            SentNotificationModel.employee_id,
+            SentNotificationModel.notification_type,
+            SentNotificationModel.contract_end_date
+        ).filter(SentNotificationModel.employee_id.in_(set(employee_ids))).all()
+        return {(employee_id, notification_type, contract_end) for employee_id, notification_type, contract_end in rows}
+
+    def add_many(self, rows: Iterable[Tuple[str, str, str, str]]) -> int:
+        """
+        Record (employee_id, notification_type, contract_end_date, sent_on) rows
+        with batched INSERTs in one commit; keys that already exist are left untouched.
+
+        Returns the number of rows inserted.
+        """
+        values = [
+            {'employee_id': employee_id, 'notification_type': notification_type,
+             'contract_end_date': contract_end, 'sent_on': sent_on}
+            for employee_id, notification_type, contract_end, sent_on in rows
+        ]
+        if not values:
+            return 0
+        if self.db.bind.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        inserted = 0
+        for start in range(0, len(values), 500):  # Stay under the bind parameter limit
+            result = self.db.execute(insert(SentNotificationModel).values(values[start:start + 500]).on_conflict_do_nothing(
+                index_elements=['employee_id', 'notification_type', 'contract_end_date']
+            ))
+            inserted += result.rowcount
+        self.db.commit()
+        return inserted
+
+    def purge_older_than(self, cutoff: str) -> int:
+        """Delete rows sent before cutoff (YYYY-MM-DD). Returns the number removed."""
+        removed = self.db.query(SentNotificationModel).filter(
+            SentNotificationModel.sent_on < cutoff
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return removed
+
+    def count(self) -> int:
+        return self.db.query(func.count(SentNotificationModel.id)).scalar()
+
+
+class DBNotificationRunRepository:
+    """Statistics of contract notification scheduler runs."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _to_run(r: NotificationRunModel) -> NotificationRun:
+        return NotificationRun(
+            id=r.id,
+            started_at=r.started_at,
+            duration_seconds=r.duration_seconds,
+            due=r.due,
+            planned=r.planned,
+            sent=r.sent,
+            failed=r.failed,
+            error=r.error
+        )
+
+    def add(self, run: NotificationRun) -> NotificationRun:
+        db_run = NotificationRunModel(**run.dict(exclude={'id'}))
+        self.db.add(db_run)
+        self.db.commit()
+        self.db.refresh(db_run)
+        return self._to_run(db_run)
+
+    def get_recent(self, limit: int = 30) -> List[NotificationRun]:
+        """Most recent runs first."""
+        runs = self.db.query(NotificationRunModel).order_by(
+            NotificationRunModel.started_at.desc(), NotificationRunModel.id.desc()
+        ).limit(limit).all()
+        return [self._to_run(run) for run in runs]
+
+
+class DBSchedulerRepository:
+    """Leader lease and job state of the in-app scheduler (see backend.app_scheduler)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _insert_if_missing(self, row) -> bool:
+        """Insert a row keyed by its primary key; False if another worker inserted it first."""
+        self.db.add(row)
+        try:
+            self.db.commit()
+            return True
+        except IntegrityError:
+            self.db.rollback()
+            return False
+
+    def try_acquire_lock(self, name: str, owner: str, ttl_seconds: float, now: Optional[datetime] = None) -> bool:
+        """
+        Take or renew the lease `name` for `owner`.
+
+        A single conditional UPDATE succeeds only if `owner` already holds the
+        lease or the previous holder's lease has expired, so at most one
+        worker holds it at a time.
+        """
+        now = now or datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        updated = self.db.query(SchedulerLockModel).filter(
+            SchedulerLockModel.name == name,
+            or_(SchedulerLockModel.owner == owner, SchedulerLockModel.expires_at < now)
+        ).update({SchedulerLockModel.owner: owner, SchedulerLockModel.expires_at: expires_at},
+                 synchronize_session=False)
+        self.db.commit()
+        if updated:
+            return True
+        if self.db.query(SchedulerLockModel).filter(SchedulerLockModel.name == name).first():
+            return False
+        return self._insert_if_missing(SchedulerLockModel(name=name, owner=owner, expires_at=expires_at))
+
+    def release_lock(self, name: str, owner: str) -> None:
+        """Expire the lease now if `owner` holds it, so another worker can take over."""
+        self.db.query(SchedulerLockModel).filter(
+            SchedulerLockModel.name == name,
+            SchedulerLockModel.owner == owner
+        ).update({SchedulerLockModel.expires_at: datetime.utcnow()}, synchronize_session=False)
+        self.db.commit()
+
+    def get_lock(self, name: str) -> Optional[Tuple[str, datetime]]:
+        """(owner, expires_at) of the lease, or None if it was never taken."""
+        lock = self.db.query(SchedulerLockModel).filter(SchedulerLockModel.name == name).first()
+        return (lock.owner, lock.expires_at) if lock else None
+
+    def claim_job(self, name: str, run_date: str, owner: str, now: Optional[datetime] = None) -> bool:
+        """
+        Record that `owner` starts the run of job `name` for run_date (YYYY-MM-DD).
+
+        Returns False if the job already ran for that date, so a leader change
+        during the day never runs a daily job twice.
+        """
+        if not self.db.query(ScheduledJobModel).filter(ScheduledJobModel.name == name).first():
+            self._insert_if_missing(ScheduledJobModel(name=name))
+        updated = self.db.query(ScheduledJobModel).filter(
+            ScheduledJobModel.name == name,
+            or_(ScheduledJobModel.last_run_date.is_(None), ScheduledJobModel.last_run_date < run_date)
+        ).update({
+            ScheduledJobModel.last_run_date: run_date,
+            ScheduledJobModel.last_owner: owner,
+            ScheduledJobModel.last_started_at: now or datetime.utcnow(),
+            ScheduledJobModel.last_finished_at: None,
+            ScheduledJobModel.last_error: None
+        }, synchronize_session=False)
+        self.db.commit()
+        return updated == 1
+
+    def finish_job(self, name: str, error: Optional[str] = None) -> None:
+        self.db.query(ScheduledJobModel).filter(ScheduledJobModel.name == name).update({
+            ScheduledJobModel.last_finished_at: datetime.utcnow(),
+            ScheduledJobModel.last_error: error[:2000] if error else None
+        }, synchronize_session=False)
+        self.db.commit()
+
+    def get_jobs(self) -> List[ScheduledJobState]:
+        return [
+            ScheduledJobState(
+                name=job.name,
+                last_run_date=job.last_run_date,
+                last_owner=job.last_owner,
+                last_started_at=job.last_started_at,
+                last_finished_at=job.last_finished_at,
+                last_error=job.last_error
+            )
+            for job in self.db.query(ScheduledJobModel).order_by(ScheduledJobModel.name).all()
+        ]
+
+
+class DBEmailOutboxRepository:
+    """Email outbox; see backend.email_outbox for the delivery worker."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _to_message(m: EmailOutboxModel) -> OutboxMessage:
+        return OutboxMessage(
+            id=m.id,
+            to_email=m.to_email,
+            subject=m.subject,
+            body=m.body,
+            is_html=m.is_html,
+            status=m.status,
+            attempts=m.attempts,
+            next_attempt_at=m.next_attempt_at,
+            last_error=m.last_error,
+            created_at=m.created_at,
+            sent_at=m.sent_at
+        )
+
+    def build(self, to_email: str, subject: str, body: str, is_html: bool = True) -> EmailOutboxModel:
+        """An outbox row that is not yet part of any session (for update_many-style batch writes)."""
+        now = datetime.utcnow()
+        return EmailOutboxModel(
+            to_email=to_email, subject=subject, body=body, is_html=is_html,
+            status='pending', attempts=0, next_attempt_at=now, created_at=now
+        )
+
+    def enqueue(self, to_email: str, subject: str, body: str, is_html: bool = True) -> None:
+        """
+        Add a message to the current transaction without committing.
+
+        It is persisted by the next commit on this session - normally the
+        repository write of the change that triggered the email.
+        """
+        self.db.add(self.build(to_email, subject, body, is_html))
+
+    def get_by_id(self, message_id: int) -> Optional[OutboxMessage]:
+        m = self.db.query(EmailOutboxModel).filter(EmailOutboxModel.id == message_id).first()
+        return self._to_message(m) if m else None
+
+    def claim_due(self, limit: int, lease_seconds: int, now: Optional[datetime] = None) -> List[OutboxMessage]:
+        """
+        Lease up to `limit` due pending messages for delivery.
+
+        Claimed rows get next_attempt_at pushed out by the lease and their
+        attempt counter incremented, so other workers skip them; if this worker
+        dies mid-send the lease expires and the message is retried.
+        """
+        now = now or datetime.utcnow()
+        query = self.db.query(EmailOutboxModel).filter(
+            EmailOutboxModel.status == 'pending',
+            EmailOutboxModel.next_attempt_at <= now
+        ).order_by(EmailOutboxModel.next_attempt_at, EmailOutboxModel.id).limit(limit)
+        if self.db.bind.dialect.name == 'postgresql':
+            query = query.with_for_update(skip_locked=True)
+
+        rows = query.all()
+        lease_until = now + timedelta(seconds=lease_seconds)
+        for m in rows:
+            m.attempts += 1
+            m.next_attempt_at = lease_until
+        self.db.commit()
+        return [self._to_message(m) for m in rows]
+
+    def mark_sent(self, message_id: int) -> None:
+        self.db.query(EmailOutboxModel).filter(EmailOutboxModel.id == message_id).update({
+            EmailOutboxModel.status: 'sent',
+            EmailOutboxModel.sent_at: datetime.utcnow(),
+            EmailOutboxModel.last_error: None
+        })
+        self.db.commit()
+
+    def mark_failed(self, message_id: int, error: str, retry_at: Optional[datetime]) -> None:
+        """Record a failed attempt; retry_at=None gives up on the message (status 'failed')."""
+        values = {EmailOutboxModel.last_error: error[:2000]}
+        if retry_at is None:
+            values[EmailOutboxModel.status] = 'failed'
+        else:
+            values[EmailOutboxModel.next_attempt_at] = retry_at
+        self.db.query(EmailOutboxModel).filter(EmailOutboxModel.id == message_id).update(values)
+        self.db.commit()
+
+    def count_by_status(self) -> Dict[str, int]:
+        rows = self.db.query(EmailOutboxModel.status, func.count(EmailOutboxModel.id)).group_by(
+            EmailOutboxModel.status
+        ).all()
+        return {status: count for status, count in rows}
+
+    def purge_sent(self, older_than: datetime) -> int:
+        """Delete delivered messages sent before older_than. Returns the number removed."""
+        removed = self.db.query(EmailOutboxModel).filter(
+            EmailOutboxModel.status == 'sent',
+            EmailOutboxModel.sent_at < older_than
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return removed
+
+
+class DBNotificationDigestRepository:
+    """Leave requests waiting for their manager's digest email."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def build(self, manager_id: str, leave_request_id: int) -> NotificationDigestItemModel:
+        """A digest item that is not yet part of any session (committed with the leave request insert)."""
+        return NotificationDigestItemModel(
+            manager_id=manager_id, leave_request_id=leave_request_id, created_at=datetime.utcnow()
+        )
+
+    def add(self, manager_id: str, leave_request_id: int) -> None:
+        self.db.add(self.build(manager_id, leave_request_id))
+        self.db.commit()
+
+    def get_due_manager_ids(self, cutoff: datetime) -> List[str]:
+        """Managers whose oldest undigested item was created at or before cutoff."""
+        rows = self.db.query(NotificationDigestItemModel.manager_id).filter(
+            NotificationDigestItemModel.digested_at.is_(None)
+        ).group_by(NotificationDigestItemModel.manager_id).having(
+            func.min(NotificationDigestItemModel.created_at) <= cutoff
+        ).all()
+        return [row[0] for row in rows]
+
+    def get_pending_request_ids(self, manager_id: str) -> List[Tuple[int, int]]:
+        """(item id, leave request id) of the manager's undigested items, oldest first."""
+        rows = self.db.query(NotificationDigestItemModel.id, NotificationDigestItemModel.leave_request_id).filter(
+            NotificationDigestItemModel.manager_id == manager_id,
+            NotificationDigestItemModel.digested_at.is_(None)
+        ).order_by(NotificationDigestItemModel.created_at, NotificationDigestItemModel.id).all()
+        return [(item_id, request_id) for item_id, request_id in rows]
+
+    def claim(self, item_ids: List[int], when: Optional[datetime] = None) -> Set[int]:
+        """
+        Mark items as handled, skipping any another worker already handled.
+        Does not commit (committed with the digest email's outbox row).
+
+        The digested_at IS NULL check is part of the UPDATE, so of several
+        workers building the same digest exactly one claims each item.
+
+        Returns:
+            Ids of the items claimed by this call
+        """
+        if not item_ids:
+            return set()
+        result = self.db.execute(
+            update(NotificationDigestItemModel)
+            .where(NotificationDigestItemModel.id.in_(item_ids), NotificationDigestItemModel.digested_at.is_(None))
+            .values(digested_at=when or datetime.utcnow())
+            .returning(NotificationDigestItemModel.id)
+            .execution_options(synchronize_session=False)
+        )
+        return set(result.scalars().all())
+
+    def purge_digested(self, older_than: datetime) -> int:
+        removed = self.db.query(NotificationDigestItemModel).filter(
+            NotificationDigestItemModel.digested_at < older_than
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return removed
+
+
+class DBAuditLogRepository:
+    """Read side of the audit log (rows are written by backend.audit)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _to_audit_log(log: AuditLogModel) -> AuditLog:
+        return AuditLog(
+            id=log.id,
+            timestamp=log.timestamp,
+            user_id=log.user_id,
+            user_email=log.user_email,
+            action=log.action,
+            entity_type=log.entity_type,
+            entity_id=log.entity_id,
+            details=log.details,
+            ip_address=log.ip_address_ref.value if log.ip_address_ref else log.ip_address,
+            user_agent=log.user_agent_ref.value if log.user_agent_ref else log.user_agent,
+            employee_id=log.employee_id,
+            previous_status=log.previous_status,
+            new_status=log.new_status,
+            vacation_type=log.vacation_type
+        )
+
+    def _search_query(self, action: Optional[str] = None, entity_type: Optional[str] = None,
+                      entity_id: Optional[str] = None, user_id: Optional[UUID] = None,
+                      employee_id: Optional[str] = None, previous_status: Optional[str] = None,
+                      new_status: Optional[str] = None, vacation_type: Optional[str] = None,
+                      start: Optional[datetime] = None, end: Optional[datetime] = None):
+        query = self.db.query(AuditLogModel)
+        if action:
+            query = query.filter(AuditLogModel.action == action)
+        if entity_type:
+            query = query.filter(AuditLogModel.entity_type == entity_type)
+        if entity_id:
+            query = query.filter(AuditLogModel.entity_id == entity_id)
+        if employee_id:
+            query = query.filter(AuditLogModel.employee_id == employee_id)
+        if previous_status:
+            query = query.filter(AuditLogModel.previous_status == previous_status)
+        if new_status:
+            query = query.filter(AuditLogModel.new_status == new_status)
+        if vacation_type:
+            query = query.filter(AuditLogModel.vacation_type == vacation_type)
+        if user_id:
+            query = query.filter(AuditLogModel.user_id == user_id)
+        if start is not None:
+            query = query.filter(AuditLogModel.timestamp >= start)
+        if end is not None:
+            query = query.filter(AuditLogModel.timestamp < end)
+        return query
+
+    def search(self, after: Optional[Tuple[datetime, UUID]] = None, limit: Optional[int] = None,
+               offset: int = 0, **filters) -> List[AuditLog]:
+        """
+        Filtered audit entries, newest first, ordered by (timestamp, id).
+
+        Filters (all optional): action, entity_type, entity_id, user_id, the
+        detail columns employee_id, previous_status, new_status and
+        vacation_type, and start/end (timestamp range, end exclusive).
+
+        Args:
+            after: Keyset position (timestamp, id) of the last row of the previous page
+            limit: Maximum number of rows to return
+            offset: Rows to skip (legacy paging; prefer `after`)
+        """
+        query = self._search_query(**filters)
+        if after is not None:
+            after_timestamp, after_id = after
+            query = query.filter(or_(
+                AuditLogModel.timestamp < after_timestamp,
+                and_(AuditLogModel.timestamp == after_timestamp, AuditLogModel.id < after_id)
+            ))
+        query = query.order_by(AuditLogModel.timestamp.desc(), AuditLogModel.id.desc())
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return [self._to_audit_log(log) for log in query.all()]
+
+    def stream(self, batch_size: int = 1000, **filters) -> Iterator[AuditLog]:
+        """
+        Every entry matching the search filters, oldest first.
+
+        Rows are fetched batch_size at a time (a server-side cursor on
+        PostgreSQL), so memory use does not grow with the number of rows.
+        """
+        query = self._search_query(**filters).order_by(AuditLogModel.timestamp, AuditLogModel.id)
+        for log in query.yield_per(batch_size):
+            yield self._to_audit_log(log)
+
+    def timeline(self, entity_type: str, entity_id: str, after: Optional[Tuple[datetime, UUID]] = None,
+                 limit: Optional[int] = None) -> List[AuditLog]:
+        """
+        Everything that happened to one entity, oldest first, ordered by (timestamp, id).
+
+        For an employee this includes the entries about their records
+        (e.g. leave request approvals), found through the employee_id column.
+
+        Args:
+            after: Keyset position (timestamp, id) of the last row of the previous page
+            limit: Maximum number of rows to return
+        """
+        condition = and_(AuditLogModel.entity_type == entity_type, AuditLogModel.entity_id == entity_id)
+        if entity_type == "employee":
+            condition = or_(condition, AuditLogModel.employee_id == entity_id)
+        query = self.db.query(AuditLogModel).filter(condition)
+        if after is not None:
+            after_timestamp, after_id = after
+            query = query.filter(or_(
+                AuditLogModel.timestamp > after_timestamp,
+                and_(AuditLogModel.timestamp == after_timestamp, AuditLogModel.id > after_id)
+            ))
+        query = query.order_by(AuditLogModel.timestamp, AuditLogModel.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return [self._to_audit_log(log) for log in query.all()]
+
+    def count(self, cap: Optional[int] = None, **filters) -> int:
+        """
+        Number of entries matching the search filters.
+
+        With a cap, counting stops after cap + 1 rows, so a result above cap
+        means "more than cap" and the cost is bounded.
+        """
+        query = self._search_query(**filters).with_entities(AuditLogModel.id)
+        if cap is not None:
+            query = query.limit(cap + 1)
+        return self.db.query(func.count()).select_from(query.subquery()).scalar()
+
+    def count_by_client(self, by: str = "user_agent", limit: int = 20, **filters) -> List[Tuple[str, int]]:
+        """
+        Entries matching the search filters per user agent (by="user_agent") or
+        client IP (by="ip_address"), most frequent first. Entries without the
+        value (e.g. written by the system) are not counted. Entries whose value
+        is not interned yet (committed directly, see backend.audit_lookups)
+        are counted under their text value.
+        """
+        if by == "ip_address":
+            id_column, text_column, model = AuditLogModel.ip_address_id, AuditLogModel.ip_address, AuditIpAddressModel
+        else:
+            id_column, text_column, model = AuditLogModel.user_agent_id, AuditLogModel.user_agent, AuditUserAgentModel
+        lookup = aliased(model)
+        value = func.coalesce(lookup.value, text_column)
+        counts = self._search_query(**filters).outerjoin(lookup, lookup.id == id_column).with_entities(
+            value, func.count()
+        ).filter(value.isnot(None)).group_by(value).order_by(func.count().desc(), value).limit(limit).all()
+        return [(client, count) for client, count in counts]
+
+
+class DBAuditLookupRepository:
+    """Lookup tables of values interned by audit entries (user agents, IP addresses)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def value_hash(value: str) -> str:
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    def get_or_create(self, model, value: str) -> int:
+        """Id of value in the lookup table `model`, inserted (and committed) if new."""
+        value_hash = self.value_hash(value)
+        found = self.db.query(model.id).filter(model.value_hash == value_hash).scalar()
+        if found is not None:
+            return found
+        if self.db.bind.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        # Another worker may insert the same value concurrently
+        self.db.execute(insert(model).values(value_hash=value_hash, value=value).on_conflict_do_nothing(
+            index_elements=['value_hash']
+        ))
+        self.db.commit()
+        return self.db.query(model.id).filter(model.value_hash == value_hash).scalar()
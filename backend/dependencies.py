@@ -5,10 +5,16 @@ from .database import get_db
 from .db_repositories import (
     DBUserRepository, DBEmployeeRepository, DBLeaveRequestRepository,
     DBUnitRepository, DBAttendanceRepository, DBEmailSettingsRepository,
-    DBPortalSettingsRepository
+    DBPortalSettingsRepository, DBLeaveBalanceRepository, DBEmailOutboxRepository,
+    DBNotificationDigestRepository, DBContractNotificationQueueRepository, DBNotificationRunRepository,
+    DBSchedulerRepository, DBAuditLogRepository
 )
 from .services import UserService, EmployeeService, LeaveRequestService, UnitService, AttendanceService, EmailSettingsService
 from .email_service import EmailService
+from .balance_ledger import BalanceLedger
+from .notification_queue import ContractNotificationPlanner
+from .employee_cache import employee_cache
+from .team_stats import TeamStatsEngine
 
 # --- Dependency Injection setup (PostgreSQL) ---
 
@@ -22,12 +28,20 @@ def get_employee_service(db: Session = Depends(get_db)) -> EmployeeService:
     user_repo = DBUserRepository(db)
     leave_request_repo = DBLeaveRequestRepository(db)
     portal_settings_repo = DBPortalSettingsRepository(db)
-    return EmployeeService(employee_repo, user_repo, leave_request_repo, portal_settings_repo)
+    balance_ledger = BalanceLedger(
+        DBLeaveBalanceRepository(db), leave_request_repo, portal_settings_repo,
+        ContractNotificationPlanner(DBContractNotificationQueueRepository(db))
+    )
+    return EmployeeService(
+        employee_repo, user_repo, leave_request_repo, portal_settings_repo, balance_ledger, employee_cache
+    )
 
 def get_leave_request_service(db: Session = Depends(get_db)) -> LeaveRequestService:
     leave_request_repo = DBLeaveRequestRepository(db)
     employee_service = get_employee_service(db)
-    return LeaveRequestService(leave_request_repo, employee_service)
+    return LeaveRequestService(
+        leave_request_repo, employee_service, DBEmailOutboxRepository(db), DBNotificationDigestRepository(db)
+    )
 
 def get_unit_service(db: Session = Depends(get_db)) -> UnitService:
     unit_repo = DBUnitRepository(db)
@@ -48,3 +62,18 @@ def get_email_settings_service(db: Session = Depends(get_db)) -> EmailSettingsSe
 
 def get_portal_settings_repo(db: Session = Depends(get_db)) -> DBPortalSettingsRepository:
     return DBPortalSettingsRepository(db)
+
+def get_email_outbox_repo(db: Session = Depends(get_db)) -> DBEmailOutboxRepository:
+    return DBEmailOutboxRepository(db)
+
+def get_notification_run_repo(db: Session = Depends(get_db)) -> DBNotificationRunRepository:
+    return DBNotificationRunRepository(db)
+
+def get_scheduler_repo(db: Session = Depends(get_db)) -> DBSchedulerRepository:
+    return DBSchedulerRepository(db)
+
+def get_audit_log_repo(db: Session = Depends(get_db)) -> DBAuditLogRepository:
+    return DBAuditLogRepository(db)
+
+def get_team_stats_engine(db: Session = Depends(get_db)) -> TeamStatsEngine:
+    return TeamStatsEngine(DBLeaveRequestRepository(db))
@@ -0,0 +1,165 @@
+"""
+Email Outbox Delivery Worker
+
+Notification emails are not sent inside HTTP requests. Services enqueue them
+in the email_outbox table in the same transaction as the leave change (see
+DBEmailOutboxRepository.enqueue), and this worker delivers them afterwards:
+
+- due messages are leased in batches and sent through one pooled SMTP session
+- a failed attempt is retried with exponential backoff
+  (base_delay * 2^(attempt-1), capped at max_delay)
+- after max_attempts the message is marked 'failed' and left for inspection
+
+Once a minute it also queues due manager digest emails
+(backend.notification_digest).
+
+The worker runs as a daemon thread started with the API (see main.on_startup,
+disabled with EMAIL_OUTBOX_WORKER_ENABLED=false), or as its own process:
+    python -m backend.email_outbox
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from .database import SessionLocal
+from .db_repositories import DBEmailOutboxRepository
+from .email_service import EmailService, prune_smtp_pools
+from .notification_digest import flush_due_digests
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """Drains the email outbox with retries and exponential backoff."""
+
+    def __init__(self, session_factory: Callable = SessionLocal, email_service: Optional[EmailService] = None,
+                 batch_size: int = 50, max_attempts: int = 6, base_delay: int = 30,
+                 max_delay: int = 3600, lease_seconds: int = 300, poll_interval: float = 5.0,
+                 digest_check_interval: float = 60.0):
+        self.session_factory = session_factory
+        self.email_service = email_service or EmailService()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.digest_check_interval = digest_check_interval
+        self._next_digest_check = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "OutboxWorker":
+        return cls(
+            batch_size=int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50")),
+            max_attempts=int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6")),
+            base_delay=int(os.getenv("EMAIL_OUTBOX_BASE_DELAY", "30")),
+            max_delay=int(os.getenv("EMAIL_OUTBOX_MAX_DELAY", "3600")),
+            poll_interval=float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", "5")),
+        )
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Delay before the next attempt after `attempts` failed attempts."""
+        return timedelta(seconds=min(self.base_delay * 2 ** (attempts - 1), self.max_delay))
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Deliver one batch of due messages.
+
+        Returns:
+            Dict with counts of 'sent', 'retried' and 'failed' messages.
+        """
+        now = now or datetime.utcnow()
+        stats = {'sent': 0, 'retried': 0, 'failed': 0}
+
+        db = self.session_factory()
+        try:
+            repo = DBEmailOutboxRepository(db)
+            messages = repo.claim_due(self.batch_size, self.lease_seconds, now)
+            if not messages:
+                return stats
+
+            def fail(message, error: str):
+                if message.attempts >= self.max_attempts:
+                    repo.mark_failed(message.id, error, None)
+                    stats['failed'] += 1
+                    logger.error(f"Outbox message {message.id} to {message.to_email} failed permanently: {error}")
+                else:
+                    repo.mark_failed(message.id, error, now + self.backoff(message.attempts))
+                    stats['retried'] += 1
+                    logger.warning(f"Outbox message {message.id} attempt {message.attempts} failed: {error}")
+
+            results = self.email_service.send_batch(
+                [(m.to_email, m.subject, m.body, m.is_html) for m in messages]
+            )
+            for message, result in zip(messages, results):
+                if result.success:
+                    repo.mark_sent(message.id)
+                    stats['sent'] += 1
+                else:
+                    fail(message, result.error)
+            return stats
+        finally:
+            db.close()
+
+    def run_until_idle(self, max_batches: int = 100) -> Dict[str, int]:
+        """Run batches until nothing is due (or max_batches is reached)."""
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        for _ in range(max_batches):
+            stats = self.run_once()
+            for key, value in stats.items():
+                totals[key] += value
+            if not any(stats.values()):
+                break
+        return totals
+
+    def flush_digests(self) -> int:
+        """Queue manager digest emails whose window has elapsed (see backend.notification_digest)."""
+        db = self.session_factory()
+        try:
+            return flush_due_digests(db)
+        finally:
+            db.close()
+
+    def run_forever(self):
+        logger.info("Email outbox worker started")
+        while not self._stop.is_set():
+            try:
+                # Sessions otherwise only expire on checkout, so a quiet
+                # outbox would keep them open on the server indefinitely
+                prune_smtp_pools()
+                if time.monotonic() >= self._next_digest_check:
+                    self._next_digest_check = time.monotonic() + self.digest_check_interval
+                    self.flush_digests()
+                stats = self.run_once()
+                if stats['sent'] or stats['retried'] or stats['failed']:
+                    logger.info(f"Email outbox batch: {stats}")
+                    continue  # More may be due; poll again immediately
+            except Exception as e:
+                logger.error(f"Email outbox worker error: {e}")
+            self._stop.wait(self.poll_interval)
+        logger.info("Email outbox worker stopped")
+
+    def start(self):
+        """Run the worker in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="email-outbox-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    OutboxWorker.from_env().run_forever()
@@ -3,16 +3,67 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .smtp_pool import SMTPConnectionPool, TrackingSMTP, MESSAGE_ERRORS
 
 # Configure logging with UTF-8 encoding to support Arabic characters
 logging.basicConfig(filename='backend/email.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s',
                     encoding='utf-8')
 
+class SendResult(NamedTuple):
+    to_email: str
+    success: bool
+    error: Optional[str]
+
+
+# One pool per (server, port, account, TLS) so short-lived EmailService
+# instances share sessions
+_pools: Dict[Tuple, SMTPConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(service: "EmailService") -> SMTPConnectionPool:
+    key = (service.smtp_server, service.smtp_port, service.smtp_username, service.use_tls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SMTPConnectionPool(
+                service.open_connection,
+                max_size=int(os.getenv("SMTP_POOL_SIZE", "4")),
+                idle_timeout=float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "60")),
+                health_check_after=float(os.getenv("SMTP_POOL_HEALTH_CHECK_AFTER", "15")),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def prune_smtp_pools() -> int:
+    """Close pooled SMTP sessions idle past their timeout. Returns the number closed."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return sum(pool.prune() for pool in pools)
+
+
+def close_smtp_pools():
+    """Close all pooled SMTP sessions (application shutdown)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
 class EmailService:
-    def __init__(self):
+    def __init__(self, timeout: Optional[float] = None):
         """
         Initialize email service with configuration from environment variables.
+
+        Args:
+            timeout: Seconds allowed for each SMTP operation and for waiting on a
+                pooled session (default: SMTP_TIMEOUT, 30)
         """
         # Load configuration from environment variables
         self.smtp_server = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -20,6 +71,8 @@ class EmailService:
         self.smtp_username = os.getenv("SMTP_USERNAME", "")
         self.sender_email = os.getenv("SMTP_SENDER_EMAIL", "noreply@iau-portal.com")
         self.sender_password = os.getenv("SMTP_PASSWORD", "")
+        self.use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+        self.timeout = timeout if timeout is not None else float(os.getenv("SMTP_TIMEOUT", "30"))
 
         # Mock mode is controlled by SMTP_ENABLED environment variable
         smtp_enabled = os.getenv("SMTP_ENABLED", "false").lower()
@@ -30,10 +83,18 @@ class EmailService:
         else:
             logging.info(f"Email service initialized for {self.smtp_server}:{self.smtp_port}")
 
+    @property
+    def pool(self) -> SMTPConnectionPool:
+        """Shared session pool for this SMTP server and account."""
+        return get_smtp_pool(self)
+
     def send_email(self, to_email: str, subject: str, body: str, is_html: bool = False):
         """
         Sends an email. If mock_mode is True, logs the email instead of sending.
 
+        Uses a pooled SMTP session; if a reused session turns out to be dead,
+        the send is retried once on a fresh one.
+
         Args:
             to_email (str): Recipient email address
             subject (str): Email subject
@@ -43,35 +104,110 @@ class EmailService:
         Returns:
             bool: True if email sent successfully, False otherwise
         """
+        result = self.send_batch([(to_email, subject, body, is_html)])[0]
+        return result.success
+
+    def send_batch(self, messages, is_html: bool = True) -> List[SendResult]:
+        """
+        Sends several emails through one pooled SMTP session.
+
+        A message the server refuses is reported and the batch continues. If
+        the session drops, the batch continues on a new session; the message
+        that hit the error is retried once, unless the server had already
+        accepted its DATA (it may have been delivered, and a retry could send
+        it twice), in which case it is reported as failed. If no session can
+        be opened at all, the remaining messages are reported as failed.
+
+        Args:
+            messages: Iterable of (to_email, subject, body) or
+                (to_email, subject, body, is_html) tuples
+            is_html (bool): Default body type for 3-tuples
+
+        Returns:
+            List[SendResult]: One result per message, in order
+        """
+        messages = [m if len(m) == 4 else (*m, is_html) for m in messages]
         if self.mock_mode:
-            self._log_email(to_email, subject, body)
-            return True
+            for to_email, subject, body, _ in messages:
+                self._log_email(to_email, subject, body)
+            return [SendResult(m[0], True, None) for m in messages]
+
+        results: List[Optional[SendResult]] = [None] * len(messages)
+        index = 0
+        retried = set()
+        while index < len(messages):
+            opened = in_doubt = False
+            try:
+                with self.pool.connection(timeout=self.timeout) as server:
+                    opened = True
+                    while index < len(messages):
+                        to_email, subject, body, html = messages[index]
+                        try:
+                            self.deliver(server, to_email, subject, body, html)
+                        except MESSAGE_ERRORS as e:
+                            results[index] = SendResult(to_email, False, str(e))
+                            logging.error(f"Failed to send email to {to_email}: {str(e)}")
+                        except Exception:
+                            in_doubt = getattr(server, 'data_accepted', False)
+                            raise
+                        else:
+                            results[index] = SendResult(to_email, True, None)
+                            logging.info(f"Email sent successfully to {to_email}")
+                        index += 1
+            except Exception as e:
+                if not opened:
+                    # Server unreachable: fail the rest without hammering it
+                    error = f"connection failed: {e}"
+                    logging.error(f"Failed to open SMTP session for {len(messages) - index} email(s): {str(e)}")
+                    for i in range(index, len(messages)):
+                        results[i] = SendResult(messages[i][0], False, error)
+                    break
+                if in_doubt:
+                    error = f"connection lost after the message was sent, not retried: {e}"
+                    results[index] = SendResult(messages[index][0], False, error)
+                    logging.error(f"Email to {messages[index][0]} may not have been delivered: {str(e)}")
+                    index += 1
+                elif index in retried:
+                    results[index] = SendResult(messages[index][0], False, str(e))
+                    logging.error(f"Failed to send email to {messages[index][0]}: {str(e)}")
+                    index += 1
+                else:
+                    retried.add(index)
+
+        for (to_email, subject, body, _), result in zip(messages, results):
+            if not result.success:
+                # Fallback to log
+                self._log_email(to_email, subject, body)
+        return results
 
+    def open_connection(self) -> smtplib.SMTP:
+        """
+        Opens an SMTP connection, upgraded with STARTTLS (unless SMTP_USE_TLS=false)
+        and logged in when credentials are configured. Raises on failure.
+        """
+        server = TrackingSMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
         try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.sender_email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-
-            # Attach body based on type
-            if is_html:
-                msg.attach(MIMEText(body, 'html', 'utf-8'))
-            else:
-                msg.attach(MIMEText(body, 'plain', 'utf-8'))
-
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.smtp_username, self.sender_password)
-            server.sendmail(self.sender_email, to_email, msg.as_string())
-            server.quit()
-
-            logging.info(f"Email sent successfully to {to_email}")
-            return True
-        except Exception as e:
-            logging.error(f"Failed to send email to {to_email}: {str(e)}")
-            # Fallback to log
-            self._log_email(to_email, subject, body)
-            return False
+            if self.use_tls:
+                server.starttls()
+            if self.smtp_username or self.sender_password:
+                server.login(self.smtp_username, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def deliver(self, server: smtplib.SMTP, to_email: str, subject: str, body: str, is_html: bool = False):
+        """Sends one message over an open connection. Raises on failure."""
+        sock = getattr(server, 'sock', None)
+        if sock is not None:
+            # Pooled sessions may have been opened by a service with another timeout
+            sock.settimeout(self.timeout)
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.sender_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'html' if is_html else 'plain', 'utf-8'))
+        server.sendmail(self.sender_email, to_email, msg.as_string())
 
     def _log_email(self, to_email, subject, body):
         print(f"--- MOCK EMAIL ---")
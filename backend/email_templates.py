@@ -1,9 +1,17 @@
 """
 HTML Email Templates for IAU Portal
 Bilingual templates (Arabic RTL + English LTR) with borderless 2-column table layout
+
+Templates are compiled once at import time (see EmailTemplate): the base
+document with its CSS, the header banner and the footer are pre-rendered and
+split around the per-message fields, so each render is a single join. Use render_batch to render
+many emails of one kind (scheduler runs, digests).
 """
 
-from typing import Dict, Any
+import string
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List
 
 
 def get_base_email_template() -> str:
@@ -105,100 +113,174 @@ def get_base_email_template() -> str:
 """
 
 
-def render_leave_request_created_email(data: Dict[str, Any]) -> str:
-    """
-    Email to manager when employee creates leave request
+# Everything before and after {content}, with the CSS braces already resolved
+_BASE_HEAD, _BASE_TAIL = get_base_email_template().format(content='\0').split('\0')
 
-    Args:
-        data: Dict containing:
-            - employee_name_ar: str
-            - employee_name_en: str
-            - employee_id: str
-            - vacation_type: str (e.g., 'annual', 'sick')
-            - start_date: str (Gregorian YYYY-MM-DD)
-            - end_date: str (Gregorian YYYY-MM-DD)
-            - duration: int
-            - manager_name_ar: str
-            - manager_name_en: str
+LEAVE_FOOTER = """
+            <p>IAU Portal - Vacation Management System</p>
+            <p>نظام إدارة الإجازات - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>"""
 
-    Returns:
-        str: Complete HTML email
+CONTRACT_FOOTER = """
+            <p>IAU Portal - Contract Management System</p>
+            <p>نظام إدارة العقود - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>"""
+
+VACATION_TYPES = {
+    'annual': {'ar': 'إجازة اعتيادية', 'en': 'Annual Vacation'},
+    'sick': {'ar': 'مرضية', 'en': 'Sick Leave'},
+    'unpaid': {'ar': 'إجازة بدون أجر', 'en': 'Unpaid Leave'},
+    'emergency': {'ar': 'طارئة', 'en': 'Emergency Leave'},
+    'exams': {'ar': 'إجازة الامتحانات', 'en': 'Exams Leave'}
+}
+
+
+_formatter = string.Formatter()
+
+
+class CompiledFormat:
+    """
+    A str.format template parsed once into (literal text, field, format spec)
+    segments, so rendering is a single join instead of re-scanning the text.
     """
-    from datetime import datetime
 
-    vacation_types = {
-        'annual': {'ar': 'إجازة اعتيادية', 'en': 'Annual Vacation'},
-        'sick': {'ar': 'مرضية', 'en': 'Sick Leave'},
-        'unpaid': {'ar': 'إجازة بدون أجر', 'en': 'Unpaid Leave'},
-        'emergency': {'ar': 'طارئة', 'en': 'Emergency Leave'},
-        'exams': {'ar': 'إجازة الامتحانات', 'en': 'Exams Leave'}
-    }
+    __slots__ = ('_segments', '_tail')
 
-    vac_type = vacation_types.get(data['vacation_type'].lower(), {'ar': data['vacation_type'], 'en': data['vacation_type']})
+    def __init__(self, source: str):
+        segments = []
+        pending = ''
+        for literal, name, spec, conversion in _formatter.parse(source):
+            if conversion:
+                raise ValueError(f"Conversions are not supported in email templates: {{{name}!{conversion}}}")
+            pending += literal
+            if name is not None:
+                segments.append((pending, name, spec))
+                pending = ''
+        self._segments = tuple(segments)
+        self._tail = pending
 
-    # Convert dates to Hijri for Arabic column
-    start_date_gregorian = data['start_date']
-    end_date_gregorian = data['end_date']
+    def render(self, **fields: Any) -> str:
+        """Fill in the fields; raises KeyError if one is missing."""
+        out = []
+        for literal, name, spec in self._segments:
+            out.append(literal)
+            out.append(format(fields[name], spec))
+        out.append(self._tail)
+        return ''.join(out)
 
-    try:
-        from hijri_converter import Gregorian
-        start_dt = datetime.strptime(start_date_gregorian, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date_gregorian, '%Y-%m-%d')
 
-        # Convert to Hijri
-        start_hijri = Gregorian(start_dt.year, start_dt.month, start_dt.day).to_hijri()
-        end_hijri = Gregorian(end_dt.year, end_dt.month, end_dt.day).to_hijri()
+def _escape_braces(text: str) -> str:
+    return text.replace('{', '{{').replace('}', '}}')
 
-        # Format Hijri dates in Arabic format (YYYY/MM/DD)
-        start_date_ar = f"{start_hijri.year}/{start_hijri.month:02d}/{start_hijri.day:02d}"
-        end_date_ar = f"{end_hijri.year}/{end_hijri.month:02d}/{end_hijri.day:02d}"
 
-    except Exception as e:
-        # Fallback to Gregorian if conversion fails
-        start_date_ar = start_date_gregorian
-        end_date_ar = end_date_gregorian
+class EmailTemplate(CompiledFormat):
+    """
+    Bilingual email compiled once at import time.
 
-    content = f"""
+    The base document (CSS), header banner and footer become constant text
+    around the body's fields; render() only formats the per-message values.
+    """
+
+    __slots__ = ('title', 'body')
+
+    def __init__(self, title: str, body: str, footer: str = LEAVE_FOOTER, header_style: str = ''):
+        """
+        Args:
+            title: Header banner text
+            body: str.format template of the content section (per-message fields only)
+            footer: Footer paragraphs
+            header_style: Extra attributes for the header div (e.g. a red banner)
+        """
+        self.title = title
+        self.body = body
+        prefix = f"""{_BASE_HEAD}
     <div class="container">
-        <div class="header">
-            <h1>New Leave Request / طلب إجازة جديد</h1>
+        <div class="header"{header_style}>
+            <h1>{title}</h1>
         </div>
         <div class="content">
+"""
+        suffix = f"""
+        </div>
+        <div class="footer">{footer}
+        </div>
+    </div>
+    {_BASE_TAIL}"""
+        super().__init__(_escape_braces(prefix) + body + _escape_braces(suffix))
+
+
+@lru_cache(maxsize=4096)
+def to_hijri(date_gregorian: str) -> str:
+    """
+    Gregorian YYYY-MM-DD to Hijri YYYY/MM/DD for the Arabic column.
+    Falls back to the Gregorian value if conversion fails.
+    """
+    try:
+        from hijri_converter import Gregorian
+        dt = datetime.strptime(date_gregorian, '%Y-%m-%d')
+        hijri = Gregorian(dt.year, dt.month, dt.day).to_hijri()
+        return f"{hijri.year}/{hijri.month:02d}/{hijri.day:02d}"
+    except Exception:
+        return date_gregorian
+
+
+@lru_cache(maxsize=256)
+def _vacation_type(vacation_type: str) -> Dict[str, str]:
+    return VACATION_TYPES.get(vacation_type.lower(), {'ar': vacation_type, 'en': vacation_type})
+
+
+def render_batch(render: Callable[[Dict[str, Any]], str], items: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    Render many emails (or digest rows) of one kind, as the notification
+    scheduler and digests do.
+
+    The template is compiled once, and the vacation-type and Hijri lookups
+    are memoised, so a batch only pays for each distinct type and date once.
+
+    Args:
+        render: One of the render_* functions below
+        items: Data dicts for that function
+
+    Returns:
+        List[str]: Rendered HTML, in the order of items
+    """
+    return [render(data) for data in items]
+
+
+LEAVE_REQUEST_CREATED = EmailTemplate("New Leave Request / طلب إجازة جديد", """\
             <table class="info-table">
                 <tr>
                     <td class="en-col">
-                        <div class="label">Dear {data['manager_name_en']}</div>
+                        <div class="label">Dear {manager_name_en}</div>
                         <p class="value">A new leave request has been submitted and requires your approval.</p>
                     </td>
                     <td class="ar-col">
-                        <div class="label">عزيزي/عزيزتي {data['manager_name_ar']}</div>
+                        <div class="label">عزيزي/عزيزتي {manager_name_ar}</div>
                         <p class="value">تم تقديم طلب إجازة جديد ويحتاج إلى موافقتك.</p>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Employee Name:</div>
-                        <div class="value">{data['employee_name_en']} ({data['employee_id']})</div>
+                        <div class="value">{employee_name_en} ({employee_id})</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">اسم الموظف:</div>
-                        <div class="value">{data['employee_name_ar']} ({data['employee_id']})</div>
+                        <div class="value">{employee_name_ar} ({employee_id})</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Vacation Type:</div>
-                        <div class="value">{vac_type['en']}</div>
+                        <div class="value">{vacation_type_en}</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">نوع الإجازة:</div>
-                        <div class="value">{vac_type['ar']}</div>
+                        <div class="value">{vacation_type_ar}</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Start Date:</div>
-                        <div class="value">{start_date_gregorian}</div>
+                        <div class="value">{start_date}</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">تاريخ البدء:</div>
@@ -208,7 +290,7 @@ def render_leave_request_created_email(data: Dict[str, Any]) -> str:
                 <tr>
                     <td class="en-col">
                         <div class="label">End Date:</div>
-                        <div class="value">{end_date_gregorian}</div>
+                        <div class="value">{end_date}</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">تاريخ الانتهاء:</div>
@@ -218,108 +300,68 @@ def render_leave_request_created_email(data: Dict[str, Any]) -> str:
                 <tr>
                     <td class="en-col">
                         <div class="label">Duration:</div>
-                        <div class="value">{data['duration']} day(s)</div>
+                        <div class="value">{duration} day(s)</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">المدة:</div>
-                        <div class="value">{data['duration']} يوم/أيام</div>
+                        <div class="value">{duration} يوم/أيام</div>
                     </td>
                 </tr>
-            </table>
-        </div>
-        <div class="footer">
-            <p>IAU Portal - Vacation Management System</p>
-            <p>نظام إدارة الإجازات - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>
-        </div>
-    </div>
-    """
-
-    return get_base_email_template().format(content=content)
-
-
-def render_leave_request_approved_email(data: Dict[str, Any]) -> str:
-    """
-    Email to employee when request is approved
-
-    Args:
-        data: Dict containing:
-            - employee_name_ar: str
-            - employee_name_en: str
-            - vacation_type: str
-            - start_date: str (Gregorian YYYY-MM-DD)
-            - end_date: str (Gregorian YYYY-MM-DD)
-            - duration: int
-            - balance_deducted: int
-            - remaining_balance: float
-
-    Returns:
-        str: Complete HTML email
-    """
-    from datetime import datetime
-
-    vacation_types = {
-        'annual': {'ar': 'إجازة اعتيادية', 'en': 'Annual Vacation'},
-        'sick': {'ar': 'مرضية', 'en': 'Sick Leave'},
-        'unpaid': {'ar': 'إجازة بدون أجر', 'en': 'Unpaid Leave'},
-        'emergency': {'ar': 'طارئة', 'en': 'Emergency Leave'},
-        'exams': {'ar': 'إجازة الامتحانات', 'en': 'Exams Leave'}
-    }
-
-    vac_type = vacation_types.get(data['vacation_type'].lower(), {'ar': data['vacation_type'], 'en': data['vacation_type']})
-
-    # Convert dates to Hijri for Arabic column
-    start_date_gregorian = data['start_date']
-    end_date_gregorian = data['end_date']
-
-    try:
-        from hijri_converter import Gregorian
-        start_dt = datetime.strptime(start_date_gregorian, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date_gregorian, '%Y-%m-%d')
-
-        # Convert to Hijri
-        start_hijri = Gregorian(start_dt.year, start_dt.month, start_dt.day).to_hijri()
-        end_hijri = Gregorian(end_dt.year, end_dt.month, end_dt.day).to_hijri()
+            </table>""")
 
-        # Format Hijri dates in Arabic format (YYYY/MM/DD)
-        start_date_ar = f"{start_hijri.year}/{start_hijri.month:02d}/{start_hijri.day:02d}"
-        end_date_ar = f"{end_hijri.year}/{end_hijri.month:02d}/{end_hijri.day:02d}"
+LEAVE_REQUEST_DIGEST = EmailTemplate("Pending Leave Requests / طلبات إجازة بانتظار الموافقة", """\
+            <table class="info-table">
+                <tr>
+                    <td class="en-col">
+                        <div class="label">Dear {manager_name_en}</div>
+                        <p class="value">{count} new leave request(s) have been submitted and require your approval.</p>
+                    </td>
+                    <td class="ar-col">
+                        <div class="label">عزيزي/عزيزتي {manager_name_ar}</div>
+                        <p class="value">تم تقديم {count} طلب/طلبات إجازة جديدة وتحتاج إلى موافقتك.</p>
+                    </td>
+                </tr>{rows}
+            </table>""")
 
-    except Exception as e:
-        # Fallback to Gregorian if conversion fails
-        start_date_ar = start_date_gregorian
-        end_date_ar = end_date_gregorian
+# One row per request in LEAVE_REQUEST_DIGEST
+_DIGEST_ROW = CompiledFormat("""
+                <tr>
+                    <td class="en-col">
+                        <div class="label">{employee_name_en} ({employee_id})</div>
+                        <div class="value">{vacation_type_en}: {start_date} - {end_date} ({duration} day(s))</div>
+                    </td>
+                    <td class="ar-col">
+                        <div class="label">{employee_name_ar} ({employee_id})</div>
+                        <div class="value">{vacation_type_ar}: {start_date_ar} - {end_date_ar} ({duration} يوم/أيام)</div>
+                    </td>
+                </tr>""")
 
-    content = f"""
-    <div class="container">
-        <div class="header">
-            <h1>Request Approved / تمت الموافقة على الطلب</h1>
-        </div>
-        <div class="content">
+LEAVE_REQUEST_APPROVED = EmailTemplate("Request Approved / تمت الموافقة على الطلب", """\
             <table class="info-table">
                 <tr>
                     <td class="en-col">
-                        <div class="label">Dear {data['employee_name_en']}</div>
+                        <div class="label">Dear {employee_name_en}</div>
                         <p class="value">Your leave request has been approved!</p>
                     </td>
                     <td class="ar-col">
-                        <div class="label">عزيزي/عزيزتي {data['employee_name_ar']}</div>
+                        <div class="label">عزيزي/عزيزتي {employee_name_ar}</div>
                         <p class="value">تمت الموافقة على طلب إجازتك!</p>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Vacation Type:</div>
-                        <div class="value">{vac_type['en']}</div>
+                        <div class="value">{vacation_type_en}</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">نوع الإجازة:</div>
-                        <div class="value">{vac_type['ar']}</div>
+                        <div class="value">{vacation_type_ar}</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">From:</div>
-                        <div class="value">{start_date_gregorian}</div>
+                        <div class="value">{start_date}</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">من:</div>
@@ -329,7 +371,7 @@ def render_leave_request_approved_email(data: Dict[str, Any]) -> str:
                 <tr>
                     <td class="en-col">
                         <div class="label">To:</div>
-                        <div class="value">{end_date_gregorian}</div>
+                        <div class="value">{end_date}</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">إلى:</div>
@@ -339,56 +381,26 @@ def render_leave_request_approved_email(data: Dict[str, Any]) -> str:
                 <tr>
                     <td class="en-col">
                         <div class="label">Days Used:</div>
-                        <div class="value">{data['balance_deducted']} day(s)</div>
+                        <div class="value">{balance_deducted} day(s)</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">عدد الأيام المستخدمة:</div>
-                        <div class="value">{data['balance_deducted']} يوم/أيام</div>
+                        <div class="value">{balance_deducted} يوم/أيام</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Remaining Balance:</div>
-                        <div class="value">{data['remaining_balance']:.1f} day(s)</div>
+                        <div class="value">{remaining_balance:.1f} day(s)</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">الرصيد المتبقي:</div>
-                        <div class="value">{data['remaining_balance']:.1f} يوم/أيام</div>
+                        <div class="value">{remaining_balance:.1f} يوم/أيام</div>
                     </td>
                 </tr>
-            </table>
-        </div>
-        <div class="footer">
-            <p>IAU Portal - Vacation Management System</p>
-            <p>نظام إدارة الإجازات - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>
-        </div>
-    </div>
-    """
-
-    return get_base_email_template().format(content=content)
+            </table>""")
 
-
-def render_contract_reminder_40_days_email(data: Dict[str, Any]) -> str:
-    """
-    Email 40 days before contract end
-
-    Args:
-        data: Dict containing:
-            - employee_name_ar: str
-            - employee_name_en: str
-            - contract_end_date: str
-            - days_remaining: int
-            - vacation_balance: float
-
-    Returns:
-        str: Complete HTML email
-    """
-    content = f"""
-    <div class="container">
-        <div class="header">
-            <h1>Contract End Reminder / تذكير بانتهاء العقد</h1>
-        </div>
-        <div class="content">
+CONTRACT_REMINDER_40_DAYS = EmailTemplate("Contract End Reminder / تذكير بانتهاء العقد", """\
             <div class="warning">
                 <table class="info-table" style="margin: 0;">
                     <tr>
@@ -404,42 +416,42 @@ def render_contract_reminder_40_days_email(data: Dict[str, Any]) -> str:
             <table class="info-table">
                 <tr>
                     <td class="ar-col">
-                        <div class="label">عزيزي/عزيزتي {data['employee_name_ar']}</div>
+                        <div class="label">عزيزي/عزيزتي {employee_name_ar}</div>
                         <p class="value">نود تذكيرك بأن عقدك الحالي سينتهي قريباً.</p>
                     </td>
                     <td class="en-col">
-                        <div class="label">Dear {data['employee_name_en']}</div>
+                        <div class="label">Dear {employee_name_en}</div>
                         <p class="value">We would like to remind you that your current contract is ending soon.</p>
                     </td>
                 </tr>
                 <tr>
                     <td class="ar-col">
                         <div class="label">تاريخ انتهاء العقد:</div>
-                        <div class="value">{data['contract_end_date']}</div>
+                        <div class="value">{contract_end_date}</div>
                     </td>
                     <td class="en-col">
                         <div class="label">Contract End Date:</div>
-                        <div class="value">{data['contract_end_date']}</div>
+                        <div class="value">{contract_end_date}</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="ar-col">
                         <div class="label">الأيام المتبقية:</div>
-                        <div class="value">{data['days_remaining']} يوم/أيام</div>
+                        <div class="value">{days_remaining} يوم/أيام</div>
                     </td>
                     <td class="en-col">
                         <div class="label">Days Remaining:</div>
-                        <div class="value">{data['days_remaining']} day(s)</div>
+                        <div class="value">{days_remaining} day(s)</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="ar-col">
                         <div class="label">رصيد الإجازات المتبقي:</div>
-                        <div class="value">{data['vacation_balance']:.1f} يوم/أيام</div>
+                        <div class="value">{vacation_balance:.1f} يوم/أيام</div>
                     </td>
                     <td class="en-col">
                         <div class="label">Remaining Vacation Balance:</div>
-                        <div class="value">{data['vacation_balance']:.1f} day(s)</div>
+                        <div class="value">{vacation_balance:.1f} day(s)</div>
                     </td>
                 </tr>
                 <tr>
@@ -450,39 +462,9 @@ def render_contract_reminder_40_days_email(data: Dict[str, Any]) -> str:
                         <p class="value">Please plan accordingly and use your vacation balance before the contract ends.</p>
                     </td>
                 </tr>
-            </table>
-        </div>
-        <div class="footer">
-            <p>IAU Portal - Vacation Management System</p>
-            <p>نظام إدارة الإجازات - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>
-        </div>
-    </div>
-    """
-
-    return get_base_email_template().format(content=content)
-
-
-def render_contract_critical_warning_email(data: Dict[str, Any]) -> str:
-    """
-    Critical email when balance equals remaining days (1 day before)
-
-    Args:
-        data: Dict containing:
-            - employee_name_ar: str
-            - employee_name_en: str
-            - contract_end_date: str
-            - days_remaining: int
-            - vacation_balance: float
+            </table>""")
 
-    Returns:
-        str: Complete HTML email
-    """
-    content = f"""
-    <div class="container">
-        <div class="header" style="background: linear-gradient(135deg, #dc3545 0%, #c82333 100%);">
-            <h1>CRITICAL: Contract Ending / تحذير حرج: انتهاء العقد</h1>
-        </div>
-        <div class="content">
+CONTRACT_CRITICAL_WARNING = EmailTemplate("CRITICAL: Contract Ending / تحذير حرج: انتهاء العقد", """\
             <div class="critical">
                 <table class="info-table" style="margin: 0;">
                     <tr>
@@ -498,42 +480,42 @@ def render_contract_critical_warning_email(data: Dict[str, Any]) -> str:
             <table class="info-table">
                 <tr>
                     <td class="ar-col">
-                        <div class="label">عزيزي/عزيزتي {data['employee_name_ar']}</div>
+                        <div class="label">عزيزي/عزيزتي {employee_name_ar}</div>
                         <p class="value">هذا تنبيه عاجل بشأن عقدك ورصيد إجازاتك.</p>
                     </td>
                     <td class="en-col">
-                        <div class="label">Dear {data['employee_name_en']}</div>
+                        <div class="label">Dear {employee_name_en}</div>
                         <p class="value">This is an urgent notification regarding your contract and vacation balance.</p>
                     </td>
                 </tr>
                 <tr>
                     <td class="ar-col">
                         <div class="label">تاريخ انتهاء العقد:</div>
-                        <div class="value">{data['contract_end_date']}</div>
+                        <div class="value">{contract_end_date}</div>
                     </td>
                     <td class="en-col">
                         <div class="label">Contract End Date:</div>
-                        <div class="value">{data['contract_end_date']}</div>
+                        <div class="value">{contract_end_date}</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="ar-col">
                         <div class="label">الأيام المتبقية في العقد:</div>
-                        <div class="value">{data['days_remaining']} يوم/أيام</div>
+                        <div class="value">{days_remaining} يوم/أيام</div>
                     </td>
                     <td class="en-col">
                         <div class="label">Days Remaining in Contract:</div>
-                        <div class="value">{data['days_remaining']} day(s)</div>
+                        <div class="value">{days_remaining} day(s)</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="ar-col">
                         <div class="label">رصيد الإجازات:</div>
-                        <div class="value">{data['vacation_balance']:.1f} يوم/أيام</div>
+                        <div class="value">{vacation_balance:.1f} يوم/أيام</div>
                     </td>
                     <td class="en-col">
                         <div class="label">Vacation Balance:</div>
-                        <div class="value">{data['vacation_balance']:.1f} day(s)</div>
+                        <div class="value">{vacation_balance:.1f} day(s)</div>
                     </td>
                 </tr>
                 <tr>
@@ -548,60 +530,9 @@ def render_contract_critical_warning_email(data: Dict[str, Any]) -> str:
                         </p>
                     </td>
                 </tr>
-            </table>
-        </div>
-        <div class="footer">
-            <p>IAU Portal - Vacation Management System</p>
-            <p>نظام إدارة الإجازات - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>
-        </div>
-    </div>
-    """
-
-    return get_base_email_template().format(content=content)
-
+            </table>""", header_style=' style="background: linear-gradient(135deg, #dc3545 0%, #c82333 100%);"')
 
-def render_contract_expiring_manager_notification(data: Dict[str, Any]) -> str:
-    """
-    Email to manager when employee's contract is expiring within 105 days
-
-    Args:
-        data: Dict containing:
-            - manager_name_ar: str
-            - manager_name_en: str
-            - employee_name_ar: str
-            - employee_name_en: str
-            - employee_id: str
-            - contract_end_date: str (YYYY-MM-DD)
-            - days_remaining: int
-
-    Returns:
-        str: Complete HTML email
-    """
-    from datetime import datetime
-
-    # Convert date to Hijri for Arabic column
-    contract_end_gregorian = data['contract_end_date']
-
-    try:
-        from hijri_converter import Gregorian
-        end_dt = datetime.strptime(contract_end_gregorian, '%Y-%m-%d')
-
-        # Convert to Hijri
-        end_hijri = Gregorian(end_dt.year, end_dt.month, end_dt.day).to_hijri()
-
-        # Format Hijri dates in Arabic format (YYYY/MM/DD)
-        contract_end_ar = f"{end_hijri.year}/{end_hijri.month:02d}/{end_hijri.day:02d}"
-
-    except Exception as e:
-        # Fallback to Gregorian if conversion fails
-        contract_end_ar = contract_end_gregorian
-
-    content = f"""
-    <div class="container">
-        <div class="header">
-            <h1>Contract Renewal Required / مطلوب تجديد العقد</h1>
-        </div>
-        <div class="content">
+CONTRACT_EXPIRING_MANAGER = EmailTemplate("Contract Renewal Required / مطلوب تجديد العقد", """\
             <div class="warning">
                 <table class="info-table" style="margin: 0;">
                     <tr>
@@ -617,42 +548,42 @@ def render_contract_expiring_manager_notification(data: Dict[str, Any]) -> str:
             <table class="info-table">
                 <tr>
                     <td class="en-col">
-                        <div class="label">Dear {data['manager_name_en']}</div>
+                        <div class="label">Dear {manager_name_en}</div>
                         <p class="value">This is a notification that one of your team members' contract is expiring soon and requires renewal action.</p>
                     </td>
                     <td class="ar-col">
-                        <div class="label">عزيزي/عزيزتي {data['manager_name_ar']}</div>
+                        <div class="label">عزيزي/عزيزتي {manager_name_ar}</div>
                         <p class="value">هذا إشعار بأن عقد أحد أعضاء فريقك سينتهي قريباً ويتطلب إجراء التجديد.</p>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Employee Name:</div>
-                        <div class="value">{data['employee_name_en']} ({data['employee_id']})</div>
+                        <div class="value">{employee_name_en} ({employee_id})</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">اسم الموظف:</div>
-                        <div class="value">{data['employee_name_ar']} ({data['employee_id']})</div>
+                        <div class="value">{employee_name_ar} ({employee_id})</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Contract End Date:</div>
-                        <div class="value">{contract_end_gregorian}</div>
+                        <div class="value">{contract_end_date}</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">تاريخ انتهاء العقد:</div>
-                        <div class="value">{contract_end_ar}</div>
+                        <div class="value">{contract_end_date_ar}</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Days Remaining:</div>
-                        <div class="value">{data['days_remaining']} day(s)</div>
+                        <div class="value">{days_remaining} day(s)</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">الأيام المتبقية:</div>
-                        <div class="value">{data['days_remaining']} يوم/أيام</div>
+                        <div class="value">{days_remaining} يوم/أيام</div>
                     </td>
                 </tr>
                 <tr>
@@ -663,59 +594,9 @@ def render_contract_expiring_manager_notification(data: Dict[str, Any]) -> str:
                         <p class="value">يرجى البدء بعملية تجديد العقد في أقرب وقت ممكن.</p>
                     </td>
                 </tr>
-            </table>
-        </div>
-        <div class="footer">
-            <p>IAU Portal - Contract Management System</p>
-            <p>نظام إدارة العقود - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>
-        </div>
-    </div>
-    """
-
-    return get_base_email_template().format(content=content)
-
-
-def render_contract_auto_renewed_notification(data: Dict[str, Any]) -> str:
-    """
-    Email to manager when employee's contract has been auto-renewed
-
-    Args:
-        data: Dict containing:
-            - manager_name_ar: str
-            - manager_name_en: str
-            - employee_name_ar: str
-            - employee_name_en: str
-            - employee_id: str
-            - new_contract_end_date: str (YYYY-MM-DD)
-
-    Returns:
-        str: Complete HTML email
-    """
-    from datetime import datetime
-
-    # Convert date to Hijri for Arabic column
-    new_end_gregorian = data['new_contract_end_date']
-
-    try:
-        from hijri_converter import Gregorian
-        end_dt = datetime.strptime(new_end_gregorian, '%Y-%m-%d')
-
-        # Convert to Hijri
-        end_hijri = Gregorian(end_dt.year, end_dt.month, end_dt.day).to_hijri()
-
-        # Format Hijri dates in Arabic format (YYYY/MM/DD)
-        new_end_ar = f"{end_hijri.year}/{end_hijri.month:02d}/{end_hijri.day:02d}"
+            </table>""", footer=CONTRACT_FOOTER)
 
-    except Exception as e:
-        # Fallback to Gregorian if conversion fails
-        new_end_ar = new_end_gregorian
-
-    content = f"""
-    <div class="container">
-        <div class="header">
-            <h1>Contract Auto-Renewed / تم تجديد العقد تلقائياً</h1>
-        </div>
-        <div class="content">
+CONTRACT_AUTO_RENEWED = EmailTemplate("Contract Auto-Renewed / تم تجديد العقد تلقائياً", """\
             <div class="warning">
                 <table class="info-table" style="margin: 0;">
                     <tr>
@@ -731,32 +612,32 @@ def render_contract_auto_renewed_notification(data: Dict[str, Any]) -> str:
             <table class="info-table">
                 <tr>
                     <td class="en-col">
-                        <div class="label">Dear {data['manager_name_en']}</div>
+                        <div class="label">Dear {manager_name_en}</div>
                         <p class="value">A contract has been automatically renewed in the system. Please verify and update the contract details if necessary.</p>
                     </td>
                     <td class="ar-col">
-                        <div class="label">عزيزي/عزيزتي {data['manager_name_ar']}</div>
+                        <div class="label">عزيزي/عزيزتي {manager_name_ar}</div>
                         <p class="value">تم تجديد عقد تلقائياً في النظام. يرجى التحقق وتحديث تفاصيل العقد إذا لزم الأمر.</p>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">Employee Name:</div>
-                        <div class="value">{data['employee_name_en']} ({data['employee_id']})</div>
+                        <div class="value">{employee_name_en} ({employee_id})</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">اسم الموظف:</div>
-                        <div class="value">{data['employee_name_ar']} ({data['employee_id']})</div>
+                        <div class="value">{employee_name_ar} ({employee_id})</div>
                     </td>
                 </tr>
                 <tr>
                     <td class="en-col">
                         <div class="label">New Contract End Date:</div>
-                        <div class="value">{new_end_gregorian}</div>
+                        <div class="value">{new_contract_end_date}</div>
                     </td>
                     <td class="ar-col">
                         <div class="label">تاريخ انتهاء العقد الجديد:</div>
-                        <div class="value">{new_end_ar}</div>
+                        <div class="value">{new_contract_end_date_ar}</div>
                     </td>
                 </tr>
                 <tr>
@@ -767,13 +648,218 @@ def render_contract_auto_renewed_notification(data: Dict[str, Any]) -> str:
                         <p class="value">يرجى تسجيل الدخول إلى البوابة والتحقق من معلومات العقد. سيتم إزالة إشعار التحقق بمجرد فتح وحفظ تفاصيل الموظف.</p>
                     </td>
                 </tr>
-            </table>
-        </div>
-        <div class="footer">
-            <p>IAU Portal - Contract Management System</p>
-            <p>نظام إدارة العقود - بوابة جامعة الإمام عبدالرحمن بن فيصل</p>
-        </div>
-    </div>
+            </table>""", footer=CONTRACT_FOOTER)
+
+
+def render_leave_request_created_email(data: Dict[str, Any]) -> str:
     """
+    Email to manager when employee creates leave request
+
+    Args:
+        data: Dict containing:
+            - employee_name_ar: str
+            - employee_name_en: str
+            - employee_id: str
+            - vacation_type: str (e.g., 'annual', 'sick')
+            - start_date: str (Gregorian YYYY-MM-DD)
+            - end_date: str (Gregorian YYYY-MM-DD)
+            - duration: int
+            - manager_name_ar: str
+            - manager_name_en: str
+
+    Returns:
+        str: Complete HTML email
+    """
+    vac_type = _vacation_type(data['vacation_type'])
+    return LEAVE_REQUEST_CREATED.render(
+        manager_name_en=data['manager_name_en'],
+        manager_name_ar=data['manager_name_ar'],
+        employee_name_en=data['employee_name_en'],
+        employee_name_ar=data['employee_name_ar'],
+        employee_id=data['employee_id'],
+        vacation_type_en=vac_type['en'],
+        vacation_type_ar=vac_type['ar'],
+        start_date=data['start_date'],
+        start_date_ar=to_hijri(data['start_date']),
+        end_date=data['end_date'],
+        end_date_ar=to_hijri(data['end_date']),
+        duration=data['duration']
+    )
+
+
+def _render_digest_row(item: Dict[str, Any]) -> str:
+    vac_type = _vacation_type(item['vacation_type'])
+    return _DIGEST_ROW.render(
+        employee_name_en=item['employee_name_en'],
+        employee_name_ar=item['employee_name_ar'],
+        employee_id=item['employee_id'],
+        vacation_type_en=vac_type['en'],
+        vacation_type_ar=vac_type['ar'],
+        start_date=item['start_date'],
+        start_date_ar=to_hijri(item['start_date']),
+        end_date=item['end_date'],
+        end_date_ar=to_hijri(item['end_date']),
+        duration=item['duration']
+    )
+
+
+def render_leave_request_digest_email(data: Dict[str, Any]) -> str:
+    """
+    Digest email to manager listing several pending leave requests
+
+    Args:
+        data: Dict containing:
+            - manager_name_ar: str
+            - manager_name_en: str
+            - items: list of dicts with the fields of
+              render_leave_request_created_email (employee_name_ar,
+              employee_name_en, employee_id, vacation_type, start_date,
+              end_date, duration)
+
+    Returns:
+        str: Complete HTML email
+    """
+    rows = render_batch(_render_digest_row, data['items'])
+    return LEAVE_REQUEST_DIGEST.render(
+        manager_name_en=data['manager_name_en'],
+        manager_name_ar=data['manager_name_ar'],
+        count=len(rows),
+        rows=''.join(rows)
+    )
+
+
+def render_leave_request_approved_email(data: Dict[str, Any]) -> str:
+    """
+    Email to employee when request is approved
 
-    return get_base_email_template().format(content=content)
+    Args:
+        data: Dict containing:
+            - employee_name_ar: str
+            - employee_name_en: str
+            - vacation_type: str
+            - start_date: str (Gregorian YYYY-MM-DD)
+            - end_date: str (Gregorian YYYY-MM-DD)
+            - duration: int
+            - balance_deducted: int
+            - remaining_balance: float
+
+    Returns:
+        str: Complete HTML email
+    """
+    vac_type = _vacation_type(data['vacation_type'])
+    return LEAVE_REQUEST_APPROVED.render(
+        employee_name_en=data['employee_name_en'],
+        employee_name_ar=data['employee_name_ar'],
+        vacation_type_en=vac_type['en'],
+        vacation_type_ar=vac_type['ar'],
+        start_date=data['start_date'],
+        start_date_ar=to_hijri(data['start_date']),
+        end_date=data['end_date'],
+        end_date_ar=to_hijri(data['end_date']),
+        balance_deducted=data['balance_deducted'],
+        remaining_balance=data['remaining_balance']
+    )
+
+
+def render_contract_reminder_40_days_email(data: Dict[str, Any]) -> str:
+    """
+    Email 40 days before contract end
+
+    Args:
+        data: Dict containing:
+            - employee_name_ar: str
+            - employee_name_en: str
+            - contract_end_date: str
+            - days_remaining: int
+            - vacation_balance: float
+
+    Returns:
+        str: Complete HTML email
+    """
+    return CONTRACT_REMINDER_40_DAYS.render(
+        employee_name_ar=data['employee_name_ar'],
+        employee_name_en=data['employee_name_en'],
+        contract_end_date=data['contract_end_date'],
+        days_remaining=data['days_remaining'],
+        vacation_balance=data['vacation_balance']
+    )
+
+
+def render_contract_critical_warning_email(data: Dict[str, Any]) -> str:
+    """
+    Critical email when balance equals remaining days (1 day before)
+
+    Args:
+        data: Dict containing:
+            - employee_name_ar: str
+            - employee_name_en: str
+            - contract_end_date: str
+            - days_remaining: int
+            - vacation_balance: float
+
+    Returns:
+        str: Complete HTML email
+    """
+    return CONTRACT_CRITICAL_WARNING.render(
+        employee_name_ar=data['employee_name_ar'],
+        employee_name_en=data['employee_name_en'],
+        contract_end_date=data['contract_end_date'],
+        days_remaining=data['days_remaining'],
+        vacation_balance=data['vacation_balance']
+    )
+
+
+def render_contract_expiring_manager_notification(data: Dict[str, Any]) -> str:
+    """
+    Email to manager when employee's contract is expiring within 105 days
+
+    Args:
+        data: Dict containing:
+            - manager_name_ar: str
+            - manager_name_en: str
+            - employee_name_ar: str
+            - employee_name_en: str
+            - employee_id: str
+            - contract_end_date: str (YYYY-MM-DD)
+            - days_remaining: int
+
+    Returns:
+        str: Complete HTML email
+    """
+    return CONTRACT_EXPIRING_MANAGER.render(
+        manager_name_en=data['manager_name_en'],
+        manager_name_ar=data['manager_name_ar'],
+        employee_name_en=data['employee_name_en'],
+        employee_name_ar=data['employee_name_ar'],
+        employee_id=data['employee_id'],
+        contract_end_date=data['contract_end_date'],
+        contract_end_date_ar=to_hijri(data['contract_end_date']),
+        days_remaining=data['days_remaining']
+    )
+
+
+def render_contract_auto_renewed_notification(data: Dict[str, Any]) -> str:
+    """
+    Email to manager when employee's contract has been auto-renewed
+
+    Args:
+        data: Dict containing:
+            - manager_name_ar: str
+            - manager_name_en: str
+            - employee_name_ar: str
+            - employee_name_en: str
+            - employee_id: str
+            - new_contract_end_date: str (YYYY-MM-DD)
+
+    Returns:
+        str: Complete HTML email
+    """
+    return CONTRACT_AUTO_RENEWED.render(
+        manager_name_en=data['manager_name_en'],
+        manager_name_ar=data['manager_name_ar'],
+        employee_name_en=data['employee_name_en'],
+        employee_name_ar=data['employee_name_ar'],
+        employee_id=data['employee_id'],
+        new_contract_end_date=data['new_contract_end_date'],
+        new_contract_end_date_ar=to_hijri(data['new_contract_end_date'])
+    )
@@ -0,0 +1,139 @@
+"""
+In-process EmployeeWithBalance cache for IAU Portal.
+
+A single request often resolves the same employee several times (e.g. the
+caller and their manager when generating a vacation form), and each lookup
+computes a balance. This LRU cache sits in front of EmployeeService and is
+keyed by (employee_id, date) so balances that accrue daily never outlive
+the day they were computed on.
+
+Invalidation is write-driven: the DB repositories call into the cache after
+every commit that can change an EmployeeWithBalance (leave requests,
+employees, users, portal settings), so this worker sees the change on its
+next lookup. Other workers see it once their entry expires, hence the short
+TTL.
+
+The cache is per process. Configure with environment variables:
+    EMPLOYEE_CACHE_ENABLED  - "true" (default) or "false"
+    EMPLOYEE_CACHE_TTL      - seconds an entry is trusted (default 30)
+    EMPLOYEE_CACHE_SIZE     - maximum number of entries (default 512)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from .models import EmployeeWithBalance
+
+
+class EmployeeCache:
+    """Thread-safe TTL + LRU cache of EmployeeWithBalance keyed by (employee_id, date)."""
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 512, enabled: bool = True):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.enabled = enabled
+        self._entries: "OrderedDict[tuple, Tuple[float, EmployeeWithBalance]]" = OrderedDict()
+        self._employee_by_user: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, employee_id: str, today: Optional[date] = None) -> Optional[EmployeeWithBalance]:
+        if not self.enabled:
+            return None
+        key = (employee_id, today or date.today())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Callers mutate results (e.g. clearing fields), so never hand out the cached object
+            return entry[1].model_copy(deep=True)
+
+    def get_by_user_id(self, user_id, today: Optional[date] = None) -> Optional[EmployeeWithBalance]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            employee_id = self._employee_by_user.get(str(user_id))
+        if employee_id is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return self.get(employee_id, today)
+
+    def put(self, employee: EmployeeWithBalance, today: Optional[date] = None) -> None:
+        if not self.enabled or employee is None:
+            return
+        today = today or date.today()
+        with self._lock:
+            # Day rollover: every existing entry is now unreachable
+            if self._entries and next(iter(self._entries))[1] != today:
+                self._entries.clear()
+            self._entries[(employee.id, today)] = (time.monotonic() + self.ttl, employee.model_copy(deep=True))
+            self._entries.move_to_end((employee.id, today))
+            self._employee_by_user[str(employee.user_id)] = employee.id
+            while len(self._entries) > self.max_size:
+                (evicted_id, _), _ = self._entries.popitem(last=False)
+                self._drop_user_index(evicted_id)
+
+    def invalidate_employee(self, employee_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == employee_id]:
+                del self._entries[key]
+            self._drop_user_index(employee_id)
+
+    def invalidate_user(self, user_id) -> None:
+        with self._lock:
+            employee_id = self._employee_by_user.pop(str(user_id), None)
+            if employee_id is not None:
+                for key in [k for k in self._entries if k[0] == employee_id]:
+                    del self._entries[key]
+
+    def invalidate_employee_type(self, employee_type: str) -> None:
+        """Drop every cached employee of a type (e.g. 'permanent' when carry-over rules change)."""
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if v.employee_type == employee_type]:
+                self._drop_user_index(key[0])
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._employee_by_user.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _drop_user_index(self, employee_id: str) -> None:
+        # Caller holds the lock
+        for user_id in [u for u, e in self._employee_by_user.items() if e == employee_id]:
+            del self._employee_by_user[user_id]
+
+
+employee_cache = EmployeeCache(
+    ttl=float(os.getenv("EMPLOYEE_CACHE_TTL", "30")),
+    max_size=int(os.getenv("EMPLOYEE_CACHE_SIZE", "512")),
+    enabled=os.getenv("EMPLOYEE_CACHE_ENABLED", "true").lower() == "true"
+)
@@ -191,6 +191,17 @@ class DuplicateResourceError(IAUPortalException):
         )
 
 
+class HierarchyCycleError(ValidationError):
+    """Manager assignment would make an employee their own (indirect) manager"""
+
+    def __init__(self, employee_id: str, manager_id: str):
+        super().__init__(
+            f"Cannot assign manager '{manager_id}' to '{employee_id}': this would create a reporting cycle",
+            field="manager_id"
+        )
+        self.error_code = "HIERARCHY_CYCLE"
+
+
 class InvalidFileError(ValidationError):
     """File upload validation failed"""
 
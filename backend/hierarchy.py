@@ -3,12 +3,26 @@ Manager hierarchy utilities for recursive subordinate lookups.
 
 This module provides functions to traverse the employee management hierarchy
 and find all subordinates (direct and indirect) of a given manager.
+
+The database keeps a closure table (employee_hierarchy) for these lookups;
+see DBEmployeeRepository.get_subordinate_ids / is_subordinate. The functions
+below work on an in-memory employee list, in time linear in its length.
 """
 
-from typing import List, Set
+from collections import defaultdict
+from typing import Dict, List, Set
 from backend.models import EmployeeWithBalance
 
 
+def build_children_index(all_employees: List[EmployeeWithBalance]) -> Dict[str, List[str]]:
+    """Map each manager ID to the IDs of their direct reports."""
+    children: Dict[str, List[str]] = defaultdict(list)
+    for emp in all_employees:
+        if emp.manager_id:
+            children[emp.manager_id].append(emp.id)
+    return children
+
+
 def get_all_subordinates(
     manager_id: str,
     all_employees: List[EmployeeWithBalance],
@@ -30,30 +44,25 @@ def get_all_subordinates(
         >>> subordinates = get_all_subordinates(manager1_id, all_employees, True)
         >>> # Returns [manager2_id, employee_id]
     """
+    children = build_children_index(all_employees)
     subordinate_ids: Set[str] = set()
-    visited: Set[str] = set()  # Prevent infinite loops from circular references
-
-    def find_subordinates(mgr_id: str):
-        # Prevent infinite recursion from circular references
-        if mgr_id in visited:
-            return
-        visited.add(mgr_id)
-
-        # Find direct reports
-        direct_reports = [emp for emp in all_employees if emp.manager_id == mgr_id]
+    visited: Set[str] = {manager_id}  # Prevent infinite loops from circular references
+    stack = [manager_id]
 
-        for employee in direct_reports:
+    while stack:
+        mgr_id = stack.pop()
+        for employee_id in children.get(mgr_id, []):
             # Skip if this would create a circular reference
-            if employee.id == mgr_id:
+            if employee_id == mgr_id:
                 continue
 
-            subordinate_ids.add(employee.id)
+            subordinate_ids.add(employee_id)
 
-            # Recursively find their subordinates if include_indirect is True
-            if include_indirect:
-                find_subordinates(employee.id)
+            # Descend into their reports if include_indirect is True
+            if include_indirect and employee_id not in visited:
+                visited.add(employee_id)
+                stack.append(employee_id)
 
-    find_subordinates(manager_id)
     return list(subordinate_ids)
 
 
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Request
+from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Request, BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse, Response
+from fastapi.responses import StreamingResponse, FileResponse, Response, JSONResponse
 from typing import List, Optional
+from sqlalchemy.exc import StatementError
 from sqlalchemy.orm import Session
 import io
+import itertools
 import os
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -17,15 +19,32 @@ from slowapi.errors import RateLimitExceeded
 # Load environment variables from .env file
 load_dotenv()
 
-from .models import User, UserCreate, LeaveRequest, Employee, EmployeeWithBalance, EmployeeCreate, LeaveRequestCreate, LeaveRequestUpdate, AdminInit, Unit, EmployeeUpdate, UserPasswordUpdate, UnitCreate, UnitUpdate, AttendanceLog, SignatureUpload, EmailSettings, EmailSettingsCreate, EmailSettingsUpdate, DashboardReportRequest, TeamMemberStats, AuditLog, PortalSettings, PortalSettingsUpdate
-from .database import init_db, get_db
+from .models import User, UserCreate, LeaveRequest, Employee, EmployeeWithBalance, EmployeeCreate, LeaveRequestCreate, LeaveRequestUpdate, AdminInit, Unit, EmployeeUpdate, UserPasswordUpdate, UnitCreate, UnitUpdate, AttendanceLog, SignatureUpload, EmailSettings, EmailSettingsCreate, EmailSettingsUpdate, DashboardReportRequest, TeamMemberStats, AuditLog, PortalSettings, PortalSettingsUpdate, PendingApprovalsPage, BulkDecisionRequest, BulkDecisionResult, NotificationPreferenceUpdate, NotificationRun
+from .database import init_db, get_db, SessionLocal, InvalidDateError
+from .db_repositories import DBEmailOutboxRepository, DBNotificationRunRepository, DBSchedulerRepository, DBAuditLogRepository
 from .services import UserService, EmployeeService, LeaveRequestService, UnitService, AttendanceService, EmailSettingsService, save_attachment
 from .document_generator import create_vacation_form, create_dashboard_report
 from .auth import create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
-from .dependencies import get_user_service, get_employee_service, get_leave_request_service, get_unit_service, get_attendance_service, get_email_settings_service, get_portal_settings_repo
+from .dependencies import get_user_service, get_employee_service, get_leave_request_service, get_unit_service, get_attendance_service, get_email_settings_service, get_portal_settings_repo, get_team_stats_engine, get_email_service, get_email_outbox_repo, get_notification_run_repo, get_scheduler_repo, get_audit_log_repo
+from .team_stats import TeamStatsEngine
+from .email_service import EmailService, close_smtp_pools
+from .email_outbox import OutboxWorker
+from .app_scheduler import AppScheduler
+from .audit_archive import audit_archive
+from .notification_scheduler import notify_managers_of_renewals
+from .pagination import clamp_limit, InvalidCursorError
 from .calculation import calculate_date_range
+from .config import MIN_DIGEST_WINDOW_MINUTES, MAX_DIGEST_WINDOW_MINUTES, AUDIT_LOG_COUNT_CAP
 from .audit import (
     log_audit,
+    build_audit_log,
+    audit_writer,
+    audit_log_to_dict,
+    encode_audit_cursor,
+    decode_audit_cursor,
+    iter_audit_export,
+    AUDIT_EXPORT_FORMATS,
+    ACTION_AUDIT_LOG_EXPORTED,
     ACTION_LEAVE_REQUEST_CREATED,
     ACTION_LEAVE_REQUEST_APPROVED,
     ACTION_LEAVE_REQUEST_REJECTED,
@@ -42,7 +61,8 @@ from .audit import (
     ENTITY_TYPE_LEAVE_REQUEST,
     ENTITY_TYPE_USER,
     ENTITY_TYPE_EMPLOYEE,
-    ENTITY_TYPE_UNIT
+    ENTITY_TYPE_UNIT,
+    ENTITY_TYPE_SYSTEM
 )
 from .exceptions import (
     InvalidCredentialsError,
@@ -57,12 +77,29 @@ from .exceptions import (
 
 app = FastAPI(title="IAU Portal API", version="0.1.0")
 
+# Delivers queued notification emails outside the request path
+outbox_worker = OutboxWorker.from_env()
+
+# Runs the daily contract jobs on one elected worker
+app_scheduler = AppScheduler.from_env()
+
 # Rate Limiting Configuration
 # Prevents brute force attacks and API abuse
 limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+
+@app.exception_handler(StatementError)
+async def invalid_date_handler(request: Request, exc: StatementError):
+    """Malformed dates are only detected when written to a DATE column: answer 400, not 500."""
+    if isinstance(exc.orig, InvalidDateError):
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={
+            "detail": {"error_code": "VALIDATION_ERROR", "message": str(exc.orig), "details": {}}
+        })
+    raise exc
+
+
 # Initialize database tables on startup
 @app.on_event("startup")
 def on_startup():
@@ -70,6 +107,30 @@ def on_startup():
     init_db()
     print("[STARTUP] Database ready!")
     print("[SECURITY] Rate limiting enabled")
+    if os.getenv("EMAIL_OUTBOX_WORKER_ENABLED", "true").lower() == "true":
+        outbox_worker.start()
+        print("[STARTUP] Email outbox worker started")
+    audit_writer.start()
+    print("[STARTUP] Buffered audit writer started")
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    outbox_worker.stop()
+    close_smtp_pools()
+    audit_writer.stop()  # Write buffered audit entries before exiting
+
+
+@app.on_event("startup")
+async def start_app_scheduler():
+    if os.getenv("APP_SCHEDULER_ENABLED", "true").lower() == "true":
+        app_scheduler.start()
+        print(f"[STARTUP] App scheduler started ({app_scheduler.instance_id})")
+
+
+@app.on_event("shutdown")
+async def stop_app_scheduler():
+    await app_scheduler.stop()
 
 # CORS Middleware - Security hardened
 # Read allowed origins from environment variable
@@ -89,6 +150,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.get("/")
@@ -221,6 +283,8 @@ def create_employee_and_user(request: Request,
             request=request
         )
         return created
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -250,6 +314,8 @@ def update_employee(request: Request,
                 request=request
             )
             return updated_employee
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
@@ -277,6 +343,8 @@ def update_employee(request: Request,
             # Clear contract verification flag when manager edits employee
             employee_service.clear_contract_verification_flag(employee_id)
             return updated_employee
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
@@ -351,6 +419,16 @@ def delete_signature_endpoint(request: Request,
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.put("/api/users/me/notification-preference", response_model=EmployeeWithBalance)
+def update_notification_preference(preference_update: NotificationPreferenceUpdate,
+                                   employee_service: EmployeeService = Depends(get_employee_service),
+                                   current_user: User = Depends(get_current_user)):
+    """Choose between one email per new leave request ('immediate') and a periodic digest ('digest')"""
+    employee = employee_service.get_employee_by_user_id(current_user.id)
+    if not employee:
+        raise HTTPException(status_code=404, detail="Employee profile not found for the current user")
+    return employee_service.set_notification_preference(employee.id, preference_update.notification_preference)
+
 @app.get("/api/employees", response_model=List[EmployeeWithBalance])
 def read_employees(employee_service: EmployeeService = Depends(get_employee_service), current_user: User = Depends(get_current_user)):
     return employee_service.get_employees()
@@ -459,8 +537,49 @@ def delete_unit(
 
 # --- Leave Request Endpoints ---
 @app.get("/api/requests", response_model=List[LeaveRequest])
-def read_leave_requests(leave_request_service: LeaveRequestService = Depends(get_leave_request_service), current_user: User = Depends(get_current_user)):
-    return leave_request_service.get_leave_requests()
+def read_leave_requests(
+    response: Response,
+    employee_id: Optional[str] = None,
+    status: Optional[str] = None,
+    vacation_type: Optional[str] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    unit_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    leave_request_service: LeaveRequestService = Depends(get_leave_request_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    List leave requests, newest start date first.
+
+    Query parameters (all optional, evaluated in the database):
+    - employee_id, status, vacation_type, unit_id: exact-match filters
+    - from_date / to_date: keep requests overlapping this window (YYYY-MM-DD)
+    - limit: page size (max 500); without it all matching requests are returned
+    - cursor: value of the X-Next-Cursor header from the previous page
+
+    The X-Next-Cursor response header is set when another page exists.
+    """
+    for value, name in ((from_date, "from_date"), (to_date, "to_date")):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {name} format. Use YYYY-MM-DD")
+
+    try:
+        page, next_cursor = leave_request_service.search_leave_requests(
+            employee_id=employee_id, status=status, vacation_type=vacation_type,
+            from_date=from_date, to_date=to_date, unit_id=unit_id,
+            limit=clamp_limit(limit, 500), cursor=cursor
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
 
 @app.get("/api/requests/{request_id}", response_model=LeaveRequest)
 def read_leave_request(request_id: int, leave_request_service: LeaveRequestService = Depends(get_leave_request_service), current_user: User = Depends(get_current_user)):
@@ -488,6 +607,7 @@ def create_leave_request(
             entity_id=str(created_request.id),
             user=current_user,
             details={
+                "employee_id": created_request.employee_id,
                 "vacation_type": created_request.vacation_type,
                 "start_date": created_request.start_date,
                 "end_date": created_request.end_date,
@@ -511,8 +631,6 @@ def update_leave_request(
     db: Session = Depends(get_db)
 ):
     """Update a leave request (status change for managers, or edit for requester)"""
-    from backend.hierarchy import is_subordinate_of
-
     existing_request = leave_request_service.get_leave_request_by_id(request_id)
     if not existing_request:
         raise HTTPException(status_code=404, detail="Request not found")
@@ -528,10 +646,7 @@ def update_leave_request(
         pass
     elif current_user.role in ["manager", "dean"]:
         # Manager can only update requests from their subordinates (direct or indirect)
-        all_employees = employee_service.get_employees()
-
-        # Check if the request belongs to a subordinate
-        if not is_subordinate_of(existing_request.employee_id, current_employee.id, all_employees):
+        if not employee_service.is_subordinate(existing_request.employee_id, current_employee.id):
             raise HTTPException(
                 status_code=403,
                 detail="Not authorized: You can only approve requests from your team members"
@@ -586,6 +701,108 @@ def update_leave_request(
     return updated_request
 
 
+@app.get("/api/approvals/pending", response_model=PendingApprovalsPage)
+def read_pending_approvals(
+    limit: Optional[int] = 50,
+    cursor: Optional[str] = None,
+    leave_request_service: LeaveRequestService = Depends(get_leave_request_service),
+    employee_service: EmployeeService = Depends(get_employee_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Pending requests the current user can decide on (admin: everyone else; manager/dean: their
+    direct and indirect reports), soonest start date first, with conflict information and counts.
+
+    Pass the returned next_cursor as `cursor` to fetch the next page (limit max 200).
+    """
+    if current_user.role not in ["admin", "manager", "dean"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    current_employee = employee_service.get_employee_by_user_id(current_user.id)
+    if current_user.role != "admin" and not current_employee:
+        raise HTTPException(status_code=404, detail="Employee record not found")
+
+    try:
+        return leave_request_service.get_pending_approvals(
+            manager_id=None if current_user.role == "admin" else current_employee.id,
+            exclude_employee_id=current_employee.id if current_employee else None,
+            limit=clamp_limit(limit, 200),
+            cursor=cursor
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.post("/api/approvals/bulk", response_model=BulkDecisionResult)
+def bulk_decide_leave_requests(
+    request: Request,
+    decision: BulkDecisionRequest,
+    background_tasks: BackgroundTasks,
+    leave_request_service: LeaveRequestService = Depends(get_leave_request_service),
+    employee_service: EmployeeService = Depends(get_employee_service),
+    email_service: EmailService = Depends(get_email_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Approve or reject up to 500 Pending requests in one transaction.
+
+    Each request is authorized like PUT /api/requests/{id}; requests that are
+    missing, out of scope or no longer Pending are reported in the per-item
+    results and do not block the rest. Audit entries are written in the same
+    commit, and approval emails are sent together after the response.
+    """
+    if current_user.role not in ["admin", "manager", "dean"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if decision.status not in ("Approved", "Rejected"):
+        raise HTTPException(status_code=400, detail="Status must be 'Approved' or 'Rejected'")
+
+    request_ids = list(dict.fromkeys(decision.request_ids))
+    if not request_ids:
+        raise HTTPException(status_code=400, detail="No requests given")
+    if len(request_ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 requests can be decided at once")
+
+    current_employee = employee_service.get_employee_by_user_id(current_user.id)
+    if not current_employee:
+        raise HTTPException(status_code=404, detail="Employee record not found")
+
+    subordinate_ids = None
+    if current_user.role != "admin":
+        subordinate_ids = employee_service.get_subordinate_ids(current_employee.id)
+
+    action = ACTION_LEAVE_REQUEST_APPROVED if decision.status == "Approved" else ACTION_LEAVE_REQUEST_REJECTED
+
+    def audit_row(leave_request: LeaveRequest, previous_status: str):
+        return build_audit_log(
+            action=action,
+            entity_type=ENTITY_TYPE_LEAVE_REQUEST,
+            entity_id=str(leave_request.id),
+            user=current_user,
+            details={
+                "employee_id": leave_request.employee_id,
+                "previous_status": previous_status,
+                "new_status": decision.status,
+                "vacation_type": leave_request.vacation_type,
+                "duration": leave_request.duration,
+                "bulk": True
+            },
+            request=request
+        )
+
+    results, emails = leave_request_service.decide_leave_requests(
+        request_ids,
+        decision.status,
+        rejection_reason=decision.rejection_reason,
+        authorize=None if subordinate_ids is None else (lambda r: r.employee_id in subordinate_ids),
+        audit_row=audit_row
+    )
+    if emails:
+        background_tasks.add_task(email_service.send_batch, emails)
+
+    succeeded = sum(1 for r in results if r.success)
+    return BulkDecisionResult(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+
 @app.get("/api/requests/{request_id}/download")
 def download_vacation_form(request_id: int,
                            employee_service: EmployeeService = Depends(get_employee_service),
@@ -708,6 +925,7 @@ def download_dashboard_report(
     leave_request_service: LeaveRequestService = Depends(get_leave_request_service),
     unit_service: UnitService = Depends(get_unit_service),
     attendance_service: AttendanceService = Depends(get_attendance_service),
+    team_stats_engine: TeamStatsEngine = Depends(get_team_stats_engine),
     current_user: User = Depends(get_current_user)
 ):
     employee = employee_service.get_employee_by_user_id(current_user.id)
@@ -728,17 +946,12 @@ def download_dashboard_report(
         emp_start_date
     )
 
-    all_requests = leave_request_service.get_leave_requests()
+    own_requests = leave_request_service.get_leave_requests_for_employee(employee.id)
 
-    # Filter my requests by date range
-    my_requests = []
-    for r in all_requests:
-        if r.employee_id == employee.id:
-            req_start = datetime.strptime(r.start_date, "%Y-%m-%d").date()
-            req_end = datetime.strptime(r.end_date, "%Y-%m-%d").date()
-            # Include if there's any overlap with the period
-            if req_start <= period_end and req_end >= period_start:
-                my_requests.append(r)
+    # My requests overlapping the period (overlap test runs in SQL)
+    my_requests = leave_request_service.get_leave_requests_overlapping(
+        period_start.isoformat(), period_end.isoformat(), employee_ids=[employee.id]
+    )
 
     # Sort requests by date desc
     my_requests.sort(key=lambda x: x.start_date, reverse=True)
@@ -749,7 +962,7 @@ def download_dashboard_report(
     used_balance = sum(r.duration for r in approved_requests_in_period)
 
     # Total balance calculations (not period-specific)
-    all_approved = [r for r in all_requests if r.status == 'Approved' and r.employee_id == employee.id]
+    all_approved = [r for r in own_requests if r.status == 'Approved']
     total_used = sum(r.duration for r in all_approved)
     earned_balance = round(employee.vacation_balance + total_used, 2)
 
@@ -784,89 +997,30 @@ def download_dashboard_report(
 
     # Fetch Team Data if Manager/Admin - with period stats
     if current_user.role in ['manager', 'admin', 'dean']:
-        from backend.hierarchy import get_all_subordinates
+        if current_user.role in ['manager', 'dean']:
+            # Manager/Dean sees direct and indirect reports; only their balances are computed
+            subordinate_ids = employee_service.get_subordinate_ids(employee.id)
+            team = employee_service.get_employees_by_ids(list(subordinate_ids))
+        else:
+            # Admin sees all (except self)
+            team = [emp for emp in employee_service.get_employees() if emp.id != employee.id]
+
+        team_stats = team_stats_engine.build(team, filter_request.filter_type, period_start, period_end)
 
-        all_employees = employee_service.get_employees()
         team_members = []
-        for emp in all_employees:
-            # Admin/Dean sees all (except self). Manager/Dean sees direct and indirect reports.
-            is_team_member = False
-            if current_user.role in ['manager', 'dean']:
-                # Get all subordinates (direct and indirect)
-                subordinate_ids = get_all_subordinates(employee.id, all_employees, include_indirect=True)
-                if emp.id in subordinate_ids:
-                    is_team_member = True
-            elif current_user.role == 'admin':
-                if emp.id != employee.id: # Exclude self
-                    is_team_member = True
-
-            if is_team_member:
-                # Calculate period-specific stats for this member
-                # For 'full_year' filter, use each employee's own contract period
-                if filter_request.filter_type == 'full_year':
-                    emp_start_date = datetime.strptime(emp.start_date, "%Y-%m-%d").date()
-                    member_period_start, member_period_end = calculate_date_range(
-                        'full_year',
-                        None,
-                        None,
-                        emp_start_date
-                    )
-                else:
-                    # For other filters, use the same period as the manager
-                    member_period_start, member_period_end = period_start, period_end
-
-                member_requests_in_period = []
-                for r in all_requests:
-                    if r.employee_id == emp.id:
-                        req_start = datetime.strptime(r.start_date, "%Y-%m-%d").date()
-                        req_end = datetime.strptime(r.end_date, "%Y-%m-%d").date()
-                        if req_start <= member_period_end and req_end >= member_period_start:
-                            member_requests_in_period.append(r)
-
-                approved_in_period = [r for r in member_requests_in_period if r.status == 'Approved']
-                total_leaves_taken = sum(r.duration for r in approved_in_period)
-
-                # Calculate leaves by type with details
-                leaves_by_type = {}
-                leaves_details = []  # List of leave details with dates
-                for r in approved_in_period:
-                    if r.vacation_type in leaves_by_type:
-                        leaves_by_type[r.vacation_type] += r.duration
-                    else:
-                        leaves_by_type[r.vacation_type] = r.duration
-
-                    # Add detailed leave information
-                    leaves_details.append({
-                        'type': r.vacation_type,
-                        'start_date': r.start_date,
-                        'end_date': r.end_date,
-                        'duration': r.duration
-                    })
-
-                # Check current status - if on leave today
-                from datetime import date as dt_date
-                today = dt_date.today()
-                on_leave_today = False
-                for r in all_requests:
-                    if r.employee_id == emp.id and r.status == 'Approved':
-                        req_start = datetime.strptime(r.start_date, "%Y-%m-%d").date()
-                        req_end = datetime.strptime(r.end_date, "%Y-%m-%d").date()
-                        if req_start <= today <= req_end:
-                            on_leave_today = True
-                            break
-                current_status = 'On Leave' if on_leave_today else 'Present'
-
-                team_members.append({
-                    'name_en': f"{emp.first_name_en} {emp.last_name_en}",
-                    'name_ar': f"{emp.first_name_ar} {emp.last_name_ar}",
-                    'position_en': emp.position_en,
-                    'position_ar': emp.position_ar,
-                    'vacation_balance': emp.vacation_balance,
-                    'total_leaves_taken': total_leaves_taken,
-                    'current_status': current_status,
-                    'leaves_by_type': leaves_by_type,
-                    'leaves_details': leaves_details
-                })
+        for emp in team:
+            member_stats = team_stats[emp.id]
+            team_members.append({
+                'name_en': f"{emp.first_name_en} {emp.last_name_en}",
+                'name_ar': f"{emp.first_name_ar} {emp.last_name_ar}",
+                'position_en': emp.position_en,
+                'position_ar': emp.position_ar,
+                'vacation_balance': emp.vacation_balance,
+                'total_leaves_taken': member_stats['total_leaves_taken'],
+                'current_status': member_stats['current_status'],
+                'leaves_by_type': member_stats['leaves_by_type'],
+                'leaves_details': member_stats['leaves_details']
+            })
         data['team_data'] = team_members
 
     file_stream = create_dashboard_report(data)
@@ -1014,26 +1168,7 @@ def check_and_renew_contracts(
         renewed_employees = employee_service.check_and_renew_expired_contracts()
 
         # Send email notifications for auto-renewed contracts
-        email_settings = email_settings_service.get_email_settings()
-        if email_settings and email_settings.is_active:
-            from backend.hierarchy import get_all_subordinates
-            all_employees = employee_service.get_employees()
-
-            for emp in renewed_employees:
-                # Find manager
-                if emp.manager_id:
-                    manager_emp = next((e for e in all_employees if e.id == emp.manager_id), None)
-                    if manager_emp and manager_emp.email:
-                        # Send email to manager about auto-renewed contract
-                        email_settings_service.send_contract_auto_renewed_notification(
-                            manager_email=manager_emp.email,
-                            manager_name_ar=f"{manager_emp.first_name_ar} {manager_emp.last_name_ar}",
-                            manager_name_en=f"{manager_emp.first_name_en} {manager_emp.last_name_en}",
-                            employee_name_ar=f"{emp.first_name_ar} {emp.last_name_ar}",
-                            employee_name_en=f"{emp.first_name_en} {emp.last_name_en}",
-                            employee_id=emp.id,
-                            new_contract_end_date=emp.contract_end_date
-                        )
+        notify_managers_of_renewals(employee_service, email_settings_service, renewed_employees)
 
         return {
             "message": f"Checked and renewed {len(renewed_employees)} contracts",
@@ -1055,16 +1190,13 @@ def get_expiring_contracts(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     try:
-        from backend.hierarchy import get_all_subordinates
-
         # Get all employees with expiring contracts
         expiring_employees = employee_service.get_employees_with_expiring_contracts(days_threshold)
 
         # Filter by manager/dean's team if not admin
         if current_user.role in ["manager", "dean"]:
             current_employee = employee_service.get_employee_by_user_id(current_user.id)
-            all_employees = employee_service.get_employees()
-            subordinate_ids = get_all_subordinates(current_employee.id, all_employees, include_indirect=True)
+            subordinate_ids = employee_service.get_subordinate_ids(current_employee.id)
             expiring_employees = [emp for emp in expiring_employees if emp.id in subordinate_ids]
 
         return {
@@ -1094,16 +1226,13 @@ def get_contracts_needing_verification(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     try:
-        from backend.hierarchy import get_all_subordinates
-
         # Get all employees needing verification
         needing_verification = employee_service.get_employees_needing_contract_verification()
 
         # Filter by manager/dean's team if not admin
         if current_user.role in ["manager", "dean"]:
             current_employee = employee_service.get_employee_by_user_id(current_user.id)
-            all_employees = employee_service.get_employees()
-            subordinate_ids = get_all_subordinates(current_employee.id, all_employees, include_indirect=True)
+            subordinate_ids = employee_service.get_subordinate_ids(current_employee.id)
             needing_verification = [emp for emp in needing_verification if emp.id in subordinate_ids]
 
         return {
@@ -1184,6 +1313,7 @@ def get_portal_settings(
 def update_portal_settings(
     update_data: PortalSettingsUpdate,
     portal_settings_repo=Depends(get_portal_settings_repo),
+    employee_service: EmployeeService = Depends(get_employee_service),
     current_user: User = Depends(get_current_user)
 ):
     """Update global portal settings (admin only)"""
@@ -1194,46 +1324,153 @@ def update_portal_settings(
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    return portal_settings_repo.update(update_dict)
+    window = update_dict.get('digest_window_minutes')
+    if window is not None and not MIN_DIGEST_WINDOW_MINUTES <= window <= MAX_DIGEST_WINDOW_MINUTES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"digest_window_minutes must be between {MIN_DIGEST_WINDOW_MINUTES} and {MAX_DIGEST_WINDOW_MINUTES}"
+        )
+
+    previous = portal_settings_repo.get()
+    updated = portal_settings_repo.update(update_dict)
+
+    # Carry-over cap feeds permanent employees' ledger balances
+    if updated.max_carry_over_days != previous.max_carry_over_days:
+        employee_service.refresh_permanent_balances()
+
+    return updated
+
+
+@app.get("/api/admin/employee-cache")
+def get_employee_cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit/miss counters and size of the in-process employee balance cache (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    from .employee_cache import employee_cache
+    return employee_cache.stats()
+
+
+@app.get("/api/admin/email-outbox")
+def get_email_outbox_stats(
+    outbox_repo: DBEmailOutboxRepository = Depends(get_email_outbox_repo),
+    current_user: User = Depends(get_current_user)
+):
+    """Number of queued notification emails by status: pending, sent, failed (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    counts = outbox_repo.count_by_status()
+    return {status_name: counts.get(status_name, 0) for status_name in ("pending", "sent", "failed")}
+
+
+@app.get("/api/admin/notification-runs", response_model=List[NotificationRun])
+def get_notification_runs(
+    limit: int = 30,
+    run_repo: DBNotificationRunRepository = Depends(get_notification_run_repo),
+    current_user: User = Depends(get_current_user)
+):
+    """Recent contract notification scheduler runs: due, planned, sent, failed and duration (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return run_repo.get_recent(clamp_limit(limit, 365))
+
+
+@app.get("/api/admin/scheduler")
+def get_scheduler_status(
+    scheduler_repo: DBSchedulerRepository = Depends(get_scheduler_repo),
+    current_user: User = Depends(get_current_user)
+):
+    """This worker's scheduler status, the elected leader and the last run of each daily job (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return app_scheduler.status(scheduler_repo)
 
 
 # ==========================================
 # Admin Audit Logging Endpoints
 # ==========================================
 
+def _parse_audit_filters(action: Optional[str], entity_type: Optional[str], user_id: Optional[str],
+                         start_date: Optional[str], end_date: Optional[str], entity_id: Optional[str] = None,
+                         employee_id: Optional[str] = None, previous_status: Optional[str] = None,
+                         new_status: Optional[str] = None, vacation_type: Optional[str] = None) -> dict:
+    """Query parameters of the audit log endpoints as DBAuditLogRepository.search filters."""
+    filters = {"action": action, "entity_type": entity_type, "entity_id": entity_id,
+               "employee_id": employee_id, "previous_status": previous_status,
+               "new_status": new_status, "vacation_type": vacation_type}
+
+    if user_id:
+        try:
+            from uuid import UUID
+            filters["user_id"] = UUID(user_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid user_id format")
+
+    if start_date:
+        try:
+            filters["start"] = datetime.strptime(start_date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start_date format. Use YYYY-MM-DD")
+
+    if end_date:
+        try:
+            # Add 1 day to include the entire end_date
+            filters["end"] = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid end_date format. Use YYYY-MM-DD")
+
+    return filters
+
+
 @app.get("/api/admin/audit-logs")
 def get_audit_logs(
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    count: str = "capped",
     action: Optional[str] = None,
     entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
     user_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    previous_status: Optional[str] = None,
+    new_status: Optional[str] = None,
+    vacation_type: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
+    audit_repo: DBAuditLogRepository = Depends(get_audit_log_repo),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get audit logs (admin only).
+    Get audit logs (admin only), newest first.
 
     Query parameters:
     - limit: Maximum number of logs to return (default: 100, max: 1000)
-    - offset: Number of logs to skip (for pagination)
+    - cursor: next_cursor from the previous page (keyset paging; every page costs the same)
+    - offset: Number of logs to skip (legacy paging, ignored with a cursor)
+    - count: "capped" (default: count up to AUDIT_LOG_COUNT_CAP), "exact" or "none"
     - action: Filter by action type (e.g., "leave_request_approved")
     - entity_type: Filter by entity type (e.g., "leave_request")
+    - entity_id: Filter by entity ID
     - user_id: Filter by user UUID
-    - start_date: Filter logs after this date (YYYY-MM-DD)
+    - employee_id, previous_status, new_status, vacation_type: Filter by these
+      details values (indexed columns, e.g. new_status=Approved&employee_id=IAU-123)
+    - start_date: Filter logs after this date (YYYY-MM-DD); archived months are
+      searched too when it is omitted or predates the hot retention period
+      (offset paging is then rejected)
     - end_date: Filter logs before this date (YYYY-MM-DD)
 
     Returns:
-    - total: Total number of logs matching filters
+    - total: Number of logs matching filters (None with count=none)
+    - total_capped: True if more than AUDIT_LOG_COUNT_CAP logs match (total is then the cap)
+    - next_cursor: Cursor of the next page, None on the last page
     - logs: List of audit log entries
 
     Example: GET /api/admin/audit-logs?action=leave_request_approved&limit=50
     """
-    from .database import AuditLogModel
-    import json
-
     # Authorization: Admin only
     if current_user.role != "admin":
         raise HTTPException(
@@ -1241,71 +1478,213 @@ def get_audit_logs(
             detail="Access denied. Admin role required to view audit logs."
         )
 
-    # Validate limit
-    if limit > 1000:
-        limit = 1000
-
-    # Build query
-    query = db.query(AuditLogModel)
+    limit = clamp_limit(limit, 1000)
+    if count not in ("capped", "exact", "none"):
+        raise HTTPException(status_code=400, detail="count must be one of: capped, exact, none")
 
-    # Apply filters
-    if action:
-        query = query.filter(AuditLogModel.action == action)
+    filters = _parse_audit_filters(action, entity_type, user_id, start_date, end_date, entity_id,
+                                   employee_id, previous_status, new_status, vacation_type)
 
-    if entity_type:
-        query = query.filter(AuditLogModel.entity_type == entity_type)
-
-    if user_id:
-        try:
-            from uuid import UUID
-            user_uuid = UUID(user_id)
-            query = query.filter(AuditLogModel.user_id == user_uuid)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid user_id format")
-
-    if start_date:
-        try:
-            start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-            query = query.filter(AuditLogModel.timestamp >= start_datetime)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid start_date format. Use YYYY-MM-DD")
+    try:
+        after = decode_audit_cursor(cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    if end_date:
-        try:
-            end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
-            # Add 1 day to include the entire end_date
-            end_datetime = end_datetime + timedelta(days=1)
-            query = query.filter(AuditLogModel.timestamp < end_datetime)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid end_date format. Use YYYY-MM-DD")
+    # Include entries still waiting in the audit buffer
+    audit_writer.flush()
 
-    # Get total count
-    total = query.count()
+    # Entries past the hot retention period are in the archive segments, all
+    # older than any row still in the table; read them unless start_date is more recent
+    include_archive = audit_archive.reaches(filters.get("start"))
+    if include_archive and offset and after is None:
+        raise HTTPException(
+            status_code=400,
+            detail="offset paging does not cover archived audit logs; use cursor (next_cursor), "
+                   "or a start_date within the retention period"
+        )
 
-    # Get paginated logs
-    logs = query.order_by(
-        AuditLogModel.timestamp.desc()
-    ).offset(offset).limit(limit).all()
+    # One extra row tells whether another page exists
+    rows = audit_repo.search(after=after, limit=limit + 1, offset=0 if after else offset, **filters)
+    if include_archive and len(rows) <= limit:
+        rows += audit_archive.search(after=after, limit=limit + 1 - len(rows), **filters)
+    logs = rows[:limit]
+    next_cursor = encode_audit_cursor(logs[-1]) if len(rows) > limit else None
+
+    total, total_capped = None, False
+    if count != "none":
+        cap = AUDIT_LOG_COUNT_CAP if count == "capped" else None
+        total = audit_repo.count(cap=cap, **filters)
+        if include_archive and (cap is None or total <= cap):
+            total += audit_archive.count(cap=cap - total if cap is not None else None, **filters)
+        if cap is not None:
+            total_capped = total > cap
+            total = min(total, cap)
 
     # Format response
     return {
         "total": total,
+        "total_capped": total_capped,
         "limit": limit,
         "offset": offset,
-        "logs": [
-            {
-                "id": str(log.id),
-                "timestamp": log.timestamp.isoformat(),
-                "user_id": str(log.user_id) if log.user_id else None,
-                "user_email": log.user_email,
-                "action": log.action,
-                "entity_type": log.entity_type,
-                "entity_id": log.entity_id,
-                "details": json.loads(log.details) if log.details else None,
-                "ip_address": log.ip_address,
-                "user_agent": log.user_agent
-            }
-            for log in logs
-        ]
+        "next_cursor": next_cursor,
+        "includes_archive": include_archive,
+        "logs": [audit_log_to_dict(log) for log in logs]
+    }
+
+
+@app.get("/api/admin/audit-logs/clients")
+def get_audit_clients(
+    by: str = "user_agent",
+    action: Optional[str] = "user_login",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 20,
+    audit_repo: DBAuditLogRepository = Depends(get_audit_log_repo),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Audit entries per client (admin only), most frequent first.
+
+    Query parameters:
+    - by: "user_agent" (default) or "ip_address"
+    - action: Action to count (default: "user_login", i.e. logins by client)
+    - start_date, end_date: Date range (YYYY-MM-DD)
+    - limit: Number of clients to return (default: 20, max: 1000)
+
+    Example: GET /api/admin/audit-logs/clients?by=ip_address&start_date=2025-01-01
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied. Admin role required to view audit logs."
+        )
+    if by not in ("user_agent", "ip_address"):
+        raise HTTPException(status_code=400, detail="by must be one of: user_agent, ip_address")
+
+    filters = _parse_audit_filters(action, None, None, start_date, end_date)
+    audit_writer.flush()
+    clients = audit_repo.count_by_client(by=by, limit=clamp_limit(limit, 1000), **filters)
+    return {
+        "by": by,
+        "clients": [{"value": value, "count": count} for value, count in clients]
     }
 
+
+@app.get("/api/admin/audit-logs/timeline/{entity_type}/{entity_id}")
+def get_audit_timeline(
+    entity_type: str,
+    entity_id: str,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    audit_repo: DBAuditLogRepository = Depends(get_audit_log_repo),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    History of one entity (admin only), oldest first.
+
+    For example /api/admin/audit-logs/timeline/leave_request/42 lists every
+    action on leave request 42; for an employee the timeline also includes
+    the actions on their records (leave requests they filed, approvals).
+    Archived entries are included.
+
+    Query parameters:
+    - limit: Maximum number of events to return (default: 100, max: 1000)
+    - cursor: next_cursor from the previous page
+
+    Returns:
+    - next_cursor: Cursor of the next page, None on the last page
+    - events: Audit log entries in time order
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied. Admin role required to view audit logs."
+        )
+
+    limit = clamp_limit(limit, 1000)
+    try:
+        after = decode_audit_cursor(cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    audit_writer.flush()
+    # Archived entries are older than any row in the table, so they come first
+    rows = audit_archive.timeline(entity_type, entity_id, after=after, limit=limit + 1)
+    if len(rows) <= limit:
+        rows += audit_repo.timeline(entity_type, entity_id, after=after, limit=limit + 1 - len(rows))
+    events = rows[:limit]
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "next_cursor": encode_audit_cursor(events[-1]) if len(rows) > limit else None,
+        "events": [audit_log_to_dict(log) for log in events]
+    }
+
+
+def _stream_audit_export(filters: dict, export_format: str):
+    """Archived then current entries, oldest first, on a session of its own (outlives the request)."""
+    db = SessionLocal()
+    try:
+        # The archive skips segments outside the filters by their index, so an
+        # export is always complete whatever its date range
+        logs = itertools.chain(audit_archive.stream(**filters), DBAuditLogRepository(db).stream(**filters))
+        yield from iter_audit_export(logs, export_format)
+    finally:
+        db.close()
+
+
+@app.get("/api/admin/audit-logs/export")
+def export_audit_logs(
+    request: Request,
+    format: str = "ndjson",
+    action: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    previous_status: Optional[str] = None,
+    new_status: Optional[str] = None,
+    vacation_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Export every matching audit log entry (admin only), oldest first.
+
+    Takes the filters of GET /api/admin/audit-logs plus format ("ndjson" or
+    "csv"). Rows are streamed as they are read, so memory use is the same
+    for any export size. Archived months in the date range (all of them
+    without start_date) are included.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied. Admin role required to export audit logs."
+        )
+    if format not in AUDIT_EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be one of: ndjson, csv")
+
+    filters = _parse_audit_filters(action, entity_type, user_id, start_date, end_date, entity_id,
+                                   employee_id, previous_status, new_status, vacation_type)
+
+    log_audit(
+        db=db,
+        action=ACTION_AUDIT_LOG_EXPORTED,
+        entity_type=ENTITY_TYPE_SYSTEM,
+        entity_id="audit_logs",
+        user=current_user,
+        details={"format": format, **{key: str(value) for key, value in filters.items() if value is not None}},
+        request=request
+    )
+    # Include entries still waiting in the audit buffer
+    audit_writer.flush()
+
+    filename = f"audit_logs_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        _stream_audit_export(filters, format),
+        media_type=AUDIT_EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
@@ -0,0 +1,299 @@
+"""
+Database Migration: Typed DATE Columns and Composite Indexes
+
+Converts the YYYY-MM-DD string columns to native DATE columns:
+- employees.start_date
+- leave_requests.start_date, end_date, approval_date
+- attendance_logs.date
+- leave_balances.period_start, period_end, earned_as_of
+
+and creates the indexes declared on the models, including
+- ix_leave_requests_employee_status_start (employee_id, status, start_date)
+- ux_attendance_logs_employee_date (employee_id, date), unique
+
+On PostgreSQL each column is converted through a shadow column that is
+backfilled in batches (one short transaction per batch), so large tables are
+never locked by a single full-table rewrite. The conversion is resumable:
+re-running picks up from the rows that are still unconverted. Dropping the
+text column drops the unique constraints on it, so those are recreated
+afterwards (e.g. uq_leave_balances_employee_period).
+
+Before anything is converted, every text column is checked for values that
+would not convert (not a YYYY-MM-DD date, or missing in a NOT NULL column).
+If there are any, they are reported with [ERROR] and the migration aborts
+without changing the schema; fix or clear them and re-run.
+
+SQLite stores DATE values as 'YYYY-MM-DD' text already, so only the indexes
+are created there.
+
+Runs automatically at startup (see database._run_migrations), or manually:
+    python backend/migrations/convert_date_columns.py
+    python backend/migrations/convert_date_columns.py --rollback
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.database import engine, Base, SessionLocal, AttendanceLogModel
+from sqlalchemy import inspect, text, func, bindparam, UniqueConstraint
+from sqlalchemy.schema import AddConstraint
+
+# (table, column, primary key, nullable)
+DATE_COLUMNS = [
+    ("employees", "start_date", "id", False),
+    ("leave_requests", "start_date", "id", False),
+    ("leave_requests", "end_date", "id", False),
+    ("leave_requests", "approval_date", "id", True),
+    ("attendance_logs", "date", "id", False),
+    ("leave_balances", "period_start", "id", False),
+    ("leave_balances", "period_end", "id", False),
+    ("leave_balances", "earned_as_of", "id", False),
+]
+
+BATCH_SIZE = 5000
+
+
+def _column_types(table_name: str) -> dict:
+    inspector = inspect(engine)
+    if table_name not in inspector.get_table_names():
+        return {}
+    return {col['name']: str(col['type']).upper() for col in inspector.get_columns(table_name)}
+
+
+def needs_conversion() -> bool:
+    """True if any date column is still stored as text (PostgreSQL only)."""
+    if engine.dialect.name != "postgresql":
+        return False
+    for table, column, _, _ in DATE_COLUMNS:
+        column_type = _column_types(table).get(column)
+        if column_type and column_type != "DATE":
+            return True
+    return False
+
+
+class UnconvertibleDatesError(Exception):
+    """Text date values that cannot be converted to DATE"""
+
+
+def _parses(value) -> bool:
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def find_unconvertible(table: str, column: str, nullable: bool) -> tuple:
+    """
+    Values of a text date column that would not convert.
+
+    Returns:
+        (number of rows, up to 5 of the offending values)
+    """
+    with engine.connect() as conn:
+        values = [row[0] for row in conn.execute(text(f'SELECT DISTINCT "{column}" FROM {table}'))]
+        bad = [v for v in values if v not in (None, '') and not _parses(v)]
+        missing = not nullable and (None in values or '' in values)
+        if not bad and not missing:
+            return 0, []
+        conditions = []
+        if bad:
+            conditions.append(f'"{column}" IN :bad')
+        if missing:
+            conditions.append(f'"{column}" IS NULL OR "{column}" = \'\'')
+        query = text(f'SELECT COUNT(*) FROM {table} WHERE {" OR ".join(conditions)}')
+        params = {}
+        if bad:
+            query = query.bindparams(bindparam("bad", expanding=True))
+            params["bad"] = bad
+        count = conn.execute(query, params).scalar()
+    return count, (bad + ([None] if missing else []))[:5]
+
+
+def check_convertible():
+    """
+    Report every text date value that would not convert, with [ERROR].
+
+    Raises:
+        UnconvertibleDatesError: If there are any (nothing has been changed yet)
+    """
+    problems = []
+    for table, column, _, nullable in DATE_COLUMNS:
+        column_type = _column_types(table).get(column)
+        if not column_type or column_type == "DATE":
+            continue
+        count, sample = find_unconvertible(table, column, nullable)
+        if count:
+            problems.append(f"{table}.{column}")
+            print(f"[ERROR] {table}.{column}: {count} rows cannot be converted to DATE (e.g. {sample})")
+    if problems:
+        raise UnconvertibleDatesError(
+            f"Unconvertible date values in {', '.join(problems)}; fix or clear them and re-run the migration"
+        )
+
+
+def _convert_column(table: str, column: str, pk: str, nullable: bool, batch_size: int):
+    """Convert one text column to DATE via a batched shadow-column backfill."""
+    shadow = f"{column}__date"
+    types = _column_types(table)
+    if types.get(column) == "DATE" and shadow not in types:
+        print(f"[OK] {table}.{column} is already DATE")
+        return
+
+    with engine.begin() as conn:
+        if shadow not in types:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN "{shadow}" DATE'))
+
+    converted = 0
+    while True:
+        # Each batch is its own short transaction
+        with engine.begin() as conn:
+            result = conn.execute(text(
+                f'UPDATE {table} SET "{shadow}" = TO_DATE("{column}", \'YYYY-MM-DD\') '
+                f'WHERE {pk} IN ('
+                f'  SELECT {pk} FROM {table} '
+                f'  WHERE "{shadow}" IS NULL AND "{column}" IS NOT NULL AND "{column}" <> \'\' '
+                f'  LIMIT :batch_size'
+                f')'
+            ), {"batch_size": batch_size})
+        if result.rowcount == 0:
+            break
+        converted += result.rowcount
+        print(f"  {table}.{column}: {converted} rows converted")
+
+    # Never drop the text column while a value in it is not converted
+    missing = f' OR "{column}" IS NULL OR "{column}" = \'\'' if not nullable else ''
+    with engine.connect() as conn:
+        unconverted = conn.execute(text(
+            f'SELECT COUNT(*) FROM {table} WHERE "{shadow}" IS NULL AND '
+            f'(("{column}" IS NOT NULL AND "{column}" <> \'\'){missing})'
+        )).scalar()
+    if unconverted:
+        print(f"[ERROR] {table}.{column}: {unconverted} rows were not converted; the text column is kept")
+        raise UnconvertibleDatesError(f"{unconverted} unconverted rows in {table}.{column}")
+
+    with engine.begin() as conn:
+        conn.execute(text(f'ALTER TABLE {table} DROP COLUMN "{column}"'))
+        conn.execute(text(f'ALTER TABLE {table} RENAME COLUMN "{shadow}" TO "{column}"'))
+        if not nullable:
+            conn.execute(text(f'ALTER TABLE {table} ALTER COLUMN "{column}" SET NOT NULL'))
+    print(f"[OK] Converted {table}.{column} to DATE ({converted} rows)")
+
+
+def dedupe_attendance_logs():
+    """Keep the earliest check-in per (employee_id, date) so the unique index can be created."""
+    db = SessionLocal()
+    try:
+        duplicates = db.query(AttendanceLogModel.employee_id, AttendanceLogModel.date).group_by(
+            AttendanceLogModel.employee_id, AttendanceLogModel.date
+        ).having(func.count(AttendanceLogModel.id) > 1).all()
+
+        removed = 0
+        for employee_id, log_date in duplicates:
+            logs = db.query(AttendanceLogModel).filter(
+                AttendanceLogModel.employee_id == employee_id,
+                AttendanceLogModel.date == log_date
+            ).order_by(AttendanceLogModel.check_in).all()
+            for log in logs[1:]:
+                db.delete(log)
+                removed += 1
+        db.commit()
+        if removed:
+            print(f"[OK] Removed {removed} duplicate attendance records")
+    finally:
+        db.close()
+
+
+def ensure_indexes():
+    """Create any index declared on the models that is missing from the database."""
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {idx['name'] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.name == 'ux_attendance_logs_employee_date':
+                dedupe_attendance_logs()
+            print(f"[MIGRATION] Creating index {index.name} on {table.name}...")
+            index.create(bind=engine, checkfirst=True)
+
+
+def ensure_unique_constraints():
+    """Create any named unique constraint declared on the models that is missing from the database."""
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {uc['name'] for uc in inspector.get_unique_constraints(table.name)}
+        for constraint in table.constraints:
+            if not isinstance(constraint, UniqueConstraint) or not constraint.name or constraint.name in existing:
+                continue
+            print(f"[MIGRATION] Creating unique constraint {constraint.name} on {table.name}...")
+            with engine.begin() as conn:
+                conn.execute(AddConstraint(constraint))
+
+
+def upgrade(batch_size: int = BATCH_SIZE):
+    """
+    Convert date columns to DATE and create the composite indexes.
+
+    Safe to run multiple times.
+
+    Raises:
+        UnconvertibleDatesError: If a text date value cannot be converted
+    """
+    print("=" * 60)
+    print("IAU Portal - Typed DATE Columns Migration")
+    print("=" * 60)
+
+    if engine.dialect.name == "postgresql":
+        check_convertible()
+        for table, column, pk, nullable in DATE_COLUMNS:
+            if _column_types(table):
+                _convert_column(table, column, pk, nullable, batch_size)
+        ensure_unique_constraints()
+    else:
+        print(f"[OK] {engine.dialect.name}: dates are stored as ISO text - no conversion needed")
+
+    ensure_indexes()
+    print("Migration completed successfully!")
+
+
+def downgrade():
+    """Convert DATE columns back to VARCHAR(10) and drop the composite indexes."""
+    print("=" * 60)
+    print("IAU Portal - Rollback Typed DATE Columns")
+    print("=" * 60)
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_leave_requests_employee_status_start"))
+        conn.execute(text("DROP INDEX IF EXISTS ux_attendance_logs_employee_date"))
+
+    if engine.dialect.name == "postgresql":
+        for table, column, _, _ in DATE_COLUMNS:
+            if _column_types(table).get(column) == "DATE":
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f'ALTER TABLE {table} ALTER COLUMN "{column}" TYPE VARCHAR(10) '
+                        f'USING TO_CHAR("{column}", \'YYYY-MM-DD\')'
+                    ))
+                print(f"[OK] Reverted {table}.{column} to VARCHAR(10)")
+
+    print("Rollback completed")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--rollback":
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,91 @@
+"""
+Database Migration: Indexed Audit Detail Columns
+
+Adds the audit_logs columns that hold copies of the commonly queried details
+keys (see audit.AUDIT_DETAIL_COLUMNS):
+- employee_id, previous_status, new_status, vacation_type
+
+and fills them for existing entries by parsing their details JSON, in
+batches of one short transaction each. New entries get the values when they
+are written. The indexes declared on AuditLogModel are created afterwards by
+convert_date_columns.ensure_indexes.
+
+Runs automatically at startup when the columns are missing (see
+database._run_migrations). The backfill is idempotent, so if it was
+interrupted, finish it manually:
+    python backend/migrations/extract_audit_details.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.audit import AUDIT_DETAIL_COLUMNS, extract_detail_fields
+from backend.database import engine, SessionLocal, AuditLogModel
+from sqlalchemy import inspect, text, update
+
+BATCH_SIZE = 1000
+
+
+def _missing_columns() -> list:
+    inspector = inspect(engine)
+    if 'audit_logs' not in inspector.get_table_names():
+        return []
+    existing = {col['name'] for col in inspector.get_columns('audit_logs')}
+    return [column for column in AUDIT_DETAIL_COLUMNS if column not in existing]
+
+
+def needs_upgrade() -> bool:
+    return bool(_missing_columns())
+
+
+def upgrade(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Add the detail columns and backfill them from details.
+
+    Returns:
+        Number of entries that got at least one value
+    """
+    for column in _missing_columns():
+        print(f"[MIGRATION] Adding {column} column to audit_logs table...")
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE audit_logs ADD COLUMN {column} VARCHAR({AUDIT_DETAIL_COLUMNS[column]})"))
+
+    updated = 0
+    last_id = None
+    db = SessionLocal()
+    try:
+        while True:
+            # Each batch is its own short transaction
+            query = db.query(AuditLogModel.id, AuditLogModel.details).filter(AuditLogModel.details.isnot(None))
+            if last_id is not None:
+                query = query.filter(AuditLogModel.id > last_id)
+            batch = query.order_by(AuditLogModel.id).limit(batch_size).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            values = []
+            for log_id, details in batch:
+                try:
+                    fields = extract_detail_fields(json.loads(details))
+                except ValueError:
+                    continue
+                if any(value is not None for value in fields.values()):
+                    values.append({"id": log_id, **fields})
+            if values:
+                db.execute(update(AuditLogModel), values)
+            db.commit()
+            updated += len(values)
+    finally:
+        db.close()
+
+    print(f"[OK] Audit detail columns backfilled for {updated} entries")
+    return updated
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,103 @@
+"""
+Database Migration: Import sent_notifications.json
+
+The contract notification scheduler used to deduplicate its emails with a
+JSON file (backend/data/sent_notifications.json) mapping
+"{employee_id}_{notification_type}_{contract_end_date}" to the date sent.
+That tracking now lives in the sent_notifications table.
+
+This migration copies the file's entries into the table and renames the file
+to sent_notifications.json.imported, so it only ever runs once. Entries that
+are already in the table are skipped; malformed entries are reported and
+skipped.
+
+Runs automatically at startup (see database._run_migrations), or manually:
+    python backend/migrations/import_sent_notifications.py
+"""
+
+import json
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Optional, Tuple
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.database import SentNotificationModel, SessionLocal, engine
+
+LEGACY_TRACKING_FILE = Path("backend/data/sent_notifications.json")
+NOTIFICATION_TYPES = ('40_days', 'critical')
+
+
+def parse_key(key: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Split a tracking key into (employee_id, notification_type, contract_end_date).
+
+    Employee IDs may contain underscores, so the key is parsed from the right.
+    Returns None for keys that do not match the format.
+    """
+    rest, _, contract_end = key.rpartition('_')
+    for notification_type in NOTIFICATION_TYPES:
+        suffix = f"_{notification_type}"
+        if rest.endswith(suffix) and len(rest) > len(suffix):
+            try:
+                date.fromisoformat(contract_end)
+            except ValueError:
+                return None
+            return rest[:-len(suffix)], notification_type, contract_end
+    return None
+
+
+def upgrade(path: Path = LEGACY_TRACKING_FILE) -> int:
+    """
+    Import the JSON tracking file into sent_notifications.
+
+    Returns:
+        Number of rows inserted
+    """
+    from backend.db_repositories import DBSentNotificationRepository
+
+    print("=" * 60)
+    print("IAU Portal - Import Sent Notifications")
+    print("=" * 60)
+
+    if not path.exists():
+        print(f"[OK] {path} not found - nothing to import")
+        return 0
+
+    try:
+        with open(path, 'r') as f:
+            tracking_data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Could not read {path}: {e}")
+        return 0
+
+    SentNotificationModel.__table__.create(engine, checkfirst=True)
+
+    rows, skipped = [], 0
+    for key, sent_on in tracking_data.items():
+        parsed = parse_key(key)
+        try:
+            sent_on = date.fromisoformat(sent_on).isoformat()
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is None:
+            skipped += 1
+            continue
+        rows.append((*parsed, sent_on))
+
+    db = SessionLocal()
+    try:
+        inserted = DBSentNotificationRepository(db).add_many(rows)
+    finally:
+        db.close()
+
+    path.rename(path.with_name(path.name + '.imported'))
+    print(f"[OK] Imported {inserted} of {len(tracking_data)} entries ({skipped} malformed)")
+    print(f"[OK] Renamed {path.name} to {path.name}.imported")
+    return inserted
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,65 @@
+"""
+Database Migration: Interned Audit IP Addresses and User Agents
+
+Adds audit_logs.ip_address_id and audit_logs.user_agent_id, which reference
+the audit_ip_addresses and audit_user_agents lookup tables (see
+backend.audit_lookups), and moves the values of existing entries there: each
+distinct value is interned once, the entries get its id, and their
+ip_address/user_agent text is cleared.
+
+Entries are processed in batches of one short transaction each. A processed
+entry has no text values left, so an interrupted run resumes where it
+stopped. On PostgreSQL, run VACUUM on audit_logs afterwards to reclaim the
+space.
+
+Runs automatically at startup when the columns are missing (see
+database._run_migrations), or manually:
+    python backend/migrations/intern_audit_client_values.py
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.audit_lookups import intern_stored_values
+from backend.database import engine
+from sqlalchemy import inspect, text
+
+BATCH_SIZE = 1000
+LOOKUP_COLUMNS = ("ip_address_id", "user_agent_id")
+
+
+def _missing_columns() -> list:
+    inspector = inspect(engine)
+    if 'audit_logs' not in inspector.get_table_names():
+        return []
+    existing = {col['name'] for col in inspector.get_columns('audit_logs')}
+    return [column for column in LOOKUP_COLUMNS if column not in existing]
+
+
+def needs_upgrade() -> bool:
+    return bool(_missing_columns())
+
+
+def upgrade(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Add the lookup id columns and intern the values of existing entries.
+
+    Returns:
+        Number of entries converted
+    """
+    for column in _missing_columns():
+        table = "audit_ip_addresses" if column == "ip_address_id" else "audit_user_agents"
+        print(f"[MIGRATION] Adding {column} column to audit_logs table...")
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE audit_logs ADD COLUMN {column} INTEGER REFERENCES {table}(id)"))
+
+    converted = intern_stored_values(batch_size)
+    print(f"[OK] Interned the IP addresses and user agents of {converted} entries")
+    return converted
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from uuid import UUID, uuid4
 from datetime import datetime
 
@@ -31,6 +31,7 @@ class Employee(BaseModel):
     signature_path: Optional[str] = None
     contract_auto_renewed: Optional[bool] = False
     employee_type: str = 'contractor'  # 'permanent' or 'contractor'
+    notification_preference: str = 'immediate'  # 'immediate' or 'digest' (new request emails as a manager)
 
 class EmployeeWithBalance(Employee):
     vacation_balance: float
@@ -41,6 +42,59 @@ class EmployeeWithBalance(Employee):
     contract_auto_renewed: Optional[bool] = False  # True if contract was auto-renewed and needs verification
     carry_over_balance: Optional[float] = None  # Only for permanent employees
 
+class LeaveBalance(BaseModel):
+    """Ledger entry: balance components for one employee and contract period."""
+    employee_id: str
+    employee_type: str
+    period_start: str  # YYYY-MM-DD
+    period_end: str  # YYYY-MM-DD
+    earned_days: float
+    earned_as_of: str  # YYYY-MM-DD
+    used_days: float
+    carry_over_days: float = 0.0
+
+class ContractNotificationDue(BaseModel):
+    """A planned contract notification (see backend.notification_queue)."""
+    id: Optional[int] = None
+    employee_id: str
+    notification_type: str  # '40_days', 'critical', 'replan'
+    due_date: str  # YYYY-MM-DD
+    contract_end_date: str  # YYYY-MM-DD
+
+class NotificationRun(BaseModel):
+    """Statistics of one contract notification scheduler run."""
+    id: Optional[int] = None
+    started_at: datetime
+    duration_seconds: float
+    due: int = 0
+    planned: int = 0
+    sent: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+
+class ScheduledJobState(BaseModel):
+    """Last run of an in-app scheduled job (see backend.app_scheduler)."""
+    name: str
+    last_run_date: Optional[str] = None  # YYYY-MM-DD
+    last_owner: Optional[str] = None
+    last_started_at: Optional[datetime] = None
+    last_finished_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+class OutboxMessage(BaseModel):
+    """A queued notification email (see backend.email_outbox)."""
+    id: int
+    to_email: str
+    subject: str
+    body: str
+    is_html: bool = True
+    status: str = 'pending'  # 'pending', 'sent', 'failed'
+    attempts: int = 0
+    next_attempt_at: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+
 class AttendanceLog(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     employee_id: str
@@ -63,6 +117,47 @@ class LeaveRequest(BaseModel):
     balance_used: int
     attachments: List[str] = Field(default_factory=list) # List of file paths
 
+class ApprovalConflict(BaseModel):
+    """An approved request of another team member overlapping a pending one."""
+    request_id: int
+    employee_id: str
+    employee_name_en: Optional[str] = None
+    employee_name_ar: Optional[str] = None
+    vacation_type: str
+    start_date: str
+    end_date: str
+
+class PendingApproval(LeaveRequest):
+    employee_name_en: Optional[str] = None
+    employee_name_ar: Optional[str] = None
+    position_en: Optional[str] = None
+    position_ar: Optional[str] = None
+    vacation_balance: Optional[float] = None
+    exceeds_balance: bool = False  # Annual request longer than the requester's balance
+    conflicts: List[ApprovalConflict] = Field(default_factory=list)
+
+class PendingApprovalsPage(BaseModel):
+    items: List[PendingApproval]
+    total: int  # Pending requests in scope, across all pages
+    counts_by_type: Dict[str, int]
+    next_cursor: Optional[str] = None
+
+class BulkDecisionRequest(BaseModel):
+    request_ids: List[int]
+    status: str  # 'Approved' or 'Rejected'
+    rejection_reason: Optional[str] = None
+
+class BulkDecisionItem(BaseModel):
+    request_id: int
+    success: bool
+    status: Optional[str] = None  # Status after the call (current status when skipped)
+    error: Optional[str] = None
+
+class BulkDecisionResult(BaseModel):
+    results: List[BulkDecisionItem]
+    succeeded: int
+    failed: int
+
 class Unit(BaseModel):
     id: int
     name_en: str
@@ -129,6 +224,7 @@ class EmployeeUpdate(BaseModel):
     role: Optional[str] = None
     contract_auto_renewed: Optional[bool] = None
     employee_type: Optional[str] = None  # 'permanent' or 'contractor'
+    notification_preference: Optional[str] = None  # 'immediate' or 'digest'
 
 class UserPasswordUpdate(BaseModel):
     current_password: str
@@ -198,6 +294,11 @@ class AuditLog(BaseModel):
     details: Optional[str] = None  # JSON string with additional context
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
+    # Indexed copies of common details keys
+    employee_id: Optional[str] = None
+    previous_status: Optional[str] = None
+    new_status: Optional[str] = None
+    vacation_type: Optional[str] = None
 
 class AuditLogCreate(BaseModel):
     """Request model for creating audit log entries (rarely used directly)."""
@@ -210,6 +311,11 @@ class AuditLogCreate(BaseModel):
 class PortalSettings(BaseModel):
     id: int = 1
     max_carry_over_days: int = 15
+    digest_window_minutes: int = 60
 
 class PortalSettingsUpdate(BaseModel):
     max_carry_over_days: Optional[int] = None
+    digest_window_minutes: Optional[int] = None
+
+class NotificationPreferenceUpdate(BaseModel):
+    notification_preference: str  # 'immediate' or 'digest'
@@ -0,0 +1,116 @@
+"""
+Manager Digest Emails
+
+Managers whose notification_preference is 'digest' do not get one
+"New Leave Request" email per request. Each new request is recorded in
+notification_digest_items instead, and once a manager's oldest item is older
+than the portal's digest window (PortalSettings.digest_window_minutes) all of
+their items are rendered into a single bilingual digest email and queued in
+the email outbox.
+
+Requests that were already approved or rejected by the time the digest is
+built are left out; if none remain, no email is sent.
+
+flush_due_digests runs periodically inside the outbox worker
+(see backend.email_outbox.OutboxWorker) of every API worker; items are
+claimed with a conditional UPDATE, so each is sent by one worker only.
+Handled items are purged daily by the digest_purge job (see
+backend.app_scheduler).
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from .db_repositories import (
+    DBEmployeeRepository, DBLeaveRequestRepository, DBPortalSettingsRepository,
+    DBNotificationDigestRepository, DBEmailOutboxRepository
+)
+from .email_templates import render_leave_request_digest_email
+
+logger = logging.getLogger(__name__)
+
+
+def flush_due_digests(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Queue digest emails for every manager whose window has elapsed.
+
+    Each manager's email and the digested items are committed together.
+
+    Returns:
+        int: Number of digest emails queued
+    """
+    now = now or datetime.utcnow()
+    window = DBPortalSettingsRepository(db).get().digest_window_minutes
+    digest_repo = DBNotificationDigestRepository(db)
+    outbox = DBEmailOutboxRepository(db)
+    leave_request_repo = DBLeaveRequestRepository(db)
+    employee_repo = DBEmployeeRepository(db)
+
+    queued = 0
+    for manager_id in digest_repo.get_due_manager_ids(now - timedelta(minutes=window)):
+        # Every API worker runs this; claim the items first so only one worker sends them
+        items = digest_repo.get_pending_request_ids(manager_id)
+        claimed = digest_repo.claim([item_id for item_id, _ in items], now)
+        items = [(item_id, request_id) for item_id, request_id in items if item_id in claimed]
+        if not items:
+            db.rollback()
+            continue
+        requests = {r.id: r for r in leave_request_repo.get_by_ids([request_id for _, request_id in items])}
+        pending = [
+            requests[request_id] for _, request_id in items
+            if request_id in requests and requests[request_id].status == 'Pending'
+        ]
+
+        manager, manager_user = employee_repo.get_by_id_with_user(manager_id)
+        if pending and manager and manager_user and manager_user.email:
+            employees = {
+                emp.id: emp for emp, _ in employee_repo.get_by_ids_with_users(list({r.employee_id for r in pending}))
+            }
+            data = {
+                'manager_name_ar': f"{manager.first_name_ar} {manager.last_name_ar}",
+                'manager_name_en': f"{manager.first_name_en} {manager.last_name_en}",
+                'items': [
+                    {
+                        'employee_name_ar': f"{employees[r.employee_id].first_name_ar} {employees[r.employee_id].last_name_ar}",
+                        'employee_name_en': f"{employees[r.employee_id].first_name_en} {employees[r.employee_id].last_name_en}",
+                        'employee_id': r.employee_id,
+                        'vacation_type': r.vacation_type,
+                        'start_date': r.start_date,
+                        'end_date': r.end_date,
+                        'duration': r.duration
+                    }
+                    for r in pending if r.employee_id in employees
+                ]
+            }
+            outbox.enqueue(
+                manager_user.email,
+                f"Pending Leave Requests ({len(data['items'])}) / طلبات إجازة بانتظار الموافقة",
+                render_leave_request_digest_email(data)
+            )
+            queued += 1
+            logger.info(f"Digest of {len(data['items'])} request(s) queued for manager {manager_id}")
+
+        db.commit()
+
+    return queued
+
+
+def purge_old_digest_items(days: Optional[int] = None) -> int:
+    """
+    Daily job: delete digest items handled more than `days` ago
+    (default DIGEST_RETENTION_DAYS, 30).
+    """
+    from .database import SessionLocal
+
+    days = days or int(os.getenv("DIGEST_RETENTION_DAYS", "30"))
+    db = SessionLocal()
+    try:
+        removed = DBNotificationDigestRepository(db).purge_digested(datetime.utcnow() - timedelta(days=days))
+        logger.info(f"Purged {removed} digest items handled more than {days} days ago")
+        return removed
+    finally:
+        db.close()
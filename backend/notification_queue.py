@@ -0,0 +1,160 @@
+"""
+Contract Notification Due-Date Queue
+
+Instead of computing every employee's balance each morning to find the few
+contractors who need a contract end notification, the notifications are
+planned ahead into the contract_notification_queue table:
+
+- '40_days':  contract end - 40 days
+- 'critical': the first day on which the vacation balance is about equal to
+              the days left in the contract (see is_critical)
+- 'replan':   the first day of the next contract period, so the next
+              period's rows get planned even if nothing else changes
+
+Rows are computed from the employee's leave balance ledger entry and are
+replaced whenever BalanceLedger recomputes that entry, i.e. when an
+employee's start date, type or accrual changes or a leave request moves
+into or out of 'Approved'. The daily job in notification_scheduler then only
+reads the rows due today.
+
+Usage:
+    python -m backend.notification_queue rebuild   # Replan every employee
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .models import Employee, LeaveBalance, ContractNotificationDue
+from .calculation import calculate_contract_earned
+
+NOTIFICATION_40_DAYS = '40_days'
+NOTIFICATION_CRITICAL = 'critical'
+NOTIFICATION_REPLAN = 'replan'
+
+REMINDER_DAYS_BEFORE_END = 40
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def is_critical(vacation_balance: float, days_remaining: int) -> bool:
+    """Balance equals the days left in the contract (+-1 day tolerance)."""
+    return (
+        abs(vacation_balance - days_remaining) <= 1
+        and 0 < days_remaining <= vacation_balance + 1
+    )
+
+
+def _first_critical_day(employee: Employee, entry: LeaveBalance, period_start: date,
+                        period_end: date, first_day: date) -> Optional[date]:
+    """
+    Scan the rest of the contract period for the first critical day.
+
+    The balance is computed like BalanceLedger.balance_from_entry. Accrual only
+    changes with the month and on the 16th, so earned days are computed once
+    per half month.
+    """
+    emp_start_date = _parse_date(employee.start_date)
+    earned_by_half_month: Dict[Tuple[int, int, bool], float] = {}
+
+    day = first_day
+    while day < period_end:
+        if emp_start_date > day:
+            balance = 0.0
+        else:
+            key = (day.year, day.month, day.day > 15)
+            if key not in earned_by_half_month:
+                earned_by_half_month[key] = calculate_contract_earned(employee, period_start, day)
+            balance = round(max(0.0, earned_by_half_month[key] - entry.used_days), 2)
+
+        if is_critical(balance, (period_end - day).days):
+            return day
+        day += timedelta(days=1)
+    return None
+
+
+def plan_contract_notifications(employee: Employee, entry: LeaveBalance,
+                                today: Optional[date] = None) -> List[ContractNotificationDue]:
+    """
+    Plan the notifications still due in the employee's current contract period.
+
+    Args:
+        employee: The employee
+        entry: Their current-period ledger entry (BalanceLedger.compute_entry)
+        today: Planning date; due dates before it are not planned
+
+    Returns:
+        List of queue rows (none for permanent employees)
+    """
+    if employee.employee_type == 'permanent':
+        return []
+
+    today = today or date.today()
+    period_start = _parse_date(entry.period_start)
+    period_end = _parse_date(entry.period_end)
+
+    def due(notification_type: str, due_date: date) -> ContractNotificationDue:
+        return ContractNotificationDue(
+            employee_id=employee.id,
+            notification_type=notification_type,
+            due_date=due_date.isoformat(),
+            contract_end_date=entry.period_end
+        )
+
+    rows = []
+    reminder_date = period_end - timedelta(days=REMINDER_DAYS_BEFORE_END)
+    if reminder_date >= today:
+        rows.append(due(NOTIFICATION_40_DAYS, reminder_date))
+
+    critical_date = _first_critical_day(employee, entry, period_start, period_end, max(today, period_start))
+    if critical_date:
+        rows.append(due(NOTIFICATION_CRITICAL, critical_date))
+
+    rows.append(due(NOTIFICATION_REPLAN, period_end))
+    return rows
+
+
+class ContractNotificationPlanner:
+    """Keeps the contract notification queue in step with the balance ledger."""
+
+    def __init__(self, queue_repository):
+        self.queue_repository = queue_repository
+
+    def replan(self, employees: List[Employee], entries: List[LeaveBalance],
+               today: Optional[date] = None, commit: bool = True) -> None:
+        """Replace the queued rows of `employees` from their fresh ledger entries."""
+        if not employees:
+            return
+        entry_by_employee = {entry.employee_id: entry for entry in entries}
+        rows = []
+        for emp in employees:
+            entry = entry_by_employee.get(emp.id)
+            if entry:
+                rows.extend(plan_contract_notifications(emp, entry, today))
+        self.queue_repository.replace_for_employees([emp.id for emp in employees], rows, commit=commit)
+
+    def forget_employee(self, employee_id: str) -> None:
+        self.queue_repository.delete_by_employee(employee_id)
+
+
+if __name__ == "__main__":
+    import sys
+    from .database import SessionLocal
+    from .dependencies import get_employee_service
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python -m backend.notification_queue rebuild")
+        sys.exit(2)
+
+    db = SessionLocal()
+    try:
+        employee_service = get_employee_service(db)
+        contractors = [
+            emp for emp in employee_service.employee_repository.get_all()
+            if emp.employee_type != 'permanent'
+        ]
+        employee_service.balance_ledger.refresh_employees(contractors)
+        print(f"[OK] Planned contract notifications for {len(contractors)} contractors")
+    finally:
+        db.close()
@@ -3,62 +3,59 @@ Contract End Notification Scheduler for IAU Portal
 Daily automated job to send vacation balance reminders
 """
 
-import schedule
+import os
 import time
 import logging
-from datetime import date, timedelta
-from typing import List
-import json
-from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Set, Tuple
 
 from .database import SessionLocal
-from .db_repositories import DBEmployeeRepository, DBUserRepository, DBLeaveRequestRepository, DBPortalSettingsRepository
-from .services import EmployeeService
+from .db_repositories import (
+    DBContractNotificationQueueRepository, DBSentNotificationRepository, DBNotificationRunRepository
+)
+from .dependencies import get_employee_service, get_email_settings_service
 from .email_service import EmailService
+from .models import ContractNotificationDue, EmployeeWithBalance, NotificationRun
 from .email_templates import (
+    render_batch,
     render_contract_reminder_40_days_email,
     render_contract_critical_warning_email
 )
-
-# Configure logging
-logging.basicConfig(
-    filename='backend/notification_scheduler.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from .notification_queue import (
+    NOTIFICATION_40_DAYS, NOTIFICATION_REPLAN, REMINDER_DAYS_BEFORE_END, is_critical
 )
 
-# Tracking file for sent notifications (JSON-based dedup, not critical data)
-NOTIFICATIONS_TRACKING_FILE = Path("backend/data/sent_notifications.json")
+logger = logging.getLogger(__name__)
+
+# Delivery: parallel sends and the per-operation SMTP timeout
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", "4"))
+NOTIFICATION_SEND_TIMEOUT = float(os.getenv("NOTIFICATION_SEND_TIMEOUT", "30"))
 
 
 class NotificationTracker:
     """
     Track which notifications have been sent to avoid duplicates.
-    Uses a simple JSON file for deduplication tracking.
+
+    Backed by the sent_notifications table (unique per employee, type and
+    contract end date). Keys are loaded only for the employees checked in
+    this run; mark_sent buffers new keys and flush() writes them in one
+    batch at the end of the run.
     """
 
-    def __init__(self):
-        self.tracking_data = self._load_tracking_data()
-
-    def _load_tracking_data(self) -> dict:
-        """Load tracking data from file"""
-        if NOTIFICATIONS_TRACKING_FILE.exists():
-            try:
-                with open(NOTIFICATIONS_TRACKING_FILE, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                logging.error(f"Failed to load tracking data: {e}")
-                return {}
-        return {}
-
-    def _save_tracking_data(self):
-        """Save tracking data to file"""
-        try:
-            NOTIFICATIONS_TRACKING_FILE.parent.mkdir(parents=True, exist_ok=True)
-            with open(NOTIFICATIONS_TRACKING_FILE, 'w') as f:
-                json.dump(self.tracking_data, f, indent=2)
-        except Exception as e:
-            logging.error(f"Failed to save tracking data: {e}")
+    def __init__(self, repository):
+        self.repository = repository
+        self.sent_keys = set()
+        self.loaded_employees = set()
+        self.pending = []
+
+    def load(self, employee_ids: List[str]):
+        """Prefetch the sent keys of the employees about to be checked."""
+        missing = [emp_id for emp_id in set(employee_ids) if emp_id not in self.loaded_employees]
+        if missing:
+            self.sent_keys |= self.repository.get_sent_keys(missing)
+            self.loaded_employees.update(missing)
 
     def has_sent(self, employee_id: str, notification_type: str, contract_end_date: str) -> bool:
         """
@@ -72,166 +69,294 @@ class NotificationTracker:
         Returns:
             bool: True if notification already sent, False otherwise
         """
-        key = f"{employee_id}_{notification_type}_{contract_end_date}"
-        return key in self.tracking_data
+        self.load([employee_id])
+        return (employee_id, notification_type, contract_end_date) in self.sent_keys
 
     def mark_sent(self, employee_id: str, notification_type: str, contract_end_date: str):
-        """Mark notification as sent"""
-        key = f"{employee_id}_{notification_type}_{contract_end_date}"
-        self.tracking_data[key] = date.today().isoformat()
-        self._save_tracking_data()
+        """Mark notification as sent (persisted by flush)"""
+        key = (employee_id, notification_type, contract_end_date)
+        if key not in self.sent_keys:
+            self.sent_keys.add(key)
+            self.pending.append(key + (date.today().isoformat(),))
+
+    def flush(self) -> int:
+        """Write the notifications marked since the last flush in one batch"""
+        pending, self.pending = self.pending, []
+        return self.repository.add_many(pending)
 
     def cleanup_old_entries(self, days_old: int = 400):
         """Remove tracking entries older than specified days"""
         cutoff_date = date.today() - timedelta(days=days_old)
-        keys_to_remove = []
+        removed = self.repository.purge_older_than(cutoff_date.isoformat())
+        if removed:
+            logger.info(f"Cleaned up {removed} old tracking entries")
+
+
+class PlannedNotification(NamedTuple):
+    row_id: int
+    employee_id: str
+    notification_type: str
+    contract_end_date: str
+    to_email: str
+    subject: str
+    body: str
+
+
+def plan_notifications(due: List[ContractNotificationDue], employees: Dict[str, EmployeeWithBalance],
+                       tracker: NotificationTracker, today: date):
+    """
+    Planning phase: decide what to do with each due queue row, without any I/O.
+
+    Returns:
+        (planned emails, queue row ids that are done, employee ids to replan)
+    """
+    # Emails are rendered per template at the end, through render_batch
+    to_render: Dict[Callable, List[Tuple[ContractNotificationDue, EmployeeWithBalance, str, dict]]] = defaultdict(list)
+    done_ids: List[int] = []
+    replan_ids: Set[str] = set()
 
-        for key, sent_date in self.tracking_data.items():
-            try:
-                if date.fromisoformat(sent_date) < cutoff_date:
-                    keys_to_remove.append(key)
-            except:
-                keys_to_remove.append(key)  # Remove invalid entries
+    for row in due:
+        employee = employees.get(row.employee_id)
+        try:
+            # Employee deleted or made permanent: nothing to send
+            if not employee or getattr(employee, 'employee_type', 'contractor') == 'permanent':
+                done_ids.append(row.id)
+                continue
+
+            # New contract period (or the plan is stale): plan it
+            if row.notification_type == NOTIFICATION_REPLAN or employee.contract_end_date != row.contract_end_date:
+                done_ids.append(row.id)
+                replan_ids.add(employee.id)
+                continue
 
-        for key in keys_to_remove:
-            del self.tracking_data[key]
+            contract_end = date.fromisoformat(employee.contract_end_date)
+            days_remaining = (contract_end - today).days
+
+            if row.notification_type == NOTIFICATION_40_DAYS:
+                render, subject = render_contract_reminder_40_days_email, "Contract End Reminder / تذكير بانتهاء العقد"
+                still_due = 0 < days_remaining <= REMINDER_DAYS_BEFORE_END
+            else:
+                render, subject = render_contract_critical_warning_email, "CRITICAL: Contract Ending / تحذير حرج: انتهاء العقد"
+                still_due = is_critical(employee.vacation_balance, days_remaining)
+
+            # Employee email is already joined in from the user record
+            if not still_due or not employee.email or tracker.has_sent(
+                employee.id, row.notification_type, employee.contract_end_date
+            ):
+                done_ids.append(row.id)
+                continue
 
-        if keys_to_remove:
-            self._save_tracking_data()
-            logging.info(f"Cleaned up {len(keys_to_remove)} old tracking entries")
+            email_data = {
+                'employee_name_ar': f"{employee.first_name_ar} {employee.last_name_ar}",
+                'employee_name_en': f"{employee.first_name_en} {employee.last_name_en}",
+                'contract_end_date': employee.contract_end_date,
+                'days_remaining': days_remaining,
+                'vacation_balance': employee.vacation_balance
+            }
+            to_render[render].append((row, employee, subject, email_data))
+
+        except Exception as e:
+            logger.error(f"Error processing employee {row.employee_id}: {str(e)}")
+
+    planned: List[PlannedNotification] = []
+    for render, batch in to_render.items():
+        try:
+            bodies = render_batch(render, [email_data for _, _, _, email_data in batch])
+        except Exception as e:
+            logger.error(f"Error rendering {len(batch)} contract notifications: {str(e)}")
+            continue
+        planned.extend(
+            PlannedNotification(row.id, employee.id, row.notification_type, employee.contract_end_date,
+                                employee.email, subject, body)
+            for (row, employee, subject, _), body in zip(batch, bodies)
+        )
+
+    return planned, done_ids, replan_ids
+
+
+def deliver_notifications(email_service: EmailService, planned: List[PlannedNotification],
+                          workers: int = NOTIFICATION_WORKERS) -> List[bool]:
+    """
+    Delivery phase: send the planned emails on a bounded thread pool.
+
+    Each send is limited by the email service's timeout (per SMTP operation
+    and for the wait on a pooled session), so one slow recipient server only
+    holds up its own worker.
+
+    Returns:
+        Success flag per planned email, in order
+    """
+    def send(notification: PlannedNotification) -> bool:
+        try:
+            return email_service.send_email(
+                to_email=notification.to_email,
+                subject=notification.subject,
+                body=notification.body,
+                is_html=True
+            )
+        except Exception as e:
+            logger.error(f"Error sending {notification.notification_type} to {notification.employee_id}: {str(e)}")
+            return False
+
+    if not planned:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(planned)))) as executor:
+        return list(executor.map(send, planned))
 
 
 def check_and_send_contract_notifications():
     """
-    Daily job to check for contract end dates and send notifications
+    Daily job to send contract end notifications
 
     Sends two types of notifications:
     1. 40-day reminder: When employee has 40 days left in contract
     2. Critical warning: When vacation balance equals remaining days (+-1 day)
+
+    Only the rows due today in the contract notification queue are read (see
+    backend.notification_queue), so the cost depends on the number of
+    notifications, not on headcount. The emails are planned first and then
+    delivered in parallel (NOTIFICATION_WORKERS threads, NOTIFICATION_SEND_TIMEOUT
+    seconds per SMTP operation). A row whose email fails stays queued and is
+    retried the next day.
+
+    Run statistics are logged and stored in notification_runs.
     """
-    logging.info("Starting contract notification check...")
+    logger.info("Starting contract notification check...")
+
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+    stats = {'due': 0, 'planned': 0, 'sent': 0, 'failed': 0}
+    error = None
 
     db = SessionLocal()
     try:
-        # Initialize services with DB repositories
-        employee_repo = DBEmployeeRepository(db)
-        user_repo = DBUserRepository(db)
-        leave_request_repo = DBLeaveRequestRepository(db)
-        portal_settings_repo = DBPortalSettingsRepository(db)
-        employee_service = EmployeeService(employee_repo, user_repo, leave_request_repo, portal_settings_repo)
-        email_service = EmailService()
-        tracker = NotificationTracker()
-
-        # Get all employees with balance info
-        employees = employee_service.get_employees()
+        # Initialize services with DB repositories (balances read from the ledger)
+        employee_service = get_employee_service(db)
+        queue_repo = DBContractNotificationQueueRepository(db)
+        email_service = EmailService(timeout=NOTIFICATION_SEND_TIMEOUT)
+        tracker = NotificationTracker(DBSentNotificationRepository(db))
         today = date.today()
 
-        notifications_sent = 0
-
-        for employee in employees:
-            # Skip permanent employees (they use calendar year, no contract expiry notifications)
-            if getattr(employee, 'employee_type', 'contractor') == 'permanent':
-                continue
-
-            # Get employee's email from user record
-            try:
-                employee_user = user_repo.get_by_id(employee.user_id)
-                if not employee_user or not employee_user.email:
-                    continue
-
-                if not employee.contract_end_date:
-                    continue
-
-                contract_end = date.fromisoformat(employee.contract_end_date)
-                days_remaining = (contract_end - today).days
-
-                # Skip if contract already ended
-                if days_remaining < 0:
-                    continue
-
-                # Check for 40-day notification
-                if days_remaining == 40:
-                    if not tracker.has_sent(employee.id, '40_days', employee.contract_end_date):
-                        email_data = {
-                            'employee_name_ar': f"{employee.first_name_ar} {employee.last_name_ar}",
-                            'employee_name_en': f"{employee.first_name_en} {employee.last_name_en}",
-                            'contract_end_date': employee.contract_end_date,
-                            'days_remaining': days_remaining,
-                            'vacation_balance': employee.vacation_balance
-                        }
-
-                        html_body = render_contract_reminder_40_days_email(email_data)
-                        success = email_service.send_email(
-                            to_email=employee_user.email,
-                            subject="Contract End Reminder / تذكير بانتهاء العقد",
-                            body=html_body,
-                            is_html=True
-                        )
-
-                        if success:
-                            tracker.mark_sent(employee.id, '40_days', employee.contract_end_date)
-                            notifications_sent += 1
-                            logging.info(f"40-day notification sent to {employee.id}")
-
-                # Check for critical notification (balance equals remaining days, +-1 day tolerance)
-                # This sends when vacation_balance is approximately equal to days_remaining
-                balance_equals_days = abs(employee.vacation_balance - days_remaining) <= 1
-
-                if balance_equals_days and days_remaining > 0 and days_remaining <= employee.vacation_balance + 1:
-                    if not tracker.has_sent(employee.id, 'critical', employee.contract_end_date):
-                        email_data = {
-                            'employee_name_ar': f"{employee.first_name_ar} {employee.last_name_ar}",
-                            'employee_name_en': f"{employee.first_name_en} {employee.last_name_en}",
-                            'contract_end_date': employee.contract_end_date,
-                            'days_remaining': days_remaining,
-                            'vacation_balance': employee.vacation_balance
-                        }
-
-                        html_body = render_contract_critical_warning_email(email_data)
-                        success = email_service.send_email(
-                            to_email=employee_user.email,
-                            subject="CRITICAL: Contract Ending / تحذير حرج: انتهاء العقد",
-                            body=html_body,
-                            is_html=True
-                        )
-
-                        if success:
-                            tracker.mark_sent(employee.id, 'critical', employee.contract_end_date)
-                            notifications_sent += 1
-                            logging.info(f"Critical notification sent to {employee.id}")
-
-            except Exception as e:
-                logging.error(f"Error processing employee {employee.id}: {str(e)}")
-                continue
+        if queue_repo.count() == 0:
+            # First run (or an emptied queue): plan every contractor once
+            contractors = [
+                emp for emp in employee_service.employee_repository.get_all()
+                if emp.employee_type != 'permanent'
+            ]
+            employee_service.balance_ledger.refresh_employees(contractors)
+            logger.info(f"Planned contract notifications for {len(contractors)} contractors")
+
+        due = queue_repo.get_due(today.isoformat())
+        employees = {
+            emp.id: emp for emp in employee_service.get_employees_by_ids(list({row.employee_id for row in due}))
+        }
+        tracker.load(list(employees))
+
+        planned, done_ids, replan_ids = plan_notifications(due, employees, tracker, today)
+        stats['due'], stats['planned'] = len(due), len(planned)
+
+        for notification, success in zip(planned, deliver_notifications(email_service, planned)):
+            if success:
+                tracker.mark_sent(notification.employee_id, notification.notification_type,
+                                  notification.contract_end_date)
+                done_ids.append(notification.row_id)
+                stats['sent'] += 1
+                logger.info(f"{notification.notification_type} notification sent to {notification.employee_id}")
+            else:
+                stats['failed'] += 1
+
+        tracker.flush()
+        queue_repo.delete_many(done_ids)
+        if replan_ids:
+            employee_service.balance_ledger.refresh_employees([
+                emp for emp, _ in employee_service.employee_repository.get_by_ids_with_users(list(replan_ids))
+            ])
 
         # Cleanup old tracking entries on the 1st of each month
         if today.day == 1:
             tracker.cleanup_old_entries()
 
-        logging.info(f"Contract notification check completed. Sent {notifications_sent} notifications.")
-
     except Exception as e:
-        logging.error(f"Contract notification check failed: {str(e)}")
+        error = str(e)
+        logger.error(f"Contract notification check failed: {error}")
+        db.rollback()
     finally:
+        duration = time.perf_counter() - started
+        logger.info(
+            f"Contract notification check completed in {duration:.2f}s. {stats['due']} queued row(s) due, "
+            f"{stats['planned']} planned, {stats['sent']} sent, {stats['failed']} failed."
+        )
+        try:
+            DBNotificationRunRepository(db).add(NotificationRun(
+                started_at=started_at, duration_seconds=round(duration, 3), error=error, **stats
+            ))
+        except Exception as e:
+            logger.error(f"Failed to record notification run: {str(e)}")
         db.close()
 
 
-def run_scheduler():
+def notify_managers_of_renewals(employee_service, email_settings_service, renewed_employees) -> None:
+    """Email each auto-renewed employee's manager so they can verify the renewal."""
+    email_settings = email_settings_service.get_email_settings()
+    if not renewed_employees or not email_settings or not email_settings.is_active:
+        return
+
+    manager_ids = list({emp.manager_id for emp in renewed_employees if emp.manager_id})
+    managers = {manager.id: manager for manager in employee_service.get_employees_by_ids(manager_ids)}
+
+    for emp in renewed_employees:
+        manager_emp = managers.get(emp.manager_id)
+        if manager_emp and manager_emp.email:
+            email_settings_service.send_contract_auto_renewed_notification(
+                manager_email=manager_emp.email,
+                manager_name_ar=f"{manager_emp.first_name_ar} {manager_emp.last_name_ar}",
+                manager_name_en=f"{manager_emp.first_name_en} {manager_emp.last_name_en}",
+                employee_name_ar=f"{emp.first_name_ar} {emp.last_name_ar}",
+                employee_name_en=f"{emp.first_name_en} {emp.last_name_en}",
+                employee_id=emp.id,
+                new_contract_end_date=emp.contract_end_date
+            )
+
+
+def check_and_renew_contracts():
     """
-    Run the scheduler in a continuous loop
-    This should be run as a separate process/service
+    Daily job to auto-renew expired contracts
+
+    Same as POST /api/contracts/check-renewals: flags contractors whose
+    contract period has ended as auto-renewed and notifies their managers.
     """
-    logging.info("Notification scheduler started")
+    logger.info("Starting contract renewal check...")
+
+    db = SessionLocal()
+    try:
+        employee_service = get_employee_service(db)
+        renewed = employee_service.check_and_renew_expired_contracts()
+        notify_managers_of_renewals(employee_service, get_email_settings_service(db), renewed)
+        logger.info(f"Contract renewal check completed. Renewed {len(renewed)} contracts.")
+    finally:
+        db.close()
 
-    # Schedule daily check at 8:00 AM
-    schedule.every().day.at("08:00").do(check_and_send_contract_notifications)
 
-    # For testing: also run immediately on startup (comment out in production)
-    # check_and_send_contract_notifications()
+def run_scheduler():
+    """
+    Run the scheduler as a separate process.
 
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+    Uses the same leader lock as the scheduler inside the API (see
+    backend.app_scheduler), so it can run next to API workers without
+    duplicating the daily jobs.
+    """
+    import asyncio
+    from .app_scheduler import AppScheduler
+
+    # Only the standalone process logs to a file; inside the API the
+    # application's logging configuration applies
+    logging.basicConfig(
+        filename='backend/notification_scheduler.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    logger.info("Notification scheduler started")
+    asyncio.run(AppScheduler.from_env().run_forever())
 
 
 if __name__ == "__main__":
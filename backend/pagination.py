@@ -0,0 +1,38 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token encoding the sort key of the last row
+on a page, e.g. (start_date, id). The next page is fetched with a WHERE
+clause on that key instead of OFFSET, so page cost does not grow with depth.
+"""
+
+import base64
+from typing import List, Optional
+
+
+class InvalidCursorError(ValueError):
+    """Cursor could not be decoded"""
+
+
+def encode_cursor(*values) -> str:
+    raw = "|".join(str(v) for v in values)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, parts: int) -> List[str]:
+    """Decode a cursor into its `parts` string values."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|")
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError("Invalid cursor")
+    if len(values) != parts:
+        raise InvalidCursorError("Invalid cursor")
+    return values
+
+
+def clamp_limit(limit: Optional[int], maximum: int) -> Optional[int]:
+    """Bound a requested page size to [1, maximum]; None means no pagination."""
+    if limit is None:
+        return None
+    return max(1, min(limit, maximum))
@@ -0,0 +1,106 @@
+"""
+In-process authentication principal cache for IAU Portal.
+
+Every authenticated request resolves the token subject (the user's email)
+to a User. This cache keeps that User for a few seconds, so most requests
+authenticate without a database round-trip.
+
+Invalidation is write-driven: DBUserRepository drops a user's entry after
+every commit that changes or deletes the user (password, role, is_active,
+email), so this worker sees the change on its next request. Other workers
+see it once their entry expires, hence the short TTL.
+
+The cache is per process. Configure with environment variables:
+    AUTH_CACHE_ENABLED  - "true" (default) or "false"
+    AUTH_CACHE_TTL      - seconds an entry is trusted (default 30)
+    AUTH_CACHE_SIZE     - maximum number of entries (default 1024)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .models import User
+
+
+class PrincipalCache:
+    """Thread-safe TTL + LRU cache of User keyed by token subject."""
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 1024, enabled: bool = True):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; put() drops users read before the latest one
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, subject: str) -> Optional[User]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[subject]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            # Callers may mutate the user, so never hand out the cached object
+            return entry[1].model_copy(deep=True)
+
+    def put(self, subject: str, user: User, generation: Optional[int] = None) -> None:
+        """
+        Cache user for subject. Pass the generation() taken before reading the
+        user, so a read that raced with an invalidation is not cached.
+        """
+        if not self.enabled or user is None:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[subject] = (time.monotonic() + self.ttl, user.model_copy(deep=True))
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id) -> None:
+        user_id = str(user_id)
+        with self._lock:
+            self._generation += 1
+            for subject in [s for s, (_, user) in self._entries.items() if str(user.id) == user_id]:
+                del self._entries[subject]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+principal_cache = PrincipalCache(
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "30")),
+    max_size=int(os.getenv("AUTH_CACHE_SIZE", "1024")),
+    enabled=os.getenv("AUTH_CACHE_ENABLED", "true").lower() == "true"
+)
@@ -1,10 +1,11 @@
-from .models import User, UserCreate, Employee, EmployeeCreate, EmployeeWithBalance, LeaveRequest, LeaveRequestCreate, LeaveRequestUpdate, AdminInit, Unit, EmployeeUpdate, UnitCreate, UnitUpdate, AttendanceLog, EmailSettings, EmailSettingsCreate, EmailSettingsUpdate
+from .models import User, UserCreate, Employee, EmployeeCreate, EmployeeWithBalance, LeaveRequest, LeaveRequestCreate, LeaveRequestUpdate, AdminInit, Unit, EmployeeUpdate, UnitCreate, UnitUpdate, AttendanceLog, EmailSettings, EmailSettingsCreate, EmailSettingsUpdate, PendingApproval, PendingApprovalsPage, ApprovalConflict, BulkDecisionItem
 from .email_templates import (
     render_leave_request_created_email,
     render_leave_request_approved_email
 )
-from .exceptions import InvalidFileError, PasswordMismatchError
-from typing import List, Optional
+from .exceptions import InvalidFileError, PasswordMismatchError, ValidationError
+from typing import Any, Callable, List, Optional, Dict, Set, Tuple
+from collections import defaultdict
 from uuid import UUID, uuid4
 from datetime import datetime, date
 from .password import verify_password, get_password_hash, verify_password_raw
@@ -13,6 +14,7 @@ from .calculation import (
     calculate_permanent_vacation_balance, get_permanent_contract_period
 )
 from .image_utils import optimize_signature_image
+from .pagination import encode_cursor, decode_cursor, InvalidCursorError
 import base64
 import os
 import shutil
@@ -36,7 +38,8 @@ from .config import (
     MAX_ATTACHMENT_SIZE,
     ALLOWED_SIGNATURE_EXTENSIONS,
     MAX_SIGNATURE_SIZE,
-    MIME_TYPE_MAP
+    MIME_TYPE_MAP,
+    NOTIFICATION_PREFERENCES
 )
 
 # ==========================================
@@ -308,32 +311,45 @@ class UserService:
         self.user_repository.delete(user_id)
 
 class EmployeeService:
-    def __init__(self, employee_repository, user_repository, leave_request_repository, portal_settings_repository=None):
+    def __init__(self, employee_repository, user_repository, leave_request_repository, portal_settings_repository=None,
+                 balance_ledger=None, cache=None):
         self.employee_repository = employee_repository
         self.user_repository = user_repository
         self.leave_request_repository = leave_request_repository
         self.portal_settings_repository = portal_settings_repository
+        # Optional BalanceLedger; when set, balances are read from persisted rows
+        self.balance_ledger = balance_ledger
+        # Optional EmployeeCache for single-employee lookups
+        self.cache = cache
+
+    def _get_max_carry_over(self) -> int:
+        """Return the portal-wide carry-over cap for permanent employees."""
+        if self.portal_settings_repository:
+            return self.portal_settings_repository.get().max_carry_over_days
+        return 15
+
+    @staticmethod
+    def _calculate_balance(employee: Employee, approved_requests: List[LeaveRequest],
+                           max_carry_over: int) -> Tuple[float, Optional[float]]:
+        """Return (vacation_balance, carry_over_balance) from the employee's approved requests."""
+        if employee.employee_type == 'permanent':
+            return calculate_permanent_vacation_balance(employee, approved_requests, max_carry_over)
+        return calculate_vacation_balance(employee, approved_requests), None
 
-    def _get_employee_with_balance(self, employee: Employee) -> EmployeeWithBalance:
-        if not employee:
-            return None
-
-        all_requests = self.leave_request_repository.get_all()
-        approved_requests = [req for req in all_requests if req.status == 'Approved' and req.employee_id == employee.id]
+    def _build_employee_with_balance(self, employee: Employee, balance: Tuple[float, Optional[float]],
+                                     user: Optional[User]) -> EmployeeWithBalance:
+        """
+        Assemble an EmployeeWithBalance from already-loaded data.
 
+        Performs no repository access, so the single-employee and batch paths
+        share exactly the same logic.
+        """
         employee_data = employee.dict()
+        vacation_balance, carry_over = balance
+        employee_data['vacation_balance'] = vacation_balance
 
         if employee.employee_type == 'permanent':
             # Permanent employee: calendar year with carry-over
-            max_carry_over = 15
-            if self.portal_settings_repository:
-                settings = self.portal_settings_repository.get()
-                max_carry_over = settings.max_carry_over_days
-
-            balance, carry_over = calculate_permanent_vacation_balance(
-                employee, approved_requests, max_carry_over
-            )
-            employee_data['vacation_balance'] = balance
             employee_data['carry_over_balance'] = carry_over
 
             # Contract period is calendar year
@@ -343,9 +359,6 @@ class EmployeeService:
             employee_data['days_remaining_in_contract'] = (year_end - today).days
         else:
             # Contractor: existing 11-month rolling contract logic
-            balance = calculate_vacation_balance(employee, approved_requests)
-            employee_data['vacation_balance'] = balance
-
             try:
                 start_date_obj = datetime.strptime(employee.start_date, "%Y-%m-%d").date()
                 _, contract_end = get_current_contract_period(start_date_obj, date.today())
@@ -354,25 +367,101 @@ class EmployeeService:
             except Exception:
                 pass
 
-        # Fetch user details (role, email)
-        user = self.user_repository.get_by_id(employee.user_id)
+        # User details (role, email)
         if user:
             employee_data['role'] = user.role
             employee_data['email'] = user.email
 
         return EmployeeWithBalance(**employee_data)
 
+    def _get_employee_with_balance(self, employee: Employee, user: Optional[User] = None) -> EmployeeWithBalance:
+        if not employee:
+            return None
+
+        if self.balance_ledger:
+            balance = self.balance_ledger.get_balance(employee)
+        else:
+            approved_requests = self.leave_request_repository.get_approved(employee.id)
+            max_carry_over = self._get_max_carry_over() if employee.employee_type == 'permanent' else 15
+            balance = self._calculate_balance(employee, approved_requests, max_carry_over)
+
+        if user is None:
+            user = self.user_repository.get_by_id(employee.user_id)
+
+        return self._build_employee_with_balance(employee, balance, user)
+
+    def _get_employees_with_balance(self, employees_with_users: List[Tuple[Employee, Optional[User]]]) -> List[EmployeeWithBalance]:
+        """
+        Batch balance engine: compute EmployeeWithBalance for many employees in one pass.
+
+        Approved requests are loaded once and grouped by employee, and portal
+        settings are read once, instead of re-reading the whole leave request
+        table for every employee. Produces the same numbers as
+        calculate_vacation_balance / calculate_permanent_vacation_balance.
+        With a balance ledger configured, balances are read from the ledger instead.
+
+        Args:
+            employees_with_users: (employee, user) pairs as returned by
+                DBEmployeeRepository.get_all_with_users()
+        """
+        if not employees_with_users:
+            return []
+
+        if self.balance_ledger:
+            balances = self.balance_ledger.get_balances([emp for emp, _ in employees_with_users])
+            return [
+                self._build_employee_with_balance(emp, balances[emp.id], user)
+                for emp, user in employees_with_users
+            ]
+
+        approved_by_employee: Dict[str, List[LeaveRequest]] = defaultdict(list)
+        for req in self.leave_request_repository.get_approved():
+            approved_by_employee[req.employee_id].append(req)
+
+        max_carry_over = 15
+        if any(emp.employee_type == 'permanent' for emp, _ in employees_with_users):
+            max_carry_over = self._get_max_carry_over()
+
+        return [
+            self._build_employee_with_balance(
+                emp, self._calculate_balance(emp, approved_by_employee.get(emp.id, []), max_carry_over), user
+            )
+            for emp, user in employees_with_users
+        ]
+
     def get_employees(self) -> List[EmployeeWithBalance]:
-        employees = self.employee_repository.get_all()
-        return [self._get_employee_with_balance(emp) for emp in employees]
+        return self._get_employees_with_balance(self.employee_repository.get_all_with_users())
+
+    def refresh_permanent_balances(self) -> None:
+        """Recompute ledger rows for permanent employees (after the carry-over cap changes)."""
+        if not self.balance_ledger:
+            return
+        permanent = [emp for emp in self.employee_repository.get_all() if emp.employee_type == 'permanent']
+        self.balance_ledger.refresh_employees(permanent)
 
     def get_employee_by_id(self, employee_id: str) -> Optional[EmployeeWithBalance]:
-        employee = self.employee_repository.get_by_id(employee_id)
-        return self._get_employee_with_balance(employee)
-    
+        if self.cache:
+            cached = self.cache.get(employee_id)
+            if cached:
+                return cached
+
+        employee, user = self.employee_repository.get_by_id_with_user(employee_id)
+        result = self._get_employee_with_balance(employee, user)
+        if self.cache and result:
+            self.cache.put(result)
+        return result
+
     def get_employee_by_user_id(self, user_id: UUID) -> Optional[EmployeeWithBalance]:
-        employee = self.employee_repository.get_by_user_id(user_id)
-        return self._get_employee_with_balance(employee)
+        if self.cache:
+            cached = self.cache.get_by_user_id(user_id)
+            if cached:
+                return cached
+
+        employee, user = self.employee_repository.get_by_user_id_with_user(user_id)
+        result = self._get_employee_with_balance(employee, user)
+        if self.cache and result:
+            self.cache.put(result)
+        return result
 
     def update_employee(self, employee_id: str, update_data: EmployeeUpdate) -> EmployeeWithBalance:
         import os
@@ -385,8 +474,14 @@ class EmployeeService:
 
         # Update fields
         update_dict = update_data.dict(exclude_unset=True)
+        if 'notification_preference' in update_dict:
+            self._validate_notification_preference(update_dict['notification_preference'])
         role_update = update_dict.pop('role', None)
         new_employee_id = update_dict.pop('employee_id', None)
+        balance_inputs_changed = any(
+            key in update_dict and update_dict[key] != getattr(employee, key)
+            for key in ('start_date', 'employee_type', 'monthly_vacation_earned')
+        )
 
         # Handle employee ID change (requires updating related records)
         if new_employee_id and new_employee_id != employee_id:
@@ -428,12 +523,19 @@ class EmployeeService:
 
             employee.id = new_employee_id
             self.employee_repository.add(employee)
+
+            if self.balance_ledger:
+                self.balance_ledger.forget_employee(employee_id)
+                self.balance_ledger.refresh_employee(employee)
         else:
             # Normal update without ID change
             for key, value in update_dict.items():
                 setattr(employee, key, value)
             self.employee_repository.update(employee)
 
+            if self.balance_ledger and balance_inputs_changed:
+                self.balance_ledger.refresh_employee(employee)
+
         # Update User role if provided
         if role_update:
             user = self.user_repository.get_by_id(employee.user_id)
@@ -443,6 +545,27 @@ class EmployeeService:
 
         return self._get_employee_with_balance(employee)
 
+    @staticmethod
+    def _validate_notification_preference(preference: str):
+        if preference not in NOTIFICATION_PREFERENCES:
+            raise ValidationError(
+                f"notification_preference must be one of: {', '.join(NOTIFICATION_PREFERENCES)}",
+                field='notification_preference'
+            )
+
+    def set_notification_preference(self, employee_id: str, preference: str) -> EmployeeWithBalance:
+        """Switch a manager between one email per request ('immediate') and batched digests ('digest')."""
+        self._validate_notification_preference(preference)
+        employee = self.employee_repository.get_by_id(employee_id)
+        if not employee:
+            raise Exception("Employee not found")
+        employee.notification_preference = preference
+        self.employee_repository.update(employee)
+        return self._get_employee_with_balance(employee)
+
+    def get_employees_by_ids(self, employee_ids: List[str]) -> List[EmployeeWithBalance]:
+        return self._get_employees_with_balance(self.employee_repository.get_by_ids_with_users(employee_ids))
+
     def get_team_members(self, manager_id: str, include_indirect: bool = True) -> List[EmployeeWithBalance]:
         """
         Get all team members for a manager (direct and indirect reports).
@@ -454,12 +577,16 @@ class EmployeeService:
         Returns:
             List of EmployeeWithBalance objects for all team members
         """
-        from backend.hierarchy import get_all_subordinates
+        subordinate_ids = self.get_subordinate_ids(manager_id, include_indirect)
+        return self.get_employees_by_ids(list(subordinate_ids))
 
-        all_employees = self.get_employees()
-        subordinate_ids = get_all_subordinates(manager_id, all_employees, include_indirect)
+    def get_subordinate_ids(self, manager_id: str, include_indirect: bool = True) -> Set[str]:
+        """IDs of the manager's direct (and, by default, indirect) reports, from the hierarchy closure table."""
+        return self.employee_repository.get_subordinate_ids(manager_id, include_indirect)
 
-        return [emp for emp in all_employees if emp.id in subordinate_ids]
+    def is_subordinate(self, employee_id: str, manager_id: str) -> bool:
+        """True if employee_id reports to manager_id directly or indirectly."""
+        return self.employee_repository.is_subordinate(employee_id, manager_id)
 
     def check_and_renew_expired_contracts(self) -> List[EmployeeWithBalance]:
         """
@@ -590,7 +717,10 @@ class EmployeeService:
             **employee_create.dict(exclude={'email', 'password', 'role', 'employee_id'})
         )
         created_employee = self.employee_repository.add(new_employee)
-        
+
+        if self.balance_ledger:
+            self.balance_ledger.refresh_employee(created_employee)
+
         return self._get_employee_with_balance(created_employee)
 
     def upload_signature(self, user_id: UUID, base64_image: str) -> str:
@@ -639,13 +769,156 @@ class EmployeeService:
         return str(file_path)
 
 class LeaveRequestService:
-    def __init__(self, leave_request_repository, employee_service: EmployeeService):
+    def __init__(self, leave_request_repository, employee_service: EmployeeService, outbox_repository=None,
+                 digest_repository=None):
         self.leave_request_repository = leave_request_repository
         self.employee_service = employee_service
+        # With an outbox, notifications are committed with the leave change and
+        # delivered by backend.email_outbox; without one they are sent inline.
+        self.outbox_repository = outbox_repository
+        # Managers who chose 'digest' get new requests batched by backend.notification_digest
+        self.digest_repository = digest_repository
+
+    def _notify(self, to_email: str, subject: str, html_body: str) -> None:
+        """Queue (or, without an outbox, send) a notification email."""
+        if self.outbox_repository:
+            self.outbox_repository.enqueue(to_email, subject, html_body, is_html=True)
+            return
+        from .dependencies import get_email_service
+        get_email_service().send_email(to_email=to_email, subject=subject, body=html_body, is_html=True)
 
     def get_leave_requests(self) -> List[LeaveRequest]:
         return self.leave_request_repository.get_all()
 
+    def search_leave_requests(self, employee_id: Optional[str] = None, status: Optional[str] = None,
+                              vacation_type: Optional[str] = None, from_date: Optional[str] = None,
+                              to_date: Optional[str] = None, unit_id: Optional[int] = None,
+                              limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> Tuple[List[LeaveRequest], Optional[str]]:
+        """
+        Filtered, keyset-paginated leave requests ordered by (start_date, id) descending.
+
+        Returns:
+            (page, next_cursor); next_cursor is None on the last page or when
+            no limit is given (all matching rows are returned).
+
+        Raises:
+            InvalidCursorError: If the cursor cannot be decoded
+        """
+        rows = self.leave_request_repository.search(
+            employee_id=employee_id, status=status, vacation_type=vacation_type,
+            from_date=from_date, to_date=to_date, unit_id=unit_id,
+            after=self._decode_cursor(cursor), limit=limit + 1 if limit is not None else None
+        )
+        return self._split_page(rows, limit)
+
+    @staticmethod
+    def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+        """Decode a (start_date, id) keyset cursor; None means the first page."""
+        if not cursor:
+            return None
+        start_date, request_id = decode_cursor(cursor, 2)
+        try:
+            return date.fromisoformat(start_date).isoformat(), int(request_id)
+        except ValueError:
+            raise InvalidCursorError("Invalid cursor")
+
+    @staticmethod
+    def _split_page(rows: List[LeaveRequest], limit: Optional[int]) -> Tuple[List[LeaveRequest], Optional[str]]:
+        """Trim a limit+1 fetch to one page and build the cursor for the next one."""
+        if limit is None or len(rows) <= limit:
+            return rows, None
+        page = rows[:limit]
+        last = page[-1]
+        return page, encode_cursor(last.start_date, last.id)
+
+    def get_pending_approvals(self, manager_id: Optional[str] = None, exclude_employee_id: Optional[str] = None,
+                              limit: Optional[int] = None, cursor: Optional[str] = None) -> PendingApprovalsPage:
+        """
+        Pending requests awaiting the caller's decision, soonest start date first.
+
+        The scope is the manager's direct and indirect reports (via the hierarchy
+        closure table), or every employee when manager_id is None (admins).
+        Each row carries the requester's details, whether it exceeds the
+        requester's balance, and the approved requests of other employees in the
+        same scope that overlap it.
+
+        Raises:
+            InvalidCursorError: If the cursor cannot be decoded
+        """
+        scope = {'manager_id': manager_id, 'exclude_employee_id': exclude_employee_id}
+
+        counts = self.leave_request_repository.count_by_vacation_type(status='Pending', **scope)
+        rows = self.leave_request_repository.search(
+            status='Pending', ascending=True, after=self._decode_cursor(cursor),
+            limit=limit + 1 if limit is not None else None, **scope
+        )
+        page, next_cursor = self._split_page(rows, limit)
+
+        # One query for every approved request in scope overlapping any row on the page
+        approved = []
+        if page:
+            approved = self.leave_request_repository.search(
+                status='Approved', from_date=min(r.start_date for r in page),
+                to_date=max(r.end_date for r in page), **scope
+            )
+
+        employee_ids = {r.employee_id for r in page} | {r.employee_id for r in approved}
+        employees = {emp.id: emp for emp in self.employee_service.get_employees_by_ids(list(employee_ids))}
+
+        items = []
+        for req in page:
+            requester = employees.get(req.employee_id)
+            conflicts = [
+                ApprovalConflict(
+                    request_id=other.id,
+                    employee_id=other.employee_id,
+                    employee_name_en=self._full_name(employees.get(other.employee_id), 'en'),
+                    employee_name_ar=self._full_name(employees.get(other.employee_id), 'ar'),
+                    vacation_type=other.vacation_type,
+                    start_date=other.start_date,
+                    end_date=other.end_date
+                )
+                for other in approved
+                if other.employee_id != req.employee_id
+                and other.start_date <= req.end_date and other.end_date >= req.start_date
+            ]
+            items.append(PendingApproval(
+                **req.dict(),
+                employee_name_en=self._full_name(requester, 'en'),
+                employee_name_ar=self._full_name(requester, 'ar'),
+                position_en=requester.position_en if requester else None,
+                position_ar=requester.position_ar if requester else None,
+                vacation_balance=requester.vacation_balance if requester else None,
+                exceeds_balance=bool(
+                    requester and req.vacation_type.lower() == 'annual' and req.duration > requester.vacation_balance
+                ),
+                conflicts=conflicts
+            ))
+
+        return PendingApprovalsPage(
+            items=items,
+            total=sum(counts.values()),
+            counts_by_type=counts,
+            next_cursor=next_cursor
+        )
+
+    @staticmethod
+    def _full_name(employee: Optional[Employee], language: str) -> Optional[str]:
+        if not employee:
+            return None
+        if language == 'ar':
+            return f"{employee.first_name_ar} {employee.last_name_ar}"
+        return f"{employee.first_name_en} {employee.last_name_en}"
+
+    def get_leave_requests_for_employee(self, employee_id: str) -> List[LeaveRequest]:
+        return self.leave_request_repository.get_by_employee_id(employee_id)
+
+    def get_leave_requests_overlapping(self, start_date: str, end_date: str,
+                                       employee_ids: Optional[List[str]] = None,
+                                       status: Optional[str] = None) -> List[LeaveRequest]:
+        return self.leave_request_repository.get_overlapping(start_date, end_date, employee_ids, status)
+
     def get_leave_request_by_id(self, leave_request_id: int) -> Optional[LeaveRequest]:
         return self.leave_request_repository.get_by_id(leave_request_id)
 
@@ -696,18 +969,15 @@ class LeaveRequestService:
             attachments=leave_request_create.attachments # Save attachment paths
         )
 
-        created_request = self.leave_request_repository.add(leave_request)
-
-        # Send notification to manager
+        # Notify the manager; queued before the insert so both commit together
+        digest_manager_id = None
         try:
             if employee.manager_id:
                 manager = self.employee_service.get_employee_by_id(employee.manager_id)
 
-                if manager:
-                    # Get manager's email from user record
-                    from .dependencies import get_email_service
-                    email_service = get_email_service()
-
+                if manager and manager.notification_preference == 'digest' and self.digest_repository:
+                    digest_manager_id = manager.id
+                elif manager:
                     # Get user records to fetch emails
                     manager_user = self.employee_service.user_repository.get_by_id(manager.user_id)
 
@@ -725,23 +995,22 @@ class LeaveRequestService:
                         }
 
                         html_body = render_leave_request_created_email(email_data)
-                        email_service.send_email(
-                            to_email=manager_user.email,
-                            subject="New Leave Request / طلب إجازة جديد",
-                            body=html_body,
-                            is_html=True
-                        )
-                        logging.info(f"Leave request notification sent to manager {manager_user.email}")
+                        self._notify(manager_user.email, "New Leave Request / طلب إجازة جديد", html_body)
+                        logging.info(f"Leave request notification queued for manager {manager_user.email}")
         except Exception as e:
             logging.error(f"Failed to send manager notification: {str(e)}")
 
-        return created_request
+        # The digest item needs the new request id; it commits with the insert
+        digest_item = (lambda request_id: [self.digest_repository.build(digest_manager_id, request_id)]) \
+            if digest_manager_id else None
+        return self.leave_request_repository.add(leave_request, extra_rows=digest_item)
 
     def update_leave_request(self, leave_request_id: int, leave_request_update: LeaveRequestUpdate) -> Optional[LeaveRequest]:
         leave_request = self.leave_request_repository.get_by_id(leave_request_id)
         if not leave_request:
             return None
 
+        previous_status = leave_request.status
         if leave_request_update.status:
             leave_request.status = leave_request_update.status
             if leave_request.status == 'Approved':
@@ -752,33 +1021,15 @@ class LeaveRequestService:
                     employee = self.employee_service.get_employee_by_id(leave_request.employee_id)
                     if employee:
                         # Get employee's email from user record
-                        from .dependencies import get_email_service
-                        email_service = get_email_service()
-
                         employee_user = self.employee_service.user_repository.get_by_id(employee.user_id)
 
                         if employee_user and employee_user.email:
-                            remaining_balance = employee.vacation_balance - leave_request.balance_used
-
-                            email_data = {
-                                'employee_name_ar': f"{employee.first_name_ar} {employee.last_name_ar}",
-                                'employee_name_en': f"{employee.first_name_en} {employee.last_name_en}",
-                                'vacation_type': leave_request.vacation_type,
-                                'start_date': leave_request.start_date,
-                                'end_date': leave_request.end_date,
-                                'duration': leave_request.duration,
-                                'balance_deducted': leave_request.balance_used,
-                                'remaining_balance': remaining_balance
-                            }
-
-                            html_body = render_leave_request_approved_email(email_data)
-                            email_service.send_email(
-                                to_email=employee_user.email,
-                                subject="Leave Request Approved / تمت الموافقة على طلب الإجازة",
-                                body=html_body,
-                                is_html=True
-                            )
-                            logging.info(f"Approval notification sent to employee {employee_user.email}")
+                            # Queued now, committed by the repository update below
+                            self._notify(*self._approval_email(
+                                leave_request, employee, employee_user.email,
+                                employee.vacation_balance - leave_request.balance_used
+                            ))
+                            logging.info(f"Approval notification queued for employee {employee_user.email}")
                 except Exception as e:
                     logging.error(f"Failed to send approval notification: {str(e)}")
             elif leave_request.status == 'Rejected':
@@ -786,8 +1037,125 @@ class LeaveRequestService:
         
         if leave_request_update.attachments is not None:
             leave_request.attachments = leave_request_update.attachments
-            
-        return self.leave_request_repository.update(leave_request)
+
+        refresh_ledger = None
+        # Approved requests are the ledger's input; refresh on any transition into or out of Approved,
+        # in the same transaction as the status change
+        if self.employee_service.balance_ledger and 'Approved' in (previous_status, leave_request.status) \
+                and previous_status != leave_request.status:
+            def refresh_ledger():
+                employee = self.employee_service.employee_repository.get_by_id(leave_request.employee_id)
+                if employee:
+                    self.employee_service.balance_ledger.refresh_employee(employee, commit=False)
+
+        return self.leave_request_repository.update(leave_request, in_transaction=refresh_ledger)
+
+    @staticmethod
+    def _approval_email(leave_request: LeaveRequest, employee: Employee, to_email: str,
+                        remaining_balance: float) -> Tuple[str, str, str]:
+        """Build the (to, subject, html body) of a leave approval notification."""
+        email_data = {
+            'employee_name_ar': f"{employee.first_name_ar} {employee.last_name_ar}",
+            'employee_name_en': f"{employee.first_name_en} {employee.last_name_en}",
+            'vacation_type': leave_request.vacation_type,
+            'start_date': leave_request.start_date,
+            'end_date': leave_request.end_date,
+            'duration': leave_request.duration,
+            'balance_deducted': leave_request.balance_used,
+            'remaining_balance': remaining_balance
+        }
+        return (
+            to_email,
+            "Leave Request Approved / تمت الموافقة على طلب الإجازة",
+            render_leave_request_approved_email(email_data)
+        )
+
+    def decide_leave_requests(self, request_ids: List[int], status: str, rejection_reason: Optional[str] = None,
+                              authorize: Optional[Callable[[LeaveRequest], bool]] = None,
+                              audit_row: Optional[Callable[[LeaveRequest, str], Any]] = None
+                              ) -> Tuple[List[BulkDecisionItem], List[Tuple[str, str, str]]]:
+        """
+        Approve or reject many Pending requests in one transaction.
+
+        Requests that do not exist, fail `authorize`, or are no longer Pending
+        are skipped and reported individually; all other changes, together with
+        one `audit_row(request, previous_status)` per change and the refreshed
+        balance ledger rows, are committed at once.
+        The Pending check is repeated in the UPDATE itself, so a request decided
+        concurrently by someone else is reported as no longer Pending.
+
+        Returns:
+            (per-item results in request_ids order, approval emails still to be
+            sent as (to, subject, html body) tuples - empty when an outbox is
+            configured, since they were queued in the same commit)
+        """
+        existing = {r.id: r for r in self.leave_request_repository.get_by_ids(request_ids)}
+        results: Dict[int, BulkDecisionItem] = {}
+        decided: List[LeaveRequest] = []
+        today = date.today().isoformat()
+
+        for request_id in request_ids:
+            leave_request = existing.get(request_id)
+            if leave_request is None:
+                results[request_id] = BulkDecisionItem(request_id=request_id, success=False, error="Request not found")
+                continue
+            if authorize and not authorize(leave_request):
+                results[request_id] = BulkDecisionItem(request_id=request_id, success=False, status=leave_request.status,
+                                                       error="Not authorized to decide this request")
+                continue
+            if leave_request.status != 'Pending':
+                results[request_id] = BulkDecisionItem(request_id=request_id, success=False, status=leave_request.status,
+                                                       error=f"Request is already {leave_request.status}")
+                continue
+
+            leave_request.status = status
+            if status == 'Approved':
+                leave_request.approval_date = today
+            else:
+                leave_request.rejection_reason = rejection_reason
+            decided.append(leave_request)
+
+        if not decided:
+            return [results[request_id] for request_id in request_ids], []
+
+        # Balances before this batch, for the "remaining balance" line of each email
+        employees = {
+            emp.id: emp for emp in self.employee_service.get_employees_by_ids(
+                list({r.employee_id for r in decided if r.status == 'Approved'}))
+        }
+        emails = []
+
+        def rows_for(won: Set[int]) -> list:
+            # Only the requests this call actually decided get audit rows and emails
+            rows = [audit_row(r, 'Pending') for r in decided if r.id in won] if audit_row else []
+            remaining = {emp_id: emp.vacation_balance for emp_id, emp in employees.items()}
+            for leave_request in decided:
+                employee = employees.get(leave_request.employee_id)
+                if leave_request.id not in won or leave_request.status != 'Approved' or not employee or not employee.email:
+                    continue
+                remaining[employee.id] -= leave_request.balance_used
+                emails.append(self._approval_email(leave_request, employee, employee.email, remaining[employee.id]))
+            if self.outbox_repository:
+                # Notifications commit with the decisions; nothing left for the caller to send
+                rows += [self.outbox_repository.build(*email) for email in emails]
+                emails.clear()
+            approved_employees = {employees[r.employee_id].id: employees[r.employee_id] for r in decided
+                                  if r.id in won and r.status == 'Approved' and r.employee_id in employees}
+            if approved_employees and self.employee_service.balance_ledger:
+                # The ledger commits with the decisions too
+                self.employee_service.balance_ledger.refresh_employees(list(approved_employees.values()), commit=False)
+            return rows
+
+        won = self.leave_request_repository.decide_pending(decided, extra_rows=rows_for)
+
+        for leave_request in decided:
+            if leave_request.id in won:
+                results[leave_request.id] = BulkDecisionItem(request_id=leave_request.id, success=True, status=status)
+            else:
+                results[leave_request.id] = BulkDecisionItem(request_id=leave_request.id, success=False,
+                                                             error="Request is no longer Pending")
+
+        return [results[request_id] for request_id in request_ids], emails
 
 class UnitService:
     def __init__(self, unit_repository):
@@ -837,16 +1205,12 @@ class AttendanceService:
         if not employee:
             return {"status": "Unknown"}
         
-        today = date.today()
+        today = date.today().isoformat()
 
-        # Check for approved leave
-        all_requests = self.leave_request_repository.get_all()
-        for req in all_requests:
-            if req.employee_id == employee.id and req.status == 'Approved':
-                start = datetime.strptime(req.start_date, "%Y-%m-%d").date()
-                end = datetime.strptime(req.end_date, "%Y-%m-%d").date()
-                if start <= today <= end:
-                    return {"status": "On Leave", "vacation_type": req.vacation_type}
+        # Check for approved leave covering today
+        on_leave = self.leave_request_repository.get_approved_overlapping([employee.id], today, today)
+        if on_leave:
+            return {"status": "On Leave", "vacation_type": on_leave[0].vacation_type}
 
         return {"status": "Present"}
 
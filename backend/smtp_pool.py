@@ -0,0 +1,184 @@
+"""
+SMTP Connection Pool
+
+Keeps a bounded set of connected, authenticated SMTP sessions so that
+sending an email does not pay for a TCP connect, STARTTLS and login every
+time. Used by EmailService for single and batch sends.
+
+- at most max_size sessions are checked out at once (others wait)
+- idle sessions older than idle_timeout are closed instead of reused
+- a session idle for more than health_check_after seconds is probed with
+  NOOP before reuse, and replaced if the server dropped it
+- a session that fails with a connection-level error is discarded, never
+  returned to the pool
+"""
+
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# Errors about a single message; the session itself is still usable
+# (smtplib issues RSET before raising these from sendmail)
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class SMTPPoolTimeout(Exception):
+    """No pooled SMTP session became available in time"""
+
+
+class TrackingSMTP(smtplib.SMTP):
+    """
+    SMTP session that records whether the server accepted DATA (replied 354)
+    for the message being sent. If the connection drops after that, the
+    message may already have been delivered and must not be resent.
+    """
+
+    data_accepted = False
+
+    def mail(self, sender, options=()):
+        # MAIL FROM starts a new message
+        self.data_accepted = False
+        return super().mail(sender, options)
+
+    def getreply(self):
+        code, message = super().getreply()
+        if code == 354:
+            self.data_accepted = True
+        return code, message
+
+
+class SMTPConnectionPool:
+    """Thread-safe pool of reusable SMTP sessions."""
+
+    def __init__(self, connect: Callable[[], smtplib.SMTP], max_size: int = 4,
+                 idle_timeout: float = 60.0, health_check_after: float = 15.0):
+        """
+        Args:
+            connect: Opens a new connected (and logged in) session; raises on failure
+            max_size: Maximum number of sessions in use at the same time
+            idle_timeout: Seconds after which an unused session is closed
+            health_check_after: Idle seconds after which a session is NOOP-checked before reuse
+        """
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []  # (session, last used), most recent last
+        self._created = 0
+        self._reused = 0
+        self._discarded = 0
+        self._health_check_failures = 0
+        self.closed = False
+
+    @contextmanager
+    def connection(self, timeout: float = 30.0):
+        """
+        Check out a session for the duration of the `with` block.
+
+        Raises:
+            SMTPPoolTimeout: If all sessions stay busy for `timeout` seconds
+            Exception: Whatever connect() raises if a new session cannot be opened
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise SMTPPoolTimeout(f"No SMTP session available within {timeout}s")
+        try:
+            server = self._checkout()
+            try:
+                yield server
+            except MESSAGE_ERRORS:
+                self._checkin(server)
+                raise
+            except BaseException:
+                self._discard(server)
+                raise
+            else:
+                self._checkin(server)
+        finally:
+            self._slots.release()
+
+    def _checkout(self) -> smtplib.SMTP:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            idle_for = now - last_used
+            if idle_for > self.idle_timeout:
+                self._discard(server)
+                continue
+            if idle_for > self.health_check_after and not self._is_healthy(server):
+                with self._lock:
+                    self._health_check_failures += 1
+                self._discard(server)
+                continue
+            with self._lock:
+                self._reused += 1
+            return server
+
+        server = self._connect()
+        with self._lock:
+            self._created += 1
+        return server
+
+    def _checkin(self, server: smtplib.SMTP):
+        with self._lock:
+            if not self.closed:
+                self._idle.append((server, time.monotonic()))
+                return
+        # Returned after close_all(): nobody would ever reuse or close it
+        self._discard(server)
+
+    def _discard(self, server: smtplib.SMTP):
+        with self._lock:
+            self._discarded += 1
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_healthy(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def prune(self) -> int:
+        """Close idle sessions past idle_timeout. Returns the number closed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [s for s, last_used in self._idle if now - last_used > self.idle_timeout]
+            self._idle = [(s, last_used) for s, last_used in self._idle if now - last_used <= self.idle_timeout]
+        for server in expired:
+            self._discard(server)
+        return len(expired)
+
+    def close_all(self):
+        """
+        Close every idle session and mark the pool closed: sessions still in
+        use are closed when they are returned instead of kept.
+        """
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._discard(server)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "idle": len(self._idle),
+                "created": self._created,
+                "reused": self._reused,
+                "discarded": self._discarded,
+                "health_check_failures": self._health_check_failures,
+            }
@@ -0,0 +1,96 @@
+"""
+Team Statistics for the Dashboard Report
+
+Builds per-member leave statistics for a manager's team in one grouped pass:
+a single query loads the team's approved requests that overlap the report
+window (or today, for the current-status column), and each row is parsed
+once and folded into its member's totals.
+
+Per member:
+- total_leaves_taken: approved days overlapping the member's report period
+- leaves_by_type: those days grouped by vacation type
+- leaves_details: the individual approved requests behind the totals
+- current_status: 'On Leave' if an approved request covers today, else 'Present'
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from .models import Employee
+from .calculation import calculate_date_range
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class TeamStatsEngine:
+    """Computes dashboard team statistics with a constant number of queries."""
+
+    def __init__(self, leave_request_repository):
+        self.leave_request_repository = leave_request_repository
+
+    @staticmethod
+    def member_period(member: Employee, filter_type: str,
+                      period_start: date, period_end: date) -> Tuple[date, date]:
+        """
+        Report period for one member.
+
+        For 'full_year' each member is reported over their own contract period;
+        other filters use the manager's period.
+        """
+        if filter_type == 'full_year':
+            return calculate_date_range('full_year', None, None, _parse_date(member.start_date))
+        return period_start, period_end
+
+    def build(self, members: List[Employee], filter_type: str, period_start: date, period_end: date,
+              today: Optional[date] = None) -> Dict[str, dict]:
+        """
+        Compute statistics for every member.
+
+        Returns:
+            Dict keyed by employee ID with total_leaves_taken, leaves_by_type,
+            leaves_details and current_status.
+        """
+        today = today or date.today()
+        periods = {m.id: self.member_period(m, filter_type, period_start, period_end) for m in members}
+        stats = {
+            m.id: {
+                'total_leaves_taken': 0,
+                'leaves_by_type': {},
+                'leaves_details': [],
+                'current_status': 'Present'
+            }
+            for m in members
+        }
+        if not members:
+            return stats
+
+        # One window covering every member's period and today
+        window_start = min([start for start, _ in periods.values()] + [today])
+        window_end = max([end for _, end in periods.values()] + [today])
+        requests = self.leave_request_repository.get_approved_overlapping(
+            list(stats), window_start.isoformat(), window_end.isoformat()
+        )
+
+        for r in requests:
+            member_stats = stats[r.employee_id]
+            req_start = _parse_date(r.start_date)
+            req_end = _parse_date(r.end_date)
+
+            if req_start <= today <= req_end:
+                member_stats['current_status'] = 'On Leave'
+
+            member_start, member_end = periods[r.employee_id]
+            if req_start <= member_end and req_end >= member_start:
+                member_stats['total_leaves_taken'] += r.duration
+                by_type = member_stats['leaves_by_type']
+                by_type[r.vacation_type] = by_type.get(r.vacation_type, 0) + r.duration
+                member_stats['leaves_details'].append({
+                    'type': r.vacation_type,
+                    'start_date': r.start_date,
+                    'end_date': r.end_date,
+                    'duration': r.duration
+                })
+
+        return stats
@@ -0,0 +1,105 @@
+"""
+Tests for the in-app scheduler's leader election and daily job claims.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import asyncio
+from datetime import datetime, time
+
+import pytest
+
+from backend.app_scheduler import AppScheduler, ScheduledJob
+
+LOCK = "test_scheduler"
+
+
+@pytest.fixture
+def runs(test_client):
+    from backend.database import SessionLocal, SchedulerLockModel, ScheduledJobModel
+
+    calls = []
+    yield calls
+    db = SessionLocal()
+    try:
+        db.query(SchedulerLockModel).filter(SchedulerLockModel.name == LOCK).delete()
+        db.query(ScheduledJobModel).filter(ScheduledJobModel.name.like("test_%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _scheduler(name, calls, lock_ttl=60.0, fail=False):
+    def job():
+        calls.append(name)
+        if fail:
+            raise RuntimeError("boom")
+    return AppScheduler([ScheduledJob("test_daily", time(8, 0), job)], lock_ttl=lock_ttl,
+                        lock_name=LOCK, instance_id=name)
+
+
+async def _tick(scheduler, now):
+    tasks = await scheduler.tick(now)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+def test_only_the_leader_runs_a_job_once_per_day(runs):
+    a, b = _scheduler("worker-a", runs), _scheduler("worker-b", runs)
+
+    async def scenario():
+        await _tick(a, datetime(2025, 3, 1, 7, 59))
+        await _tick(b, datetime(2025, 3, 1, 7, 59))
+        assert a.is_leader and not b.is_leader and runs == []
+
+        for _ in range(2):
+            await _tick(a, datetime(2025, 3, 1, 8, 0))
+            await _tick(b, datetime(2025, 3, 1, 8, 0))
+        assert runs == ["worker-a"]
+
+        # The leader shuts down: the other worker takes over, but today's run is done
+        await a.stop()
+        await _tick(b, datetime(2025, 3, 1, 9, 0))
+        assert b.is_leader and runs == ["worker-a"]
+
+        await _tick(b, datetime(2025, 3, 2, 8, 0))
+        assert runs == ["worker-a", "worker-b"]
+
+    asyncio.run(scenario())
+
+
+def test_expired_lease_is_taken_over_and_errors_recorded(runs):
+    from backend.database import SessionLocal
+    from backend.db_repositories import DBSchedulerRepository
+
+    a = _scheduler("worker-a", runs, lock_ttl=0)
+    b = _scheduler("worker-b", runs, fail=True)
+
+    async def scenario():
+        await _tick(a, datetime(2025, 3, 1, 7, 0))
+        # worker-a stops renewing (e.g. the process died) and its lease lapses
+        await _tick(b, datetime(2025, 3, 1, 8, 0))
+        assert b.is_leader and runs == ["worker-b"]
+
+    asyncio.run(scenario())
+
+    db = SessionLocal()
+    try:
+        status = b.status(DBSchedulerRepository(db))
+    finally:
+        db.close()
+    assert status["leader"]["instance_id"] == "worker-b"
+    job = status["jobs"][0]
+    assert job["last_run_date"] == "2025-03-01" and job["last_error"] == "boom"
+
+
+def test_status_endpoint_requires_admin(test_client, admin_token):
+    response = test_client.get("/api/admin/scheduler", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    body = response.json()
+    assert {job["name"] for job in body["jobs"]} == {"audit_retention", "digest_purge", "contract_renewals", "contract_notifications"}
+    assert body["running"] is False
+
+    assert test_client.get("/api/admin/scheduler").status_code == 401
@@ -0,0 +1,163 @@
+"""
+Tests for audit retention: archiving old entries into monthly segments and
+reading them back through the audit log view.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.audit import build_audit_log
+from backend.audit_archive import AuditArchive
+
+CUTOFF = datetime(2020, 3, 1)
+
+
+def _seed(db, timestamps):
+    rows = []
+    for i, timestamp in enumerate(timestamps):
+        row = build_audit_log("test_archive", "system", f"ARCHIVE-{i}")
+        row.timestamp = timestamp
+        db.add(row)
+        rows.append(row)
+    db.commit()
+    return rows
+
+
+def _hot_count(db):
+    from backend.database import AuditLogModel
+    return db.query(AuditLogModel).filter(AuditLogModel.action == "test_archive").count()
+
+
+@pytest.fixture
+def db(test_client):
+    from backend.database import SessionLocal, AuditLogModel
+
+    db = SessionLocal()
+    yield db
+    db.query(AuditLogModel).filter(AuditLogModel.action == "test_archive").delete()
+    db.commit()
+    db.close()
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    from backend import main
+
+    archive = AuditArchive(tmp_path / "audit_archive")
+    monkeypatch.setattr(main, "audit_archive", archive)
+    return archive
+
+
+def test_archive_moves_old_rows_once(db, archive):
+    _seed(db, [datetime(2020, 1, 10), datetime(2020, 1, 20), datetime(2020, 2, 5), CUTOFF + timedelta(days=1)])
+
+    assert archive.archive(db, CUTOFF) == 3
+    assert _hot_count(db) == 1
+    assert archive.months() == ["2020-01", "2020-02"]
+    index = archive.load_index("2020-01")
+    assert index["rows"] == 2 and index["actions"] == {"test_archive": 2}
+
+    # A rerun with new old rows appends them without duplicating the archived ones
+    _seed(db, [datetime(2020, 1, 25)])
+    assert archive.archive(db, CUTOFF) == 1
+    assert archive.load_index("2020-01")["rows"] == 3
+    assert sorted(log.entity_id for log in archive.iter_segment("2020-01")) == ["ARCHIVE-0", "ARCHIVE-0", "ARCHIVE-1"]
+    assert archive.count(action="test_archive") == 4
+
+
+def test_interrupted_run_is_repaired(db, archive):
+    _seed(db, [datetime(2020, 1, 10)])
+    archive.archive(db, CUTOFF)
+
+    # A partial member written after the index was last updated
+    path = archive.segment_path("2020-01")
+    with open(path, 'ab') as f:
+        f.write(b"\x1f\x8b\x08 partial")
+    assert [log.entity_id for log in archive.iter_segment("2020-01")] == ["ARCHIVE-0"]
+
+    _seed(db, [datetime(2020, 1, 11)])
+    assert archive.archive(db, CUTOFF) == 1
+    assert [log.entity_id for log in archive.iter_segment("2020-01")] == ["ARCHIVE-0", "ARCHIVE-0"]
+
+
+def test_audit_view_reads_archived_entries(db, archive, test_client, admin_token):
+    _seed(db, [datetime(2020, 1, 1) + timedelta(days=i) for i in range(4)] + [CUTOFF + timedelta(days=i) for i in range(3)])
+    archive.archive(db, CUTOFF)
+    assert _hot_count(db) == 3
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    url = "/api/admin/audit-logs?action=test_archive&count=exact"
+
+    recent = test_client.get(f"{url}&start_date=2020-03-01", headers=headers).json()
+    assert recent["total"] == 3 and recent["includes_archive"] is False
+
+    # An open-ended range reaches the archive
+    default_view = test_client.get(url, headers=headers).json()
+    assert default_view["total"] == 7 and default_view["includes_archive"] is True
+    assert test_client.get("/api/admin/audit-logs?action=test_archive", headers=headers).json()["total"] == 7
+    assert test_client.get(f"{url}&offset=2", headers=headers).status_code == 400
+
+    everything = test_client.get(f"{url}&start_date=2019-12-01", headers=headers).json()
+    assert everything["total"] == 7 and everything["includes_archive"] is True
+    assert everything["logs"] == default_view["logs"]
+    timestamps = [log["timestamp"] for log in everything["logs"]]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    ids, cursor = [], None
+    while True:
+        page = test_client.get(f"{url}&start_date=2019-12-01&limit=2" + (f"&cursor={cursor}" if cursor else ""),
+                               headers=headers).json()
+        ids += [log["id"] for log in page["logs"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert ids == [log["id"] for log in everything["logs"]]
+
+    january = test_client.get(f"{url}&start_date=2020-01-02&end_date=2020-01-03", headers=headers).json()
+    assert [log["timestamp"][:10] for log in january["logs"]] == ["2020-01-03", "2020-01-02"]
+
+
+def test_export_includes_archived_months(db, archive, test_client, admin_token):
+    import json
+
+    _seed(db, [datetime(2020, 1, 5), datetime(2020, 2, 5), CUTOFF + timedelta(days=1)])
+    archive.archive(db, CUTOFF)
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    for query in ("action=test_archive&start_date=2019-12-01", "action=test_archive"):
+        response = test_client.get(f"/api/admin/audit-logs/export?{query}", headers=headers)
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["timestamp"][:10] for row in rows] == ["2020-01-05", "2020-02-05", "2020-03-02"]
+
+    response = test_client.get("/api/admin/audit-logs/export?action=test_archive&start_date=2020-02-01",
+                               headers=headers)
+    assert [json.loads(line)["timestamp"][:10] for line in response.text.splitlines()] == ["2020-02-05", "2020-03-02"]
+
+
+def test_timeline_continues_into_the_archive(db, archive, test_client, admin_token):
+    from backend.database import AuditLogModel
+
+    for i, timestamp in enumerate([datetime(2020, 1, 5), datetime(2020, 2, 5), CUTOFF + timedelta(days=1)]):
+        row = build_audit_log("test_archive", "leave_request", "ARCHIVE-TL", details={"new_status": f"S{i}"})
+        row.timestamp = timestamp
+        db.add(row)
+    db.commit()
+    archive.archive(db, CUTOFF)
+    assert db.query(AuditLogModel).filter(AuditLogModel.entity_id == "ARCHIVE-TL").count() == 1
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    statuses, cursor = [], None
+    while True:
+        page = test_client.get("/api/admin/audit-logs/timeline/leave_request/ARCHIVE-TL?limit=1"
+                               + (f"&cursor={cursor}" if cursor else ""), headers=headers).json()
+        statuses += [event["details"]["new_status"] for event in page["events"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert statuses == ["S0", "S1", "S2"]
@@ -0,0 +1,316 @@
+"""
+Tests for the admin audit log view: keyset paging and capped counts.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.audit import build_audit_log
+
+
+@pytest.fixture(scope="module")
+def seeded_logs(test_client):
+    """Seven entries of one action; three share a timestamp so paging must break ties on id."""
+    from backend.database import SessionLocal, AuditLogModel
+
+    base = datetime(2024, 5, 1, 12, 0, 0)
+    db = SessionLocal()
+    try:
+        for i, offset in enumerate([0, 0, 0, 1, 2, 3, 4]):
+            row = build_audit_log("test_keyset", "system", f"KEYSET-{i}")
+            row.timestamp = base + timedelta(seconds=offset)
+            db.add(row)
+        db.commit()
+        yield
+        db.query(AuditLogModel).filter(AuditLogModel.action == "test_keyset").delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _get(test_client, admin_token, query):
+    response = test_client.get(f"/api/admin/audit-logs?action=test_keyset&{query}",
+                               headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200, response.json()
+    return response.json()
+
+
+def test_cursor_pages_cover_every_row_once(test_client, admin_token, seeded_logs):
+    everything = _get(test_client, admin_token, "limit=100")
+    assert everything["total"] == 7 and everything["next_cursor"] is None
+
+    ids, cursor = [], None
+    while True:
+        page = _get(test_client, admin_token, "limit=2" + (f"&cursor={cursor}" if cursor else ""))
+        ids += [log["id"] for log in page["logs"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert ids == [log["id"] for log in everything["logs"]]
+
+    timestamps = [log["timestamp"] for log in everything["logs"]]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+
+def test_count_modes(test_client, admin_token, seeded_logs, monkeypatch):
+    from backend import main
+
+    assert _get(test_client, admin_token, "count=none")["total"] is None
+    assert _get(test_client, admin_token, "count=exact")["total"] == 7
+
+    monkeypatch.setattr(main, "AUDIT_LOG_COUNT_CAP", 5)
+    capped = _get(test_client, admin_token, "limit=1")
+    assert capped["total"] == 5 and capped["total_capped"] is True
+    assert _get(test_client, admin_token, "count=exact")["total"] == 7
+
+
+def test_invalid_cursor_and_count_rejected(test_client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    assert test_client.get("/api/admin/audit-logs?cursor=bm90LWEtY3Vyc29y", headers=headers).status_code == 400
+    assert test_client.get("/api/admin/audit-logs?count=maybe", headers=headers).status_code == 400
+
+
+def test_export_streams_every_matching_row(test_client, admin_token, seeded_logs):
+    import csv
+    import io
+    import json
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = test_client.get("/api/admin/audit-logs/export?action=test_keyset", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 7
+    assert [row["timestamp"] for row in rows] == sorted(row["timestamp"] for row in rows)
+
+    response = test_client.get("/api/admin/audit-logs/export?action=test_keyset&format=csv", headers=headers)
+    assert response.status_code == 200 and "attachment" in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 7 and rows[0]["action"] == "test_keyset"
+
+    assert test_client.get("/api/admin/audit-logs/export?format=xml", headers=headers).status_code == 400
+    assert test_client.get("/api/admin/audit-logs/export").status_code == 401
+
+
+def test_export_is_written_in_chunks():
+    from backend.audit import iter_audit_export
+
+    logs = [build_audit_log("test_keyset", "system", f"CHUNK-{i}") for i in range(5)]
+    chunks = list(iter_audit_export(logs, "csv", chunk_rows=2))
+    assert len(chunks) == 3
+    assert "".join(chunks).count("CHUNK-") == 5
+
+
+@pytest.fixture
+def leave_history(test_client):
+    """A leave request's life cycle and an unrelated entry about its employee."""
+    from backend.database import SessionLocal, AuditLogModel
+
+    base = datetime(2024, 6, 1, 9, 0, 0)
+    entries = [
+        ("leave_request_created", "leave_request", "9042", {"employee_id": "IAU-T23", "vacation_type": "annual"}),
+        ("leave_request_approved", "leave_request", "9042",
+         {"employee_id": "IAU-T23", "previous_status": "Pending", "new_status": "Approved", "vacation_type": "annual"}),
+        ("employee_updated", "employee", "IAU-T23", {"updated_fields": ["phone"]}),
+        ("leave_request_approved", "leave_request", "9043",
+         {"employee_id": "IAU-T99", "previous_status": "Pending", "new_status": "Approved", "vacation_type": "sick"}),
+    ]
+    db = SessionLocal()
+    try:
+        for i, (action, entity_type, entity_id, details) in enumerate(entries):
+            row = build_audit_log(action, entity_type, entity_id, details=details)
+            row.timestamp = base + timedelta(minutes=i)
+            db.add(row)
+        db.commit()
+        yield
+        db.query(AuditLogModel).filter(AuditLogModel.entity_id.in_(["9042", "9043", "IAU-T23"])).delete(
+            synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_detail_fields_are_filterable(test_client, admin_token, leave_history):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = test_client.get("/api/admin/audit-logs?employee_id=IAU-T23&new_status=Approved", headers=headers)
+    assert response.status_code == 200
+    logs = response.json()["logs"]
+    assert [(log["action"], log["entity_id"]) for log in logs] == [("leave_request_approved", "9042")]
+
+    sick = test_client.get("/api/admin/audit-logs?vacation_type=sick&count=exact", headers=headers).json()
+    assert sick["total"] == 1 and sick["logs"][0]["details"]["employee_id"] == "IAU-T99"
+
+
+def test_entity_timeline(test_client, admin_token, leave_history):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    leave = test_client.get("/api/admin/audit-logs/timeline/leave_request/9042", headers=headers).json()
+    assert [event["action"] for event in leave["events"]] == ["leave_request_created", "leave_request_approved"]
+
+    actions, cursor = [], None
+    while True:
+        page = test_client.get("/api/admin/audit-logs/timeline/employee/IAU-T23?limit=1"
+                               + (f"&cursor={cursor}" if cursor else ""), headers=headers).json()
+        actions += [event["action"] for event in page["events"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert actions == ["leave_request_created", "leave_request_approved", "employee_updated"]
+
+
+def test_detail_columns_backfill(test_client):
+    import json
+    from backend.database import SessionLocal, AuditLogModel
+    from backend.migrations.extract_audit_details import upgrade
+
+    db = SessionLocal()
+    try:
+        row = AuditLogModel(action="test_backfill", entity_type="leave_request", entity_id="9044",
+                            details=json.dumps({"employee_id": "IAU-T44", "new_status": "Rejected"}))
+        db.add(row)
+        db.commit()
+        assert row.employee_id is None
+
+        upgrade()
+        db.refresh(row)
+        assert (row.employee_id, row.new_status, row.previous_status) == ("IAU-T44", "Rejected", None)
+        db.delete(row)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_client_values_are_interned(test_client, admin_token):
+    from backend.audit_lookups import user_agents
+    from backend.database import SessionLocal, AuditLogModel
+    from backend.tests.conftest import ADMIN_EMAIL, ADMIN_PASSWORD
+
+    agent = "TestBrowser/24.0 (interning)"
+    misses = user_agents.misses
+    for _ in range(3):
+        response = test_client.post("/api/token", data={"username": ADMIN_EMAIL, "password": ADMIN_PASSWORD},
+                                    headers={"User-Agent": agent, "X-Real-IP": "10.24.0.1"})
+        assert response.status_code == 200
+    assert user_agents.misses == misses + 1
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    clients = test_client.get("/api/admin/audit-logs/clients", headers=headers).json()["clients"]
+    assert {"value": agent, "count": 3} in clients
+    # X-Real-IP is ignored: the test client is not a trusted proxy
+    by_ip = test_client.get("/api/admin/audit-logs/clients?by=ip_address", headers=headers).json()["clients"]
+    assert "10.24.0.1" not in [client["value"] for client in by_ip]
+
+    logs = test_client.get("/api/admin/audit-logs?action=user_login&limit=1", headers=headers).json()["logs"]
+    assert logs[0]["user_agent"] == agent and logs[0]["ip_address"] == "testclient"
+
+    db = SessionLocal()
+    try:
+        row = db.query(AuditLogModel).filter(AuditLogModel.id == logs[0]["id"]).one()
+        assert row.user_agent is None and row.user_agent_id is not None
+    finally:
+        db.close()
+
+
+def test_legacy_client_values_migrated(test_client):
+    from backend.database import SessionLocal, AuditLogModel
+    from backend.migrations.intern_audit_client_values import upgrade
+
+    db = SessionLocal()
+    try:
+        row = AuditLogModel(action="test_legacy_client", entity_type="user", entity_id="legacy",
+                            ip_address="10.24.0.2", user_agent="LegacyBrowser/1.0")
+        db.add(row)
+        db.commit()
+
+        upgrade()
+        db.refresh(row)
+        assert row.ip_address is None and row.user_agent is None
+        assert (row.ip_address_ref.value, row.user_agent_ref.value) == ("10.24.0.2", "LegacyBrowser/1.0")
+        db.delete(row)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_proxy_headers_trusted_only_from_configured_proxies(monkeypatch):
+    import ipaddress
+    from starlette.requests import Request
+    from backend import audit
+
+    def request(client_ip, headers):
+        return Request({"type": "http", "client": (client_ip, 5000),
+                        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+    monkeypatch.setattr(audit, "TRUSTED_PROXIES", (ipaddress.ip_network("172.16.0.0/12"),))
+    forwarded = {"X-Forwarded-For": "10.24.0.1, 172.18.0.3"}
+    assert audit.get_client_ip(request("172.18.0.3", forwarded)) == "10.24.0.1"
+    assert audit.get_client_ip(request("172.18.0.3", {"X-Real-IP": "10.24.0.2"})) == "10.24.0.2"
+    assert audit.get_client_ip(request("203.0.113.9", forwarded)) == "203.0.113.9"
+
+
+def test_user_agent_interned_by_writer_not_request(monkeypatch):
+    from starlette.requests import Request
+    from backend.audit import AuditWriter, build_audit_log, USER_AGENT_MAX_LENGTH
+    from backend.audit_lookups import user_agents
+    from backend.database import SessionLocal, AuditLogModel
+
+    agent = "LongBrowser/1.0  " + "x" * 2000
+    request = Request({"type": "http", "client": ("198.51.100.7", 5000), "headers": [(b"user-agent", agent.encode())]})
+    misses = user_agents.misses
+    row = build_audit_log("test_interning", "system", "UA", request=request)
+    assert user_agents.misses == misses and row.user_agent_id is None
+    assert row.user_agent == ("LongBrowser/1.0 " + "x" * 2000)[:USER_AGENT_MAX_LENGTH]
+
+    AuditWriter().submit(row)
+    db = SessionLocal()
+    try:
+        stored = db.query(AuditLogModel).filter(AuditLogModel.action == "test_interning").one()
+        assert stored.user_agent is None and stored.user_agent_ref.value == row.user_agent
+        assert stored.ip_address_ref.value == "198.51.100.7"
+        db.delete(stored)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_stored_values_keep_ids_interned_earlier(test_client):
+    from backend.audit import build_audit_log
+    from backend.audit_lookups import ip_addresses, intern_stored_values
+    from backend.database import SessionLocal, AuditLogModel
+
+    db = SessionLocal()
+    try:
+        # Half-interned: the IP address has its id, the user agent is still text
+        row = build_audit_log("test_interning", "system", "HALF")
+        row.ip_address_id = ip_addresses.id_for("192.0.2.44")
+        row.user_agent = "HalfInterned/1.0"
+        db.add(row)
+        db.commit()
+
+        assert intern_stored_values() >= 1
+        db.refresh(row)
+        assert row.ip_address is None and row.ip_address_ref.value == "192.0.2.44"
+        assert row.user_agent is None and row.user_agent_ref.value == "HalfInterned/1.0"
+        db.delete(row)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_failed_logins_are_counted_by_client_before_interning(test_client, admin_token):
+    from backend.tests.conftest import ADMIN_EMAIL
+
+    agent = "FailedLoginBrowser/3.0"
+    for _ in range(2):
+        response = test_client.post("/api/token", data={"username": ADMIN_EMAIL, "password": "wrong-password"},
+                                    headers={"User-Agent": agent})
+        assert response.status_code == 401
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    clients = test_client.get("/api/admin/audit-logs/clients?action=user_login_failed",
+                              headers=headers).json()["clients"]
+    assert {"value": agent, "count": 2} in clients
@@ -0,0 +1,75 @@
+"""
+Tests for the buffered audit log writer.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import time
+
+import pytest
+
+from backend import audit
+from backend.audit import AuditWriter, build_audit_log, log_audit
+
+
+def _count(entity_id):
+    from backend.database import SessionLocal, AuditLogModel
+
+    db = SessionLocal()
+    try:
+        return db.query(AuditLogModel).filter(AuditLogModel.entity_id == entity_id).count()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def writer(test_client):
+    writer = AuditWriter(batch_size=3, flush_interval=60)
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def test_rows_are_buffered_until_batch_size(writer):
+    for _ in range(2):
+        writer.submit(build_audit_log("test_buffered", "system", "AUDIT-BATCH"))
+    assert writer.pending() == 2 and _count("AUDIT-BATCH") == 0
+
+    writer.submit(build_audit_log("test_buffered", "system", "AUDIT-BATCH"))
+    deadline = time.monotonic() + 5
+    while _count("AUDIT-BATCH") < 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _count("AUDIT-BATCH") == 3 and writer.pending() == 0
+
+
+def test_stop_flushes_buffer(writer):
+    writer.submit(build_audit_log("test_buffered", "system", "AUDIT-STOP"))
+    assert _count("AUDIT-STOP") == 0
+    writer.stop()
+    assert _count("AUDIT-STOP") == 1
+
+
+def test_durable_actions_commit_immediately(writer, monkeypatch):
+    from backend.database import SessionLocal
+
+    monkeypatch.setattr(audit, "audit_writer", writer)
+    db = SessionLocal()
+    try:
+        log_audit(db, audit.ACTION_USER_LOGIN_FAILED, "user", "AUDIT-DURABLE")
+        log_audit(db, audit.ACTION_USER_LOGIN, "user", "AUDIT-DURABLE")
+        log_audit(db, audit.ACTION_USER_LOGIN, "user", "AUDIT-DURABLE", durable=True)
+    finally:
+        db.close()
+    assert _count("AUDIT-DURABLE") == 2 and writer.pending() == 1
+
+
+def test_failed_flush_keeps_rows(test_client):
+    def broken_session():
+        raise RuntimeError("database unavailable")
+
+    writer = AuditWriter(session_factory=broken_session, max_buffer=2)
+    for i in range(3):
+        writer.submit(build_audit_log("test_buffered", "system", f"AUDIT-FAIL-{i}"))
+    assert [row["entity_id"] for row in writer._buffer] == ["AUDIT-FAIL-1", "AUDIT-FAIL-2"]
@@ -0,0 +1,275 @@
+"""
+Tests for the persistent leave balance ledger.
+
+Ledger balances must match calculate_vacation_balance /
+calculate_permanent_vacation_balance, and stay current as requests are
+approved or un-approved.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import pytest
+from datetime import date, timedelta
+from backend.models import Employee, LeaveRequest, PortalSettings
+from backend.balance_ledger import BalanceLedger
+from backend.calculation import calculate_vacation_balance, calculate_permanent_vacation_balance
+
+
+class _FakeLeaveBalanceRepository:
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, employee_id, period_start):
+        return self.rows.get((employee_id, period_start))
+
+    def get_for_employees(self, employee_ids):
+        return [row for (emp_id, _), row in self.rows.items() if emp_id in employee_ids]
+
+    def upsert_many(self, entries, commit=True):
+        for entry in entries:
+            self.rows[(entry.employee_id, entry.period_start)] = entry
+
+    def delete_by_employee(self, employee_id):
+        self.rows = {key: row for key, row in self.rows.items() if key[0] != employee_id}
+
+    def delete_all(self):
+        self.rows = {}
+
+
+class _FakeLeaveRequestRepository:
+    def __init__(self, requests):
+        self.requests = requests
+
+    def get_approved(self, employee_id=None):
+        return [
+            r for r in self.requests
+            if r.status == 'Approved' and (employee_id is None or r.employee_id == employee_id)
+        ]
+
+
+class _FakePortalSettingsRepository:
+    def get(self):
+        return PortalSettings(max_carry_over_days=10)
+
+
+def _make_employee(emp_id, start_date, employee_type='contractor'):
+    return Employee(
+        id=emp_id,
+        user_id="00000000-0000-0000-0000-000000000000",
+        first_name_ar="test",
+        last_name_ar="test",
+        first_name_en="Test",
+        last_name_en=emp_id,
+        position_ar="موظف",
+        position_en="Employee",
+        unit_id=1,
+        start_date=start_date,
+        employee_type=employee_type,
+    )
+
+
+def _make_request(req_id, emp_id, start_date, duration, status='Approved'):
+    return LeaveRequest(
+        id=req_id,
+        employee_id=emp_id,
+        vacation_type="Annual",
+        start_date=start_date,
+        end_date=start_date,
+        duration=duration,
+        status=status,
+        balance_used=duration,
+    )
+
+
+EMPLOYEES = [
+    _make_employee("EMP-001", "2024-01-01"),
+    _make_employee("EMP-002", "2023-05-20"),
+    _make_employee("EMP-003", "2022-03-01", employee_type='permanent'),
+    _make_employee("EMP-004", "2099-01-01"),
+]
+
+
+@pytest.fixture
+def ledger():
+    requests = [
+        _make_request(1, "EMP-001", "2025-12-01", 3),
+        _make_request(2, "EMP-001", "2026-02-01", 2),
+        _make_request(3, "EMP-002", "2026-01-10", 5),
+        _make_request(4, "EMP-003", "2025-06-01", 7),
+        _make_request(5, "EMP-003", "2026-01-05", 2),
+        _make_request(6, "EMP-003", "2026-02-05", 1, status='Rejected'),
+    ]
+    return BalanceLedger(
+        _FakeLeaveBalanceRepository(),
+        _FakeLeaveRequestRepository(requests),
+        _FakePortalSettingsRepository(),
+    )
+
+
+def _expected(employee, ledger):
+    approved = ledger.leave_request_repository.get_approved()
+    if employee.employee_type == 'permanent':
+        return calculate_permanent_vacation_balance(employee, approved, 10)
+    return calculate_vacation_balance(employee, approved), None
+
+
+def test_ledger_matches_calculation_functions(ledger):
+    balances = ledger.get_balances(EMPLOYEES)
+    for emp in EMPLOYEES:
+        assert balances[emp.id] == _expected(emp, ledger)
+        assert ledger.get_balance(emp) == _expected(emp, ledger)
+    assert ledger.check_consistency(EMPLOYEES) == []
+
+
+def test_refresh_after_approval_updates_balance(ledger):
+    employee = EMPLOYEES[0]
+    before, _ = ledger.get_balance(employee)
+
+    ledger.leave_request_repository.requests.append(
+        _make_request(99, employee.id, date.today().isoformat(), 1)
+    )
+    # Stale until the employee's row is refreshed
+    assert ledger.check_consistency([employee])[0]["issue"] == "mismatch"
+
+    ledger.refresh_employee(employee)
+    after, _ = ledger.get_balance(employee)
+    assert after == _expected(employee, ledger)[0]
+    assert after <= before
+
+
+def test_stale_earned_snapshot_is_recomputed(ledger):
+    employee = EMPLOYEES[1]
+    entry = ledger.refresh_employee(employee, today=date.today() - timedelta(days=1))
+    assert entry.earned_as_of != date.today().isoformat()
+    assert ledger.balance_from_entry(employee, entry) == _expected(employee, ledger)
+
+
+def test_check_reports_missing_rows_and_rebuild_fixes_them(ledger):
+    problems = ledger.check_consistency(EMPLOYEES)
+    assert {p["employee_id"] for p in problems if p["issue"] == "missing"} == {e.id for e in EMPLOYEES}
+
+    assert ledger.rebuild(EMPLOYEES) == len(EMPLOYEES)
+    assert ledger.check_consistency(EMPLOYEES) == []
+
+
+# ==========================================
+# Integration - ledger follows the approval workflow
+# ==========================================
+
+def test_ledger_consistent_after_api_approval(test_client, admin_token):
+    from backend.database import SessionLocal
+    from backend.dependencies import get_employee_service
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": "ledger_employee@test.com",
+            "password": "LedgerPass123!",
+            "role": "employee",
+            "first_name_ar": "موظف",
+            "last_name_ar": "سجل",
+            "first_name_en": "Ledger",
+            "last_name_en": "Employee",
+            "position_ar": "موظف",
+            "position_en": "Staff Member",
+            "unit_id": 1,
+            "manager_id": "IAU-001",
+            "start_date": (date.today() - timedelta(days=120)).isoformat(),
+        },
+        headers=headers
+    )
+    assert response.status_code == 201, response.json()
+    employee_id = response.json()["id"]
+
+    token = test_client.post(
+        "/api/token",
+        data={"username": "ledger_employee@test.com", "password": "LedgerPass123!"}
+    ).json()["access_token"]
+    start = date.today() - timedelta(days=10)
+    response = test_client.post(
+        "/api/requests",
+        json={"vacation_type": "annual", "start_date": start.isoformat(), "end_date": start.isoformat()},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 201, response.json()
+    request_id = response.json()["id"]
+    duration = response.json()["duration"]
+
+    db = SessionLocal()
+    try:
+        service = get_employee_service(db)
+        before = service.get_employee_by_id(employee_id).vacation_balance
+
+        response = test_client.put(f"/api/requests/{request_id}", json={"status": "Approved"}, headers=headers)
+        assert response.status_code == 200
+
+        db.expire_all()
+        after = service.get_employee_by_id(employee_id).vacation_balance
+        assert after == round(max(0.0, before - duration), 2)
+
+        employees = service.employee_repository.get_all()
+        assert service.balance_ledger.check_consistency(employees) == []
+    finally:
+        db.close()
+
+
+def test_approval_rolls_back_when_ledger_refresh_fails(test_client, admin_token, monkeypatch):
+    from backend.database import SessionLocal
+    from backend.dependencies import get_leave_request_service
+    from backend.models import LeaveRequestUpdate
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": "ledger_rollback@test.com",
+            "password": "LedgerPass123!",
+            "role": "employee",
+            "first_name_ar": "موظف",
+            "last_name_ar": "سجل",
+            "first_name_en": "Ledger",
+            "last_name_en": "Rollback",
+            "position_ar": "موظف",
+            "position_en": "Staff Member",
+            "unit_id": 1,
+            "manager_id": "IAU-001",
+            "start_date": (date.today() - timedelta(days=120)).isoformat(),
+        },
+        headers=headers
+    )
+    assert response.status_code == 201, response.json()
+
+    token = test_client.post(
+        "/api/token",
+        data={"username": "ledger_rollback@test.com", "password": "LedgerPass123!"}
+    ).json()["access_token"]
+    start = date.today() + timedelta(days=30)
+    response = test_client.post(
+        "/api/requests",
+        json={"vacation_type": "annual", "start_date": start.isoformat(), "end_date": start.isoformat()},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 201, response.json()
+    request_id = response.json()["id"]
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("ledger unavailable")
+    monkeypatch.setattr(BalanceLedger, "compute_entry", fail)
+
+    db = SessionLocal()
+    try:
+        with pytest.raises(RuntimeError):
+            get_leave_request_service(db).update_leave_request(request_id, LeaveRequestUpdate(status="Approved"))
+    finally:
+        db.close()
+
+    # The status change must not be committed without its ledger update
+    db = SessionLocal()
+    try:
+        service = get_leave_request_service(db)
+        assert service.leave_request_repository.get_by_id(request_id).status == "Pending"
+    finally:
+        db.close()
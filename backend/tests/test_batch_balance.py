@@ -0,0 +1,239 @@
+"""
+Tests for the batch balance engine in EmployeeService.
+
+The batch path (get_employees) must produce exactly the same numbers as the
+per-employee calculation functions, while loading approved requests only once.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import pytest
+from uuid import uuid4
+from backend.models import Employee, LeaveRequest, User, PortalSettings
+from backend.services import EmployeeService
+from backend.calculation import calculate_vacation_balance, calculate_permanent_vacation_balance
+
+
+class _FakeUserRepository:
+    def __init__(self, users):
+        self.users = {u.id: u for u in users}
+        self.get_by_id_calls = 0
+
+    def get_by_id(self, user_id):
+        self.get_by_id_calls += 1
+        return self.users.get(user_id)
+
+
+class _FakeEmployeeRepository:
+    def __init__(self, employees, user_repository):
+        self.employees = employees
+        self.user_repository = user_repository
+
+    def get_all(self):
+        return list(self.employees)
+
+    def get_by_id(self, employee_id):
+        return next((e for e in self.employees if e.id == employee_id), None)
+
+    def get_all_with_users(self):
+        return [(e, self.user_repository.users.get(e.user_id)) for e in self.employees]
+
+    def get_by_id_with_user(self, employee_id):
+        employee = self.get_by_id(employee_id)
+        if not employee:
+            return None, None
+        return employee, self.user_repository.users.get(employee.user_id)
+
+    def get_by_ids_with_users(self, employee_ids):
+        return [pair for pair in self.get_all_with_users() if pair[0].id in employee_ids]
+
+    def get_subordinate_ids(self, manager_id, include_indirect=True):
+        return {e.id for e in self.employees if e.manager_id == manager_id}
+
+
+class _FakeLeaveRequestRepository:
+    def __init__(self, requests):
+        self.requests = requests
+        self.approved_calls = 0
+
+    def get_all(self):
+        return list(self.requests)
+
+    def get_approved(self, employee_id=None):
+        self.approved_calls += 1
+        return [
+            r for r in self.requests
+            if r.status == 'Approved' and (employee_id is None or r.employee_id == employee_id)
+        ]
+
+
+class _FakePortalSettingsRepository:
+    def get(self):
+        return PortalSettings(max_carry_over_days=10)
+
+
+def _make_employee(emp_id, user_id, start_date, employee_type='contractor'):
+    return Employee(
+        id=emp_id,
+        user_id=user_id,
+        first_name_ar="test",
+        last_name_ar="test",
+        first_name_en="Test",
+        last_name_en=emp_id,
+        position_ar="موظف",
+        position_en="Employee",
+        unit_id=1,
+        start_date=start_date,
+        employee_type=employee_type,
+    )
+
+
+def _make_request(req_id, emp_id, start_date, duration, status='Approved'):
+    return LeaveRequest(
+        id=req_id,
+        employee_id=emp_id,
+        vacation_type="Annual",
+        start_date=start_date,
+        end_date=start_date,
+        duration=duration,
+        status=status,
+        balance_used=duration,
+    )
+
+
+@pytest.fixture
+def service():
+    users = [User(id=uuid4(), email=f"user{i}@test.com", password_hash="x", role="employee") for i in range(4)]
+    employees = [
+        _make_employee("EMP-001", users[0].id, "2024-01-01"),
+        _make_employee("EMP-002", users[1].id, "2023-05-20"),
+        _make_employee("EMP-003", users[2].id, "2022-03-01", employee_type='permanent'),
+        _make_employee("EMP-004", users[3].id, "2099-01-01"),
+    ]
+    requests = [
+        _make_request(1, "EMP-001", "2025-12-01", 3),
+        _make_request(2, "EMP-001", "2026-02-01", 2),
+        _make_request(3, "EMP-001", "2026-03-01", 4, status='Pending'),
+        _make_request(4, "EMP-002", "2026-01-10", 5),
+        _make_request(5, "EMP-003", "2025-06-01", 7),
+        _make_request(6, "EMP-003", "2026-01-05", 2),
+        _make_request(7, "EMP-003", "2026-02-05", 1, status='Rejected'),
+    ]
+    user_repository = _FakeUserRepository(users)
+    return EmployeeService(
+        _FakeEmployeeRepository(employees, user_repository),
+        user_repository,
+        _FakeLeaveRequestRepository(requests),
+        _FakePortalSettingsRepository(),
+    )
+
+
+def test_batch_matches_calculation_functions(service):
+    all_requests = service.leave_request_repository.get_all()
+    approved = [r for r in all_requests if r.status == 'Approved']
+
+    for emp in service.get_employees():
+        source = service.employee_repository.get_by_id(emp.id)
+        if source.employee_type == 'permanent':
+            expected, carry_over = calculate_permanent_vacation_balance(source, approved, 10)
+            assert emp.carry_over_balance == carry_over
+        else:
+            expected = calculate_vacation_balance(source, approved)
+        assert emp.vacation_balance == expected
+
+
+def test_batch_matches_single_employee_path(service):
+    batch = {emp.id: emp for emp in service.get_employees()}
+    for emp_id, emp in batch.items():
+        single = service.get_employee_by_id(emp_id)
+        assert single == emp
+
+
+def test_batch_loads_approved_requests_once(service):
+    employees = service.get_employees()
+    assert len(employees) == 4
+    assert service.leave_request_repository.approved_calls == 1
+
+
+def test_batch_fills_user_details(service):
+    for emp in service.get_employees():
+        assert emp.email is not None
+        assert emp.role == "employee"
+    # User data comes from the joined employee query, not per-row lookups
+    assert service.user_repository.get_by_id_calls == 0
+
+
+def test_team_members_only_computes_the_team(service, monkeypatch):
+    for emp in service.employee_repository.employees[1:3]:
+        emp.manager_id = "EMP-001"
+    everyone = {emp.id: emp for emp in service.get_employees()}
+
+    def whole_organisation():
+        raise AssertionError("balances computed for every employee")
+
+    monkeypatch.setattr(service, "get_employees", whole_organisation)
+    team = service.get_team_members("EMP-001")
+    assert sorted(emp.id for emp in team) == ["EMP-002", "EMP-003"]
+    assert all(emp == everyone[emp.id] for emp in team)
+
+
+# ==========================================
+# Query count - /api/employees
+# ==========================================
+
+def _count_queries(fn):
+    from sqlalchemy import event
+    from backend.database import engine
+
+    statements = []
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_execute)
+    return len(statements)
+
+
+def _create_employee(test_client, admin_token, index):
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": f"batch_employee_{index}@test.com",
+            "password": "BatchPass123!",
+            "role": "employee",
+            "first_name_ar": "موظف",
+            "last_name_ar": "دفعة",
+            "first_name_en": "Batch",
+            "last_name_en": f"Employee{index}",
+            "position_ar": "موظف",
+            "position_en": "Staff Member",
+            "unit_id": 1,
+            "manager_id": "IAU-001",
+            "start_date": "2024-01-01",
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 201, response.json()
+
+
+def test_employee_listing_query_count_is_constant(test_client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    def list_employees():
+        response = test_client.get("/api/employees", headers=headers)
+        assert response.status_code == 200
+
+    _create_employee(test_client, admin_token, 1)
+    before = _count_queries(list_employees)
+
+    for index in range(2, 6):
+        _create_employee(test_client, admin_token, index)
+    after = _count_queries(list_employees)
+
+    assert after == before
@@ -0,0 +1,183 @@
+"""
+Tests for bulk approve/reject (/api/approvals/bulk).
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import json
+import pytest
+
+PASSWORD = "BulkPass123!"
+
+
+def _create_employee(test_client, admin_token, suffix, manager_id, role="employee"):
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": f"bulk_{suffix}@test.com",
+            "password": PASSWORD,
+            "role": role,
+            "first_name_ar": "موظف",
+            "last_name_ar": "جماعي",
+            "first_name_en": "Bulk",
+            "last_name_en": suffix,
+            "position_ar": "موظف",
+            "position_en": "Staff",
+            "unit_id": 1,
+            "manager_id": manager_id,
+            "start_date": "2024-01-01",
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 201, response.json()
+    return response.json()["id"]
+
+
+def _login(test_client, suffix):
+    response = test_client.post("/api/token", data={"username": f"bulk_{suffix}@test.com", "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def team(test_client, admin_token):
+    manager = _create_employee(test_client, admin_token, "manager", "IAU-001", role="manager")
+    member = _create_employee(test_client, admin_token, "member", manager)
+    outsider = _create_employee(test_client, admin_token, "outsider", "IAU-001")
+    return {"manager": manager, "member": member, "outsider": outsider}
+
+
+@pytest.fixture
+def leave_requests(team):
+    from backend.database import SessionLocal
+    from backend.db_repositories import DBLeaveRequestRepository
+    from backend.models import LeaveRequest
+
+    db = SessionLocal()
+    repo = DBLeaveRequestRepository(db)
+    specs = [
+        (team["member"], "2033-01-10", "Pending"),
+        (team["member"], "2033-02-10", "Pending"),
+        (team["member"], "2033-03-10", "Rejected"),
+        (team["outsider"], "2033-01-10", "Pending"),
+    ]
+    created = [
+        repo.add(LeaveRequest(id=0, employee_id=emp, vacation_type="Annual", start_date=day, end_date=day,
+                              duration=1, balance_used=1, status=status))
+        for emp, day, status in specs
+    ]
+    try:
+        yield created
+    finally:
+        for request in created:
+            repo.delete(request.id)
+        db.close()
+
+
+def test_bulk_approve_reports_each_item(test_client, team, leave_requests):
+    from backend.database import SessionLocal, AuditLogModel
+
+    ids = [r.id for r in leave_requests] + [999999]
+    response = test_client.post(
+        "/api/approvals/bulk",
+        json={"request_ids": ids, "status": "Approved"},
+        headers=_login(test_client, "manager")
+    )
+    assert response.status_code == 200
+    body = response.json()
+    results = {r["request_id"]: r for r in body["results"]}
+
+    assert [r["request_id"] for r in body["results"]] == ids
+    assert results[leave_requests[0].id]["success"] and results[leave_requests[1].id]["success"]
+    assert results[leave_requests[2].id]["error"] == "Request is already Rejected"
+    assert not results[leave_requests[3].id]["success"]  # outside the manager's team
+    assert results[999999]["error"] == "Request not found"
+    assert (body["succeeded"], body["failed"]) == (2, 3)
+
+    db = SessionLocal()
+    try:
+        audit_rows = db.query(AuditLogModel).filter(
+            AuditLogModel.entity_id.in_([str(leave_requests[0].id), str(leave_requests[1].id)]),
+            AuditLogModel.action == "leave_request_approved"
+        ).all()
+        assert len(audit_rows) == 2
+        assert all(json.loads(row.details)["bulk"] for row in audit_rows)
+    finally:
+        db.close()
+
+    member_requests = test_client.get(
+        "/api/requests", params={"employee_id": team["member"]}, headers=_login(test_client, "manager")
+    ).json()
+    statuses = {r["id"]: r["status"] for r in member_requests}
+    assert statuses[leave_requests[0].id] == "Approved"
+    assert statuses[leave_requests[1].id] == "Approved"
+
+
+def test_bulk_reject_stores_reason(test_client, admin_token, leave_requests):
+    response = test_client.post(
+        "/api/approvals/bulk",
+        json={"request_ids": [leave_requests[3].id], "status": "Rejected", "rejection_reason": "Term exams"},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["succeeded"] == 1
+
+    stored = test_client.get(f"/api/requests/{leave_requests[3].id}", headers={"Authorization": f"Bearer {admin_token}"}).json()
+    assert stored["status"] == "Rejected"
+    assert stored["rejection_reason"] == "Term exams"
+
+
+def test_bulk_validation(test_client, admin_token, team):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    assert test_client.post("/api/approvals/bulk", json={"request_ids": [1], "status": "Pending"}, headers=headers).status_code == 400
+    assert test_client.post("/api/approvals/bulk", json={"request_ids": [], "status": "Approved"}, headers=headers).status_code == 400
+    assert test_client.post(
+        "/api/approvals/bulk", json={"request_ids": [1], "status": "Approved"}, headers=_login(test_client, "member")
+    ).status_code == 403
+
+
+def test_send_batch_in_mock_mode():
+    from backend.email_service import EmailService
+    service = EmailService()
+    assert service.mock_mode
+    results = service.send_batch([("a@test.com", "S", "<p>1</p>"), ("b@test.com", "S", "<p>2</p>")])
+    assert [(r.to_email, r.success) for r in results] == [("a@test.com", True), ("b@test.com", True)]
+    assert service.send_batch([]) == []
+
+
+def test_request_decided_concurrently_is_not_decided_twice(test_client, leave_requests):
+    """Another decider rejects a request between the read and the write."""
+    from backend.database import SessionLocal, AuditLogModel, LeaveRequestModel
+    from backend.dependencies import get_leave_request_service
+
+    raced = leave_requests[1].id
+
+    def concurrent_reject(leave_request):
+        if leave_request.id == raced:
+            other = SessionLocal()
+            try:
+                other.query(LeaveRequestModel).filter(LeaveRequestModel.id == raced).update({"status": "Rejected"})
+                other.commit()
+            finally:
+                other.close()
+        return True
+
+    db = SessionLocal()
+    try:
+        service = get_leave_request_service(db)
+        results, _ = service.decide_leave_requests(
+            [leave_requests[0].id, raced], "Approved", authorize=concurrent_reject,
+            audit_row=lambda r, previous: AuditLogModel(action="test_race", entity_type="leave_request",
+                                                         entity_id=str(r.id))
+        )
+        assert [(r.success, r.error) for r in results] == [(True, None), (False, "Request is no longer Pending")]
+
+        assert db.query(LeaveRequestModel.status).filter(LeaveRequestModel.id == raced).scalar() == "Rejected"
+        audited = [row.entity_id for row in db.query(AuditLogModel).filter(AuditLogModel.action == "test_race")]
+        assert audited == [str(leave_requests[0].id)]
+        db.query(AuditLogModel).filter(AuditLogModel.action == "test_race").delete()
+        db.commit()
+    finally:
+        db.close()
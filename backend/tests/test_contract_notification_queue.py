@@ -0,0 +1,265 @@
+"""
+Tests for the contract notification due-date queue.
+
+Planned due dates must agree with evaluating the scheduler's conditions day
+by day, and the daily job must only act on the rows due today.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from backend.models import Employee, LeaveRequest, ContractNotificationDue
+from backend.balance_ledger import BalanceLedger
+from backend.notification_queue import (
+    ContractNotificationPlanner, plan_contract_notifications, is_critical,
+    NOTIFICATION_40_DAYS, NOTIFICATION_CRITICAL, NOTIFICATION_REPLAN
+)
+
+
+class _FakeQueueRepository:
+    def __init__(self):
+        self.rows = []
+
+    def replace_for_employees(self, employee_ids, rows, commit=True):
+        self.rows = [r for r in self.rows if r.employee_id not in employee_ids] + list(rows)
+
+    def delete_by_employee(self, employee_id):
+        self.rows = [r for r in self.rows if r.employee_id != employee_id]
+
+
+class _FakeLeaveBalanceRepository:
+    def __init__(self):
+        self.rows = {}
+
+    def upsert_many(self, entries, commit=True):
+        for entry in entries:
+            self.rows[(entry.employee_id, entry.period_start)] = entry
+
+    def delete_by_employee(self, employee_id):
+        self.rows = {key: row for key, row in self.rows.items() if key[0] != employee_id}
+
+
+class _FakeLeaveRequestRepository:
+    def __init__(self, requests):
+        self.requests = requests
+
+    def get_approved(self, employee_id=None):
+        return [r for r in self.requests if employee_id is None or r.employee_id == employee_id]
+
+
+def _make_employee(emp_id, start_date, employee_type='contractor', monthly=2.5):
+    return Employee(
+        id=emp_id,
+        user_id="00000000-0000-0000-0000-000000000000",
+        first_name_ar="test",
+        last_name_ar="test",
+        first_name_en="Test",
+        last_name_en=emp_id,
+        position_ar="موظف",
+        position_en="Employee",
+        unit_id=1,
+        start_date=start_date,
+        employee_type=employee_type,
+        monthly_vacation_earned=monthly,
+    )
+
+
+def _make_request(emp_id, start_date, duration):
+    return LeaveRequest(
+        id=1, employee_id=emp_id, vacation_type="Annual", start_date=start_date,
+        end_date=start_date, duration=duration, status="Approved", balance_used=duration,
+    )
+
+
+def _daily_scan(ledger, employee, entry, today):
+    """First day the scheduler's conditions hold, checked one day at a time."""
+    period_end = date.fromisoformat(entry.period_end)
+    reminder, critical = None, None
+    day = today
+    while day < period_end:
+        days_remaining = (period_end - day).days
+        balance, _ = ledger.balance_from_entry(employee, entry, day)
+        if reminder is None and days_remaining == 40:
+            reminder = day
+        if critical is None and is_critical(balance, days_remaining):
+            critical = day
+        day += timedelta(days=1)
+    return reminder, critical
+
+
+@pytest.mark.parametrize("start_date,monthly,requests,today", [
+    ("2025-01-10", 2.5, [], "2025-01-10"),
+    ("2024-03-20", 2.5, [("2025-02-01", 5)], "2025-03-01"),
+    ("2025-06-16", 3.0, [("2025-07-01", 10), ("2025-09-01", 4)], "2025-08-20"),
+    ("2025-01-10", 1.0, [], "2025-01-10"),  # Low accrual: critical only close to the end
+])
+def test_planned_dates_match_daily_evaluation(start_date, monthly, requests, today):
+    employee = _make_employee("EMP-Q", start_date, monthly=monthly)
+    approved = [_make_request("EMP-Q", d, n) for d, n in requests]
+    ledger = BalanceLedger(_FakeLeaveBalanceRepository(), _FakeLeaveRequestRepository(approved))
+    today = date.fromisoformat(today)
+    entry = ledger.compute_entry(employee, approved, 15, today)
+
+    rows = {r.notification_type: r for r in plan_contract_notifications(employee, entry, today)}
+    reminder, critical = _daily_scan(ledger, employee, entry, today)
+
+    assert rows.get(NOTIFICATION_40_DAYS) and rows[NOTIFICATION_40_DAYS].due_date == reminder.isoformat()
+    if critical:
+        assert rows[NOTIFICATION_CRITICAL].due_date == critical.isoformat()
+    else:
+        assert NOTIFICATION_CRITICAL not in rows
+    assert rows[NOTIFICATION_REPLAN].due_date == entry.period_end
+    assert {r.contract_end_date for r in rows.values()} == {entry.period_end}
+
+
+def test_past_reminder_not_planned_and_permanent_skipped():
+    employee = _make_employee("EMP-Q", "2025-01-10")
+    ledger = BalanceLedger(_FakeLeaveBalanceRepository(), _FakeLeaveRequestRepository([]))
+    today = date(2025, 11, 20)  # Period ends 2025-12-10
+    entry = ledger.compute_entry(employee, [], 15, today)
+    types = [r.notification_type for r in plan_contract_notifications(employee, entry, today)]
+    assert NOTIFICATION_40_DAYS not in types and NOTIFICATION_REPLAN in types
+
+    permanent = _make_employee("EMP-P", "2020-01-01", employee_type='permanent')
+    assert plan_contract_notifications(permanent, ledger.compute_entry(permanent, [], 15, today), today) == []
+
+
+def test_ledger_refresh_replans_employee():
+    queue = _FakeQueueRepository()
+    requests = []
+    ledger = BalanceLedger(
+        _FakeLeaveBalanceRepository(), _FakeLeaveRequestRepository(requests),
+        notification_planner=ContractNotificationPlanner(queue)
+    )
+    employee = _make_employee("EMP-Q", "2025-01-10")
+    today = date(2025, 2, 1)
+
+    ledger.refresh_employee(employee, today)
+    before = {r.notification_type: r.due_date for r in queue.rows}
+    assert set(before) == {NOTIFICATION_40_DAYS, NOTIFICATION_CRITICAL, NOTIFICATION_REPLAN}
+
+    # Approved leave lowers the balance, so the critical point moves later
+    requests.append(_make_request("EMP-Q", "2025-03-01", 5))
+    ledger.refresh_employee(employee, today)
+    after = {r.notification_type: r.due_date for r in queue.rows}
+    assert len(queue.rows) == 3
+    assert after[NOTIFICATION_40_DAYS] == before[NOTIFICATION_40_DAYS]
+    assert after[NOTIFICATION_CRITICAL] > before[NOTIFICATION_CRITICAL]
+
+    ledger.forget_employee("EMP-Q")
+    assert queue.rows == []
+
+
+def test_daily_job_pops_only_due_rows(test_client, admin_token):
+    from backend import notification_scheduler
+    from backend.database import SessionLocal
+    from backend.db_repositories import DBContractNotificationQueueRepository, DBSentNotificationRepository
+
+    # Contract period ends (at most) 40 days from today
+    start_date = date.today() + timedelta(days=40) - relativedelta(months=11)
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": "queue_contractor@test.com",
+            "password": "QueuePass123!",
+            "role": "employee",
+            "first_name_ar": "موظف",
+            "last_name_ar": "عقد",
+            "first_name_en": "Queue",
+            "last_name_en": "Contractor",
+            "position_ar": "موظف",
+            "position_en": "Staff",
+            "unit_id": 1,
+            "manager_id": "IAU-001",
+            "start_date": start_date.isoformat(),
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 201, response.json()
+    employee_id = response.json()["id"]
+
+    db = SessionLocal()
+    try:
+        repo = DBContractNotificationQueueRepository(db)
+        contract_end = response.json()["contract_end_date"]
+        # Creating the employee planned their current period
+        assert (NOTIFICATION_REPLAN, contract_end) in {
+            (r.notification_type, r.due_date) for r in repo.get_by_employee(employee_id)
+        }
+
+        # A reminder row that has come due, and the next-period replan row
+        repo.replace_for_employees([employee_id], [
+            ContractNotificationDue(employee_id=employee_id, notification_type=NOTIFICATION_40_DAYS,
+                                    due_date=date.today().isoformat(), contract_end_date=contract_end),
+            ContractNotificationDue(employee_id=employee_id, notification_type=NOTIFICATION_REPLAN,
+                                    due_date=contract_end, contract_end_date=contract_end),
+        ])
+
+        notification_scheduler.check_and_send_contract_notifications()
+
+        db.expire_all()
+        remaining = {r.notification_type for r in repo.get_by_employee(employee_id)}
+        assert NOTIFICATION_40_DAYS not in remaining and NOTIFICATION_REPLAN in remaining
+        sent_repo = DBSentNotificationRepository(db)
+        sent = sent_repo.get_sent_keys([employee_id])
+        assert sent == {(employee_id, NOTIFICATION_40_DAYS, contract_end)}
+
+        # Nothing left for today: a second run sends nothing new
+        notification_scheduler.check_and_send_contract_notifications()
+        assert sent_repo.get_sent_keys([employee_id]) == sent
+
+        runs = test_client.get(
+            "/api/admin/notification-runs?limit=2", headers={"Authorization": f"Bearer {admin_token}"}
+        ).json()
+        assert [(r["planned"], r["sent"], r["failed"]) for r in runs] == [(0, 0, 0), (1, 1, 0)]
+        assert runs[1]["due"] >= 1 and runs[1]["error"] is None
+    finally:
+        db.close()
+        test_client.delete(f"/api/employees/{employee_id}", headers={"Authorization": f"Bearer {admin_token}"})
+
+
+class _SlowEmailService:
+    """Fails for one recipient, takes 0.2s per send and records peak concurrency."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def send_email(self, to_email, subject, body, is_html=False):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.2)
+        with self.lock:
+            self.active -= 1
+        if to_email == "down@test.com":
+            raise OSError("connection timed out")
+        return True
+
+
+def test_delivery_is_parallel_and_bounded():
+    from backend.notification_scheduler import PlannedNotification, deliver_notifications
+
+    planned = [
+        PlannedNotification(i, f"EMP-{i}", NOTIFICATION_40_DAYS, "2025-12-10",
+                            "down@test.com" if i == 2 else f"emp{i}@test.com", "subject", "body")
+        for i in range(8)
+    ]
+    service = _SlowEmailService()
+
+    started = time.perf_counter()
+    results = deliver_notifications(service, planned, workers=4)
+    elapsed = time.perf_counter() - started
+
+    assert results == [i != 2 for i in range(8)]
+    assert service.peak == 4
+    assert elapsed < 0.2 * 8 / 2
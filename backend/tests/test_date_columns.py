@@ -0,0 +1,118 @@
+"""
+Tests for typed DATE columns, the composite indexes and SQL date predicates.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+from datetime import datetime
+import pytest
+from sqlalchemy import inspect
+
+
+@pytest.fixture
+def db():
+    from backend.database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def test_date_columns_are_typed(setup_test_database):
+    from backend.database import engine
+    inspector = inspect(engine)
+
+    leave_columns = {c['name']: str(c['type']).upper() for c in inspector.get_columns('leave_requests')}
+    assert leave_columns['start_date'] == 'DATE'
+    assert leave_columns['end_date'] == 'DATE'
+    assert leave_columns['approval_date'] == 'DATE'
+
+    employee_columns = {c['name']: str(c['type']).upper() for c in inspector.get_columns('employees')}
+    assert employee_columns['start_date'] == 'DATE'
+
+    ledger_columns = {c['name']: str(c['type']).upper() for c in inspector.get_columns('leave_balances')}
+    assert ledger_columns['period_start'] == 'DATE'
+    assert ledger_columns['period_end'] == 'DATE'
+    assert ledger_columns['earned_as_of'] == 'DATE'
+
+
+def test_composite_indexes_exist_and_ensure_is_idempotent(setup_test_database):
+    from backend.database import engine
+    from backend.migrations.convert_date_columns import ensure_indexes
+
+    ensure_indexes()
+    inspector = inspect(engine)
+
+    leave_indexes = {idx['name']: idx for idx in inspector.get_indexes('leave_requests')}
+    assert leave_indexes['ix_leave_requests_employee_status_start']['column_names'] == ['employee_id', 'status', 'start_date']
+
+    attendance_indexes = {idx['name']: idx for idx in inspector.get_indexes('attendance_logs')}
+    assert attendance_indexes['ux_attendance_logs_employee_date']['unique']
+
+
+def test_overlap_predicate_runs_in_sql(test_client, admin_token, db):
+    from backend.db_repositories import DBLeaveRequestRepository
+    from backend.models import LeaveRequest
+
+    repo = DBLeaveRequestRepository(db)
+    created = [
+        repo.add(LeaveRequest(id=0, employee_id="IAU-001", vacation_type="Annual", start_date=start,
+                              end_date=end, duration=1, balance_used=1, status=status))
+        for start, end, status in [
+            ("2030-03-01", "2030-03-05", "Approved"),
+            ("2030-03-10", "2030-03-12", "Pending"),
+            ("2030-04-01", "2030-04-02", "Approved"),
+        ]
+    ]
+
+    overlapping = repo.get_overlapping("2030-03-05", "2030-03-10", employee_ids=["IAU-001"])
+    assert [r.id for r in overlapping] == [created[0].id, created[1].id]
+    # Values come back as ISO strings
+    assert overlapping[0].start_date == "2030-03-01"
+
+    approved = repo.get_approved_overlapping(["IAU-001"], "2030-03-01", "2030-12-31")
+    assert [r.id for r in approved] == [created[0].id, created[2].id]
+
+    for request in created:
+        repo.delete(request.id)
+
+
+def test_attendance_is_unique_per_employee_and_day(test_client, admin_token, db):
+    from sqlalchemy.exc import IntegrityError
+    from backend.db_repositories import DBAttendanceRepository
+    from backend.models import AttendanceLog
+
+    repo = DBAttendanceRepository(db)
+    repo.add(AttendanceLog(employee_id="IAU-001", date="2030-01-02", check_in=datetime(2030, 1, 2, 8), status="Present"))
+    assert repo.get_by_employee_and_date("IAU-001", "2030-01-02").date == "2030-01-02"
+
+    with pytest.raises(IntegrityError):
+        repo.add(AttendanceLog(employee_id="IAU-001", date="2030-01-02", check_in=datetime(2030, 1, 2, 9), status="Present"))
+    db.rollback()
+
+
+def test_malformed_date_is_a_bad_request(test_client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    # Passes the endpoint's strptime check but is not an ISO date
+    response = test_client.get("/api/requests?from_date=2030-2-3", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"]["error_code"] == "VALIDATION_ERROR"
+
+
+def test_unconvertible_text_dates_are_found(setup_test_database):
+    from sqlalchemy import text
+    from backend.database import engine
+    from backend.migrations.convert_date_columns import find_unconvertible
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE legacy_dates (id INTEGER PRIMARY KEY, day VARCHAR(10))"))
+        conn.execute(text("INSERT INTO legacy_dates (day) VALUES ('2030-01-02'), ('02/01/2030'), ('02/01/2030'), (NULL), ('')"))
+    try:
+        assert find_unconvertible("legacy_dates", "day", nullable=True) == (2, ["02/01/2030"])
+        assert find_unconvertible("legacy_dates", "day", nullable=False) == (4, ["02/01/2030", None])
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE legacy_dates"))
@@ -0,0 +1,229 @@
+"""
+Tests for the transactional email outbox and its delivery worker.
+
+The worker is run against a local aiosmtpd server standing in for SMTP.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import socket
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+PASSWORD = "OutboxPass123!"
+
+
+def _create_employee(test_client, admin_token, suffix, manager_id, role="employee"):
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": f"outbox_{suffix}@test.com",
+            "password": PASSWORD,
+            "role": role,
+            "first_name_ar": "موظف",
+            "last_name_ar": "بريد",
+            "first_name_en": "Outbox",
+            "last_name_en": suffix,
+            "position_ar": "موظف",
+            "position_en": "Staff",
+            "unit_id": 1,
+            "manager_id": manager_id,
+            "start_date": "2024-01-01",
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 201, response.json()
+    return response.json()["id"]
+
+
+@pytest.fixture
+def db():
+    from backend.database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def clean_outbox(db):
+    from backend.database import EmailOutboxModel
+    db.query(EmailOutboxModel).delete()
+    db.commit()
+    yield
+    db.query(EmailOutboxModel).delete()
+    db.commit()
+
+
+def _unused_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class _Collector:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    from aiosmtpd.controller import Controller
+
+    handler = _Collector()
+    controller = Controller(handler, hostname="127.0.0.1", port=_unused_port())
+    controller.start()
+    try:
+        yield handler, controller.port
+    finally:
+        controller.stop()
+
+
+def _email_service(monkeypatch, port):
+    from backend.email_service import EmailService
+    monkeypatch.setenv("SMTP_ENABLED", "true")
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(port))
+    monkeypatch.setenv("SMTP_USE_TLS", "false")
+    monkeypatch.setenv("SMTP_USERNAME", "")
+    monkeypatch.setenv("SMTP_PASSWORD", "")
+    monkeypatch.setenv("SMTP_TIMEOUT", "5")
+    return EmailService()
+
+
+def test_leave_request_queues_manager_email(test_client, admin_token, clean_outbox, db):
+    from backend.database import EmailOutboxModel
+
+    manager = _create_employee(test_client, admin_token, "manager", "IAU-001", role="manager")
+    _create_employee(test_client, admin_token, "requester", manager)
+    token = test_client.post(
+        "/api/token", data={"username": "outbox_requester@test.com", "password": PASSWORD}
+    ).json()["access_token"]
+
+    response = test_client.post(
+        "/api/requests",
+        json={"vacation_type": "annual", "start_date": "2034-01-10", "end_date": "2034-01-11"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 201
+
+    queued = db.query(EmailOutboxModel).all()
+    assert [(m.to_email, m.status, m.attempts) for m in queued] == [("outbox_manager@test.com", "pending", 0)]
+    assert "New Leave Request" in queued[0].subject
+
+    test_client.delete(f"/api/requests/{response.json()['id']}", headers={"Authorization": f"Bearer {admin_token}"})
+
+
+def test_worker_delivers_over_smtp(monkeypatch, smtp_server, clean_outbox, db):
+    from backend.db_repositories import DBEmailOutboxRepository
+    from backend.email_outbox import OutboxWorker
+
+    handler, port = smtp_server
+    repo = DBEmailOutboxRepository(db)
+    repo.enqueue("one@test.com", "First", "<p>1</p>")
+    repo.enqueue("two@test.com", "Second", "<p>2</p>")
+    db.commit()
+
+    worker = OutboxWorker(email_service=_email_service(monkeypatch, port))
+    assert worker.run_until_idle() == {'sent': 2, 'retried': 0, 'failed': 0}
+
+    assert sorted(rcpt[0] for rcpt, _ in handler.messages) == ["one@test.com", "two@test.com"]
+    assert repo.count_by_status() == {"sent": 2}
+    # Nothing left to deliver
+    assert worker.run_once() == {'sent': 0, 'retried': 0, 'failed': 0}
+
+
+def test_worker_closes_idle_smtp_sessions(monkeypatch, smtp_server, clean_outbox, db):
+    from backend.db_repositories import DBEmailOutboxRepository
+    from backend.email_outbox import OutboxWorker
+    from backend.email_service import close_smtp_pools
+
+    _, port = smtp_server
+    monkeypatch.setenv("SMTP_POOL_IDLE_TIMEOUT", "0")
+    close_smtp_pools()
+    repo = DBEmailOutboxRepository(db)
+    repo.enqueue("idle@test.com", "Idle", "<p>idle</p>")
+    db.commit()
+
+    worker = OutboxWorker(email_service=_email_service(monkeypatch, port), poll_interval=0.05)
+    assert worker.run_until_idle()['sent'] == 1
+    pool = worker.email_service.pool
+    assert pool.stats()["idle"] == 1
+
+    # Nothing is due, so the loop never checks a session out; pruning alone must close it
+    worker.start()
+    try:
+        deadline = time.monotonic() + 5
+        while pool.stats()["idle"] and time.monotonic() < deadline:
+            time.sleep(0.02)
+        stats = pool.stats()
+    finally:
+        worker.stop()
+        close_smtp_pools()
+    assert stats["idle"] == 0
+    assert stats["discarded"] == 1
+    assert stats["created"] == 1
+    assert stats["reused"] == 0
+
+
+def test_worker_retries_with_backoff_then_gives_up(monkeypatch, clean_outbox, db):
+    from backend.database import EmailOutboxModel
+    from backend.db_repositories import DBEmailOutboxRepository
+    from backend.email_outbox import OutboxWorker
+
+    repo = DBEmailOutboxRepository(db)
+    repo.enqueue("down@test.com", "Unreachable", "<p>x</p>")
+    db.commit()
+
+    worker = OutboxWorker(email_service=_email_service(monkeypatch, _unused_port()),
+                          max_attempts=3, base_delay=10, max_delay=15)
+    start = datetime.utcnow()
+
+    assert worker.run_once(now=start)['retried'] == 1
+    message = db.query(EmailOutboxModel).one()
+    assert message.attempts == 1
+    assert message.next_attempt_at == start + timedelta(seconds=10)
+    assert "connection failed" in message.last_error
+
+    # Not due yet
+    assert worker.run_once(now=start + timedelta(seconds=5)) == {'sent': 0, 'retried': 0, 'failed': 0}
+
+    assert worker.run_once(now=start + timedelta(seconds=10))['retried'] == 1
+    db.expire_all()
+    # Second delay is capped at max_delay
+    assert db.query(EmailOutboxModel).one().next_attempt_at == start + timedelta(seconds=25)
+
+    assert worker.run_once(now=start + timedelta(seconds=25))['failed'] == 1
+    db.expire_all()
+    message = db.query(EmailOutboxModel).one()
+    assert (message.status, message.attempts) == ("failed", 3)
+    assert worker.run_once(now=start + timedelta(days=1)) == {'sent': 0, 'retried': 0, 'failed': 0}
+
+
+def test_worker_recovers_when_smtp_comes_back(monkeypatch, smtp_server, clean_outbox, db):
+    from backend.db_repositories import DBEmailOutboxRepository
+    from backend.email_outbox import OutboxWorker
+
+    handler, port = smtp_server
+    repo = DBEmailOutboxRepository(db)
+    repo.enqueue("later@test.com", "Eventually", "<p>y</p>")
+    db.commit()
+
+    start = datetime.utcnow()
+    down = OutboxWorker(email_service=_email_service(monkeypatch, _unused_port()), base_delay=60)
+    assert down.run_once(now=start)['retried'] == 1
+
+    up = OutboxWorker(email_service=_email_service(monkeypatch, port))
+    assert up.run_once(now=start + timedelta(seconds=60))['sent'] == 1
+    assert [rcpt for rcpt, _ in handler.messages] == [["later@test.com"]]
@@ -0,0 +1,71 @@
+"""
+Tests for the precompiled bilingual email templates.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import pytest
+
+from backend.email_templates import (
+    CompiledFormat, get_base_email_template, render_batch,
+    render_leave_request_created_email, render_leave_request_approved_email,
+    render_contract_critical_warning_email
+)
+
+LEAVE = {
+    'employee_name_ar': 'أحمد علي',
+    'employee_name_en': 'Ahmed Ali',
+    'employee_id': 'IAU-100',
+    'vacation_type': 'Annual',
+    'start_date': '2025-03-02',
+    'end_date': '2025-03-06',
+    'duration': 5,
+    'manager_name_ar': 'سارة محمد',
+    'manager_name_en': 'Sara Mohammed',
+    'balance_deducted': 5,
+    'remaining_balance': 12.34,
+}
+
+
+def test_compiled_format_matches_str_format():
+    source = "a {x} b {{literal}} {y:.1f} {x}"
+    assert CompiledFormat(source).render(x="X", y=2.345) == source.format(x="X", y=2.345)
+
+    with pytest.raises(KeyError):
+        CompiledFormat("{missing}").render()
+    with pytest.raises(ValueError):
+        CompiledFormat("{x!r}")
+
+
+def test_rendered_email_wraps_body_in_base_document():
+    html = render_leave_request_created_email(LEAVE)
+    head, tail = get_base_email_template().format(content='\0').split('\0')
+
+    assert html.startswith(head) and html.endswith(tail)
+    assert "<h1>New Leave Request / طلب إجازة جديد</h1>" in html
+    assert "Dear Sara Mohammed" in html and "عزيزي/عزيزتي سارة محمد" in html
+    assert "Annual Vacation" in html and "إجازة اعتيادية" in html
+    # Gregorian in the English column, Hijri in the Arabic column
+    assert "2025-03-02" in html and "1446/09/02" in html
+    assert "{" not in html.split("</style>")[1]
+
+
+def test_format_specs_and_header_style():
+    approved = render_leave_request_approved_email(LEAVE)
+    assert "12.3 day(s)" in approved and "12.3 يوم/أيام" in approved
+
+    critical = render_contract_critical_warning_email({
+        'employee_name_ar': 'أحمد', 'employee_name_en': 'Ahmed', 'contract_end_date': '2025-05-01',
+        'days_remaining': 3, 'vacation_balance': 3.0
+    })
+    assert 'class="header" style="background: linear-gradient(135deg, #dc3545' in critical
+    assert "3.0 day(s)" in critical
+
+
+def test_render_batch_preserves_order():
+    items = [dict(LEAVE, employee_id=f"IAU-{i}") for i in range(3)]
+    emails = render_batch(render_leave_request_created_email, items)
+    assert len(emails) == 3
+    assert all(f"(IAU-{i})" in email for i, email in enumerate(emails))
@@ -0,0 +1,168 @@
+"""
+Tests for the in-process EmployeeWithBalance cache.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import time
+from datetime import date, timedelta
+from uuid import uuid4
+from backend.models import EmployeeWithBalance
+from backend.employee_cache import EmployeeCache, employee_cache
+
+
+def _make_employee(emp_id, employee_type='contractor', balance=10.0):
+    return EmployeeWithBalance(
+        id=emp_id,
+        user_id=uuid4(),
+        first_name_ar="test",
+        last_name_ar="test",
+        first_name_en="Test",
+        last_name_en=emp_id,
+        position_ar="موظف",
+        position_en="Employee",
+        unit_id=1,
+        start_date="2024-01-01",
+        employee_type=employee_type,
+        vacation_balance=balance,
+    )
+
+
+def test_hit_and_miss_counters():
+    cache = EmployeeCache(max_size=10)
+    emp = _make_employee("EMP-001")
+
+    assert cache.get("EMP-001") is None
+    cache.put(emp)
+    assert cache.get("EMP-001") == emp
+    assert cache.get_by_user_id(emp.user_id) == emp
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_returns_copies():
+    cache = EmployeeCache(max_size=10)
+    cache.put(_make_employee("EMP-001"))
+    cache.get("EMP-001").vacation_balance = 0
+    assert cache.get("EMP-001").vacation_balance == 10.0
+
+
+def test_entries_expire_after_ttl():
+    # Other workers never see this worker's invalidations, so entries must expire
+    cache = EmployeeCache(ttl=0.05, max_size=10)
+    cache.put(_make_employee("EMP-001"))
+    assert cache.get("EMP-001") is not None
+
+    time.sleep(0.06)
+    assert cache.get("EMP-001") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction():
+    cache = EmployeeCache(max_size=2)
+    cache.put(_make_employee("EMP-001"))
+    cache.put(_make_employee("EMP-002"))
+    cache.get("EMP-001")
+    cache.put(_make_employee("EMP-003"))
+
+    assert cache.get("EMP-002") is None
+    assert cache.get("EMP-001") is not None
+    assert cache.get("EMP-003") is not None
+
+
+def test_entries_are_keyed_by_date():
+    cache = EmployeeCache(max_size=10)
+    yesterday = date.today() - timedelta(days=1)
+    cache.put(_make_employee("EMP-001"), today=yesterday)
+
+    assert cache.get("EMP-001") is None
+    cache.put(_make_employee("EMP-002"))
+    assert cache.stats()["size"] == 1
+
+
+def test_invalidation():
+    cache = EmployeeCache(max_size=10)
+    contractor = _make_employee("EMP-001")
+    permanent = _make_employee("EMP-002", employee_type='permanent')
+    other = _make_employee("EMP-003")
+    for emp in (contractor, permanent, other):
+        cache.put(emp)
+
+    cache.invalidate_employee("EMP-001")
+    assert cache.get("EMP-001") is None
+
+    cache.invalidate_employee_type('permanent')
+    assert cache.get("EMP-002") is None
+
+    cache.invalidate_user(other.user_id)
+    assert cache.get("EMP-003") is None
+
+
+def test_disabled_cache_never_stores():
+    cache = EmployeeCache(max_size=10, enabled=False)
+    cache.put(_make_employee("EMP-001"))
+    assert cache.get("EMP-001") is None
+    assert cache.stats()["size"] == 0
+
+
+# ==========================================
+# Integration - repository writes invalidate
+# ==========================================
+
+def test_leave_request_write_invalidates_cached_employee(test_client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": "cache_employee@test.com",
+            "password": "CachePass123!",
+            "role": "employee",
+            "first_name_ar": "موظف",
+            "last_name_ar": "ذاكرة",
+            "first_name_en": "Cache",
+            "last_name_en": "Employee",
+            "position_ar": "موظف",
+            "position_en": "Staff Member",
+            "unit_id": 1,
+            "manager_id": "IAU-001",
+            "start_date": (date.today() - timedelta(days=120)).isoformat(),
+        },
+        headers=headers
+    )
+    assert response.status_code == 201, response.json()
+    employee_id = response.json()["id"]
+
+    token = test_client.post(
+        "/api/token",
+        data={"username": "cache_employee@test.com", "password": "CachePass123!"}
+    ).json()["access_token"]
+    start = date.today() - timedelta(days=10)
+    response = test_client.post(
+        "/api/requests",
+        json={"vacation_type": "annual", "start_date": start.isoformat(), "end_date": start.isoformat()},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 201, response.json()
+    leave_request = response.json()
+
+    before = test_client.get(f"/api/employees/{employee_id}", headers=headers).json()["vacation_balance"]
+    hits = employee_cache.stats()["hits"]
+    assert test_client.get(f"/api/employees/{employee_id}", headers=headers).json()["vacation_balance"] == before
+    assert employee_cache.stats()["hits"] > hits
+
+    response = test_client.put(f"/api/requests/{leave_request['id']}", json={"status": "Approved"}, headers=headers)
+    assert response.status_code == 200
+
+    after = test_client.get(f"/api/employees/{employee_id}", headers=headers).json()["vacation_balance"]
+    assert after == round(max(0.0, before - leave_request["duration"]), 2)
+
+
+def test_cache_stats_endpoint(test_client, admin_token):
+    response = test_client.get("/api/admin/employee-cache", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    assert {"enabled", "size", "max_size", "hits", "misses"} <= set(response.json())
@@ -0,0 +1,126 @@
+"""
+Tests for the management hierarchy: in-memory helpers and the
+employee_hierarchy closure table maintained by DBEmployeeRepository.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import pytest
+from types import SimpleNamespace
+from backend.hierarchy import get_all_subordinates, is_subordinate_of
+
+
+def _emp(emp_id, manager_id=None):
+    return SimpleNamespace(id=emp_id, manager_id=manager_id)
+
+
+def test_get_all_subordinates_direct_and_indirect():
+    employees = [_emp("A"), _emp("B", "A"), _emp("C", "B"), _emp("D", "C"), _emp("E", "A")]
+
+    assert sorted(get_all_subordinates("A", employees)) == ["B", "C", "D", "E"]
+    assert sorted(get_all_subordinates("A", employees, include_indirect=False)) == ["B", "E"]
+    assert is_subordinate_of("D", "A", employees)
+    assert not is_subordinate_of("A", "D", employees)
+
+
+def test_get_all_subordinates_tolerates_cycles():
+    employees = [_emp("A", "B"), _emp("B", "A")]
+    assert sorted(get_all_subordinates("A", employees)) == ["A", "B"]
+
+
+# ==========================================
+# Closure table - maintained on employee writes
+# ==========================================
+
+def _create_employee(test_client, admin_token, suffix, manager_id):
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": f"hierarchy_{suffix}@test.com",
+            "password": "HierPass123!",
+            "role": "manager",
+            "first_name_ar": "موظف",
+            "last_name_ar": "هرمي",
+            "first_name_en": "Hierarchy",
+            "last_name_en": suffix,
+            "position_ar": "مدير",
+            "position_en": "Manager",
+            "unit_id": 1,
+            "manager_id": manager_id,
+            "start_date": "2024-01-01",
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 201, response.json()
+    return response.json()["id"]
+
+
+@pytest.fixture
+def repo():
+    from backend.database import SessionLocal
+    from backend.db_repositories import DBEmployeeRepository
+
+    db = SessionLocal()
+    try:
+        yield DBEmployeeRepository(db)
+    finally:
+        db.close()
+
+
+def _closure(repo):
+    from backend.database import EmployeeHierarchyModel
+    repo.db.expire_all()
+    return {(r.ancestor_id, r.descendant_id, r.depth) for r in repo.db.query(EmployeeHierarchyModel).all()}
+
+
+def test_closure_table_follows_manager_changes(test_client, admin_token, repo):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    top = _create_employee(test_client, admin_token, "top", "IAU-001")
+    middle = _create_employee(test_client, admin_token, "middle", top)
+    bottom = _create_employee(test_client, admin_token, "bottom", middle)
+
+    assert repo.get_subordinate_ids(top) == {middle, bottom}
+    assert repo.get_subordinate_ids(top, include_indirect=False) == {middle}
+    assert repo.is_subordinate(bottom, "IAU-001")
+
+    # Move the middle manager (with their report) directly under the admin
+    response = test_client.put(f"/api/employees/{middle}", json={"manager_id": "IAU-001"}, headers=headers)
+    assert response.status_code == 200, response.json()
+    assert repo.get_subordinate_ids(top) == set()
+    assert repo.get_subordinate_ids("IAU-001", include_indirect=False) >= {top, middle}
+    assert repo.is_subordinate(bottom, "IAU-001")
+
+    # Maintained closure equals a full rebuild from manager_id
+    maintained = _closure(repo)
+    repo.rebuild_hierarchy()
+    assert _closure(repo) == maintained
+
+
+def test_cycle_is_rejected(test_client, admin_token, repo):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    upper = _create_employee(test_client, admin_token, "upper", "IAU-001")
+    lower = _create_employee(test_client, admin_token, "lower", upper)
+
+    response = test_client.put(f"/api/employees/{upper}", json={"manager_id": lower}, headers=headers)
+    assert response.status_code == 400
+    assert "cycle" in response.json()["detail"]["message"]
+
+    response = test_client.put(f"/api/employees/{upper}", json={"manager_id": upper}, headers=headers)
+    assert response.status_code == 400
+
+    # Nothing changed
+    repo.db.expire_all()
+    assert repo.get_by_id(upper).manager_id == "IAU-001"
+    assert repo.get_subordinate_ids(upper) == {lower}
+
+
+def test_delete_detaches_subtree(test_client, admin_token, repo):
+    parent = _create_employee(test_client, admin_token, "parent", "IAU-001")
+    child = _create_employee(test_client, admin_token, "child", parent)
+
+    repo.delete(parent)
+
+    assert not repo.is_subordinate(child, "IAU-001")
+    assert all(parent not in (a, d) for a, d, _ in _closure(repo))
@@ -0,0 +1,193 @@
+"""
+Tests for manager digest emails (notification_preference = 'digest').
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+from datetime import datetime, timedelta
+
+import pytest
+
+PASSWORD = "DigestPass123!"
+
+
+def _create_employee(test_client, admin_token, suffix, manager_id, role="employee"):
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": f"digest_{suffix}@test.com",
+            "password": PASSWORD,
+            "role": role,
+            "first_name_ar": "موظف",
+            "last_name_ar": "ملخص",
+            "first_name_en": "Digest",
+            "last_name_en": suffix,
+            "position_ar": "موظف",
+            "position_en": "Staff",
+            "unit_id": 1,
+            "manager_id": manager_id,
+            "start_date": "2024-01-01",
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 201, response.json()
+    return response.json()["id"]
+
+
+def _login(test_client, suffix):
+    token = test_client.post(
+        "/api/token", data={"username": f"digest_{suffix}@test.com", "password": PASSWORD}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _submit(test_client, headers, start, end):
+    response = test_client.post(
+        "/api/requests",
+        json={"vacation_type": "annual", "start_date": start, "end_date": end},
+        headers=headers
+    )
+    assert response.status_code == 201, response.json()
+    return response.json()["id"]
+
+
+@pytest.fixture
+def db():
+    from backend.database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def clean_queues(db):
+    from backend.database import EmailOutboxModel, NotificationDigestItemModel
+    for model in (EmailOutboxModel, NotificationDigestItemModel):
+        db.query(model).delete()
+    db.commit()
+    yield
+    for model in (EmailOutboxModel, NotificationDigestItemModel):
+        db.query(model).delete()
+    db.commit()
+
+
+@pytest.fixture(scope="module")
+def team(test_client, admin_token):
+    digest_manager = _create_employee(test_client, admin_token, "dmanager", "IAU-001", role="manager")
+    immediate_manager = _create_employee(test_client, admin_token, "imanager", "IAU-001", role="manager")
+    _create_employee(test_client, admin_token, "alice", digest_manager)
+    _create_employee(test_client, admin_token, "bob", digest_manager)
+    _create_employee(test_client, admin_token, "carol", immediate_manager)
+
+    response = test_client.put(
+        "/api/users/me/notification-preference",
+        json={"notification_preference": "digest"},
+        headers=_login(test_client, "dmanager")
+    )
+    assert response.status_code == 200
+    assert response.json()["notification_preference"] == "digest"
+    return {"digest_manager": digest_manager, "immediate_manager": immediate_manager}
+
+
+def test_digest_batches_pending_requests(test_client, admin_token, team, clean_queues, db):
+    from backend.database import EmailOutboxModel, NotificationDigestItemModel
+    from backend.notification_digest import flush_due_digests
+
+    alice = _submit(test_client, _login(test_client, "alice"), "2035-02-01", "2035-02-02")
+    bob = _submit(test_client, _login(test_client, "bob"), "2035-02-10", "2035-02-12")
+    withdrawn = _submit(test_client, _login(test_client, "bob"), "2035-03-01", "2035-03-01")
+    carol = _submit(test_client, _login(test_client, "carol"), "2035-02-05", "2035-02-05")
+
+    # Only the immediate-mode manager got an email straight away
+    assert [m.to_email for m in db.query(EmailOutboxModel).all()] == ["digest_imanager@test.com"]
+    items = db.query(NotificationDigestItemModel).all()
+    assert sorted(i.leave_request_id for i in items) == sorted([alice, bob, withdrawn])
+    assert {i.manager_id for i in items} == {team["digest_manager"]}
+
+    test_client.put(
+        f"/api/requests/{withdrawn}", json={"status": "Rejected", "rejection_reason": "Overlap"},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    db.query(EmailOutboxModel).delete()
+    db.commit()
+
+    # Inside the window (default 60 minutes) nothing is sent yet
+    assert flush_due_digests(db, now=datetime.utcnow() + timedelta(minutes=30)) == 0
+    assert db.query(EmailOutboxModel).count() == 0
+
+    assert flush_due_digests(db, now=datetime.utcnow() + timedelta(minutes=61)) == 1
+    digest = db.query(EmailOutboxModel).one()
+    assert digest.to_email == "digest_dmanager@test.com"
+    assert "(2)" in digest.subject
+    assert "Digest alice" in digest.body and "Digest bob" in digest.body
+    assert "2035-03-01" not in digest.body
+
+    # Items are consumed
+    assert db.query(NotificationDigestItemModel).filter(
+        NotificationDigestItemModel.digested_at.is_(None)
+    ).count() == 0
+    assert flush_due_digests(db, now=datetime.utcnow() + timedelta(minutes=120)) == 0
+
+    for request_id in (alice, bob, withdrawn, carol):
+        test_client.delete(f"/api/requests/{request_id}", headers={"Authorization": f"Bearer {admin_token}"})
+
+
+def test_no_email_when_everything_was_decided(test_client, admin_token, team, clean_queues, db):
+    from backend.database import EmailOutboxModel
+    from backend.notification_digest import flush_due_digests
+
+    request_id = _submit(test_client, _login(test_client, "alice"), "2035-04-01", "2035-04-01")
+    test_client.put(
+        f"/api/requests/{request_id}", json={"status": "Rejected", "rejection_reason": "No"},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    db.query(EmailOutboxModel).delete()
+    db.commit()
+
+    assert flush_due_digests(db, now=datetime.utcnow() + timedelta(hours=2)) == 0
+    assert db.query(EmailOutboxModel).count() == 0
+
+    test_client.delete(f"/api/requests/{request_id}", headers={"Authorization": f"Bearer {admin_token}"})
+
+
+def test_items_are_claimed_once_and_purged(test_client, team, clean_queues, db):
+    from backend.database import SessionLocal, NotificationDigestItemModel
+    from backend.db_repositories import DBNotificationDigestRepository
+    from backend.notification_digest import purge_old_digest_items
+
+    repo = DBNotificationDigestRepository(db)
+    repo.add(team["digest_manager"], 424242)
+    item_ids = [item_id for item_id, _ in repo.get_pending_request_ids(team["digest_manager"])]
+
+    # Two workers read the same items; only the first claim wins them
+    other = SessionLocal()
+    try:
+        assert DBNotificationDigestRepository(other).claim(item_ids) == set(item_ids)
+        other.commit()
+    finally:
+        other.close()
+    assert repo.claim(item_ids) == set()
+    db.rollback()
+
+    db.query(NotificationDigestItemModel).update({"digested_at": datetime.utcnow() - timedelta(days=31)})
+    db.commit()
+    assert purge_old_digest_items(days=30) == 1
+
+
+def test_preference_and_window_validation(test_client, admin_token, team):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = test_client.put(
+        "/api/users/me/notification-preference", json={"notification_preference": "weekly"},
+        headers=_login(test_client, "dmanager")
+    )
+    assert response.status_code == 400
+
+    assert test_client.put("/api/settings/portal", json={"digest_window_minutes": 1}, headers=headers).status_code == 400
+    response = test_client.put("/api/settings/portal", json={"digest_window_minutes": 30}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["digest_window_minutes"] == 30
+    test_client.put("/api/settings/portal", json={"digest_window_minutes": 60}, headers=headers)
@@ -0,0 +1,119 @@
+"""
+Tests for the role-scoped approval queue (/api/approvals/pending).
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import pytest
+
+PASSWORD = "QueuePass123!"
+
+
+def _create_employee(test_client, admin_token, suffix, manager_id, role="employee"):
+    response = test_client.post(
+        "/api/employees",
+        json={
+            "email": f"queue_{suffix}@test.com",
+            "password": PASSWORD,
+            "role": role,
+            "first_name_ar": "موظف",
+            "last_name_ar": "طابور",
+            "first_name_en": "Queue",
+            "last_name_en": suffix,
+            "position_ar": "موظف",
+            "position_en": "Staff",
+            "unit_id": 1,
+            "manager_id": manager_id,
+            "start_date": "2024-01-01",
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 201, response.json()
+    return response.json()["id"]
+
+
+def _login(test_client, suffix):
+    response = test_client.post("/api/token", data={"username": f"queue_{suffix}@test.com", "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def team(test_client, admin_token):
+    """manager -> (lead -> member), plus an outsider reporting to the admin."""
+    manager = _create_employee(test_client, admin_token, "manager", "IAU-001", role="manager")
+    lead = _create_employee(test_client, admin_token, "lead", manager)
+    member = _create_employee(test_client, admin_token, "member", lead)
+    outsider = _create_employee(test_client, admin_token, "outsider", "IAU-001")
+    return {"manager": manager, "lead": lead, "member": member, "outsider": outsider}
+
+
+@pytest.fixture
+def requests_in_db(team):
+    from backend.database import SessionLocal
+    from backend.db_repositories import DBLeaveRequestRepository
+    from backend.models import LeaveRequest
+
+    db = SessionLocal()
+    repo = DBLeaveRequestRepository(db)
+    specs = {
+        "lead_pending": (team["lead"], "2032-05-10", "2032-05-12", "Annual", "Pending"),
+        "member_pending": (team["member"], "2032-05-01", "2032-05-03", "Sick", "Pending"),
+        "member_approved": (team["member"], "2032-05-11", "2032-05-11", "Annual", "Approved"),
+        "outsider_pending": (team["outsider"], "2032-05-01", "2032-05-02", "Annual", "Pending"),
+        "outsider_approved": (team["outsider"], "2032-05-10", "2032-05-10", "Annual", "Approved"),
+    }
+    created = {
+        name: repo.add(LeaveRequest(id=0, employee_id=emp, vacation_type=vtype, start_date=start, end_date=end,
+                                    duration=1, balance_used=1, status=status))
+        for name, (emp, start, end, vtype, status) in specs.items()
+    }
+    try:
+        yield created
+    finally:
+        for request in created.values():
+            repo.delete(request.id)
+        db.close()
+
+
+def test_manager_sees_only_their_subtree(test_client, team, requests_in_db):
+    response = test_client.get("/api/approvals/pending", headers=_login(test_client, "manager"))
+    assert response.status_code == 200
+    body = response.json()
+
+    # Soonest start date first; the outsider's request is out of scope
+    assert [item["id"] for item in body["items"]] == [
+        requests_in_db["member_pending"].id, requests_in_db["lead_pending"].id
+    ]
+    assert body["total"] == 2
+    assert body["counts_by_type"] == {"Annual": 1, "Sick": 1}
+    assert body["next_cursor"] is None
+
+    lead_item = body["items"][1]
+    assert lead_item["employee_name_en"] == "Queue lead"
+    # Only in-scope approved requests of other employees count as conflicts
+    assert [c["request_id"] for c in lead_item["conflicts"]] == [requests_in_db["member_approved"].id]
+    assert body["items"][0]["conflicts"] == []
+
+
+def test_pagination_and_admin_scope(test_client, admin_token, team, requests_in_db):
+    headers = _login(test_client, "manager")
+    first = test_client.get("/api/approvals/pending", params={"limit": 1}, headers=headers).json()
+    assert [item["id"] for item in first["items"]] == [requests_in_db["member_pending"].id]
+    assert first["total"] == 2
+
+    second = test_client.get("/api/approvals/pending", params={"limit": 1, "cursor": first["next_cursor"]}, headers=headers).json()
+    assert [item["id"] for item in second["items"]] == [requests_in_db["lead_pending"].id]
+    assert second["next_cursor"] is None
+
+    admin_body = test_client.get(
+        "/api/approvals/pending", params={"limit": 200}, headers={"Authorization": f"Bearer {admin_token}"}
+    ).json()
+    assert requests_in_db["outsider_pending"].id in {item["id"] for item in admin_body["items"]}
+
+
+def test_employees_cannot_read_the_queue(test_client, team):
+    response = test_client.get("/api/approvals/pending", headers=_login(test_client, "member"))
+    assert response.status_code == 403
@@ -0,0 +1,95 @@
+"""
+Tests for the authentication principal cache and its invalidation.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import time
+from uuid import uuid4
+
+import pytest
+
+from backend.models import User
+from backend.principal_cache import PrincipalCache, principal_cache
+
+EMAIL = "principal.cache@test.com"
+
+
+def _user(**fields):
+    return User(email="cached@test.com", password_hash="x", role="employee", **fields)
+
+
+def test_entries_expire_and_are_copies():
+    cache = PrincipalCache(ttl=0.05)
+    user = _user()
+    cache.put(user.email, user)
+
+    cached = cache.get(user.email)
+    cached.role = "admin"
+    assert cache.get(user.email).role == "employee"
+
+    time.sleep(0.06)
+    assert cache.get(user.email) is None
+
+
+def test_read_racing_an_invalidation_is_not_cached():
+    cache = PrincipalCache()
+    user = _user()
+    generation = cache.generation()
+    cache.invalidate_user(uuid4())
+    cache.put(user.email, user, generation)
+    assert cache.get(user.email) is None
+
+
+@pytest.fixture
+def user_token(test_client):
+    from backend.auth import create_access_token
+    from backend.database import SessionLocal
+    from backend.db_repositories import DBUserRepository
+
+    user = User(email=EMAIL, password_hash="unused", role="employee")
+    db = SessionLocal()
+    try:
+        DBUserRepository(db).add(user)
+    finally:
+        db.close()
+    yield user.id, {"Authorization": f"Bearer {create_access_token({'sub': EMAIL})}"}
+
+    db = SessionLocal()
+    try:
+        DBUserRepository(db).delete(user.id)
+    finally:
+        db.close()
+
+
+def test_requests_are_served_from_cache_until_the_user_changes(test_client, user_token):
+    from backend.database import SessionLocal
+    from backend.db_repositories import DBUserRepository
+
+    user_id, headers = user_token
+    # Admin only: 403 means the token was accepted
+    assert test_client.get("/api/users", headers=headers).status_code == 403
+    hits = principal_cache.hits
+    assert test_client.get("/api/users", headers=headers).status_code == 403
+    assert principal_cache.hits == hits + 1
+
+    # Deactivation is seen by the next request
+    db = SessionLocal()
+    try:
+        repo = DBUserRepository(db)
+        user = repo.get_by_id(user_id)
+        user.is_active = False
+        repo.update(user)
+    finally:
+        db.close()
+    assert principal_cache.get(EMAIL) is None
+    assert test_client.get("/api/users", headers=headers).status_code == 400
+
+    db = SessionLocal()
+    try:
+        DBUserRepository(db).delete(user_id)
+    finally:
+        db.close()
+    assert test_client.get("/api/users", headers=headers).status_code == 401
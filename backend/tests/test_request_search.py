@@ -0,0 +1,97 @@
+"""
+Tests for server-side filtering and keyset pagination of /api/requests.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import pytest
+
+from backend.pagination import encode_cursor, decode_cursor, clamp_limit, InvalidCursorError
+
+
+@pytest.fixture
+def seeded_requests(test_client, admin_token):
+    from backend.database import SessionLocal
+    from backend.db_repositories import DBLeaveRequestRepository
+    from backend.models import LeaveRequest
+
+    db = SessionLocal()
+    repo = DBLeaveRequestRepository(db)
+    created = [
+        repo.add(LeaveRequest(id=0, employee_id="IAU-001", vacation_type=vacation_type, start_date=start,
+                              end_date=end, duration=1, balance_used=1, status=status))
+        for start, end, vacation_type, status in [
+            ("2031-01-05", "2031-01-06", "Annual", "Approved"),
+            ("2031-01-05", "2031-01-05", "Sick", "Pending"),
+            ("2031-02-01", "2031-02-03", "Annual", "Pending"),
+            ("2031-03-10", "2031-03-12", "Annual", "Rejected"),
+        ]
+    ]
+    try:
+        yield created
+    finally:
+        for request in created:
+            repo.delete(request.id)
+        db.close()
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("2031-01-05", 42), 2) == ["2031-01-05", "42"]
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_cursor("only-one"), 2)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("!!!", 2)
+    assert clamp_limit(None, 10) is None
+    assert clamp_limit(0, 10) == 1
+    assert clamp_limit(50, 10) == 10
+
+
+def test_filters_are_applied(test_client, admin_token, seeded_requests):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    response = test_client.get(
+        "/api/requests",
+        params={"employee_id": "IAU-001", "status": "Pending", "from_date": "2031-01-01", "to_date": "2031-12-31"},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert [r["id"] for r in response.json()] == [seeded_requests[2].id, seeded_requests[1].id]
+
+    response = test_client.get(
+        "/api/requests",
+        params={"vacation_type": "Annual", "from_date": "2031-01-06", "to_date": "2031-02-01", "unit_id": 1},
+        headers=headers
+    )
+    assert [r["id"] for r in response.json()] == [seeded_requests[2].id, seeded_requests[0].id]
+
+
+def test_keyset_pagination_walks_all_pages(test_client, admin_token, seeded_requests):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    params = {"employee_id": "IAU-001", "from_date": "2031-01-01", "to_date": "2031-12-31", "limit": 1}
+
+    seen = []
+    cursor = None
+    while True:
+        response = test_client.get("/api/requests", params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) == 1
+        seen.extend(r["id"] for r in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # Newest start_date first; ties on start_date broken by id
+    expected = [seeded_requests[3].id, seeded_requests[2].id,
+                max(seeded_requests[0].id, seeded_requests[1].id),
+                min(seeded_requests[0].id, seeded_requests[1].id)]
+    assert seen == expected
+
+
+def test_invalid_cursor_and_dates_are_rejected(test_client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    assert test_client.get("/api/requests", params={"cursor": "bogus"}, headers=headers).status_code == 400
+    assert test_client.get("/api/requests", params={"cursor": encode_cursor("x", 1)}, headers=headers).status_code == 400
+    assert test_client.get("/api/requests", params={"from_date": "01/02/2031"}, headers=headers).status_code == 400
@@ -0,0 +1,94 @@
+"""
+Tests for the database-backed contract notification tracking.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from backend.migrations.import_sent_notifications import parse_key, upgrade as import_sent_notifications
+
+
+@pytest.fixture
+def sent_repo(test_client):
+    from backend.database import SessionLocal, SentNotificationModel
+    from backend.db_repositories import DBSentNotificationRepository
+
+    db = SessionLocal()
+    try:
+        yield DBSentNotificationRepository(db)
+    finally:
+        db.query(SentNotificationModel).filter(SentNotificationModel.employee_id.like("SENT%")).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        db.close()
+
+
+def test_tracker_buffers_until_flush(sent_repo):
+    from backend.notification_scheduler import NotificationTracker
+
+    tracker = NotificationTracker(sent_repo)
+    tracker.load(["SENT-1"])
+    assert not tracker.has_sent("SENT-1", "40_days", "2025-12-10")
+
+    tracker.mark_sent("SENT-1", "40_days", "2025-12-10")
+    tracker.mark_sent("SENT-1", "40_days", "2025-12-10")
+    assert tracker.has_sent("SENT-1", "40_days", "2025-12-10")
+    assert sent_repo.get_sent_keys(["SENT-1"]) == set()
+
+    assert tracker.flush() == 1
+    assert sent_repo.get_sent_keys(["SENT-1"]) == {("SENT-1", "40_days", "2025-12-10")}
+
+    # A second tracker (another run or process) sees the row and cannot insert it twice
+    other = NotificationTracker(sent_repo)
+    assert other.has_sent("SENT-1", "40_days", "2025-12-10")
+    assert sent_repo.add_many([("SENT-1", "40_days", "2025-12-10", "2025-12-01")]) == 0
+
+
+def test_cleanup_deletes_old_rows(sent_repo):
+    from backend.notification_scheduler import NotificationTracker
+
+    old = (date.today() - timedelta(days=401)).isoformat()
+    recent = date.today().isoformat()
+    sent_repo.add_many([
+        ("SENT-2", "critical", "2024-01-01", old),
+        ("SENT-2", "40_days", "2026-01-01", recent),
+    ])
+
+    NotificationTracker(sent_repo).cleanup_old_entries()
+    assert sent_repo.get_sent_keys(["SENT-2"]) == {("SENT-2", "40_days", "2026-01-01")}
+
+
+def test_parse_key():
+    assert parse_key("IAU-001_40_days_2025-12-10") == ("IAU-001", "40_days", "2025-12-10")
+    assert parse_key("EMP_2_critical_2025-12-10") == ("EMP_2", "critical", "2025-12-10")
+    assert parse_key("IAU-001_weekly_2025-12-10") is None
+    assert parse_key("IAU-001_40_days_soon") is None
+    assert parse_key("_critical_2025-12-10") is None
+
+
+def test_json_file_imported_once(sent_repo, tmp_path):
+    path = tmp_path / "sent_notifications.json"
+    today = date.today().isoformat()
+    path.write_text(json.dumps({
+        "SENT-3_40_days_2025-12-10": today,
+        "SENT_4_critical_2025-12-10": today,
+        "SENT-3_critical_2025-12-10": "not a date",
+        "garbage": today,
+    }))
+
+    assert import_sent_notifications(path) == 2
+    assert not path.exists() and (tmp_path / "sent_notifications.json.imported").exists()
+    assert sent_repo.get_sent_keys(["SENT-3", "SENT_4"]) == {
+        ("SENT-3", "40_days", "2025-12-10"),
+        ("SENT_4", "critical", "2025-12-10"),
+    }
+
+    # Already imported: nothing to do
+    assert import_sent_notifications(path) == 0
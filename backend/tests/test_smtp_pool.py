@@ -0,0 +1,209 @@
+"""
+Tests for pooled SMTP sessions and batch sending, against a local aiosmtpd server.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+import smtplib
+import socket
+
+import pytest
+
+from backend.smtp_pool import SMTPConnectionPool, SMTPPoolTimeout, TrackingSMTP
+
+
+def _unused_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class _Collector:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bad@"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.rcpt_tos)
+        return "250 OK"
+
+
+class _Server:
+    """aiosmtpd controller that can be restarted on the same port."""
+
+    def __init__(self):
+        from aiosmtpd.controller import Controller
+        self._controller_class = Controller
+        self.handler = _Collector()
+        self.port = _unused_port()
+        self.controller = None
+
+    def start(self):
+        self.controller = self._controller_class(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    def stop(self):
+        self.controller.stop()
+
+    def connect(self):
+        return smtplib.SMTP("127.0.0.1", self.port, timeout=5)
+
+
+@pytest.fixture
+def smtp():
+    server = _Server()
+    server.start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def email_service(monkeypatch, smtp):
+    from backend.email_service import EmailService, close_smtp_pools
+    monkeypatch.setenv("SMTP_ENABLED", "true")
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(smtp.port))
+    monkeypatch.setenv("SMTP_USE_TLS", "false")
+    monkeypatch.setenv("SMTP_USERNAME", "")
+    monkeypatch.setenv("SMTP_PASSWORD", "")
+    yield EmailService()
+    close_smtp_pools()
+
+
+def _send(server, to_email):
+    server.sendmail("noreply@test.com", to_email, "Subject: hi\r\n\r\nbody")
+
+
+def test_sessions_are_reused(smtp):
+    pool = SMTPConnectionPool(smtp.connect, max_size=2)
+    for i in range(3):
+        with pool.connection() as server:
+            _send(server, f"user{i}@test.com")
+
+    assert len(smtp.handler.messages) == 3
+    assert pool.stats()["created"] == 1
+    assert pool.stats()["reused"] == 2
+    pool.close_all()
+
+
+def test_idle_timeout_closes_old_sessions(smtp):
+    pool = SMTPConnectionPool(smtp.connect, idle_timeout=0)
+    for _ in range(2):
+        with pool.connection() as server:
+            _send(server, "user@test.com")
+    assert pool.stats()["created"] == 2
+    assert pool.prune() == 1
+    assert pool.stats()["idle"] == 0
+
+
+def test_health_check_replaces_dropped_session(smtp):
+    pool = SMTPConnectionPool(smtp.connect, health_check_after=0)
+    with pool.connection() as server:
+        _send(server, "user@test.com")
+
+    smtp.stop()
+    smtp.start()
+
+    with pool.connection() as server:
+        _send(server, "user@test.com")
+    stats = pool.stats()
+    assert stats["health_check_failures"] == 1
+    assert stats["created"] == 2
+    pool.close_all()
+
+
+def test_pool_is_bounded(smtp):
+    pool = SMTPConnectionPool(smtp.connect, max_size=1)
+    with pool.connection():
+        with pytest.raises(SMTPPoolTimeout):
+            with pool.connection(timeout=0.1):
+                pass
+    pool.close_all()
+
+
+def test_session_returned_after_close_is_closed(smtp):
+    pool = SMTPConnectionPool(smtp.connect)
+    with pool.connection() as server:
+        pool.close_all()
+        _send(server, "user@test.com")
+    assert pool.stats()["idle"] == 0
+    assert server.sock is None
+
+
+def test_batch_send_reports_each_message(email_service, smtp):
+    results = email_service.send_batch([
+        ("one@test.com", "First", "<p>1</p>"),
+        ("bad@test.com", "Refused", "<p>x</p>"),
+        ("two@test.com", "Second", "<p>2</p>"),
+    ])
+
+    assert [(r.to_email, r.success) for r in results] == [
+        ("one@test.com", True), ("bad@test.com", False), ("two@test.com", True)
+    ]
+    assert "No such user" in results[1].error
+    assert smtp.handler.messages == [["one@test.com"], ["two@test.com"]]
+    # A refused recipient does not cost the session
+    assert email_service.pool.stats()["created"] == 1
+
+
+def test_send_email_reconnects_after_server_restart(email_service, smtp):
+    assert email_service.send_email("first@test.com", "Hi", "body")
+
+    smtp.stop()
+    smtp.start()
+
+    # The pooled session is dead; the send is retried on a fresh one
+    assert email_service.send_email("second@test.com", "Hi", "body")
+    assert smtp.handler.messages[-1] == ["second@test.com"]
+    assert email_service.pool.stats()["created"] == 2
+
+
+def test_unreachable_server_fails_whole_batch(monkeypatch):
+    from backend.email_service import EmailService, close_smtp_pools
+    monkeypatch.setenv("SMTP_ENABLED", "true")
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(_unused_port()))
+    monkeypatch.setenv("SMTP_USE_TLS", "false")
+    try:
+        results = EmailService().send_batch([("a@test.com", "S", "b"), ("b@test.com", "S", "b")])
+        assert [r.success for r in results] == [False, False]
+        assert all(r.error.startswith("connection failed") for r in results)
+    finally:
+        close_smtp_pools()
+
+
+def test_message_not_resent_after_data_was_accepted(email_service, smtp, monkeypatch):
+    from backend.email_service import EmailService
+    deliveries = []
+    deliver = EmailService.deliver
+
+    def drop_after_data(service, server, to_email, *args):
+        deliveries.append(to_email)
+        deliver(service, server, to_email, *args)
+        assert isinstance(server, TrackingSMTP) and server.data_accepted
+        if to_email == "dropped@test.com":
+            server.close()
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+    monkeypatch.setattr(EmailService, "deliver", drop_after_data)
+    results = email_service.send_batch([
+        ("dropped@test.com", "S", "b"),
+        ("next@test.com", "S", "b"),
+    ])
+
+    # The first message reached the server once and was not sent again
+    assert deliveries == ["dropped@test.com", "next@test.com"]
+    assert smtp.handler.messages == [["dropped@test.com"], ["next@test.com"]]
+    assert [r.success for r in results] == [False, True]
+    assert "not retried" in results[0].error
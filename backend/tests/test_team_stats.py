@@ -0,0 +1,123 @@
+"""
+Tests for the dashboard team statistics engine.
+"""
+import os
+os.environ["DATABASE_URL"] = "sqlite:///./test_iau_portal.db"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only"
+
+from datetime import date, timedelta
+from backend.models import Employee, LeaveRequest
+from backend.team_stats import TeamStatsEngine
+
+
+class _FakeLeaveRequestRepository:
+    def __init__(self, requests):
+        self.requests = requests
+        self.calls = 0
+
+    def get_approved_overlapping(self, employee_ids, start_date, end_date):
+        self.calls += 1
+        return [
+            r for r in self.requests
+            if r.status == 'Approved' and r.employee_id in employee_ids
+            and r.start_date <= end_date and r.end_date >= start_date
+        ]
+
+
+def _make_employee(emp_id, start_date="2024-01-01"):
+    return Employee(
+        id=emp_id,
+        user_id="00000000-0000-0000-0000-000000000000",
+        first_name_ar="test",
+        last_name_ar="test",
+        first_name_en="Test",
+        last_name_en=emp_id,
+        position_ar="موظف",
+        position_en="Employee",
+        unit_id=1,
+        start_date=start_date,
+    )
+
+
+def _make_request(req_id, emp_id, start, end, vacation_type="Annual", status='Approved'):
+    return LeaveRequest(
+        id=req_id,
+        employee_id=emp_id,
+        vacation_type=vacation_type,
+        start_date=start.isoformat(),
+        end_date=end.isoformat(),
+        duration=(end - start).days + 1,
+        status=status,
+        balance_used=(end - start).days + 1,
+    )
+
+
+TODAY = date(2026, 6, 15)
+
+
+def test_period_totals_by_type_and_details():
+    members = [_make_employee("EMP-001"), _make_employee("EMP-002")]
+    repo = _FakeLeaveRequestRepository([
+        _make_request(1, "EMP-001", date(2026, 6, 1), date(2026, 6, 2)),
+        _make_request(2, "EMP-001", date(2026, 6, 5), date(2026, 6, 5), vacation_type="Sick"),
+        _make_request(3, "EMP-001", date(2026, 6, 8), date(2026, 6, 9), status='Pending'),
+        _make_request(4, "EMP-001", date(2026, 1, 1), date(2026, 1, 3)),  # outside the period
+        _make_request(5, "EMP-002", date(2026, 5, 30), date(2026, 6, 1)),  # overlaps the period start
+    ])
+
+    stats = TeamStatsEngine(repo).build(members, 'last_30', date(2026, 5, 31), TODAY, today=TODAY)
+
+    assert stats["EMP-001"]["total_leaves_taken"] == 3
+    assert stats["EMP-001"]["leaves_by_type"] == {"Annual": 2, "Sick": 1}
+    assert [d["start_date"] for d in stats["EMP-001"]["leaves_details"]] == ["2026-06-01", "2026-06-05"]
+    assert stats["EMP-002"]["total_leaves_taken"] == 3
+    assert repo.calls == 1
+
+
+def test_current_status_uses_requests_outside_the_period():
+    members = [_make_employee("EMP-001"), _make_employee("EMP-002")]
+    repo = _FakeLeaveRequestRepository([
+        _make_request(1, "EMP-001", TODAY - timedelta(days=1), TODAY + timedelta(days=1)),
+        _make_request(2, "EMP-002", TODAY, TODAY, status='Rejected'),
+    ])
+
+    stats = TeamStatsEngine(repo).build(members, 'custom', date(2025, 1, 1), date(2025, 1, 31), today=TODAY)
+
+    assert stats["EMP-001"]["current_status"] == 'On Leave'
+    assert stats["EMP-001"]["total_leaves_taken"] == 0
+    assert stats["EMP-002"]["current_status"] == 'Present'
+
+
+def test_full_year_uses_each_members_contract_period():
+    # Contract periods differ per member, so the same request counts for one member only
+    members = [
+        _make_employee("EMP-001", (date.today() - timedelta(days=30)).isoformat()),
+        _make_employee("EMP-002", date.today().isoformat()),
+    ]
+    yesterday = date.today() - timedelta(days=1)
+    repo = _FakeLeaveRequestRepository([
+        _make_request(1, "EMP-001", yesterday, yesterday),
+        _make_request(2, "EMP-002", yesterday, yesterday),
+    ])
+
+    stats = TeamStatsEngine(repo).build(members, 'full_year', date.today(), date.today())
+
+    assert stats["EMP-001"]["total_leaves_taken"] == 1
+    assert stats["EMP-002"]["total_leaves_taken"] == 0
+
+
+def test_empty_team():
+    repo = _FakeLeaveRequestRepository([])
+    assert TeamStatsEngine(repo).build([], 'last_30', TODAY, TODAY) == {}
+    assert repo.calls == 0
+
+
+def test_dashboard_report_for_admin(test_client, admin_token):
+    response = test_client.post(
+        "/api/reports/dashboard",
+        json={"filter_type": "last_90", "language": "en", "date_system": "gregorian"},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    assert "dashboard_report_" in response.headers["content-disposition"]
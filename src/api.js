@@ -101,13 +101,61 @@ export const fetchUnits = async () => {
     return handleResponse(response);
 };
 
-export const fetchRequests = async () => {
-    const response = await fetch(`${API_BASE_URL}/requests`, {
+export const fetchPendingApprovals = async (cursor = null, limit = 50) => {
+    const params = new URLSearchParams({ limit });
+    if (cursor) params.append('cursor', cursor);
+    const response = await fetch(`${API_BASE_URL}/approvals/pending?${params}`, {
+        headers: getAuthHeaders(),
+    });
+    return handleResponse(response);
+};
+
+export const bulkDecideRequests = async (requestIds, status, rejectionReason = null) => {
+    const response = await fetch(`${API_BASE_URL}/approvals/bulk`, {
+        method: 'POST',
+        headers: getAuthHeaders(),
+        body: JSON.stringify({ request_ids: requestIds, status, rejection_reason: rejectionReason }),
+    });
+    return handleResponse(response);
+};
+
+const requestsUrl = (filters) => {
+    // Optional filters: employee_id, status, vacation_type, from_date, to_date, unit_id, limit, cursor
+    const params = new URLSearchParams(
+        Object.entries(filters).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    );
+    const query = params.toString();
+    return `${API_BASE_URL}/requests${query ? `?${query}` : ''}`;
+};
+
+export const fetchRequests = async (filters = {}) => {
+    const response = await fetch(requestsUrl(filters), {
         headers: getAuthHeaders(),
     });
     return handleResponse(response);
 };
 
+// One page of requests plus the cursor of the next one (null on the last page)
+export const fetchRequestsPage = async (filters = {}, cursor = null, limit = 200) => {
+    const response = await fetch(requestsUrl({ ...filters, limit, cursor }), {
+        headers: getAuthHeaders(),
+    });
+    const items = await handleResponse(response);
+    return { items, nextCursor: response.headers.get('X-Next-Cursor') };
+};
+
+// Every request matching the filters, fetched page by page
+export const fetchAllRequests = async (filters = {}) => {
+    const items = [];
+    let cursor = null;
+    do {
+        const page = await fetchRequestsPage(filters, cursor);
+        items.push(...page.items);
+        cursor = page.nextCursor;
+    } while (cursor);
+    return items;
+};
+
 export const createRequest = async (requestData) => {
     const response = await fetch(`${API_BASE_URL}/requests`, {
         method: 'POST',
@@ -199,6 +247,15 @@ export const changePassword = async (passwordData) => {
     return handleResponse(response);
 };
 
+export const updateNotificationPreference = async (preference) => {
+    const response = await fetch(`${API_BASE_URL}/users/me/notification-preference`, {
+        method: 'PUT',
+        headers: getAuthHeaders(),
+        body: JSON.stringify({ notification_preference: preference }),
+    });
+    return handleResponse(response);
+};
+
 export const updateRequest = async (requestId, updateData) => {
     const response = await fetch(`${API_BASE_URL}/requests/${requestId}`, {
         method: 'PUT',
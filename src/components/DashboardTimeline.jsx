@@ -1,13 +1,19 @@
-import React, { useState, useMemo } from 'react';
+import React, { useState, useMemo, useEffect } from 'react';
 import { ChevronLeft, ChevronRight } from 'lucide-react';
 import { Link } from 'react-router-dom';
 import { usePortal } from '../context/PortalContext';
+import { fetchAllRequests } from '../api';
 import { convertToHijri, getHijriMonthNames } from '../utils/hijriUtils';
 
-export default function DashboardTimeline({ teamMembers, requests }) {
+const toIsoDate = (date) =>
+  `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}-${String(date.getDate()).padStart(2, '0')}`;
+
+// refreshKey: any value that changes when requests may have changed (e.g. after a decision)
+export default function DashboardTimeline({ teamMembers, refreshKey }) {
   const { t, lang, isHijri, isRTL, units } = usePortal();
   const [currentDate, setCurrentDate] = useState(new Date());
   const [selectedUnit, setSelectedUnit] = useState('all');
+  const [requests, setRequests] = useState([]);
 
   // Generate 60 days starting from current date
   const days = useMemo(() => {
@@ -23,6 +29,25 @@ export default function DashboardTimeline({ teamMembers, requests }) {
     return result;
   }, [currentDate]);
 
+  // Only approved/pending requests overlapping the visible days (and today) are loaded
+  useEffect(() => {
+    const today = new Date();
+    const first = days[0] < today ? days[0] : today;
+    const last = days[days.length - 1] > today ? days[days.length - 1] : today;
+    const filters = {
+      from_date: toIsoDate(first),
+      to_date: toIsoDate(last),
+      unit_id: selectedUnit === 'all' ? null : selectedUnit,
+    };
+    let cancelled = false;
+    Promise.all(['Approved', 'Pending'].map(status => fetchAllRequests({ ...filters, status })))
+      .then(([approved, pending]) => {
+        if (!cancelled) setRequests([...approved, ...pending]);
+      })
+      .catch(e => console.error("fetchRequests failed", e));
+    return () => { cancelled = true; };
+  }, [days, selectedUnit, refreshKey]);
+
   // Filter team members by unit
   const filteredTeamMembers = useMemo(() => {
     if (selectedUnit === 'all') {
@@ -3,7 +3,7 @@ import { TRANSLATIONS } from '../utils/translations';
 import {
   fetchUsers,
   fetchEmployees,
-  fetchRequests,
+  fetchAllRequests,
   fetchUnits,
   login as apiLogin,
   createRequest as apiCreateRequest,
@@ -60,6 +60,8 @@ export const PortalProvider = ({ children }) => {
 
   const userRole = user?.role;
   const userId = user?.user_id;
+  // Employee ID of the current user; `requests` holds only this employee's own requests
+  const employeeId = user?.id;
 
   const refreshData = useCallback(async () => {
     if (!userId) {
@@ -76,7 +78,9 @@ export const PortalProvider = ({ children }) => {
       const [usersResult, employeesResult, requestsResult, unitsResult, attendanceResult] = await Promise.all([
         isAdmin ? fetchUsers().catch(e => { console.error("fetchUsers failed", e); return []; }) : Promise.resolve([]),
         fetchEmployees().catch(e => { console.error("fetchEmployees failed", e); return []; }),
-        fetchRequests().catch(e => { console.error("fetchRequests failed", e); return []; }),
+        employeeId
+          ? fetchAllRequests({ employee_id: employeeId }).catch(e => { console.error("fetchRequests failed", e); return []; })
+          : Promise.resolve([]),
         fetchUnits().catch(e => { console.error("fetchUnits failed", e); return []; }),
         apiGetTodayAttendance().catch(e => { console.error("getAttendance failed", e); return null; }),
       ]);
@@ -121,7 +125,7 @@ export const PortalProvider = ({ children }) => {
     finally {
       setLoading(false);
     }
-  }, [userId, userRole]);
+  }, [userId, userRole, employeeId]);
 
   useEffect(() => {
     const checkAuth = async () => {
@@ -1,22 +1,65 @@
-import React, { useState } from 'react';
-import { CheckCircle, AlertTriangle, Paperclip } from 'lucide-react';
+import React, { useState, useEffect, useCallback } from 'react';
+import { CheckCircle, AlertTriangle, AlertCircle, Paperclip } from 'lucide-react';
 import { usePortal } from '../context/PortalContext';
-import { downloadAttachment } from '../api';
+import { downloadAttachment, fetchPendingApprovals, bulkDecideRequests } from '../api';
 import DashboardTimeline from '../components/DashboardTimeline';
 import { getAllSubordinates } from '../utils/hierarchy';
 
 export default function Approvals() {
-  const { user, employees, requests, updateRequestStatus, t, isRTL, formatDate } = usePortal();
+  const { user, employees, requests, updateRequestStatus, refreshData, t, isRTL, formatDate } = usePortal();
 
   const [rejectingRequestId, setRejectingRequestId] = useState(null);
   const [rejectionReason, setRejectionReason] = useState('');
   const [rejectError, setRejectError] = useState('');
   const [processingRequestId, setProcessingRequestId] = useState(null);
+  // Pending queue comes pre-scoped (with conflicts) from /api/approvals/pending
+  const [pendingRequests, setPendingRequests] = useState([]);
+  const [pendingTotal, setPendingTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [selectedIds, setSelectedIds] = useState([]);
+  const [bulkProcessing, setBulkProcessing] = useState(false);
+
+  const loadPending = useCallback(async (cursor = null) => {
+    try {
+      const page = await fetchPendingApprovals(cursor);
+      setPendingRequests(prev => (cursor ? [...prev, ...page.items] : page.items));
+      setPendingTotal(page.total);
+      setNextCursor(page.next_cursor);
+    } catch (e) {
+      console.error("fetchPendingApprovals failed", e);
+    }
+  }, []);
+
+  useEffect(() => {
+    loadPending();
+  }, [loadPending, requests]);
+
+  const toggleSelected = (reqId) => {
+    setSelectedIds(prev => (prev.includes(reqId) ? prev.filter(id => id !== reqId) : [...prev, reqId]));
+  };
+
+  const handleBulkApprove = async () => {
+    if (selectedIds.length === 0) return;
+    setBulkProcessing(true);
+    try {
+      const result = await bulkDecideRequests(selectedIds, 'Approved');
+      if (result.failed > 0) {
+        alert(`${t.approveFailed || 'Failed to approve request. Please try again.'} (${result.failed})`);
+      }
+      setSelectedIds([]);
+      await refreshData();
+    } catch (error) {
+      console.error("Bulk approve error:", error);
+      alert(t.approveFailed || 'Failed to approve request. Please try again.');
+    } finally {
+      setBulkProcessing(false);
+    }
+  };
 
   // "user" in context is the Employee profile (after refreshData), so user.id is "IAU-XXX".
   // user.role comes from the User account.
 
-  // Filter employees who report to this user (direct and indirect for managers/deans)
+  // Team members for the timeline (direct and indirect reports for managers/deans)
   const teamEmployeeIds = employees
     .filter(e => {
         // Admins see all except themselves
@@ -32,8 +75,6 @@ export default function Approvals() {
     })
     .map(e => e.id);
 
-  const pendingRequests = requests.filter(r => teamEmployeeIds.includes(r.employee_id) && r.status === 'Pending');
-
   const handleRejectClick = (reqId) => {
     setRejectingRequestId(reqId);
     setRejectionReason('');
@@ -90,8 +131,27 @@ export default function Approvals() {
   return (
     <div className="space-y-6">
       <div className="bg-white border border-gray-200">
-        <div className="p-6 border-b border-gray-200 bg-gray-50">
-          <h2 className="text-xl font-bold text-primary">{t.approvals}</h2>
+        <div className="p-6 border-b border-gray-200 bg-gray-50 flex items-center justify-between gap-4">
+          <h2 className="text-xl font-bold text-primary">{t.approvals}{pendingTotal > 0 && ` (${pendingTotal})`}</h2>
+          {pendingRequests.length > 0 && (
+            <div className="flex items-center gap-3">
+              <label className="flex items-center gap-2 text-sm text-gray-600">
+                <input
+                  type="checkbox"
+                  checked={selectedIds.length === pendingRequests.length}
+                  onChange={(e) => setSelectedIds(e.target.checked ? pendingRequests.map(r => r.id) : [])}
+                />
+                {t.selectAll || 'Select all'}
+              </label>
+              <button
+                onClick={handleBulkApprove}
+                disabled={selectedIds.length === 0 || bulkProcessing}
+                className="px-4 py-2 text-sm font-medium text-white bg-primary hover:bg-primary-hover transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                {bulkProcessing ? (t.approving || 'Approving...') : `${t.approveSelected || 'Approve selected'} (${selectedIds.length})`}
+              </button>
+            </div>
+          )}
         </div>
         <div className="divide-y divide-gray-200">
         {pendingRequests.length === 0 ? (
@@ -101,36 +161,27 @@ export default function Approvals() {
           </div>
         ) : (
           pendingRequests.map(req => {
-             const requester = employees.find(e => e.id === req.employee_id);
-             
-             // Conflict Detection
-             const conflicts = requests.filter(r => {
-                 if (r.status !== 'Approved') return false;
-                 // Check if the other request is from a team member (or any employee if Admin)
-                 // We want to know if *other* people in the team are away.
-                 if (!teamEmployeeIds.includes(r.employee_id)) return false;
-                 if (r.employee_id === req.employee_id) return false;
-                 
-                 const startA = new Date(req.start_date);
-                 const endA = new Date(req.end_date);
-                 const startB = new Date(r.start_date);
-                 const endB = new Date(r.end_date);
-                 
-                 return startA <= endB && endA >= startB;
-             });
+             // Other team members already approved to be away (computed by the server)
+             const conflicts = req.conflicts || [];
 
              return (
               <div key={req.id} className="p-6 flex flex-col md:flex-row justify-between gap-4">
                 <div className="flex items-start gap-4 flex-1">
+                   <input
+                     type="checkbox"
+                     className="mt-3"
+                     checked={selectedIds.includes(req.id)}
+                     onChange={() => toggleSelected(req.id)}
+                   />
                    <div className="h-10 w-10 rounded-full bg-blue-100 flex items-center justify-center text-blue-700 font-bold shrink-0">
-                     {(isRTL ? requester?.first_name_ar : requester?.first_name_en)?.charAt(0)}
+                     {(isRTL ? req.employee_name_ar : req.employee_name_en)?.charAt(0)}
                    </div>
                    <div className="flex-1">
                      <div className="font-bold text-primary">
-                        {isRTL ? `${requester?.first_name_ar} ${requester?.last_name_ar}` : `${requester?.first_name_en} ${requester?.last_name_en}`}
+                        {isRTL ? req.employee_name_ar : req.employee_name_en}
                      </div>
                      <div className="text-xs text-gray-500 mb-2">
-                        {isRTL ? requester?.position_ar : requester?.position_en}
+                        {isRTL ? req.position_ar : req.position_en}
                      </div>
                      <div className="bg-gray-100 p-2 rounded text-sm text-gray-700 inline-block border border-gray-200 mb-2">
                         <span className="flex items-center gap-2">
@@ -154,24 +205,22 @@ export default function Approvals() {
                                 {t.conflicts || "Conflicts"}: {conflicts.length} {t.othersOnLeave || "other(s) on leave"}
                             </div>
                             <ul className="list-disc list-inside space-y-1 ml-1 text-orange-700">
-                                {conflicts.map(c => {
-                                    const cUser = employees.find(e => e.id === c.employee_id);
-                                    const cName = isRTL ? `${cUser?.first_name_ar} ${cUser?.last_name_ar}` : `${cUser?.first_name_en} ${cUser?.last_name_en}`;
-                                    return <li key={c.id}>{cName} ({formatDate(c.start_date)} - {formatDate(c.end_date)})</li>
-                                })}
+                                {conflicts.map(c => (
+                                    <li key={c.request_id}>{isRTL ? c.employee_name_ar : c.employee_name_en} ({formatDate(c.start_date)} - {formatDate(c.end_date)})</li>
+                                ))}
                             </ul>
                         </div>
                      )}
 
-                     {req.vacation_type?.toLowerCase() === 'annual' && requester && req.duration > requester.vacation_balance && (
+                     {req.exceeds_balance && (
                         <div className="mt-2 text-xs text-red-800 bg-red-50 p-3 rounded border border-red-200">
                             <div className="flex items-center gap-1 font-bold mb-1">
                                 <AlertCircle size={14} className="text-red-600"/>
                                 {t.negativeBalanceWarning || "Negative Balance Warning"}
                             </div>
                             <p className="text-red-700">
-                                {t.exceedsBalance || "This request exceeds employee's available balance"} ({requester.vacation_balance} {t.days || "days"}).
-                                {t.willResultIn || " Approving will result in"} <strong className="text-red-900">{requester.vacation_balance - req.duration} {t.days || "days"}</strong>.
+                                {t.exceedsBalance || "This request exceeds employee's available balance"} ({req.vacation_balance} {t.days || "days"}).
+                                {t.willResultIn || " Approving will result in"} <strong className="text-red-900">{req.vacation_balance - req.duration} {t.days || "days"}</strong>.
                             </p>
                         </div>
                      )}
@@ -216,12 +265,22 @@ export default function Approvals() {
              );
           })
         )}
+        {nextCursor && (
+          <div className="p-4 text-center">
+            <button
+              onClick={() => loadPending(nextCursor)}
+              className="px-4 py-2 text-sm font-medium text-primary border border-gray-200 hover:bg-gray-50 transition-colors"
+            >
+              {t.loadMore || 'Load more'}
+            </button>
+          </div>
+        )}
         </div>
       </div>
 
       {/* Team Timeline */}
       {teamMembers.length > 0 && (
-        <DashboardTimeline teamMembers={teamMembers} requests={requests} />
+        <DashboardTimeline teamMembers={teamMembers} refreshKey={requests} />
       )}
     </div>
   );
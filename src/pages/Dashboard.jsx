@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { FileDown, CheckCircle, LogIn, LogOut, AlertTriangle, AlertCircle, Clock, ChevronDown, CalendarClock, CheckSquare } from 'lucide-react';
 import { usePortal } from '../context/PortalContext';
-import { downloadDashboardReport, getExpiringContracts, getContractsNeedingVerification } from '../api';
+import { downloadDashboardReport, getExpiringContracts, getContractsNeedingVerification, fetchPendingApprovals } from '../api';
 import { useNavigate } from 'react-router-dom';
 import DashboardTimeline from '../components/DashboardTimeline';
 import { getAllSubordinates } from '../utils/hierarchy';
@@ -40,10 +40,10 @@ export default function Dashboard() {
     fetchContractNotifications();
   }, [user.role]);
 
-  // Calculate balances
+  // Calculate balances (the context holds only the user's own requests)
   const availableBalance = user.vacation_balance || 0;
   const usedBalance = requests
-    .filter(r => r.employee_id === user.id && r.status === 'Approved')
+    .filter(r => r.status === 'Approved')
     .reduce((acc, curr) => acc + curr.duration, 0);
   const totalEarned = availableBalance + usedBalance;
   
@@ -61,19 +61,14 @@ export default function Dashboard() {
       return false;
   });
 
-  // Count pending requests for managers/admins/deans
-  const pendingRequests = requests.filter(r => {
-    if (user.role?.toLowerCase() === 'admin' || user.role?.toLowerCase() === 'dean') return r.status === 'Pending';
-    if (user.role?.toLowerCase() === 'manager') {
-      const employee = employees.find(e => e.id === r.employee_id);
-      if (!employee) return false;
-      // Check if employee is a subordinate (direct or indirect)
-      const subordinateIds = getAllSubordinates(user.id, employees, true);
-      return r.status === 'Pending' && subordinateIds.includes(employee.id);
-    }
-    return false;
-  });
-  const pendingCount = pendingRequests.length;
+  // Pending requests awaiting this manager/admin/dean, counted by the API (same scope as Approvals)
+  const [pendingCount, setPendingCount] = useState(0);
+  useEffect(() => {
+    if (!['admin', 'manager', 'dean'].includes(user.role?.toLowerCase())) return;
+    fetchPendingApprovals(null, 1)
+      .then(page => setPendingCount(page.total))
+      .catch(error => console.error('Failed to fetch pending approvals:', error));
+  }, [user.role, requests]);
 
   const formatTime = (isoString) => {
     if (!isoString) return '--:--';
@@ -319,7 +314,7 @@ export default function Dashboard() {
 
       {/* Timeline Calendar for Managers/Admins/Deans */}
       {(user.role?.toLowerCase() === 'manager' || user.role?.toLowerCase() === 'admin' || user.role?.toLowerCase() === 'dean') && teamMembers.length > 0 && (
-        <DashboardTimeline teamMembers={teamMembers} requests={requests} />
+        <DashboardTimeline teamMembers={teamMembers} refreshKey={requests} />
       )}
     </div>
   );
@@ -4,8 +4,8 @@ import { usePortal } from '../context/PortalContext';
 import { downloadRequestForm, downloadAttachment } from '../api';
 
 export default function MyRequests() {
-  const { user, requests, t, updateRequestStatus, formatDate, isRTL } = usePortal();
-  const myRequests = requests.filter(r => r.employee_id === user.id);
+  // The context loads only the current user's requests (filtered by the API)
+  const { requests: myRequests, t, updateRequestStatus, formatDate, isRTL } = usePortal();
 
   const generateDocx = async (req) => {
     try {
@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { CheckCircle, FileText, Trash2 } from 'lucide-react';
 import { usePortal } from '../context/PortalContext';
-import { changePassword } from '../api';
+import { changePassword, updateNotificationPreference } from '../api';
 
 export default function Profile() {
    const { user, uploadSignature, deleteSignature, t, lang } = usePortal();
@@ -9,6 +9,8 @@ export default function Profile() {
    const [newPassword, setNewPassword] = useState('');
    const [message, setMessage] = useState(null);
    const [loading, setLoading] = useState(false);
+   const [notificationPreference, setNotificationPreference] = useState(user.notification_preference || 'immediate');
+   const [preferenceMessage, setPreferenceMessage] = useState(null);
 
    const handleFile = async (e) => {
      const file = e.target.files[0];
@@ -59,6 +61,18 @@ export default function Profile() {
        }
    };
 
+   const handlePreferenceChange = async (e) => {
+       const preference = e.target.value;
+       setPreferenceMessage(null);
+       try {
+           await updateNotificationPreference(preference);
+           setNotificationPreference(preference);
+           setPreferenceMessage({ type: 'success', text: t.notificationPreferenceSaved || 'Notification preference saved' });
+       } catch (err) {
+           setPreferenceMessage({ type: 'error', text: err.message || 'Failed to save notification preference' });
+       }
+   };
+
    return (
      <div className="max-w-2xl mx-auto space-y-6">
        {/* ... Header ... */}
@@ -138,6 +152,22 @@ export default function Profile() {
              </button>
           </form>
        </div>
+
+       {['manager', 'dean', 'admin'].includes(user.role) && (
+         <div className="bg-white p-8 rounded-xl shadow-sm border border-gray-100">
+            <h4 className="font-bold text-primary mb-2">{t.leaveRequestEmails || "Leave Request Emails"}</h4>
+            <p className="text-xs text-gray-500 mb-4">{t.leaveRequestEmailsHint || "Get an email for every new request from your team, or one summary of pending requests per digest window."}</p>
+            {preferenceMessage && <div className={`mb-4 p-2 rounded text-sm ${preferenceMessage.type === 'error' ? 'bg-red-50 text-red-600' : 'bg-green-50 text-green-600'}`}>{preferenceMessage.text}</div>}
+            <select
+              value={notificationPreference}
+              onChange={handlePreferenceChange}
+              className="border p-2 focus:ring-2 focus:ring-primary"
+            >
+              <option value="immediate">{t.notifyImmediately || "One email per request"}</option>
+              <option value="digest">{t.notifyDigest || "Digest of pending requests"}</option>
+            </select>
+         </div>
+       )}
      </div>
    );
 }
\ No newline at end of file
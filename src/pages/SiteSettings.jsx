@@ -13,7 +13,7 @@ export default function SiteSettings() {
   const [message, setMessage] = useState(null);
 
   // Portal settings state
-  const [portalSettings, setPortalSettings] = useState({ max_carry_over_days: 15 });
+  const [portalSettings, setPortalSettings] = useState({ max_carry_over_days: 15, digest_window_minutes: 60 });
   const [savingPortalSettings, setSavingPortalSettings] = useState(false);
 
   useEffect(() => {
@@ -34,7 +34,10 @@ export default function SiteSettings() {
     setSavingPortalSettings(true);
     setMessage(null);
     try {
-      await updatePortalSettings({ max_carry_over_days: portalSettings.max_carry_over_days });
+      await updatePortalSettings({
+        max_carry_over_days: portalSettings.max_carry_over_days,
+        digest_window_minutes: portalSettings.digest_window_minutes
+      });
       setMessage({ type: 'success', text: t.portalSettingsSaved || 'Portal settings saved successfully' });
     } catch (error) {
       setMessage({ type: 'error', text: error.message || 'Failed to save portal settings' });
@@ -186,6 +189,24 @@ export default function SiteSettings() {
                 onChange={(e) => setPortalSettings({ ...portalSettings, max_carry_over_days: parseInt(e.target.value) || 0 })}
                 className="w-32 px-3 py-2 border border-gray-300 focus:ring-2 focus:ring-primary focus:border-transparent"
               />
+            </div>
+          </div>
+          <div>
+            <label className="block text-sm font-medium text-gray-700 mb-1">
+              {t.digestWindowMinutes || 'Digest Window (minutes)'}
+            </label>
+            <p className="text-xs text-gray-500 mb-2">
+              How long new requests are collected before managers on digest mode get one summary email (5-1440).
+            </p>
+            <div className="flex items-center gap-3">
+              <input
+                type="number"
+                min="5"
+                max="1440"
+                value={portalSettings.digest_window_minutes}
+                onChange={(e) => setPortalSettings({ ...portalSettings, digest_window_minutes: parseInt(e.target.value) || 0 })}
+                className="w-32 px-3 py-2 border border-gray-300 focus:ring-2 focus:ring-primary focus:border-transparent"
+              />
               <button
                 onClick={handleSavePortalSettings}
                 disabled={savingPortalSettings}